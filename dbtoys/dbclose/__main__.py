@@ -4,9 +4,12 @@ import sys
 
 import pandas
 
+from dbtoys.dbclose.adjustments import ADJUSTMENTS
 from dbtoys.dbclose.app import _PROG
+from dbtoys.dbclose.app import DEFAULT_DATASET
 from dbtoys.dbclose.app import main
 from dbtoys.utilities.parser import ToyParser
+from dbtoys.utilities.parser import run_main
 
 
 def _parse_args(*args):
@@ -29,6 +32,33 @@ def _parse_args(*args):
         help="the date to request in ISO 8601 format",
         default=pandas.Timestamp.today().date().isoformat(),
     )
+    parser.add_argument(
+        "-s",
+        "--start",
+        type=pandas.Timestamp.fromisoformat,
+        metavar="YYYY-MM-DD",
+        help="print every close from this date to --date",
+        default=None,
+    )
+    parser.add_argument(
+        "--dataset",
+        type=str,
+        help=f"the dataset to request, defaults to {DEFAULT_DATASET}",
+        default=DEFAULT_DATASET,
+    )
+    parser.add_argument(
+        "--adjust",
+        choices=ADJUSTMENTS,
+        help="the corporate actions to adjust closes for",
+        default="none",
+    )
+    parser.add_argument(
+        "--actions",
+        type=str,
+        metavar="PATH",
+        help="a CSV or Parquet file of symbol, ex_date, action and value",
+        default=None,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -38,4 +68,4 @@ def _parse_args(*args):
     return dict(vars(parser.parse_args(*args)).items())
 
 
-sys.exit(main(**_parse_args(sys.argv[1:])))
+sys.exit(run_main(_PROG, main, _parse_args(sys.argv[1:])))
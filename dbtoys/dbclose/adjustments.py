@@ -0,0 +1,106 @@
+"""Corporate action adjustments of close prices.
+Closes are adjusted backwards, so the latest close is unchanged and earlier
+closes are scaled to be comparable with it. Every action contributes a factor
+to the closes before its ex date; the factor of a close is the product of
+the factors of every later action, a reversed cumulative product down each
+column of the close matrix.
+"""
+import logging
+from pathlib import Path
+from typing import Tuple
+from typing import Union
+
+import numpy
+import pandas
+
+_LOG = logging.getLogger()
+
+ADJUSTMENTS: Tuple[str, ...] = ("none", "splits", "total")
+ACTION_TYPES: Tuple[str, ...] = ("split", "dividend")
+ACTION_COLUMNS: Tuple[str, ...] = ("symbol", "ex_date", "action", "value")
+
+
+def load_actions(path: Union[str, Path]) -> pandas.DataFrame:
+    """Load a table of corporate actions from a CSV or Parquet file.
+    The table has a row per action with its symbol, ex_date, action and
+    value; the value of a split is the number of shares after the split per
+    share before it, and the value of a dividend is its cash amount.
+    :param path: The CSV or Parquet file.
+    :return: The actions.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        actions = pandas.read_parquet(path)
+    else:
+        actions = pandas.read_csv(path)
+    missing = set(ACTION_COLUMNS) - set(actions.columns)
+    if missing:
+        raise ValueError(
+            f"{path} is missing the columns {', '.join(sorted(missing))}"
+        )
+    unknown = set(actions["action"]) - set(ACTION_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown actions {', '.join(sorted(unknown))}")
+    actions = actions.assign(
+        ex_date=pandas.to_datetime(actions["ex_date"]).dt.normalize(),
+        value=actions["value"].astype(float),
+    )
+    _LOG.debug("Loaded %s corporate actions from %s", len(actions), path)
+    return actions[list(ACTION_COLUMNS)]
+
+
+def adjustment_factors(
+    closes: pandas.DataFrame,
+    actions: pandas.DataFrame,
+    adjust: str = "total",
+) -> numpy.ndarray:
+    """Compute the cumulative adjustment factor of every close.
+    :param closes: Closes indexed by sorted date with a column per symbol.
+    :param actions: Corporate actions as returned by load_actions.
+    :param adjust: One of ADJUSTMENTS.
+    :return: An array of factors the shape of closes.
+    """
+    if adjust not in ADJUSTMENTS:
+        raise ValueError(f"Unknown adjustment {adjust}")
+    factors = numpy.ones(closes.shape)
+    if adjust == "none" or closes.empty:
+        return factors
+    if adjust == "splits":
+        actions = actions[actions["action"] == "split"]
+
+    dates = pandas.DatetimeIndex(closes.index).tz_localize(None).normalize()
+    columns = closes.columns.get_indexer(actions["symbol"])
+    ex_dates = pandas.DatetimeIndex(actions["ex_date"]).tz_localize(None)
+    # An action adjusts every close before its ex date; its factor is placed
+    # on the last of them and carried back by the cumulative product.
+    rows = dates.searchsorted(ex_dates, side="left") - 1
+    keep = (columns >= 0) & (rows >= 0)
+    rows = rows[keep]
+    columns = columns[keep]
+    values = actions["value"].to_numpy(float)[keep]
+    is_split = (actions["action"] == "split").to_numpy()[keep]
+
+    previous = closes.to_numpy(float)[rows, columns]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        event_factors = numpy.where(
+            is_split, 1.0 / values, 1.0 - values / previous
+        )
+    # Actions without a usable close before them leave prices unchanged.
+    event_factors[~numpy.isfinite(event_factors) | (event_factors <= 0)] = 1.0
+
+    numpy.multiply.at(factors, (rows, columns), event_factors)
+    return numpy.cumprod(factors[::-1], axis=0)[::-1]
+
+
+def adjust_closes(
+    closes: pandas.DataFrame,
+    actions: pandas.DataFrame,
+    adjust: str = "total",
+) -> pandas.DataFrame:
+    """Adjust a matrix of closes for corporate actions in one pass.
+    :param closes: Closes indexed by sorted date with a column per symbol.
+    :param actions: Corporate actions as returned by load_actions.
+    :param adjust: One of ADJUSTMENTS.
+    :return: The adjusted closes.
+    """
+    return closes * adjustment_factors(closes, actions, adjust)
@@ -3,21 +3,175 @@
 import datetime
 import logging
 import logging.config
+import sqlite3
 import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+from typing import Dict
 from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Union
 
+import pandas
+from databento.common.enums import SType
+
+import dbtoys.utilities.client
+import dbtoys.utilities.dbz
 import dbtoys.utilities.key
 import dbtoys.utilities.logging
 import dbtoys.utilities.parser
+import dbtoys.utilities.render
+import dbtoys.utilities.symbology
+from dbtoys.dbclose import adjustments
 
 _LOG = logging.getLogger()
 _PROG = "dbclose"
 
+DEFAULT_DATASET: str = "XNAS.ITCH"
+CLOSE_SCHEMA: str = "ohlcv-1d"
+
+
+def read_closes(
+    path: Union[str, Path],
+    metadata: Optional[Dict[str, Any]] = None,
+    mappings: Optional[
+        Dict[str, List[dbtoys.utilities.symbology.SymbolInterval]]
+    ] = None,
+) -> pandas.DataFrame:
+    """Read the closes of a DBZ file of daily bars.
+    :param path: The DBZ file of ohlcv-1d records.
+    :param metadata: The DBZ metadata; read from the file if not given.
+    :param mappings: If given, the product ID intervals of the requested
+        symbols, which name the columns instead of the metadata.
+    :return: Closes indexed by date with a column per symbol.
+    """
+    frames = [
+        pandas.DataFrame(
+            {
+                "date": pandas.to_datetime(
+                    records["ts_event"], utc=True
+                ).normalize(),
+                "product_id": records["product_id"],
+                "close": records["close"]
+                * dbtoys.utilities.dbz.FIXED_PRICE_SCALE,
+            }
+        )
+        for records in dbtoys.utilities.dbz.iter_records(path, CLOSE_SCHEMA)
+    ]
+    if not frames:
+        return pandas.DataFrame()
+    frame = pandas.concat(frames, ignore_index=True)
+    if mappings is not None:
+        frame = _name_by_intervals(frame, mappings)
+    else:
+        if metadata is None:
+            metadata = dbtoys.utilities.dbz.read_metadata(path)
+        symbols = dbtoys.utilities.dbz.symbol_map(metadata)
+        frame["symbol"] = (
+            frame["product_id"]
+            .map(symbols)
+            .fillna(frame["product_id"].astype(str))
+        )
+    return frame.pivot_table(
+        index="date", columns="symbol", values="close", aggfunc="last"
+    ).sort_index()
+
+
+def _name_by_intervals(
+    frame: pandas.DataFrame,
+    mappings: Dict[str, List[dbtoys.utilities.symbology.SymbolInterval]],
+) -> pandas.DataFrame:
+    """Name the closes of each product by the symbols it was on each date."""
+    intervals = pandas.DataFrame(
+        [
+            (
+                symbol,
+                int(interval.product_id),
+                pandas.Timestamp(interval.start_date, tz="UTC"),
+                pandas.Timestamp(interval.end_date, tz="UTC"),
+            )
+            for symbol, symbol_intervals in mappings.items()
+            for interval in symbol_intervals
+        ],
+        columns=["symbol", "product_id", "start", "end"],
+    ).astype({"product_id": frame["product_id"].dtype})
+    named = frame.merge(intervals, on="product_id")
+    return named[
+        (named["date"] >= named["start"]) & (named["date"] < named["end"])
+    ]
+
 
-def main(symbols: Iterable[str], date: datetime.date, verbose: bool) -> int:
+def fetch_closes(
+    client: Any,
+    dataset: str,
+    symbols: List[str],
+    start: datetime.date,
+    end: datetime.date,
+    cache: Optional[dbtoys.utilities.symbology.SymbologyCache] = None,
+) -> pandas.DataFrame:
+    """Download the daily closes of symbols.
+    With a symbology cache, symbols are resolved to product IDs through it,
+    so only symbols it has not seen are resolved by the API.
+    :param client: The databento historical client.
+    :param dataset: The dataset to request.
+    :param symbols: The symbols to request.
+    :param start: The first date of closes.
+    :param end: The last date of closes.
+    :param cache: If given, the symbology cache to resolve symbols with.
+    :return: Closes indexed by date with a column per symbol.
+    :raises ValueError: If a symbol does not resolve.
+    """
+    start_date = pandas.Timestamp(start).date().isoformat()
+    end_date = (
+        (pandas.Timestamp(end) + pandas.Timedelta(days=1)).date().isoformat()
+    )
+    stype_in = SType.NATIVE.value
+    mappings = None
+    if cache is not None:
+        mappings = dbtoys.utilities.symbology.resolve(
+            client, dataset, symbols, start_date, end_date, cache=cache
+        )
+        unresolved = [symbol for symbol in symbols if symbol not in mappings]
+        if unresolved:
+            raise ValueError(
+                f"Failed to resolve symbols {', '.join(unresolved)} "
+                f"in {dataset}"
+            )
+        symbols = dbtoys.utilities.symbology.product_ids(mappings)
+        stype_in = SType.PRODUCT_ID.value
+
+    with tempfile.TemporaryDirectory(prefix=f"{_PROG}-") as directory:
+        path = Path(directory) / "closes.dbz"
+        client.timeseries.stream(
+            dataset=dataset,
+            symbols=symbols,
+            schema=CLOSE_SCHEMA,
+            start=start_date,
+            end=end_date,
+            stype_in=stype_in,
+            path=str(path),
+        )
+        return read_closes(path, mappings=mappings)
+
+
+def main(
+    symbols: Iterable[str],
+    date: datetime.date,
+    start: Optional[datetime.date],
+    dataset: str,
+    adjust: str,
+    actions: Optional[str],
+    verbose: bool,
+) -> int:
     """Runs the toy dbclose.
     :param symbols: One or more symbols to query the close price of.
     :param date: The date of the close price; defaults to most revent.
+    :param start: If given, print every close from this date to date.
+    :param dataset: The dataset to request.
+    :param adjust: One of adjustments.ADJUSTMENTS.
+    :param actions: A CSV or Parquet file of corporate actions.
     :param verbose: Enables printing of log records to stderr.
     :return: POSIX exit code.
     """
@@ -34,16 +188,49 @@ def main(symbols: Iterable[str], date: datetime.date, verbose: bool) -> int:
         )
 
     _LOG.debug(
-        "Executing %s with arguments: symbols=%s date=%s verbose=%s",
+        "Executing %s with arguments: symbols=%s date=%s start=%s dataset=%s "
+        "adjust=%s actions=%s verbose=%s",
         _PROG,
         symbols,
         date,
+        start,
+        dataset,
+        adjust,
+        actions,
         verbose,
     )
 
+    if adjust != "none" and actions is None:
+        sys.stderr.write(f"--adjust {adjust} needs an --actions file\n")
+        return 1
+
     try:
         api_key = dbtoys.utilities.key.get_api_key(prompt_for_key=True)
-        # TODO: The actual thing ya idiot.
+        client = dbtoys.utilities.client.get_historical_client(key=api_key)
+        try:
+            cache = dbtoys.utilities.symbology.SymbologyCache()
+        except (OSError, sqlite3.Error) as exc:
+            _LOG.warning("Running without the symbology cache: %s", exc)
+            cache = None
+        closes = fetch_closes(
+            client, dataset, list(symbols), start or date, date, cache
+        )
+        if actions is not None:
+            closes = adjustments.adjust_closes(
+                closes, adjustments.load_actions(actions), adjust
+            )
+        if start is None:
+            # Only the latest close, which adjustment leaves unchanged.
+            closes = closes.tail(1)
+        for line in dbtoys.utilities.render.stream_table(
+            (
+                [day.date().isoformat(), *row]
+                for day, row in zip(closes.index, closes.to_numpy())
+            ),
+            headers=["date", *closes.columns],
+            floatfmt=".4f",
+        ):
+            sys.stdout.write(line + "\n")
     except Exception as exc:
         _LOG.exception("Terminating due to unhandled %s!", exc.__class__)
         return 1
@@ -0,0 +1,3 @@
+"""dbexplore, a tool for exploring databento data sets."""
+
+_PROG = "dbexplore"
@@ -1,9 +1,11 @@
 """Entry point for dbexplore."""
 import sys
 
-from dbtoys.dbexplore.app import _PROG
-from dbtoys.dbexplore.app import main
+from dbtoys.dbexplore import _PROG
+from dbtoys.dbexplore.server import DEFAULT_SOCKET_PATH
+from dbtoys.utilities.memory import parse_size
 from dbtoys.utilities.parser import ToyParser
+from dbtoys.utilities.parser import run_main
 
 
 def _parse_args(*args):
@@ -20,13 +22,56 @@ def _parse_args(*args):
         type=str,
         help="parse further arguments as a command and without entering the read-line interface",
     )
+    group.add_argument(
+        "--serve",
+        action="store_true",
+        help="keep dbexplore running and serve cantrips on a local socket",
+    )
+    parser.add_argument(
+        "-r",
+        "--remote",
+        action="store_true",
+        help="forward the cantrip to a dbexplore server started with --serve",
+    )
+    parser.add_argument(
+        "--socket",
+        dest="socket_path",
+        type=str,
+        metavar="PATH",
+        help="the local socket used by --serve and --remote",
+        default=str(DEFAULT_SOCKET_PATH),
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        metavar="SIZE",
+        help="the memory converters and exporters may buffer, such as 512M",
+        default=None,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
         action="store_true",
         help="enables printing of the log to stderr",
     )
-    return dict(vars(parser.parse_args(*args)).items())
+    namespace = parser.parse_args(*args)
+    if namespace.remote and (namespace.serve or not namespace.cantrip):
+        parser.error("-r/--remote requires -c/--cantrip and excludes --serve")
+    return dict(vars(namespace).items())
+
+
+_ARGS = _parse_args(sys.argv[1:])
+if _ARGS.pop("remote"):
+    # The thin client skips importing the application and its dependencies.
+    from dbtoys.dbexplore.server import forward_cantrip
+
+    sys.exit(
+        forward_cantrip(
+            " ".join(_ARGS["cantrip"]),
+            socket_path=_ARGS["socket_path"],
+        )
+    )
 
+from dbtoys.dbexplore.app import main  # pylint: disable=wrong-import-position
 
-sys.exit(main(**_parse_args(sys.argv[1:])))
+sys.exit(run_main(_PROG, main, _ARGS))
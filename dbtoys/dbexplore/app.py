@@ -1,34 +1,83 @@
 """The dbexplore application"""
+import contextlib
 import functools
 import logging
 import logging.config
+import os
+import sqlite3
 import sys
 from pprint import pformat
+from typing import TYPE_CHECKING
+from typing import Any
 from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
 
 import cmd2
 import databento
 import humanize
 from colorama import Fore
+from databento.common.enums import SType
 from databento.historical.error import BentoError
 from tabulate import tabulate
 
+import dbtoys.utilities.client
 import dbtoys.utilities.key
+import dbtoys.utilities.ledger
 import dbtoys.utilities.logging
 import dbtoys.utilities.parser
+import dbtoys.utilities.render
+import dbtoys.utilities.singleflight
+import dbtoys.utilities.symbology
+from dbtoys.dbexplore import _PROG
 from dbtoys.dbexplore import command_parsers
+from dbtoys.dbexplore import planner
+from dbtoys.dbexplore import plugins as dbexplore_plugins
+from dbtoys.dbexplore import server
+
+if TYPE_CHECKING:
+    import dbtoys.utilities.jobs
 
 _LOG = logging.getLogger()
-_PROG = "dbexplore"
 
 
-def main(cantrip: str = "", verbose: bool = False) -> int:
+def _open_store(factory: Callable[[], Any]) -> Any:
+    """Open one of the stores kept under the home directory.
+    :param factory: The store class.
+    :return: The store; None if it cannot be opened, such as on a read only
+        or full home directory, so the explorer runs without it.
+    """
+    try:
+        return factory()
+    except (OSError, sqlite3.Error) as exc:
+        _LOG.warning("Running without the %s: %s", factory.__name__, exc)
+        return None
+
+
+def main(
+    cantrip: str = "",
+    verbose: bool = False,
+    serve: bool = False,
+    socket_path: str = str(server.DEFAULT_SOCKET_PATH),
+    memory_budget: Optional[int] = None,
+) -> int:
     """Runs the toy dbexplore.
     :param cantrip: Read all commands from stdin and then exit.
     :param list_datasets: print a list of datasets; skips entering the readline interface.
     :param verbose: Enables printing of log records to stderr.
+    :param serve: Serve cantrips on a Unix domain socket instead.
+    :param socket_path: The Unix domain socket to serve cantrips on.
+    :param memory_budget: If given, the bytes exports may buffer.
     :return: A POSIX exit code.
     """
+    # The job queue is opened here but its commands are a plugin.
+    # pylint: disable-next=import-outside-toplevel
+    from dbtoys.utilities.jobs import JobQueue
+
     logging.config.dictConfig(dbtoys.utilities.logging.DEFAULT_LOGGING)
     dbtoys.utilities.logging.configure_file_logger(
         logger=_LOG, log_file_name=f"{_PROG}.log"
@@ -42,16 +91,27 @@ def main(cantrip: str = "", verbose: bool = False) -> int:
         )
 
     _LOG.debug(
-        "Executing %s with arguments: cantrip=%s  verbose=%s",
+        "Executing %s with arguments: cantrip=%s  verbose=%s serve=%s "
+        "memory_budget=%s",
         _PROG,
         cantrip,
         verbose,
+        serve,
+        memory_budget,
     )
 
     try:
         api_key = dbtoys.utilities.key.get_api_key(prompt_for_key=True)
-        explorer = DataBentoExplorer(api_key=api_key)
-        if cantrip:
+        explorer = DataBentoExplorer(
+            api_key=api_key,
+            ledger=_open_store(dbtoys.utilities.ledger.Ledger),
+            symbology=_open_store(dbtoys.utilities.symbology.SymbologyCache),
+            memory_budget=memory_budget,
+            job_queue=_open_store(JobQueue),
+        )
+        if serve:
+            server.serve(explorer, socket_path=socket_path)
+        elif cantrip:
             cantrip_str = " ".join(cantrip)
             _LOG.debug(
                 "Running cantrip %s",
@@ -68,7 +128,10 @@ def main(cantrip: str = "", verbose: bool = False) -> int:
 
 
 def log_command(func: Callable) -> Callable:
-    """This is a wrapper to log user commands."""
+    """This is a wrapper to log user commands.
+    When the profile setting is on, the command is also profiled, and when
+    the memory setting is on its peak memory is reported.
+    """
 
     @functools.wraps(func)
     def wrapper(obj, statement, *args, **kwargs):
@@ -76,21 +139,115 @@ def log_command(func: Callable) -> Callable:
             "Processing %s",
             pformat(statement.raw),
         )
-        return func(obj, statement, *args, **kwargs)
+        app = obj._cmd if isinstance(obj, cmd2.CommandSet) else obj
+        profile = getattr(app, "profile", False)
+        memory = getattr(app, "memory", False)
+        if not profile and not memory:
+            return func(obj, statement, *args, **kwargs)
+        # These are only imported once a setting needs them.
+        # pylint: disable-next=import-outside-toplevel
+        from dbtoys.utilities.memory import MemoryMonitor
+
+        # pylint: disable-next=import-outside-toplevel
+        from dbtoys.utilities.profiling import Profiler
+
+        with contextlib.ExitStack() as stack:
+            profiler = (
+                stack.enter_context(Profiler(statement.command))
+                if profile
+                else None
+            )
+            monitor = stack.enter_context(MemoryMonitor()) if memory else None
+            result = func(obj, statement, *args, **kwargs)
+        if profiler is not None:
+            app.perror(profiler.summary(), apply_style=False)
+        if monitor is not None:
+            _LOG.debug("%s %s", statement.command, monitor.summary())
+            app.perror(monitor.summary(), apply_style=False)
+        return result
 
     return wrapper
 
 
+def on_off(value: Any) -> bool:
+    """Convert a setting of on or off, or true or false, to a boolean."""
+    if isinstance(value, str) and value.lower() in ("on", "off"):
+        return value.lower() == "on"
+    return cmd2.utils.to_bool(value)
+
+
+def size_or_off(value: Any) -> Optional[int]:
+    """Convert a setting of a size such as 512M, or off, to bytes or None."""
+    if value is None or str(value).lower() in ("", "off", "none"):
+        return None
+    # pylint: disable-next=import-outside-toplevel
+    from dbtoys.utilities.memory import parse_size
+
+    return parse_size(value)
+
+
 class DataBentoExplorer(cmd2.Cmd):
     """The read-line interpreter for dbexplore."""
 
+    DATA_COMMANDS: str = "Data Commands"
+    DIAGNOSTIC_COMMANDS: str = "Diagnostic Commands"
     METADATA_COMMANDS: str = "Metadata Commands"
+    PLANNING_COMMANDS: str = "Planning Commands"
+
+    def __init__(
+        self,
+        api_key: str,
+        ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+        symbology: Optional[dbtoys.utilities.symbology.SymbologyCache] = None,
+        plugins: Optional[Dict[str, dbexplore_plugins.Plugin]] = None,
+        memory_budget: Optional[int] = None,
+        job_queue: Optional["dbtoys.utilities.jobs.JobQueue"] = None,
+        **kwargs,
+    ):
+        # Plugins are registered when one of their commands is first used;
+        # cmd2 looks up commands while it is initialized.
+        self.plugins: Dict[str, dbexplore_plugins.Plugin] = (
+            dbexplore_plugins.discover() if plugins is None else plugins
+        )
+        self._loaded_plugins: Set[str] = set()
+        self._describing_commands = False
 
-    def __init__(self, api_key: str, **kwargs):
+        # Command sets are registered by load_plugin when first used. cmd2
+        # would otherwise register every CommandSet subclass imported so
+        # far, including those of plugins loaded by other explorers.
+        kwargs.setdefault("auto_load_commands", False)
         super().__init__(**kwargs)
         self.prompt = f"{Fore.MAGENTA}>> {Fore.RESET}"
         self.continuation_prompt = f"{Fore.MAGENTA}>{Fore.RESET}"
 
+        self.profile = False
+        self.add_settable(
+            cmd2.Settable(
+                "profile",
+                on_off,
+                "profile each command and print its hottest functions",
+                self,
+            )
+        )
+        self.memory = False
+        self.add_settable(
+            cmd2.Settable(
+                "memory",
+                on_off,
+                "report the peak memory of each command",
+                self,
+            )
+        )
+        self.memory_budget = memory_budget
+        self.add_settable(
+            cmd2.Settable(
+                "memory_budget",
+                size_or_off,
+                "memory converters may buffer, such as 512M, or off",
+                self,
+            )
+        )
+
         # Hide some builtin cmd2 commands
         self.hidden_commands.append("edit")
         self.hidden_commands.append("eof")
@@ -102,33 +259,201 @@ class DataBentoExplorer(cmd2.Cmd):
         self.hidden_commands.append("shortcuts")
 
         # Databento
-        self._historical_client: databento.Historical = databento.Historical(
-            key=api_key,
+        self._historical_client: databento.Historical = (
+            dbtoys.utilities.client.get_historical_client(key=api_key)
         )
+        self._single_flight = dbtoys.utilities.singleflight.SingleFlight()
+        self.ledger = ledger
+        self.symbology = symbology
+        self.job_queue = job_queue
+
+    def cmd_func(self, command: str) -> Optional[Callable]:
+        """Get the function for a command, loading its plugin if needed."""
+        plugin = self.plugins.get(command)
+        if (
+            plugin is not None
+            and plugin.target not in self._loaded_plugins
+            and not self._describing_commands
+        ):
+            self.load_plugin(plugin)
+        return super().cmd_func(command)
+
+    def _unloaded_plugins(self) -> Dict[str, dbexplore_plugins.Plugin]:
+        return {
+            command: plugin
+            for command, plugin in self.plugins.items()
+            if plugin.target not in self._loaded_plugins
+        }
+
+    def get_all_commands(self) -> List[str]:
+        """Get all commands, including those of plugins not loaded yet, so
+        they are listed by help and completed.
+        """
+        commands = super().get_all_commands()
+        return commands + sorted(set(self._unloaded_plugins()) - set(commands))
+
+    def _build_command_info(
+        self,
+    ) -> Tuple[Dict[str, List[str]], List[str], List[str], List[str]]:
+        """List the commands of plugins under the category of their
+        manifest without loading them.
+        """
+        unloaded = self._unloaded_plugins()
+        self._describing_commands = True
+        try:
+            (
+                categories,
+                documented,
+                undocumented,
+                topics,
+            ) = super()._build_command_info()
+        finally:
+            self._describing_commands = False
+        for command in set(unloaded).intersection(undocumented):
+            undocumented.remove(command)
+            category = categories.setdefault(unloaded[command].category, [])
+            category.append(command)
+            category.sort(key=self.default_sort_key)
+        return categories, documented, undocumented, topics
+
+    def load_plugin(self, plugin: dbexplore_plugins.Plugin):
+        """Import and register the command set of a plugin.
+        :param plugin: The plugin to load.
+        """
+        self._loaded_plugins.add(plugin.target)
+        try:
+            command_set = dbexplore_plugins.load(plugin.target)
+            self.register_command_set(command_set())
+        except (ImportError, AttributeError, TypeError) as exc:
+            self.perror(f"ERROR: Failed to load plugin {plugin.target}: {exc}")
+            _LOG.exception(exc)
 
     @property
     def historical_client(self) -> databento.Historical:
         """The databento historical client"""
         return self._historical_client
 
+    def ppaged_lines(self, lines: Iterable[str], chop: bool = False):
+        """Like ppaged, but lines are written to the pager as they are
+        produced instead of being joined into one message first.
+        :param lines: The lines to show.
+        :param chop: Chop long lines instead of wrapping them.
+        """
+        functional_terminal = (
+            self.stdin.isatty()
+            and self.stdout.isatty()
+            and (
+                sys.platform.startswith("win")
+                or os.environ.get("TERM") is not None
+            )
+        )
+        if (
+            functional_terminal
+            and not self._redirecting  # pylint: disable=protected-access
+            and not self.in_pyscript()
+            and not self.in_script()
+        ):
+            with self.sigint_protection:
+                dbtoys.utilities.render.page(
+                    lines,
+                    self.pager_chop if chop else self.pager,
+                    self.stdout,  # type: ignore
+                )
+        else:
+            for line in lines:
+                self.poutput(line)
+
+    def _record(self, kind: str, args, **kwargs):
+        """Append an entry for a command to the ledger, if there is one.
+        Failing to record an entry never fails the command.
+        """
+        if self.ledger is None:
+            return
+        try:
+            fields = {
+                "dataset": args.dataset,
+                "schema": getattr(args, "schema", None),
+                "symbols": args.symbols.split(","),
+                "start": args.start,
+                "end": args.end,
+            }
+            fields.update(kwargs)
+            self.ledger.record(kind, **fields)
+        except (AttributeError, KeyError, ValueError, sqlite3.Error) as exc:
+            _LOG.warning("Failed to record ledger entry: %s", exc)
+
+    def cache_unit_prices(
+        self, dataset: str, prices: Dict[str, Dict[str, float]]
+    ):
+        """Cache unit prices by mode in the ledger, if there is one."""
+        if self.ledger is None:
+            return
+        try:
+            for mode, unit_prices in prices.items():
+                self.ledger.cache_unit_prices(dataset, mode, unit_prices)
+        except sqlite3.Error as exc:
+            _LOG.warning("Failed to cache unit prices: %s", exc)
+
+    def _symbols(self, args) -> Tuple[List[str], str]:
+        """The symbols of a command and their stype.
+        Symbols are resolved to product IDs through the symbology cache if
+        there is one, so symbols it has seen are not resolved again by every
+        request. Without a cache, symbols of a single type are sent as they
+        are for the API to resolve, and mixed types are resolved here.
+        :raises ValueError: If any of the resolved symbols does not resolve,
+            rather than querying without it, or with no symbols at all.
+        """
+        symbols = args.symbols.split(",")
+        stypes = {dbtoys.utilities.symbology.infer_stype(s) for s in symbols}
+        if len(stypes) == 1 and (
+            self.symbology is None
+            or "*" in symbols
+            or stypes == {SType.PRODUCT_ID.value}
+        ):
+            return symbols, stypes.pop()
+        mappings = dbtoys.utilities.symbology.resolve(
+            self.coalesced_client,
+            dataset=args.dataset,
+            symbols=symbols,
+            start=args.start,
+            end=args.end,
+            cache=self.symbology,
+        )
+        unresolved = [symbol for symbol in symbols if symbol not in mappings]
+        if unresolved:
+            raise ValueError(
+                f"Failed to resolve symbols {', '.join(unresolved)} "
+                f"in {args.dataset}"
+            )
+        return dbtoys.utilities.symbology.product_ids(mappings), "product_id"
+
+    @property
+    def coalesced_client(self) -> databento.Historical:
+        """The databento historical client, coalescing identical requests"""
+        return dbtoys.utilities.singleflight.SingleFlightClient(
+            self.historical_client, self._single_flight
+        )  # type: ignore
+
     @log_command
     @cmd2.with_category(METADATA_COMMANDS)
     @cmd2.with_argparser(command_parsers.get_billable_size)  # type: ignore
     def do_get_billable_size(self, args):
         """Gets the size in bytes of timeseries data."""
         try:
-            result = self.historical_client.metadata.get_billable_size(
+            symbols, stype_in = self._symbols(args)
+            result = self.coalesced_client.metadata.get_billable_size(
                 dataset=args.dataset,
-                symbols=args.symbols.split(","),
+                symbols=symbols,
+                stype_in=stype_in,
                 schema=args.schema,
-                encoding=args.encoding,
                 start=args.start,
                 end=args.end,
             )
-        except BentoError as exc:
+        except (BentoError, ValueError, sqlite3.Error) as exc:
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
         else:
+            self._record("billable_size", args, size=result)
             formatted = [str(result), humanize.naturalsize(result)]
             self.columnize(formatted)
 
@@ -138,17 +463,20 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_get_cost(self, args):
         """Gets the cost of timeseries data."""
         try:
-            result = self.historical_client.metadata.get_cost(
+            symbols, stype_in = self._symbols(args)
+            result = self.coalesced_client.metadata.get_cost(
                 dataset=args.dataset,
-                symbols=args.symbols.split(","),
+                symbols=symbols,
+                stype_in=stype_in,
                 schema=args.schema,
                 start=args.start,
                 end=args.end,
             )
-        except BentoError as exc:
+        except (BentoError, ValueError, sqlite3.Error) as exc:
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
         else:
+            self._record("estimate", args, cost=result)
             self.poutput(f"{result:.2f}")
 
     @log_command
@@ -157,25 +485,68 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_get_shape(self, args):
         """Gets the dimensions of timeseries data."""
         try:
-            result = self.historical_client.metadata.get_shape(
+            symbols, stype_in = self._symbols(args)
+            result = self.coalesced_client.metadata.get_shape(
                 dataset=args.dataset,
-                symbols=args.symbols.split(","),
+                symbols=symbols,
+                stype_in=stype_in,
                 schema=args.schema,
                 start=args.start,
                 end=args.end,
             )
-        except BentoError as exc:
+        except (BentoError, ValueError, sqlite3.Error) as exc:
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
         else:
+            # pylint: disable-next=import-outside-toplevel
+            from dbtoys.utilities.dbz import record_dtype
+
+            # Shapes count DBZ records, so their billable size is known too,
+            # unless the schema has no DBZ record type.
+            try:
+                record_size = record_dtype(args.schema).itemsize
+            except (KeyError, ValueError):
+                _LOG.debug("No DBZ record type for %s", args.schema)
+            else:
+                self._record("shape", args, size=int(result[0]) * record_size)
             self.columnize([str(r) for r in result])
 
+    @log_command
+    @cmd2.with_category(PLANNING_COMMANDS)
+    @cmd2.with_argparser(command_parsers.ledger)  # type: ignore
+    def do_ledger(self, args):
+        """Report estimated and spent cost from the local ledger."""
+        if self.ledger is None:
+            self.perror("ERROR: No ledger is configured")
+            return
+        try:
+            if args.report == "spend":
+                rows = self.ledger.spend_by(args.by)
+                headers = [args.by, "estimated", "spent", "downloaded"]
+            else:
+                rows = self.ledger.top_symbols(kind=args.kind, limit=args.limit)
+                headers = ["symbol", "bytes"]
+        except sqlite3.Error as exc:
+            self.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self.ppaged(
+                tabulate(
+                    tabular_data=[
+                        [*row[:-1], humanize.naturalsize(row[-1])]
+                        for row in rows
+                    ],
+                    floatfmt=".2f",
+                    headers=headers,
+                )
+            )
+
     @log_command
     @cmd2.with_category(METADATA_COMMANDS)
     def do_list_compressions(self, _):
         """List all compressions."""
         try:
-            result = self.historical_client.metadata.list_compressions()
+            result = self.coalesced_client.metadata.list_compressions()
         except BentoError as exc:
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
@@ -188,9 +559,9 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_list_datasets(self, args):
         """List all datasets."""
         try:
-            result = self.historical_client.metadata.list_datasets(
-                start=args.start,
-                end=args.end,
+            result = self.coalesced_client.metadata.list_datasets(
+                start_date=args.start,
+                end_date=args.end,
             )
         except BentoError as exc:
             self.perror(f"ERROR: {str(exc)}")
@@ -203,7 +574,7 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_list_encodings(self, _):
         """List all encodings."""
         try:
-            result = self.historical_client.metadata.list_encodings()
+            result = self.coalesced_client.metadata.list_encodings()
         except BentoError as exc:
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
@@ -216,7 +587,7 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_list_fields(self, args):
         """List all fields from the given dataset and schema."""
         try:
-            result = self.historical_client.metadata.list_fields(
+            result = self.coalesced_client.metadata.list_fields(
                 dataset=args.dataset,
                 schema=args.schema,
                 encoding=args.encoding,
@@ -225,21 +596,23 @@ class DataBentoExplorer(cmd2.Cmd):
             self.perror(f"ERROR: {str(exc)}")
             _LOG.exception(exc)
         else:
-            output = []
-            for _, encodings in result.items():
-                for encoding, schemas in encodings.items():
-                    if args.encoding is None:
-                        output.append(f"--- {encoding} fields ---")
-                    for _, fields in schemas.items():
-                        output.append(
-                            tabulate(
-                                tabular_data=[
-                                    [k, v] for k, v in fields.items()
-                                ],
+
+            def sections():
+                for _, encodings in result.items():
+                    for encoding, schemas in encodings.items():
+                        if args.encoding is None:
+                            yield [f"--- {encoding} fields ---"]
+                        for _, fields in schemas.items():
+                            yield dbtoys.utilities.render.stream_table(
+                                dbtoys.utilities.render.window(
+                                    fields.items(), args.offset, args.limit
+                                ),
                                 headers=["field", "type"],
                             )
-                        )
-            self.ppaged("\n\n".join(output))
+
+            self.ppaged_lines(
+                dbtoys.utilities.render.stream_sections(sections())
+            )
 
     @log_command
     @cmd2.with_category(METADATA_COMMANDS)
@@ -247,10 +620,10 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_list_schemas(self, args):
         """List all available schemas for a data set within the given start and end dates."""
         try:
-            result = self.historical_client.metadata.list_schemas(
+            result = self.coalesced_client.metadata.list_schemas(
                 dataset=args.dataset,
-                start=args.start,
-                end=args.end,
+                start_date=args.start,
+                end_date=args.end,
             )
         except BentoError as exc:
             self.perror(f"ERROR: {str(exc)}")
@@ -264,7 +637,7 @@ class DataBentoExplorer(cmd2.Cmd):
     def do_list_unit_prices(self, args):
         """List unit prices per GB for a dataset"""
         try:
-            result = self.historical_client.metadata.list_unit_prices(
+            result = self.coalesced_client.metadata.list_unit_prices(
                 dataset=args.dataset,
                 mode=args.mode,
                 schema=args.schema,
@@ -277,17 +650,141 @@ class DataBentoExplorer(cmd2.Cmd):
                 # If we only have one price just print it.
                 self.poutput(result)
             else:
-                output = []
-                for mode, unit_prices in result.items():
-                    if args.mode is None:
-                        output.append(f"--- {mode} ---")
-                    output.append(
-                        tabulate(
-                            tabular_data=[
-                                [k, v] for k, v in unit_prices.items()
-                            ],
-                            floatfmt=".2f",
+                if args.schema is None:
+                    self.cache_unit_prices(args.dataset, result)
+
+                def sections():
+                    for mode, unit_prices in result.items():
+                        if args.mode is None:
+                            yield [f"--- {mode} ---"]
+                        yield dbtoys.utilities.render.stream_table(
+                            dbtoys.utilities.render.window(
+                                unit_prices.items(), args.offset, args.limit
+                            ),
                             headers=["field", "unit_price"],
+                            floatfmt=".2f",
                         )
-                    )
-                self.ppaged("\n\n".join(output))
+
+                self.ppaged_lines(
+                    dbtoys.utilities.render.stream_sections(sections())
+                )
+
+    @log_command
+    @cmd2.with_category(PLANNING_COMMANDS)
+    @cmd2.with_argparser(command_parsers.plan)  # type: ignore
+    def do_plan(self, args):
+        """Rank the schemas that satisfy a data need by cost."""
+        try:
+            options = planner.plan_request(
+                metadata=self.coalesced_client.metadata,
+                dataset=args.dataset,
+                symbols=args.symbols.split(","),
+                resolution=args.resolution,
+                start=args.start,
+                end=args.end,
+            )
+        except BentoError as exc:
+            self.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            for option in options:
+                self._record(
+                    "plan",
+                    args,
+                    schema=option.schema,
+                    cost=option.cost,
+                    size=option.billable_size,
+                )
+            self.ppaged(
+                tabulate(
+                    tabular_data=[
+                        [
+                            option.schema,
+                            option.cost,
+                            humanize.naturalsize(option.billable_size),
+                            option.unit_price,
+                            ",".join(option.derivable),
+                        ]
+                        for option in options
+                    ],
+                    floatfmt=".2f",
+                    headers=[
+                        "schema",
+                        "cost",
+                        "billable_size",
+                        "unit_price",
+                        "derivable",
+                    ],
+                )
+            )
+
+    @log_command
+    @cmd2.with_category(DIAGNOSTIC_COMMANDS)
+    @cmd2.with_argparser(command_parsers.plugins)  # type: ignore
+    def do_plugins(self, args):
+        """List plugin commands and whether they are loaded."""
+        if args.load:
+            plugin = self.plugins.get(args.load)
+            if plugin is None:
+                self.perror(f"ERROR: No plugin provides {args.load}")
+                return
+            if plugin.target not in self._loaded_plugins:
+                self.load_plugin(plugin)
+        self.poutput(
+            tabulate(
+                tabular_data=[
+                    [
+                        plugin.command,
+                        plugin.target,
+                        plugin.source,
+                        plugin.target in self._loaded_plugins,
+                    ]
+                    for plugin in sorted(self.plugins.values())
+                ],
+                headers=["command", "command_set", "source", "loaded"],
+            )
+        )
+
+    @log_command
+    @cmd2.with_category(DIAGNOSTIC_COMMANDS)
+    @cmd2.with_argparser(command_parsers.request_stats)  # type: ignore
+    def do_request_stats(self, args):
+        """Show how many metadata requests were sent and coalesced."""
+        stats = self._single_flight.stats()
+        self.poutput(
+            tabulate(
+                tabular_data=list(stats.items()),
+                headers=["counter", "value"],
+            )
+        )
+        if args.reset:
+            self._single_flight.reset_stats()
+
+    @log_command
+    @cmd2.with_category(METADATA_COMMANDS)
+    @cmd2.with_argparser(command_parsers.resolve_symbols)  # type: ignore
+    def do_resolve_symbols(self, args):
+        """Resolve symbols of any type to product IDs over a date range."""
+        try:
+            mappings = dbtoys.utilities.symbology.resolve(
+                self.coalesced_client,
+                dataset=args.dataset,
+                symbols=args.symbols.split(","),
+                start=args.start,
+                end=args.end,
+                cache=self.symbology,
+            )
+        except (BentoError, sqlite3.Error) as exc:
+            self.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self.ppaged_lines(
+                dbtoys.utilities.render.stream_table(
+                    (
+                        [symbol, *interval]
+                        for symbol, intervals in mappings.items()
+                        for interval in intervals
+                    ),
+                    headers=["symbol", "start_date", "end_date", "product_id"],
+                )
+            )
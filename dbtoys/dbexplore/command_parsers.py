@@ -9,12 +9,32 @@ from databento.common.enums import Encoding
 from databento.common.enums import FeedMode
 from databento.common.enums import Schema
 
+from dbtoys.dbexplore.planner import KNOWN_RESOLUTIONS
+from dbtoys.utilities.ledger import ENTRY_KINDS
+from dbtoys.utilities.ledger import SPEND_GROUPS
+
 KNOWN_COMPRESSIONS: Tuple[str, ...] = tuple(x.value for x in Compression)
 KNOWN_DATASETS: Tuple[str, ...] = tuple(x.value for x in Dataset)
 KNOWN_ENCODINGS: Tuple[str, ...] = tuple(x.value for x in Encoding)
 KNOWN_FEED_MODES: Tuple[str, ...] = tuple(x.value for x in FeedMode)
 KNOWN_SCHEMAS: Tuple[str, ...] = tuple(x.value for x in Schema)
 
+
+def window(value: str) -> Tuple[pandas.Timestamp, pandas.Timestamp]:
+    """Parse a request window given as START/END in ISO 8601 format."""
+    start, _, end = value.partition("/")
+    return (
+        pandas.Timestamp.fromisoformat(start),
+        pandas.Timestamp.fromisoformat(end),
+    )
+
+
+def dataset_limit(value: str) -> Tuple[str, int]:
+    """Parse a concurrency limit of a dataset given as DATASET=N."""
+    dataset, _, limit = value.partition("=")
+    return dataset, int(limit)
+
+
 get_billable_size: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
 get_billable_size.add_argument(
     "dataset",
@@ -31,12 +51,6 @@ get_billable_size.add_argument(
     type=str,
     help="a data schema",
 )
-get_billable_size.add_argument(
-    "encoding",
-    choices=KNOWN_ENCODINGS,
-    type=str,
-    help="a data encoding",
-)
 get_billable_size.add_argument(
     "--start",
     "-s",
@@ -136,6 +150,35 @@ get_shape.add_argument(
     default=pandas.Timestamp.today().date(),
 )
 
+ledger: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+ledger.add_argument(
+    "report",
+    choices=("spend", "symbols"),
+    type=str,
+    help="spend by a group, or the top symbols by bytes",
+)
+ledger.add_argument(
+    "--by",
+    choices=SPEND_GROUPS,
+    type=str,
+    help="the group to aggregate spend by",
+    default="dataset",
+)
+ledger.add_argument(
+    "--kind",
+    choices=ENTRY_KINDS,
+    type=str,
+    help="the kind of entries to rank symbols by",
+    default="download",
+)
+ledger.add_argument(
+    "--limit",
+    "-n",
+    type=int,
+    help="the number of symbols to show",
+    default=10,
+)
+
 list_datasets: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
 list_datasets.add_argument(
     "--start",
@@ -175,6 +218,19 @@ list_fields.add_argument(
     help="a data encoding",
     const=None,
 )
+list_fields.add_argument(
+    "--limit",
+    "-n",
+    type=int,
+    help="show at most this many rows of each table",
+    default=None,
+)
+list_fields.add_argument(
+    "--offset",
+    type=int,
+    help="skip this many rows of each table",
+    default=0,
+)
 
 list_schemas: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
 list_schemas.add_argument(
@@ -223,3 +279,94 @@ list_unit_prices.add_argument(
     help="a data schema",
     default=None,
 )
+list_unit_prices.add_argument(
+    "--limit",
+    "-n",
+    type=int,
+    help="show at most this many rows of each table",
+    default=None,
+)
+list_unit_prices.add_argument(
+    "--offset",
+    type=int,
+    help="skip this many rows of each table",
+    default=0,
+)
+
+plan: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+plan.add_argument(
+    "dataset",
+    choices=KNOWN_DATASETS,
+    type=str,
+    help="the target dataset",
+)
+plan.add_argument(
+    "symbols", type=str, help="one or more symbols separated by commas"
+)
+plan.add_argument(
+    "resolution",
+    choices=KNOWN_RESOLUTIONS,
+    type=str,
+    help="the desired data resolution as a schema",
+)
+plan.add_argument(
+    "--start",
+    "-s",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DDTHHMMSS.MMM",
+    help="the earlierst date in ISO 8601 format",
+    default=pandas.Timestamp.today().date(),
+)
+plan.add_argument(
+    "--end",
+    "-e",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DDTHHMMSS.MMM",
+    help="the latest date in ISO 8601 format",
+    default=pandas.Timestamp.today().date(),
+)
+
+plugins: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+plugins.add_argument(
+    "--load",
+    type=str,
+    metavar="COMMAND",
+    help="load the plugin providing a command now",
+    default=None,
+)
+
+request_stats: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+request_stats.add_argument(
+    "--reset",
+    action="store_true",
+    help="reset the counters after printing them",
+)
+
+resolve_symbols: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+resolve_symbols.add_argument(
+    "dataset",
+    choices=KNOWN_DATASETS,
+    type=str,
+    help="the target dataset",
+)
+resolve_symbols.add_argument(
+    "symbols",
+    type=str,
+    help="symbols of any type separated by commas",
+)
+resolve_symbols.add_argument(
+    "--start",
+    "-s",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DD",
+    help="the earliest date in ISO 8601 format",
+    default=pandas.Timestamp.today().date(),
+)
+resolve_symbols.add_argument(
+    "--end",
+    "-e",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DD",
+    help="the exclusive end date in ISO 8601 format",
+    default=None,
+)
@@ -0,0 +1,4 @@
+"""Command sets of the dbexplore plugins declared in dbtoys.plugins.
+Each module holds the commands of one feature with their parsers, so using
+a command imports only the dependencies of its own feature.
+"""
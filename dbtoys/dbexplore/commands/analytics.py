@@ -0,0 +1,115 @@
+"""Rolling analytics of local DBZ files, loaded as a plugin on first use."""
+import logging
+
+import cmd2
+
+import dbtoys.utilities.render
+import dbtoys.utilities.rolling
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.utilities.convert import KNOWN_FORMATS
+from dbtoys.utilities.rolling import DEFAULT_ANALYTICS_TS_FIELD
+from dbtoys.utilities.rolling import Window
+
+_LOG = logging.getLogger()
+
+analytics: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+analytics.add_argument(
+    "paths",
+    nargs="+",
+    type=str,
+    help="DBZ files of one schema with prices and sizes, in time order",
+    completer=cmd2.Cmd.path_complete,
+)
+analytics.add_argument(
+    "--window",
+    "-w",
+    type=Window.parse,
+    help="a number of records, or a duration such as 500ms or 5min",
+    default=Window.parse("1min"),
+)
+analytics.add_argument(
+    "--ts-field",
+    choices=("ts_event", "ts_recv"),
+    type=str,
+    help="the timestamp to window by",
+    default=DEFAULT_ANALYTICS_TS_FIELD,
+)
+analytics.add_argument(
+    "--output",
+    "-o",
+    type=str,
+    help="write the statistics of every record to this file",
+    completer=cmd2.Cmd.path_complete,
+    default=None,
+)
+analytics.add_argument(
+    "--format",
+    "-f",
+    dest="fmt",
+    choices=KNOWN_FORMATS,
+    type=str,
+    help="the output format",
+    default="csv",
+)
+analytics.add_argument(
+    "--volume-profile",
+    action="store_true",
+    help="also show the volume traded at each price",
+)
+analytics.add_argument(
+    "--tick",
+    type=float,
+    help="group volume profile prices into multiples of this",
+    default=None,
+)
+
+
+class AnalyticsCommands(cmd2.CommandSet):
+    """Compute rolling statistics of local DBZ files."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(analytics)  # type: ignore
+    def do_analytics(self, args):
+        """Compute rolling VWAP, range, volatility and spread of each symbol."""
+        try:
+            latest, profile = dbtoys.utilities.rolling.analyze(
+                args.paths,
+                window=args.window,
+                ts_field=args.ts_field,
+                output=args.output,
+                fmt=args.fmt,
+                tick=args.tick,
+            )
+        except (OSError, ValueError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+            return
+
+        lines = list(
+            dbtoys.utilities.render.stream_table(
+                latest.drop(columns="product_id").itertuples(index=False),
+                headers=[
+                    column
+                    for column in latest.columns
+                    if column != "product_id"
+                ],
+                floatfmt=".6g",
+            )
+        )
+        if args.volume_profile:
+            profile = profile.drop(columns="product_id")
+            lines.append("")
+            lines.extend(
+                dbtoys.utilities.render.stream_table(
+                    profile.itertuples(index=False),
+                    headers=list(profile.columns),
+                    floatfmt=".6g",
+                )
+            )
+        if args.output is not None:
+            lines.append(
+                f"Wrote the statistics of every record to {args.output}"
+            )
+        self._cmd.ppaged_lines(lines, chop=True)
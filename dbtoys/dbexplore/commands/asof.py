@@ -0,0 +1,172 @@
+"""As-of queries and joins of local DBZ files, loaded as a plugin on first
+use.
+"""
+import logging
+
+import cmd2
+import pandas
+import zstandard
+from tabulate import tabulate
+
+import dbtoys.utilities.asof
+import dbtoys.utilities.join
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.dbexplore.command_parsers import KNOWN_COMPRESSIONS
+from dbtoys.utilities.asof import DEFAULT_TS_FIELD
+from dbtoys.utilities.convert import KNOWN_FORMATS
+from dbtoys.utilities.join import DEFAULT_JOIN_TS_FIELD
+
+_LOG = logging.getLogger()
+
+asof: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+asof.add_argument(
+    "timestamp",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DDTHHMMSS.MMM",
+    help="the time of the snapshot in ISO 8601 format",
+)
+asof.add_argument(
+    "paths",
+    nargs="+",
+    type=str,
+    help="DBZ files of one schema to search",
+    completer=cmd2.Cmd.path_complete,
+)
+asof.add_argument(
+    "--symbols",
+    type=str,
+    help="only find these symbols, separated by commas",
+    default=None,
+)
+asof.add_argument(
+    "--ts-field",
+    choices=("ts_event", "ts_recv"),
+    type=str,
+    help="the timestamp to search by",
+    default=DEFAULT_TS_FIELD,
+)
+asof.add_argument(
+    "--pretty-px",
+    action="store_true",
+    help="convert prices to floats",
+)
+asof.add_argument(
+    "--pretty-ts",
+    action="store_true",
+    help="convert timestamps to ISO 8601 datetimes",
+)
+
+join_quotes: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+join_quotes.add_argument(
+    "trades",
+    type=str,
+    help="a DBZ file of trades sorted by time",
+    completer=cmd2.Cmd.path_complete,
+)
+join_quotes.add_argument(
+    "quotes",
+    type=str,
+    help="a DBZ file of mbp-1, mbp-10 or tbbo quotes sorted by time",
+    completer=cmd2.Cmd.path_complete,
+)
+join_quotes.add_argument(
+    "output",
+    type=str,
+    help="the file to write the enriched trades to",
+    completer=cmd2.Cmd.path_complete,
+)
+join_quotes.add_argument(
+    "--format",
+    "-f",
+    dest="fmt",
+    choices=KNOWN_FORMATS,
+    type=str,
+    help="the output format",
+    default="csv",
+)
+join_quotes.add_argument(
+    "--tolerance",
+    type=float,
+    help="ignore quotes older than this many seconds",
+    default=None,
+)
+join_quotes.add_argument(
+    "--ts-field",
+    choices=("ts_event", "ts_recv"),
+    type=str,
+    help="the timestamp to join by",
+    default=DEFAULT_JOIN_TS_FIELD,
+)
+join_quotes.add_argument(
+    "--strict",
+    action="store_true",
+    help="only match quotes strictly before each trade",
+)
+join_quotes.add_argument(
+    "--pretty-px",
+    action="store_true",
+    help="convert prices to floats",
+)
+join_quotes.add_argument(
+    "--pretty-ts",
+    action="store_true",
+    help="convert timestamps to ISO 8601 datetimes",
+)
+join_quotes.add_argument(
+    "--compression",
+    "-z",
+    choices=KNOWN_COMPRESSIONS,
+    type=str,
+    help="compress the output file",
+    default="none",
+)
+
+
+class AsofCommands(cmd2.CommandSet):
+    """Find the records prevailing at a time in local DBZ files."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(asof)  # type: ignore
+    def do_asof(self, args):
+        """Show the latest record of each symbol at or before a time."""
+        try:
+            result = dbtoys.utilities.asof.asof(
+                paths=args.paths,
+                ts=args.timestamp,
+                symbols=args.symbols.split(",") if args.symbols else None,
+                ts_field=args.ts_field,
+                pretty_px=args.pretty_px,
+                pretty_ts=args.pretty_ts,
+            )
+        except (OSError, ValueError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.ppaged(tabulate(result, headers="keys", showindex=False))
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(join_quotes)  # type: ignore
+    def do_join_quotes(self, args):
+        """Join trades to the prevailing quote to sign them and compute
+        effective spreads."""
+        try:
+            total = dbtoys.utilities.join.join_quotes(
+                args.trades,
+                args.quotes,
+                args.output,
+                fmt=args.fmt,
+                compression=args.compression,
+                tolerance=args.tolerance,
+                ts_field=args.ts_field,
+                allow_exact=not args.strict,
+                pretty_px=args.pretty_px,
+                pretty_ts=args.pretty_ts,
+            )
+        except (OSError, ValueError, zstandard.ZstdError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.poutput(f"Joined {total} trades to {args.output}")
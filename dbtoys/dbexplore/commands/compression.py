@@ -0,0 +1,173 @@
+"""Compression benchmarks and dictionaries, loaded as a plugin on first use."""
+import logging
+
+import cmd2
+import humanize
+import zstandard
+from tabulate import tabulate
+
+import dbtoys.utilities.compression
+import dbtoys.utilities.dbz
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.utilities.compression import DEFAULT_BENCHMARK_LEVELS
+from dbtoys.utilities.compression import DEFAULT_DICTIONARY_SIZE
+from dbtoys.utilities.compression import DEFAULT_LEVEL
+from dbtoys.utilities.compression import DEFAULT_SAMPLE_LIMIT
+from dbtoys.utilities.memory import parse_size
+
+_LOG = logging.getLogger()
+
+benchmark_compression: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+benchmark_compression.add_argument(
+    "path",
+    type=str,
+    help="a DBZ file to sample records from",
+    completer=cmd2.Cmd.path_complete,
+)
+benchmark_compression.add_argument(
+    "--levels",
+    type=str,
+    help="the zstd levels to compare, separated by commas",
+    default=",".join(map(str, DEFAULT_BENCHMARK_LEVELS)),
+)
+benchmark_compression.add_argument(
+    "--threads",
+    type=int,
+    help="the number of zstd worker threads",
+    default=0,
+)
+benchmark_compression.add_argument(
+    "--per-symbol",
+    action="store_true",
+    help="compress small per-symbol samples instead of one archive",
+)
+benchmark_compression.add_argument(
+    "--sample-bytes",
+    type=parse_size,
+    metavar="SIZE",
+    help="the most bytes of records to read from the file, such as 64M",
+    default=DEFAULT_SAMPLE_LIMIT,
+)
+benchmark_compression.add_argument(
+    "--dictionary",
+    type=str,
+    help="compress with a trained dictionary",
+    default=None,
+    completer=cmd2.Cmd.path_complete,
+)
+
+train_dictionary: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+train_dictionary.add_argument(
+    "paths",
+    nargs="+",
+    type=str,
+    help="DBZ files of one schema to sample records from",
+    completer=cmd2.Cmd.path_complete,
+)
+train_dictionary.add_argument(
+    "--output",
+    "-o",
+    type=str,
+    help="the dictionary file to write (default: one per schema)",
+    default=None,
+    completer=cmd2.Cmd.path_complete,
+)
+train_dictionary.add_argument(
+    "--size",
+    type=int,
+    help="the maximum size of the dictionary in bytes",
+    default=DEFAULT_DICTIONARY_SIZE,
+)
+train_dictionary.add_argument(
+    "--level",
+    type=int,
+    help="the zstd compression level to tune for",
+    default=DEFAULT_LEVEL,
+)
+
+
+class CompressionCommands(cmd2.CommandSet):
+    """Tune the zstd compression of local DBZ files."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DIAGNOSTIC_COMMANDS)
+    @cmd2.with_argparser(benchmark_compression)  # type: ignore
+    def do_benchmark_compression(self, args):
+        """Compare zstd ratio and throughput across levels on a DBZ file."""
+        try:
+            schema = dbtoys.utilities.dbz.read_metadata(args.path)["schema"]
+            if args.per_symbol:
+                samples = dbtoys.utilities.compression.symbol_samples(
+                    args.path, schema, limit=args.sample_bytes
+                )
+            else:
+                samples = [
+                    dbtoys.utilities.compression.archive_sample(
+                        args.path, schema, limit=args.sample_bytes
+                    )
+                ]
+            dictionary = None
+            if args.dictionary:
+                dictionary = dbtoys.utilities.compression.load_dictionary(
+                    args.dictionary
+                )
+            results = dbtoys.utilities.compression.benchmark(
+                samples,
+                levels=[int(level) for level in args.levels.split(",")],
+                threads=args.threads,
+                dictionary=dictionary,
+            )
+        except (OSError, ValueError, zstandard.ZstdError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.poutput(
+                tabulate(
+                    tabular_data=results,
+                    floatfmt=".2f",
+                    headers=[
+                        "level",
+                        "ratio",
+                        "compress_mb/s",
+                        "decompress_mb/s",
+                    ],
+                )
+            )
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(train_dictionary)  # type: ignore
+    def do_train_dictionary(self, args):
+        """Train a zstd dictionary for small per-symbol files of a schema."""
+        try:
+            schemas = {
+                dbtoys.utilities.dbz.read_metadata(path)["schema"]
+                for path in args.paths
+            }
+            if len(schemas) != 1:
+                raise ValueError("Dictionaries are trained on a single schema")
+            schema = schemas.pop()
+            samples = [
+                sample
+                for path in args.paths
+                for sample in dbtoys.utilities.compression.symbol_samples(
+                    path, schema
+                )
+            ]
+            dictionary = dbtoys.utilities.compression.train_dictionary(
+                samples, dict_size=args.size, level=args.level
+            )
+            output = (
+                args.output
+                or dbtoys.utilities.compression.dictionary_path(schema)
+            )
+            dbtoys.utilities.compression.save_dictionary(dictionary, output)
+        except (OSError, ValueError, zstandard.ZstdError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.poutput(
+                f"Trained a {humanize.naturalsize(len(dictionary))} {schema} "
+                f"dictionary from {len(samples)} samples into {output}"
+            )
@@ -0,0 +1,179 @@
+"""Offline cost estimates, loaded as a plugin on first use."""
+import logging
+import math
+import sqlite3
+from typing import Dict
+
+import cmd2
+import humanize
+from databento.historical.error import BentoError
+
+import dbtoys.utilities.render
+from dbtoys.dbexplore import estimator
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.dbexplore.command_parsers import KNOWN_DATASETS
+from dbtoys.dbexplore.command_parsers import KNOWN_FEED_MODES
+from dbtoys.dbexplore.command_parsers import window
+from dbtoys.dbexplore.planner import DEFAULT_PLAN_MODE
+
+_LOG = logging.getLogger()
+
+estimate_cost: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+estimate_cost.add_argument(
+    "dataset",
+    choices=KNOWN_DATASETS,
+    type=str,
+    help="the target dataset",
+)
+estimate_cost.add_argument(
+    "--symbols",
+    "-y",
+    type=str,
+    action="append",
+    help="a set of symbols separated by commas; repeat for more sets",
+    required=True,
+)
+estimate_cost.add_argument(
+    "--window",
+    "-w",
+    type=window,
+    action="append",
+    metavar="START/END",
+    help="a window in ISO 8601 format; repeat for more windows",
+    required=True,
+)
+estimate_cost.add_argument(
+    "--schemas",
+    type=str,
+    help="schemas separated by commas; defaults to every schema with sizes",
+    default=None,
+)
+estimate_cost.add_argument(
+    "--mode",
+    choices=KNOWN_FEED_MODES,
+    type=str,
+    help="the feed mode to price",
+    default=DEFAULT_PLAN_MODE,
+)
+estimate_cost.add_argument(
+    "--verify",
+    type=int,
+    metavar="N",
+    help="query the live cost of the N cheapest estimates",
+    default=0,
+)
+estimate_cost.add_argument(
+    "--refresh-prices",
+    action="store_true",
+    help="query unit prices even if they are cached",
+)
+estimate_cost.add_argument(
+    "--limit",
+    "-n",
+    type=int,
+    help="the number of estimates to show",
+    default=20,
+)
+
+
+class EstimateCommands(cmd2.CommandSet):
+    """Estimate costs from the ledger without querying them."""
+
+    def _unit_prices(
+        self, dataset: str, mode: str, refresh: bool = False
+    ) -> Dict[str, float]:
+        """The unit prices of a dataset, from the ledger if it has them."""
+        if self._cmd.ledger is not None and not refresh:
+            prices = self._cmd.ledger.unit_prices(
+                dataset, mode, max_age=estimator.DEFAULT_PRICE_MAX_AGE
+            )
+            if prices:
+                return prices
+        result = self._cmd.coalesced_client.metadata.list_unit_prices(
+            dataset=dataset, mode=mode
+        )
+        prices = result.get(mode, result)
+        self._cmd.cache_unit_prices(dataset, {mode: prices})
+        return prices
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.PLANNING_COMMANDS)
+    @cmd2.with_argparser(estimate_cost)  # type: ignore
+    def do_estimate_cost(self, args):
+        """Estimate costs offline from cached unit prices and the billable
+        sizes in the ledger."""
+        if self._cmd.ledger is None:
+            self._cmd.perror("ERROR: No ledger is configured")
+            return
+        try:
+            model = estimator.SizeModel.fit(
+                self._cmd.ledger.size_observations(args.dataset)
+            )
+            schemas = (
+                args.schemas.split(",")
+                if args.schemas
+                else model.schemas(args.dataset)
+            )
+            if not schemas:
+                raise ValueError(
+                    f"The ledger has no billable sizes of {args.dataset}, "
+                    "run get_billable_size, get_shape or plan first"
+                )
+            estimates = estimator.estimate_grid(
+                model,
+                self._unit_prices(
+                    args.dataset, args.mode, refresh=args.refresh_prices
+                ),
+                args.dataset,
+                [symbols.split(",") for symbols in args.symbols],
+                schemas,
+                args.window,
+            )
+            if args.verify:
+                verified = estimator.verify_estimates(
+                    self._cmd.coalesced_client.metadata,
+                    args.dataset,
+                    estimates,
+                    args.verify,
+                    mode=args.mode,
+                )
+                for row in verified.itertuples():
+                    self._cmd.ledger.record(
+                        "estimate",
+                        dataset=args.dataset,
+                        schema=row.schema,
+                        symbols=row.symbols.split(","),
+                        start=row.start,
+                        end=row.end,
+                        cost=row.live_cost,
+                    )
+                estimates = estimates.join(verified["live_cost"])
+        except (BentoError, ValueError, sqlite3.Error) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            headers = ["symbols", "schema", "start", "end", "size", "cost"]
+            if args.verify:
+                headers.append("live_cost")
+            self._cmd.ppaged_lines(
+                dbtoys.utilities.render.stream_table(
+                    (
+                        [
+                            row[0],
+                            row[1],
+                            row[2],
+                            row[3],
+                            "?"
+                            if math.isnan(row[4])
+                            else humanize.naturalsize(row[4]),
+                            *row[5:],
+                        ]
+                        for row in estimates.head(args.limit).itertuples(
+                            index=False
+                        )
+                    ),
+                    headers=headers,
+                    floatfmt=".2f",
+                )
+            )
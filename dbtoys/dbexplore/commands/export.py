@@ -0,0 +1,165 @@
+"""Conversion and export of local DBZ files, loaded as a plugin on first
+use.
+"""
+import logging
+
+import cmd2
+import zstandard
+
+import dbtoys.utilities.compression
+import dbtoys.utilities.convert
+import dbtoys.utilities.parquet
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.dbexplore.command_parsers import KNOWN_COMPRESSIONS
+from dbtoys.utilities.compression import DEFAULT_LEVEL
+from dbtoys.utilities.convert import KNOWN_FORMATS
+from dbtoys.utilities.parquet import DEFAULT_ROW_GROUP_SIZE
+
+_LOG = logging.getLogger()
+
+convert: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+convert.add_argument(
+    "path",
+    type=str,
+    help="the DBZ file to convert",
+    completer=cmd2.Cmd.path_complete,
+)
+convert.add_argument(
+    "output",
+    type=str,
+    help="the file to write",
+    completer=cmd2.Cmd.path_complete,
+)
+convert.add_argument(
+    "--format",
+    "-f",
+    dest="fmt",
+    choices=KNOWN_FORMATS,
+    type=str,
+    help="the output format",
+    default="csv",
+)
+convert.add_argument(
+    "--symbols",
+    type=str,
+    help="only convert these symbols, separated by commas",
+    default=None,
+)
+convert.add_argument(
+    "--pretty-px",
+    action="store_true",
+    help="convert prices to floats",
+)
+convert.add_argument(
+    "--pretty-ts",
+    action="store_true",
+    help="convert timestamps to ISO 8601 datetimes",
+)
+convert.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="the number of worker processes (default: CPU count)",
+    default=None,
+)
+convert.add_argument(
+    "--compression",
+    "-z",
+    choices=KNOWN_COMPRESSIONS,
+    type=str,
+    help="compress the output file",
+    default="none",
+)
+convert.add_argument(
+    "--level",
+    type=int,
+    help="the zstd compression level",
+    default=DEFAULT_LEVEL,
+)
+convert.add_argument(
+    "--threads",
+    type=int,
+    help="the number of zstd worker threads",
+    default=0,
+)
+convert.add_argument(
+    "--dictionary",
+    type=str,
+    help="compress with a trained dictionary",
+    default=None,
+    completer=cmd2.Cmd.path_complete,
+)
+
+export: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+export.add_argument(
+    "path",
+    type=str,
+    help="the DBZ file to export",
+    completer=cmd2.Cmd.path_complete,
+)
+export.add_argument(
+    "root",
+    type=str,
+    help="the root directory of the Parquet dataset",
+    completer=cmd2.Cmd.path_complete,
+)
+export.add_argument(
+    "--row-group-size",
+    type=int,
+    help="the number of rows in each row group",
+    default=DEFAULT_ROW_GROUP_SIZE,
+)
+
+
+class ExportCommands(cmd2.CommandSet):
+    """Convert and export local DBZ files."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(convert)  # type: ignore
+    def do_convert(self, args):
+        """Convert a DBZ file to another format using every core."""
+        try:
+            dictionary = None
+            if args.dictionary:
+                dictionary = dbtoys.utilities.compression.load_dictionary(
+                    args.dictionary
+                )
+            total = dbtoys.utilities.convert.convert(
+                path=args.path,
+                output=args.output,
+                fmt=args.fmt,
+                symbols=args.symbols.split(",") if args.symbols else None,
+                pretty_px=args.pretty_px,
+                pretty_ts=args.pretty_ts,
+                jobs=args.jobs,
+                compression=args.compression,
+                level=args.level,
+                threads=args.threads,
+                dictionary=dictionary,
+                memory_budget=self._cmd.memory_budget,
+            )
+        except (OSError, RuntimeError, ValueError, zstandard.ZstdError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.poutput(f"Converted {total} records to {args.output}")
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(export)  # type: ignore
+    def do_export(self, args):
+        """Export a DBZ file to a Parquet dataset partitioned by date."""
+        try:
+            written = dbtoys.utilities.parquet.export_parquet(
+                path=args.path,
+                root=args.root,
+                row_group_size=args.row_group_size,
+                memory_budget=self._cmd.memory_budget,
+            )
+        except (ImportError, OSError, ValueError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.columnize([str(path) for path in written])
@@ -0,0 +1,222 @@
+"""Queued download jobs, loaded as a plugin on first use."""
+import logging
+import sqlite3
+
+import cmd2
+import humanize
+import pandas
+from tabulate import tabulate
+
+import dbtoys.utilities.jobs
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.dbexplore.command_parsers import KNOWN_DATASETS
+from dbtoys.dbexplore.command_parsers import KNOWN_SCHEMAS
+from dbtoys.dbexplore.command_parsers import dataset_limit
+from dbtoys.utilities.jobs import DEFAULT_DATASET_LIMIT
+from dbtoys.utilities.jobs import DEFAULT_JOBS_ROOT
+from dbtoys.utilities.jobs import DEFAULT_MAX_ATTEMPTS
+from dbtoys.utilities.jobs import DEFAULT_PART_DAYS
+from dbtoys.utilities.jobs import DEFAULT_WORKERS
+from dbtoys.utilities.jobs import JOB_STATES
+from dbtoys.utilities.memory import parse_size
+
+_LOG = logging.getLogger()
+
+jobs: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+jobs_actions = jobs.add_subparsers(
+    dest="action", metavar="ACTION", required=True
+)
+jobs_submit = jobs_actions.add_parser("submit", help="queue a download job")
+jobs_submit.add_argument(
+    "dataset",
+    choices=KNOWN_DATASETS,
+    type=str,
+    help="the target dataset",
+)
+jobs_submit.add_argument(
+    "symbols", type=str, help="one or more symbols separated by commas"
+)
+jobs_submit.add_argument(
+    "schema",
+    choices=KNOWN_SCHEMAS,
+    type=str,
+    help="a data schema",
+)
+jobs_submit.add_argument(
+    "--start",
+    "-s",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DD",
+    help="the earliest date in ISO 8601 format",
+    required=True,
+)
+jobs_submit.add_argument(
+    "--end",
+    "-e",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DD",
+    help="the exclusive end date in ISO 8601 format",
+    required=True,
+)
+jobs_submit.add_argument(
+    "--priority",
+    "-p",
+    type=int,
+    help="jobs with higher priorities are downloaded first",
+    default=0,
+)
+jobs_submit.add_argument(
+    "--part-days",
+    type=int,
+    help="the longest part of the job to download and checkpoint at once",
+    default=DEFAULT_PART_DAYS,
+)
+jobs_submit.add_argument(
+    "--root",
+    type=str,
+    help="the directory to download into",
+    default=str(DEFAULT_JOBS_ROOT),
+    completer=cmd2.Cmd.path_complete,
+)
+jobs_list = jobs_actions.add_parser("list", help="list jobs and their progress")
+jobs_list.add_argument(
+    "--state",
+    choices=JOB_STATES,
+    action="append",
+    type=str,
+    help="only list jobs in this state",
+    default=None,
+)
+jobs_cancel = jobs_actions.add_parser(
+    "cancel", help="stop downloading the parts of a job"
+)
+jobs_cancel.add_argument("job_id", type=int, help="the job to cancel")
+jobs_resume = jobs_actions.add_parser(
+    "resume", help="queue a cancelled or failed job again"
+)
+jobs_resume.add_argument("job_id", type=int, help="the job to resume")
+jobs_run = jobs_actions.add_parser(
+    "run", help="download queued jobs until none are left"
+)
+jobs_run.add_argument(
+    "--workers",
+    "-j",
+    type=int,
+    help="the number of concurrent downloads",
+    default=DEFAULT_WORKERS,
+)
+jobs_run.add_argument(
+    "--dataset-limit",
+    type=dataset_limit,
+    action="append",
+    metavar="DATASET=N",
+    help="the most concurrent downloads of a dataset",
+    default=[],
+)
+jobs_run.add_argument(
+    "--default-limit",
+    type=int,
+    help="the most concurrent downloads of other datasets",
+    default=DEFAULT_DATASET_LIMIT,
+)
+jobs_run.add_argument(
+    "--bandwidth",
+    type=parse_size,
+    metavar="SIZE",
+    help="the most bytes to download per second, such as 20M",
+    default=None,
+)
+jobs_run.add_argument(
+    "--max-attempts",
+    type=int,
+    help="the most times to attempt each part",
+    default=DEFAULT_MAX_ATTEMPTS,
+)
+
+
+class JobCommands(cmd2.CommandSet):
+    """Queue and run resumable downloads."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(jobs)  # type: ignore
+    def do_jobs(self, args):
+        """Submit, list, cancel, resume and run queued download jobs."""
+        if self._cmd.job_queue is None:
+            self._cmd.perror("ERROR: No job queue is configured")
+            return
+        try:
+            if args.action == "submit":
+                job_id = self._cmd.job_queue.submit(
+                    dataset=args.dataset,
+                    schema=args.schema,
+                    symbols=args.symbols.split(","),
+                    start=args.start,
+                    end=args.end,
+                    priority=args.priority,
+                    part_days=args.part_days,
+                    root=args.root,
+                )
+                self._cmd.poutput(f"Submitted job {job_id}")
+            elif args.action == "list":
+                self._cmd.ppaged(
+                    tabulate(
+                        tabular_data=[
+                            [
+                                job.id,
+                                job.dataset,
+                                job.schema,
+                                len(job.symbols),
+                                job.start,
+                                job.end,
+                                job.priority,
+                                job.state,
+                                f"{job.parts_done}/{job.parts}",
+                                humanize.naturalsize(job.bytes),
+                            ]
+                            for job in self._cmd.job_queue.jobs(args.state)
+                        ],
+                        headers=[
+                            "id",
+                            "dataset",
+                            "schema",
+                            "symbols",
+                            "start",
+                            "end",
+                            "priority",
+                            "state",
+                            "parts",
+                            "bytes",
+                        ],
+                    )
+                )
+            elif args.action == "cancel":
+                if not self._cmd.job_queue.cancel(args.job_id):
+                    raise ValueError(f"Job {args.job_id} is not queued")
+                self._cmd.poutput(f"Job {args.job_id} cancelled")
+            elif args.action == "resume":
+                if not self._cmd.job_queue.resume(args.job_id):
+                    raise ValueError(
+                        f"Job {args.job_id} is not cancelled or failed"
+                    )
+                self._cmd.poutput(f"Job {args.job_id} resumed")
+            else:
+                stats = dbtoys.utilities.jobs.JobRunner(
+                    self._cmd.job_queue,
+                    self._cmd.historical_client,
+                    workers=args.workers,
+                    dataset_limits=dict(args.dataset_limit),
+                    default_limit=args.default_limit,
+                    bandwidth=args.bandwidth,
+                    max_attempts=args.max_attempts,
+                    ledger=self._cmd.ledger,
+                ).run()
+                self._cmd.poutput(
+                    f"Downloaded {stats.parts} parts, "
+                    f"{humanize.naturalsize(stats.bytes)} in "
+                    f"{stats.seconds:.1f}s; {stats.failed} jobs failed"
+                )
+        except (OSError, ValueError, sqlite3.Error) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
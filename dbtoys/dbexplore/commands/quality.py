@@ -0,0 +1,119 @@
+"""Data quality checks of local DBZ files, loaded as a plugin on first use."""
+import json
+import logging
+
+import cmd2
+from databento.historical.error import BentoError
+
+import dbtoys.utilities.quality
+import dbtoys.utilities.render
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+
+_LOG = logging.getLogger()
+
+validate: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+validate.add_argument(
+    "paths",
+    nargs="+",
+    type=str,
+    help="the DBZ files to check",
+    completer=cmd2.Cmd.path_complete,
+)
+validate.add_argument(
+    "--max-gap",
+    type=float,
+    help="flag symbols with no records for longer than this many seconds",
+    default=None,
+)
+validate.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="the number of worker processes (default: CPU count)",
+    default=None,
+)
+validate.add_argument(
+    "--offline",
+    action="store_true",
+    help="do not compare record counts with get_shape",
+)
+validate.add_argument(
+    "--all",
+    action="store_true",
+    help="show every symbol and day, not only those with issues",
+)
+validate.add_argument(
+    "--json",
+    action="store_true",
+    help="print the report as JSON instead of a table",
+)
+
+
+class QualityCommands(cmd2.CommandSet):
+    """Validate local DBZ files."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(validate)  # type: ignore
+    def do_validate(self, args):
+        """Check DBZ files for gaps, duplicates, out of order timestamps,
+        crossed books, bad prices and truncated downloads."""
+        metadata_api = None
+        if not args.offline:
+            metadata_api = self._cmd.coalesced_client.metadata
+        try:
+            results = [
+                dbtoys.utilities.quality.validate(
+                    path,
+                    metadata_api=metadata_api,
+                    max_gap=args.max_gap,
+                    jobs=args.jobs,
+                    memory_budget=self._cmd.memory_budget,
+                )
+                for path in args.paths
+            ]
+        except (BentoError, OSError, RuntimeError, ValueError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+            return
+
+        if args.json:
+            self._cmd.poutput(
+                json.dumps(
+                    [
+                        {
+                            "path": result.path,
+                            "records": result.records,
+                            "expected": result.expected,
+                            "truncated": result.truncated,
+                            "report": result.report.to_dict(orient="records"),
+                        }
+                        for result in results
+                    ],
+                    indent=2,
+                )
+            )
+            return
+
+        lines = []
+        for result in results:
+            summary = f"{result.path}: {result.records} records"
+            if result.expected is not None:
+                summary += f", {result.expected} expected from get_shape"
+            if result.truncated:
+                summary += ", TRUNCATED"
+            lines.append(summary)
+            report = result.report
+            if not args.all:
+                report = report[report["issues"] != ""]
+            if len(report):
+                lines.extend(
+                    dbtoys.utilities.render.stream_table(
+                        report.itertuples(index=False),
+                        headers=list(report.columns),
+                        floatfmt=".3f",
+                    )
+                )
+            lines.append("")
+        self._cmd.ppaged_lines(lines)
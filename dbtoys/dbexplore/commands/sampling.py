@@ -0,0 +1,134 @@
+"""Random samples of local DBZ files and remote windows, loaded as a plugin
+on first use.
+"""
+import logging
+
+import cmd2
+import pandas
+from databento.historical.error import BentoError
+
+import dbtoys.utilities.render
+import dbtoys.utilities.sampling
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import log_command
+from dbtoys.dbexplore.command_parsers import KNOWN_DATASETS
+from dbtoys.dbexplore.command_parsers import KNOWN_SCHEMAS
+from dbtoys.utilities.sampling import DEFAULT_SAMPLE_SIZE
+from dbtoys.utilities.sampling import DEFAULT_STRATA
+
+_LOG = logging.getLogger()
+
+sample: cmd2.Cmd2ArgumentParser = cmd2.Cmd2ArgumentParser()
+sample.add_argument(
+    "paths",
+    nargs="*",
+    type=str,
+    help="DBZ files of one schema to sample, unless --dataset is given",
+    completer=cmd2.Cmd.path_complete,
+)
+sample.add_argument(
+    "--size",
+    "-n",
+    type=int,
+    help="the number of records to sample, of each symbol with --by-symbol",
+    default=DEFAULT_SAMPLE_SIZE,
+)
+sample.add_argument(
+    "--by-symbol",
+    action="store_true",
+    help="sample each symbol separately",
+)
+sample.add_argument(
+    "--seed",
+    type=int,
+    help="the seed of the random sample",
+    default=None,
+)
+sample.add_argument(
+    "--dataset",
+    choices=KNOWN_DATASETS,
+    type=str,
+    help="sample a remote window of this dataset instead of files",
+    default=None,
+)
+sample.add_argument(
+    "--symbols",
+    type=str,
+    help="the symbols of the remote window, separated by commas",
+    default=None,
+)
+sample.add_argument(
+    "--schema",
+    choices=KNOWN_SCHEMAS,
+    type=str,
+    help="the schema of the remote window",
+    default="trades",
+)
+sample.add_argument(
+    "--start",
+    "-s",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DDTHHMMSS.MMM",
+    help="the start of the remote window in ISO 8601 format",
+    default=None,
+)
+sample.add_argument(
+    "--end",
+    "-e",
+    type=pandas.Timestamp.fromisoformat,
+    metavar="YYYY-MM-DDTHHMMSS.MMM",
+    help="the end of the remote window in ISO 8601 format",
+    default=None,
+)
+sample.add_argument(
+    "--strata",
+    type=int,
+    help="the least number of time strata to download the remote window in",
+    default=DEFAULT_STRATA,
+)
+
+
+class SamplingCommands(cmd2.CommandSet):
+    """Preview random samples of data."""
+
+    @log_command
+    @cmd2.with_category(DataBentoExplorer.DATA_COMMANDS)
+    @cmd2.with_argparser(sample)  # type: ignore
+    def do_sample(self, args):
+        """Preview a random sample of DBZ files or of a remote window."""
+        try:
+            if args.dataset is not None:
+                if not args.symbols or args.start is None or args.end is None:
+                    raise ValueError(
+                        "Sampling a dataset needs --symbols, --start and --end"
+                    )
+                result = dbtoys.utilities.sampling.sample_window(
+                    self._cmd.historical_client.timeseries,
+                    dataset=args.dataset,
+                    symbols=args.symbols.split(","),
+                    schema=args.schema,
+                    start=args.start,
+                    end=args.end,
+                    size=args.size,
+                    by_symbol=args.by_symbol,
+                    seed=args.seed,
+                    count=args.strata,
+                )
+            else:
+                result = dbtoys.utilities.sampling.sample_files(
+                    args.paths,
+                    size=args.size,
+                    by_symbol=args.by_symbol,
+                    seed=args.seed,
+                )
+        except (BentoError, OSError, ValueError) as exc:
+            self._cmd.perror(f"ERROR: {str(exc)}")
+            _LOG.exception(exc)
+        else:
+            self._cmd.ppaged_lines(
+                dbtoys.utilities.render.stream_table(
+                    result.itertuples(index=False),
+                    headers=list(result.columns),
+                ),
+                chop=True,
+            )
@@ -0,0 +1,213 @@
+"""Offline cost estimates for dbexplore.
+Costs are estimated from cached unit prices and a model of billable bytes
+per symbol per day, fitted to the sizes the ledger has seen, so a grid of
+scenarios is priced at once without a request per scenario. A symbol's own
+rate is used where the ledger has seen it, otherwise the rate of its dataset
+and schema.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+import numpy
+import pandas
+
+from dbtoys.dbexplore.planner import DEFAULT_PLAN_MODE
+from dbtoys.dbexplore.planner import DEFAULT_PLAN_WORKERS
+
+_LOG = logging.getLogger()
+
+BYTES_PER_GB: float = 1e9
+DEFAULT_PRICE_MAX_AGE: float = 24 * 60 * 60
+
+Window = Tuple[Any, Any]
+
+
+def window_days(starts: Any, ends: Any) -> numpy.ndarray:
+    """The length of request windows in days.
+    :param starts: The starts of the windows.
+    :param ends: The ends of the windows.
+    :return: The fractional number of days in each window.
+    """
+    starts = pandas.to_datetime(pandas.Series(starts), utc=True)
+    ends = pandas.to_datetime(pandas.Series(ends), utc=True)
+    return ((ends - starts) / pandas.Timedelta(days=1)).to_numpy(float)
+
+
+class SizeModel:
+    """Billable bytes per symbol per day of each dataset and schema."""
+
+    def __init__(
+        self,
+        symbol_rates: pandas.Series,
+        schema_rates: pandas.Series,
+    ):
+        """
+        :param symbol_rates: Rates indexed by dataset, schema and symbol.
+        :param schema_rates: Rates indexed by dataset and schema.
+        """
+        self.symbol_rates = symbol_rates
+        self.schema_rates = schema_rates
+
+    @classmethod
+    def fit(cls, observations: pandas.DataFrame) -> "SizeModel":
+        """Fit rates to observed sizes.
+        Each rate is the total bytes over the total symbol days observed,
+        the least squares fit of a size proportional to symbol days.
+        :param observations: A table of dataset, schema, symbol,
+            window_start, window_end and bytes, as Ledger.size_observations.
+        :return: The fitted model.
+        """
+        observations = observations.assign(
+            days=window_days(
+                observations["window_start"], observations["window_end"]
+            )
+        )
+        observations = observations[observations["days"] > 0]
+        by_symbol = observations.groupby(["dataset", "schema", "symbol"])[
+            ["bytes", "days"]
+        ].sum()
+        by_schema = by_symbol.groupby(level=["dataset", "schema"]).sum()
+        _LOG.debug(
+            "Fitted %s symbol rates and %s schema rates from %s observations",
+            len(by_symbol),
+            len(by_schema),
+            len(observations),
+        )
+        return cls(
+            symbol_rates=by_symbol["bytes"] / by_symbol["days"],
+            schema_rates=by_schema["bytes"] / by_schema["days"],
+        )
+
+    def schemas(self, dataset: str) -> List[str]:
+        """The schemas of a dataset the model has rates for."""
+        if self.schema_rates.empty:
+            return []
+        return sorted(
+            schema
+            for known, schema in self.schema_rates.index
+            if known == dataset
+        )
+
+    def rates(
+        self,
+        dataset: str,
+        symbol_sets: Sequence[Sequence[str]],
+        schemas: Sequence[str],
+    ) -> numpy.ndarray:
+        """The bytes per day of sets of symbols.
+        :param dataset: The dataset of the symbols.
+        :param symbol_sets: The sets of symbols to estimate.
+        :param schemas: The schemas to estimate.
+        :return: An array of rates by set and schema; NaN where the model
+            has no rate for a schema.
+        """
+        set_index = numpy.repeat(
+            numpy.arange(len(symbol_sets)), [len(s) for s in symbol_sets]
+        )
+        symbols = [
+            symbol for symbol_set in symbol_sets for symbol in symbol_set
+        ]
+        result = numpy.full((len(symbol_sets), len(schemas)), numpy.nan)
+        for i, schema in enumerate(schemas):
+            fallback = self.schema_rates.get((dataset, schema))
+            if fallback is None:
+                continue
+            try:
+                known = self.symbol_rates.loc[(dataset, schema)]
+            except KeyError:
+                known = pandas.Series(dtype=float)
+            symbol_rates = known.reindex(symbols).fillna(fallback).to_numpy()
+            result[:, i] = numpy.bincount(
+                set_index, weights=symbol_rates, minlength=len(symbol_sets)
+            )
+        return result
+
+
+def estimate_grid(
+    model: SizeModel,
+    unit_prices: Dict[str, float],
+    dataset: str,
+    symbol_sets: Sequence[Sequence[str]],
+    schemas: Sequence[str],
+    windows: Sequence[Window],
+) -> pandas.DataFrame:
+    """Estimate the size and cost of every combination of symbol set,
+    schema and window.
+    :param model: The fitted size model.
+    :param unit_prices: The price per GB of each schema.
+    :param dataset: The dataset to estimate.
+    :param symbol_sets: The sets of symbols.
+    :param schemas: The schemas.
+    :param windows: The start and end of each window.
+    :return: A table of symbols, schema, start, end, bytes and cost,
+        cheapest first; bytes and cost are NaN where a rate or price is
+        unknown.
+    """
+    rates = model.rates(dataset, symbol_sets, schemas)
+    days = window_days([w[0] for w in windows], [w[1] for w in windows])
+    prices = numpy.array(
+        [unit_prices.get(schema, numpy.nan) for schema in schemas], float
+    )
+
+    size = rates[:, :, numpy.newaxis] * days[numpy.newaxis, numpy.newaxis, :]
+    cost = size / BYTES_PER_GB * prices[numpy.newaxis, :, numpy.newaxis]
+    set_i, schema_i, window_i = (i.ravel() for i in numpy.indices(size.shape))
+    starts = numpy.array(
+        [pandas.Timestamp(w[0]).isoformat() for w in windows], object
+    )
+    ends = numpy.array(
+        [pandas.Timestamp(w[1]).isoformat() for w in windows], object
+    )
+    frame = pandas.DataFrame(
+        {
+            "symbols": numpy.array(
+                [",".join(s) for s in symbol_sets], dtype=object
+            )[set_i],
+            "schema": numpy.asarray(schemas, dtype=object)[schema_i],
+            "start": starts[window_i],
+            "end": ends[window_i],
+            "bytes": size.ravel(),
+            "cost": cost.ravel(),
+        }
+    )
+    return frame.sort_values("cost", kind="stable", na_position="last")
+
+
+def verify_estimates(
+    metadata,
+    dataset: str,
+    estimates: pandas.DataFrame,
+    top: int,
+    mode: str = DEFAULT_PLAN_MODE,
+    max_workers: int = DEFAULT_PLAN_WORKERS,
+) -> pandas.DataFrame:
+    """Query the live cost of the cheapest estimates in parallel.
+    :param metadata: The databento metadata API to query.
+    :param dataset: The dataset of the estimates.
+    :param estimates: Estimates as returned by estimate_grid.
+    :param top: The number of estimates to verify.
+    :param mode: The feed mode to price.
+    :param max_workers: The maximum number of concurrent requests.
+    :return: The top estimates with a live_cost column.
+    """
+    verified = estimates.head(top).copy()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                metadata.get_cost,
+                dataset=dataset,
+                mode=mode,
+                symbols=row.symbols.split(","),
+                schema=row.schema,
+                start=row.start,
+                end=row.end,
+            )
+            for row in verified.itertuples()
+        ]
+        verified["live_cost"] = [future.result() for future in futures]
+    return verified
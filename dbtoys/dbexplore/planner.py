@@ -0,0 +1,159 @@
+"""Cost-aware request planning for dbexplore."""
+import datetime
+import logging
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+_LOG = logging.getLogger()
+
+DEFAULT_PLAN_MODE = "historical-streaming"
+DEFAULT_PLAN_WORKERS = 8
+
+# Which schemas can be rebuilt locally from another schema.
+# Book and trade schemas carry every trade, so bars can be resampled from them.
+SCHEMA_DERIVATIONS: Dict[str, Tuple[str, ...]] = {
+    "mbo": (
+        "mbp-10",
+        "mbp-1",
+        "tbbo",
+        "trades",
+        "ohlcv-1s",
+        "ohlcv-1m",
+        "ohlcv-1h",
+        "ohlcv-1d",
+    ),
+    "mbp-10": (
+        "mbp-1",
+        "tbbo",
+        "trades",
+        "ohlcv-1s",
+        "ohlcv-1m",
+        "ohlcv-1h",
+        "ohlcv-1d",
+    ),
+    "mbp-1": (
+        "tbbo",
+        "trades",
+        "ohlcv-1s",
+        "ohlcv-1m",
+        "ohlcv-1h",
+        "ohlcv-1d",
+    ),
+    "tbbo": ("trades", "ohlcv-1s", "ohlcv-1m", "ohlcv-1h", "ohlcv-1d"),
+    "trades": ("ohlcv-1s", "ohlcv-1m", "ohlcv-1h", "ohlcv-1d"),
+    "ohlcv-1s": ("ohlcv-1m", "ohlcv-1h", "ohlcv-1d"),
+    "ohlcv-1m": ("ohlcv-1h", "ohlcv-1d"),
+    "ohlcv-1h": ("ohlcv-1d",),
+    "ohlcv-1d": (),
+}
+
+KNOWN_RESOLUTIONS: Tuple[str, ...] = tuple(SCHEMA_DERIVATIONS)
+
+
+class PlanOption(NamedTuple):
+    """A candidate schema that satisfies a data need."""
+
+    schema: str
+    cost: float
+    billable_size: int
+    unit_price: Optional[float]
+    derivable: Tuple[str, ...]
+
+
+def candidate_schemas(resolution: str) -> Tuple[str, ...]:
+    """Find every schema which can provide the given resolution.
+    :param resolution: The desired schema resolution.
+    :return: The resolution itself followed by schemas it can be derived from.
+    """
+    if resolution not in SCHEMA_DERIVATIONS:
+        raise ValueError(f"Unknown resolution {resolution}")
+    return (resolution,) + tuple(
+        schema
+        for schema, derivable in SCHEMA_DERIVATIONS.items()
+        if resolution in derivable
+    )
+
+
+def plan_request(
+    metadata,
+    dataset: str,
+    symbols: Iterable[str],
+    resolution: str,
+    start: datetime.date,
+    end: datetime.date,
+    mode: str = DEFAULT_PLAN_MODE,
+    max_workers: int = DEFAULT_PLAN_WORKERS,
+) -> List[PlanOption]:
+    """Query the cost of every schema that satisfies a data need in parallel.
+    :param metadata: The databento metadata API to query.
+    :param dataset: The target dataset.
+    :param symbols: The symbols to request.
+    :param resolution: The desired schema resolution.
+    :param start: The earliest date of the request.
+    :param end: The latest date of the request.
+    :param mode: The feed mode to price.
+    :param max_workers: The maximum number of concurrent requests.
+    :return: The plan options ordered from cheapest to most expensive.
+    """
+    schemas = candidate_schemas(resolution)
+    symbols = list(symbols)
+
+    _LOG.debug(
+        "Planning %s over %s for %s from %s to %s",
+        resolution,
+        schemas,
+        dataset,
+        start,
+        end,
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        prices_future: Future = executor.submit(
+            metadata.list_unit_prices,
+            dataset=dataset,
+            mode=mode,
+        )
+        cost_futures: Dict[str, Future] = {}
+        size_futures: Dict[str, Future] = {}
+        for schema in schemas:
+            cost_futures[schema] = executor.submit(
+                metadata.get_cost,
+                dataset=dataset,
+                symbols=symbols,
+                schema=schema,
+                start=start,
+                end=end,
+            )
+            size_futures[schema] = executor.submit(
+                metadata.get_billable_size,
+                dataset=dataset,
+                symbols=symbols,
+                schema=schema,
+                start=start,
+                end=end,
+            )
+
+        unit_prices = prices_future.result()
+        if isinstance(unit_prices, dict):
+            unit_prices = unit_prices.get(mode, {})
+        else:
+            unit_prices = {}
+
+        options = [
+            PlanOption(
+                schema=schema,
+                cost=cost_futures[schema].result(),
+                billable_size=size_futures[schema].result(),
+                unit_price=unit_prices.get(schema),
+                derivable=SCHEMA_DERIVATIONS[schema],
+            )
+            for schema in schemas
+        ]
+
+    return sorted(options, key=lambda o: (o.cost, o.billable_size))
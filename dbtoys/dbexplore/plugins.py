@@ -0,0 +1,103 @@
+"""Discovery and loading of dbexplore command plugins.
+A plugin is a cmd2 CommandSet that is only imported when one of its commands
+is first used. Plugins are found by command name from two sources:
+
+- Entry points in the ENTRY_POINT_GROUP group, named after the command they
+  provide, with a value of "module:CommandSet".
+- Modules in the dbtoys.plugins namespace package, each declaring a
+  COMMAND_SET of "module:CommandSet" and the COMMANDS it provides, either
+  as a tuple of names or as a mapping of names to their help categories.
+
+Discovery only reads these declarations; it never imports a command set, so
+help lists the commands of a plugin under its declared categories until the
+plugin is loaded.
+"""
+import importlib
+import importlib.metadata
+import logging
+import pkgutil
+from typing import Dict
+from typing import Mapping
+from typing import NamedTuple
+from typing import Type
+
+import cmd2
+
+_LOG = logging.getLogger()
+
+ENTRY_POINT_GROUP: str = "dbtoys.dbexplore.commands"
+NAMESPACE: str = "dbtoys.plugins"
+DEFAULT_CATEGORY: str = "Plugin Commands"
+
+
+class Plugin(NamedTuple):
+    """A command provided by a command set that may not be imported yet."""
+
+    command: str
+    target: str
+    source: str
+    category: str = DEFAULT_CATEGORY
+
+
+def _entry_points():
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINT_GROUP)
+    # Python 3.9 returns a dictionary of groups.
+    return entry_points.get(ENTRY_POINT_GROUP, ())  # type: ignore
+
+
+def _namespace_modules():
+    try:
+        namespace = importlib.import_module(NAMESPACE)
+    except ImportError:
+        return
+    for module_info in pkgutil.iter_modules(
+        namespace.__path__, prefix=f"{NAMESPACE}."
+    ):
+        try:
+            yield importlib.import_module(module_info.name)
+        except ImportError as exc:
+            _LOG.warning("Skipping plugin %s: %s", module_info.name, exc)
+
+
+def discover() -> Dict[str, Plugin]:
+    """Find every plugin command without importing its command set.
+    Namespace plugins take precedence over entry points of the same name.
+    :return: The plugins by command name.
+    """
+    plugins: Dict[str, Plugin] = {}
+    for entry_point in _entry_points():
+        plugins[entry_point.name] = Plugin(
+            command=entry_point.name,
+            target=entry_point.value,
+            source="entry point",
+        )
+    for module in _namespace_modules():
+        commands = getattr(module, "COMMANDS", ())
+        categories = commands if isinstance(commands, Mapping) else {}
+        for command in commands:
+            plugins[command] = Plugin(
+                command=command,
+                target=module.COMMAND_SET,
+                source=module.__name__,
+                category=categories.get(command, DEFAULT_CATEGORY),
+            )
+    _LOG.debug("Discovered plugin commands %s", sorted(plugins))
+    return plugins
+
+
+def load(target: str) -> Type[cmd2.CommandSet]:
+    """Import a command set.
+    :param target: The command set as "module:CommandSet".
+    :return: The command set class.
+    """
+    module_name, _, attribute = target.partition(":")
+    command_set = getattr(importlib.import_module(module_name), attribute)
+    if not (
+        isinstance(command_set, type)
+        and issubclass(command_set, cmd2.CommandSet)
+    ):
+        raise TypeError(f"{target} is not a cmd2.CommandSet")
+    _LOG.debug("Loaded plugin %s", target)
+    return command_set
@@ -0,0 +1,171 @@
+"""A local socket server and thin client for dbexplore cantrips.
+This module is imported by the thin client, so it must stay lightweight.
+"""
+import contextlib
+import getpass
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from tempfile import gettempdir
+from typing import Optional
+from typing import Union
+
+_LOG = logging.getLogger()
+
+
+def _user() -> str:
+    try:
+        return getpass.getuser()
+    except (KeyError, OSError):
+        return str(os.getuid()) if hasattr(os, "getuid") else "unknown"
+
+
+# The socket lives in a directory only its user may enter, since anyone who
+# can connect to it runs cantrips as that user.
+DEFAULT_SOCKET_PATH: Path = (
+    Path(gettempdir()) / f"dbtoys-{_user()}" / "dbexplore.sock"
+)
+_ENCODING = "utf-8"
+
+
+def _check_unix_sockets():
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not supported on this platform")
+
+
+def _private_directory(directory: Path):
+    """Create the directory of a socket, refusing one owned by another user.
+    :param directory: The directory.
+    """
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if directory == DEFAULT_SOCKET_PATH.parent:
+        directory.chmod(0o700)
+    if hasattr(os, "getuid") and directory.stat().st_uid != os.getuid():
+        raise OSError(f"{directory} is owned by another user")
+
+
+class CantripHandler(socketserver.StreamRequestHandler):
+    """Runs one cantrip per connection against the warm explorer."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # Connections which send nothing are liveness checks.
+            return
+        cantrip = line.decode(_ENCODING).strip()
+        if not cantrip:
+            self._respond("", "No cantrip given\n", 2)
+            return
+        _LOG.debug("Serving cantrip %s", cantrip)
+
+        explorer = self.server.explorer  # type: ignore
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        original_stdout = explorer.stdout
+        explorer.stdout = stdout
+        try:
+            with contextlib.redirect_stderr(stderr):
+                stop = explorer.onecmd_plus_hooks(cantrip)
+        finally:
+            explorer.stdout = original_stdout
+
+        # Commands report failures with perror, so anything on stderr means
+        # the cantrip failed.
+        errors = stderr.getvalue()
+        self._respond(stdout.getvalue(), errors, 1 if errors else 0)
+
+        if stop:
+            # shutdown() blocks until serve_forever() returns,
+            # so it cannot be called from the serving thread.
+            threading.Thread(target=self.server.shutdown).start()
+
+    def _respond(self, stdout: str, stderr: str, exit_code: int):
+        response = {"stdout": stdout, "stderr": stderr, "exit_code": exit_code}
+        self.wfile.write(json.dumps(response).encode(_ENCODING) + b"\n")
+
+
+class CantripServer(socketserver.UnixStreamServer):
+    """A Unix domain socket server holding a warm DataBentoExplorer.
+    Cantrips are handled one at a time since cmd2 is not thread safe.
+    """
+
+    def __init__(self, socket_path: Union[str, Path], explorer):
+        _check_unix_sockets()
+        self.explorer = explorer
+        self.socket_path = Path(socket_path)
+        if self.socket_path.exists():
+            if _is_listening(self.socket_path):
+                raise OSError(f"A server is already listening on {socket_path}")
+            self.socket_path.unlink()
+        _private_directory(self.socket_path.parent)
+        super().__init__(str(self.socket_path), CantripHandler)
+        self.socket_path.chmod(0o600)
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            self.socket_path.unlink()
+
+
+def _is_listening(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def serve(explorer, socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH):
+    """Serve cantrips on a Unix domain socket until interrupted.
+    :param explorer: The DataBentoExplorer to run cantrips with.
+    :param socket_path: The path of the Unix domain socket.
+    """
+    with CantripServer(socket_path, explorer) as server:
+        _LOG.info("Serving cantrips on %s", socket_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            _LOG.debug("Received interrupt signal, exiting")
+
+
+def forward_cantrip(
+    cantrip: str,
+    socket_path: Union[str, Path] = DEFAULT_SOCKET_PATH,
+    timeout: Optional[float] = None,
+) -> int:
+    """Forward a cantrip to a running dbexplore server and print the result.
+    :param cantrip: The command to run.
+    :param socket_path: The path of the Unix domain socket.
+    :param timeout: Seconds to wait for the server; waits forever if None.
+    :return: A POSIX exit code; that of the cantrip if it was run.
+    """
+    _check_unix_sockets()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(socket_path))
+        except OSError as exc:
+            sys.stderr.write(f"No dbexplore server at {socket_path}: {exc}\n")
+            return 1
+        try:
+            sock.sendall(cantrip.encode(_ENCODING) + b"\n")
+            with sock.makefile("rb") as response_file:
+                line = response_file.readline()
+            response = json.loads(line.decode(_ENCODING)) if line else None
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"Bad response from {socket_path}: {exc}\n")
+            return 1
+
+    if not isinstance(response, dict):
+        sys.stderr.write(f"No response from the server at {socket_path}\n")
+        return 1
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return int(response.get("exit_code", 1))
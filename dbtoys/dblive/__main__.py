@@ -0,0 +1,98 @@
+"""Entry point for dblive."""
+
+import argparse
+import sys
+
+from dbtoys.dblive.app import _PROG
+from dbtoys.dblive.app import main
+from dbtoys.dblive.stream import DEFAULT_BATCH_RECORDS
+from dbtoys.dblive.stream import DEFAULT_HOST
+from dbtoys.dblive.stream import DEFAULT_PORT
+from dbtoys.dblive.stream import DEFAULT_RING_BYTES
+from dbtoys.utilities.parser import ToyParser
+from dbtoys.utilities.parser import run_main
+
+
+def _parse_args(*args):
+    """Parses command line arguments for main"""
+    parser = ToyParser(
+        prog=_PROG,
+        description="Consumes a live record stream, or replays a file as one.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        help="the host to connect to or listen on",
+        default=DEFAULT_HOST,
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="the port to connect to or listen on",
+        default=DEFAULT_PORT,
+    )
+    parser.add_argument(
+        "--batch-records",
+        type=int,
+        help="the largest number of records handled at once",
+        default=DEFAULT_BATCH_RECORDS,
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="enables printing of the log to stderr",
+    )
+    commands = parser.add_subparsers(
+        dest="command", required=True, parser_class=argparse.ArgumentParser
+    )
+
+    consume = commands.add_parser(
+        "consume", help="consume a stream and report latency percentiles"
+    )
+    consume.add_argument(
+        "--callback",
+        type=str,
+        metavar="MODULE:FUNCTION",
+        help="a function to call with each batch of records",
+        default=None,
+    )
+    consume.add_argument(
+        "--duration",
+        type=float,
+        metavar="SECONDS",
+        help="stop after this many seconds instead of at the end of the stream",
+        default=None,
+    )
+    consume.add_argument(
+        "--ring-bytes",
+        type=int,
+        help="the size of the ring buffer between the socket and callback",
+        default=DEFAULT_RING_BYTES,
+    )
+
+    replay = commands.add_parser(
+        "replay", help="serve a DBZ file as a live stream"
+    )
+    replay.add_argument(
+        "path",
+        type=str,
+        help="the DBZ file to replay",
+    )
+    replay.add_argument(
+        "--rate",
+        type=float,
+        metavar="RECORDS_PER_SECOND",
+        help="the rate to send records at (default: as fast as possible)",
+        default=None,
+    )
+    replay.add_argument(
+        "--repeat",
+        type=int,
+        help="the number of times to replay the file; 0 for forever",
+        default=1,
+    )
+    return dict(vars(parser.parse_args(*args)).items())
+
+
+sys.exit(run_main(_PROG, main, _parse_args(sys.argv[1:])))
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+"""Consumes a live record stream, or replays a DBZ file as one."""
+import logging
+import logging.config
+import sys
+from typing import Optional
+
+from tabulate import tabulate
+
+import dbtoys.utilities.logging
+from dbtoys.dblive.replay import ReplayServer
+from dbtoys.dblive.stream import ConsumerStats
+from dbtoys.dblive.stream import LiveConsumer
+from dbtoys.dblive.stream import load_callback
+
+_LOG = logging.getLogger()
+_PROG = "dblive"
+
+
+def format_stats(stats: ConsumerStats) -> str:
+    """Format the statistics of a consumer as a table.
+    :param stats: The statistics.
+    :return: The table.
+    """
+    seconds = max(stats.seconds, 1e-9)
+    rows = [
+        ["records", stats.records],
+        ["records/s", f"{stats.records / seconds:,.0f}"],
+        ["MB/s", f"{stats.bytes / 1e6 / seconds:,.1f}"],
+        ["ring stalls", stats.stalls],
+    ]
+    rows.extend(
+        [f"p{percentile:g} latency (us)", f"{value / 1000:,.1f}"]
+        for percentile, value in stats.latency.percentiles().items()
+    )
+    rows.append(["max latency (us)", f"{stats.latency.max / 1000:,.1f}"])
+    return tabulate(rows, headers=["statistic", "value"])
+
+
+def _count(_):
+    """The default callback, which only counts records."""
+
+
+def main(
+    command: str,
+    host: str,
+    port: int,
+    batch_records: int,
+    verbose: bool,
+    path: Optional[str] = None,
+    rate: Optional[float] = None,
+    repeat: int = 1,
+    callback: Optional[str] = None,
+    duration: Optional[float] = None,
+    ring_bytes: int = 0,
+) -> int:
+    """Runs the toy dblive.
+    :param command: Either "consume" or "replay".
+    :param host: The host to connect to or listen on.
+    :param port: The port to connect to or listen on.
+    :param batch_records: The largest number of records handled at once.
+    :param verbose: Enables printing of log records to stderr.
+    :param path: The DBZ file to replay.
+    :param rate: The number of records per second to replay.
+    :param repeat: The number of times to replay the file; 0 forever.
+    :param callback: A "module:function" to call with each batch.
+    :param duration: Stop consuming after this many seconds.
+    :param ring_bytes: The size of the consumer's ring buffer.
+    :return: POSIX exit code.
+    """
+    logging.config.dictConfig(dbtoys.utilities.logging.DEFAULT_LOGGING)
+    dbtoys.utilities.logging.configure_file_logger(
+        logger=_LOG, log_file_name=f"{_PROG}.log"
+    )
+    _LOG.setLevel("NOTSET")
+
+    if verbose:
+        # If the --verbose flag was given we will print log events to stderr.
+        dbtoys.utilities.logging.configure_console_handler(
+            logger=_LOG, stream=sys.stderr
+        )
+
+    _LOG.debug(
+        "Executing %s with arguments: command=%s host=%s port=%s path=%s "
+        "rate=%s repeat=%s callback=%s duration=%s ring_bytes=%s "
+        "batch_records=%s verbose=%s",
+        _PROG,
+        command,
+        host,
+        port,
+        path,
+        rate,
+        repeat,
+        callback,
+        duration,
+        ring_bytes,
+        batch_records,
+        verbose,
+    )
+
+    try:
+        if command == "replay":
+            with ReplayServer(
+                path,  # type: ignore
+                (host, port),
+                rate=rate,
+                repeat=repeat,
+                batch_records=batch_records,
+            ) as server:
+                sys.stdout.write(
+                    "Replaying {} on {}:{}\n".format(
+                        path, *server.server_address
+                    )
+                )
+                server.serve_forever()
+        else:
+            consumer = LiveConsumer(
+                load_callback(callback) if callback else _count,
+                address=(host, port),
+                ring_bytes=ring_bytes,
+                batch_records=batch_records,
+            )
+            sys.stdout.write(format_stats(consumer.run(duration)) + "\n")
+    except KeyboardInterrupt:
+        return 0
+    except Exception as exc:
+        _LOG.exception("Terminating due to unhandled %s!", exc.__class__)
+        return 1
+    else:
+        return 0
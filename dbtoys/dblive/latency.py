@@ -0,0 +1,55 @@
+"""A fixed size histogram of latencies."""
+from typing import Dict
+from typing import Iterable
+
+import numpy
+
+# Each power of two is split into this many buckets, about 4% apart.
+SUB_BUCKETS: int = 16
+# Latencies up to 2**40 nanoseconds, about 18 minutes, are distinguished.
+MAX_EXPONENT: int = 40
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """Counts latencies in logarithmic buckets, so memory stays constant
+    however many are recorded.
+    """
+
+    def __init__(self):
+        self.counts = numpy.zeros(MAX_EXPONENT * SUB_BUCKETS + 1, numpy.int64)
+        self.total = 0
+        self.max = 0
+
+    def record(self, latencies: numpy.ndarray):
+        """Count a batch of latencies.
+        :param latencies: Latencies in nanoseconds.
+        """
+        if not len(latencies):
+            return
+        latencies = numpy.maximum(latencies, 1)
+        buckets = numpy.minimum(
+            (numpy.log2(latencies) * SUB_BUCKETS).astype(numpy.int64),
+            len(self.counts) - 1,
+        )
+        self.counts += numpy.bincount(buckets, minlength=len(self.counts))
+        self.total += len(latencies)
+        self.max = max(self.max, int(latencies.max()))
+
+    def percentiles(
+        self, percentiles: Iterable[float] = DEFAULT_PERCENTILES
+    ) -> Dict[float, int]:
+        """Estimate latency percentiles.
+        :param percentiles: The percentiles to estimate, from 0 to 100.
+        :return: The upper bound of each percentile in nanoseconds.
+        """
+        cumulative = numpy.cumsum(self.counts)
+        result = {}
+        for percentile in percentiles:
+            bucket = int(
+                numpy.searchsorted(cumulative, self.total * percentile / 100)
+            )
+            upper = int(2 ** ((bucket + 1) / SUB_BUCKETS))
+            result[percentile] = min(upper, self.max)
+        return result
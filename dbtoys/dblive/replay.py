@@ -0,0 +1,126 @@
+"""A local stand-in for a live feed, replaying a DBZ file over TCP.
+Records are sent at a steady rate with ts_event set to the time they are
+sent, so consumers can measure their latency as they would on a live feed.
+"""
+import logging
+import socket
+import socketserver
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy
+
+import dbtoys.utilities.dbz
+from dbtoys.dblive.stream import DEFAULT_BATCH_RECORDS
+from dbtoys.dblive.stream import write_header
+
+_LOG = logging.getLogger()
+
+# Paced sends aim for a batch about this often, in seconds.
+_PACING_INTERVAL: float = 0.001
+
+
+def send_records(
+    sock: socket.socket,
+    chunks: Iterator[numpy.ndarray],
+    rate: Optional[float] = None,
+    batch_records: int = DEFAULT_BATCH_RECORDS,
+) -> int:
+    """Send records in batches, stamping each batch with ts_event.
+    :param sock: The connected socket.
+    :param chunks: Writable record arrays to send.
+    :param rate: If given, the number of records per second to send.
+    :param batch_records: The largest number of records to send at once.
+    :return: The number of records sent.
+    """
+    if rate:
+        batch_records = max(1, min(batch_records, int(rate * _PACING_INTERVAL)))
+    started = time.perf_counter()
+    sent = 0
+    for chunk in chunks:
+        for i in range(0, len(chunk), batch_records):
+            batch = chunk[i : i + batch_records]
+            if rate:
+                delay = started + (sent + len(batch)) / rate
+                delay -= time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            batch["ts_event"] = time.time_ns()
+            sock.sendall(batch.view(numpy.uint8))
+            sent += len(batch)
+    return sent
+
+
+class _ReplayHandler(socketserver.BaseRequestHandler):
+    """Replays the file of the server to one consumer."""
+
+    server: "ReplayServer"
+
+    def handle(self):
+        server = self.server
+        schema = server.metadata["schema"]
+        write_header(self.request, server.metadata)
+
+        def chunks():
+            passes = 0
+            while not server.repeat or passes < server.repeat:
+                yield from dbtoys.utilities.dbz.iter_records(
+                    server.path, schema
+                )
+                passes += 1
+
+        started = time.perf_counter()
+        try:
+            sent = send_records(
+                self.request, chunks(), server.rate, server.batch_records
+            )
+        except (BrokenPipeError, ConnectionResetError):
+            _LOG.debug("Consumer %s disconnected", self.client_address)
+        else:
+            _LOG.debug(
+                "Replayed %s records to %s in %.3fs",
+                sent,
+                self.client_address,
+                time.perf_counter() - started,
+            )
+
+
+class ReplayServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Serves a replay of a DBZ file to every consumer that connects."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        address: Tuple[str, int],
+        rate: Optional[float] = None,
+        repeat: int = 1,
+        batch_records: int = DEFAULT_BATCH_RECORDS,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        :param path: The DBZ file to replay.
+        :param address: The host and port to listen on; port 0 picks one.
+        :param rate: If given, the number of records per second to send.
+        :param repeat: The number of times to replay the file; 0 forever.
+        :param batch_records: The largest number of records to send at once.
+        :param metadata: The DBZ metadata; read from the file if not given.
+        """
+        self.path = Path(path)
+        self.rate = rate
+        self.repeat = repeat
+        self.batch_records = batch_records
+        self.metadata = (
+            metadata
+            if metadata is not None
+            else dbtoys.utilities.dbz.read_metadata(path)
+        )
+        super().__init__(address, _ReplayHandler)
@@ -0,0 +1,88 @@
+"""A bounded ring buffer between a socket reader and a record consumer."""
+import socket
+import threading
+from typing import Optional
+
+import numpy
+
+
+class RingBuffer:
+    """A single producer, single consumer ring of fixed size records.
+    The producer receives from a socket straight into free space and the
+    consumer decodes whole records in place, so bytes are never copied
+    between the socket and the callback. The capacity is a whole number of
+    records, which keeps every record contiguous.
+    """
+
+    def __init__(self, capacity: int, dtype: numpy.dtype):
+        self.dtype = dtype
+        self.capacity = max(1, capacity // dtype.itemsize) * dtype.itemsize
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._condition = threading.Condition()
+        # Total bytes ever written and read; positions are modulo capacity.
+        self._written = 0
+        self._read = 0
+        self._closed = False
+        self.stalls = 0
+
+    def __len__(self) -> int:
+        return self._written - self._read
+
+    def close(self):
+        """Signal that no more bytes will be written."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """Receive from a socket into the free space of the ring, waiting
+        while the ring is full.
+        :param sock: The socket to receive from.
+        :return: The number of bytes received; 0 at the end of the stream.
+        """
+        with self._condition:
+            if self._written - self._read == self.capacity:
+                self.stalls += 1
+                while (
+                    self._written - self._read == self.capacity
+                    and not self._closed
+                ):
+                    self._condition.wait()
+            if self._closed:
+                return 0
+            start = self._written % self.capacity
+            end = min(self.capacity, start + self.capacity - len(self))
+        # The consumer never touches free space, so no lock is needed here.
+        count = sock.recv_into(self._view[start:end])
+        with self._condition:
+            self._written += count
+            self._condition.notify_all()
+        return count
+
+    def peek(self, max_records: int, timeout: Optional[float] = None):
+        """Wait for whole records and view them without copying.
+        The records stay valid until they are released.
+        :param max_records: The maximum number of records to return.
+        :param timeout: The longest time to wait, in seconds.
+        :return: The records; empty at the end of the stream or on timeout.
+        """
+        size = self.dtype.itemsize
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self) >= size or self._closed, timeout=timeout
+            )
+            start = self._read % self.capacity
+            available = min(len(self), self.capacity - start)
+        count = min(available // size, max_records)
+        return numpy.frombuffer(
+            self._buffer, dtype=self.dtype, count=count, offset=start
+        )
+
+    def release(self, records: int):
+        """Free the space of records returned by peek.
+        :param records: The number of records to free.
+        """
+        with self._condition:
+            self._read += records * self.dtype.itemsize
+            self._condition.notify_all()
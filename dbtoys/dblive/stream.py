@@ -0,0 +1,165 @@
+"""A consumer of live record streams over TCP.
+A stream starts with a header of the magic bytes, the length of the JSON
+metadata and the metadata itself, followed by raw records of the schema the
+metadata names. One thread receives into a bounded ring buffer while the
+calling thread decodes batches of records in place and runs the callback,
+so a slow callback delays records but never the socket reader.
+"""
+import contextlib
+import importlib
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+import numpy
+
+import dbtoys.utilities.dbz
+from dbtoys.dblive.latency import LatencyHistogram
+from dbtoys.dblive.ring import RingBuffer
+
+_LOG = logging.getLogger()
+
+MAGIC: bytes = b"DBLV"
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PORT: int = 13000
+DEFAULT_RING_BYTES: int = 64 * 1024 * 1024
+DEFAULT_BATCH_RECORDS: int = 8192
+
+_HEADER = struct.Struct("<4sI")
+# How often the consumer checks whether it should stop, in seconds.
+_POLL_SECONDS: float = 0.1
+
+
+def write_header(sock: socket.socket, metadata: Dict[str, Any]):
+    """Send the header of a stream.
+    :param sock: The connected socket.
+    :param metadata: The metadata, which must name the schema.
+    """
+    data = json.dumps(metadata, default=str).encode("utf-8")
+    sock.sendall(_HEADER.pack(MAGIC, len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, count: int) -> bytes:
+    data = bytearray()
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise ConnectionError("The stream ended before its header")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_header(sock: socket.socket) -> Dict[str, Any]:
+    """Receive the header of a stream.
+    :param sock: The connected socket.
+    :return: The metadata of the stream.
+    """
+    magic, length = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    if magic != MAGIC:
+        raise ConnectionError("The peer is not a dblive stream")
+    return json.loads(_recv_exactly(sock, length))
+
+
+def load_callback(target: str) -> Callable[[numpy.ndarray], Any]:
+    """Import a callback.
+    :param target: The callback as "module:function".
+    :return: The callback.
+    """
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class ConsumerStats(NamedTuple):
+    """What a consumer received and how late it was."""
+
+    records: int
+    bytes: int
+    seconds: float
+    stalls: int
+    latency: LatencyHistogram
+
+
+class LiveConsumer:
+    """Consumes one stream, passing batches of records to a callback.
+    The records passed to the callback are views into the ring buffer and
+    are only valid until the callback returns; copy them to keep them.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[numpy.ndarray], Any],
+        address: Tuple[str, int] = (DEFAULT_HOST, DEFAULT_PORT),
+        ring_bytes: int = DEFAULT_RING_BYTES,
+        batch_records: int = DEFAULT_BATCH_RECORDS,
+    ):
+        self.callback = callback
+        self.address = address
+        self.ring_bytes = ring_bytes
+        self.batch_records = batch_records
+        self.metadata: Optional[Dict[str, Any]] = None
+
+    def run(self, duration: Optional[float] = None) -> ConsumerStats:
+        """Consume the stream until it ends or for a while.
+        :param duration: If given, stop after this many seconds.
+        :return: The statistics of the stream.
+        """
+        latency = LatencyHistogram()
+        records = 0
+        with socket.create_connection(self.address) as sock:
+            self.metadata = read_header(sock)
+            dtype = dbtoys.utilities.dbz.record_dtype(self.metadata["schema"])
+            ring = RingBuffer(self.ring_bytes, dtype)
+            reader = threading.Thread(
+                target=self._receive, args=(sock, ring), daemon=True
+            )
+            started = time.perf_counter()
+            deadline = None if duration is None else started + duration
+            reader.start()
+            try:
+                while deadline is None or time.perf_counter() < deadline:
+                    ended = not reader.is_alive()
+                    batch = ring.peek(self.batch_records, timeout=_POLL_SECONDS)
+                    if not len(batch):
+                        if ended:
+                            break
+                        continue
+                    received = time.time_ns()
+                    latency.record(
+                        received - batch["ts_event"].astype(numpy.int64)
+                    )
+                    self.callback(batch)
+                    records += len(batch)
+                    ring.release(len(batch))
+            finally:
+                seconds = time.perf_counter() - started
+                ring.close()
+                with contextlib.suppress(OSError):
+                    sock.shutdown(socket.SHUT_RDWR)
+                reader.join()
+        _LOG.debug("Consumed %s records in %.3fs", records, seconds)
+        return ConsumerStats(
+            records=records,
+            bytes=records * dtype.itemsize,
+            seconds=seconds,
+            stalls=ring.stalls,
+            latency=latency,
+        )
+
+    @staticmethod
+    def _receive(sock: socket.socket, ring: RingBuffer):
+        try:
+            while ring.recv_into(sock):
+                pass
+        except OSError as exc:
+            _LOG.debug("Stopped receiving: %s", exc)
+        finally:
+            ring.close()
@@ -0,0 +1,92 @@
+"""Entry point for dbsync."""
+
+import sys
+
+from dbtoys.dbsync.app import _PROG
+from dbtoys.dbsync.app import DEFAULT_JOBS
+from dbtoys.dbsync.app import main
+from dbtoys.utilities.coordination import DEFAULT_LEASE_SECONDS
+from dbtoys.utilities.parser import ToyParser
+from dbtoys.utilities.parser import run_main
+
+
+def _parse_args(*args):
+    """Parses command line arguments for main"""
+    parser = ToyParser(
+        prog=_PROG,
+        description="Fills the gaps of a local mirror of databento data.",
+    )
+    parser.add_argument(
+        "spec",
+        type=str,
+        help="a JSON list of dataset, schema, symbols, start and end to mirror",
+    )
+    parser.add_argument(
+        "root",
+        type=str,
+        help="the root directory of the local mirror",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        metavar="USD",
+        help="refuse to download if the total cost is higher",
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="the number of concurrent requests",
+        default=DEFAULT_JOBS,
+    )
+    parser.add_argument(
+        "--max-gap-days",
+        type=int,
+        help="merge gaps separated by this many days which are held",
+        default=0,
+    )
+    parser.add_argument(
+        "--max-days",
+        type=int,
+        help="split requests longer than this many days",
+        default=None,
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="print the requests and their cost without downloading",
+    )
+    parser.add_argument(
+        "--coordinate",
+        nargs="?",
+        const="",
+        type=str,
+        metavar="DIR",
+        help="share the work with other dbsync workers, on any host, through "
+        "a shared directory; ROOT/.coordination by default",
+        default=None,
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        help="take over work from coordinated workers silent for this long",
+        default=DEFAULT_LEASE_SECONDS,
+    )
+    parser.add_argument(
+        "--fold",
+        action="store_true",
+        help="record the work done by coordinated workers in the manifest; "
+        "run once from one process after they finish",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="enables printing of the log to stderr",
+    )
+    return dict(vars(parser.parse_args(*args)).items())
+
+
+sys.exit(run_main(_PROG, main, _parse_args(sys.argv[1:])))
@@ -0,0 +1,489 @@
+#!/usr/bin/python3
+"""Fills the gaps of a local mirror from the historical API."""
+import datetime
+import hashlib
+import logging
+import logging.config
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+
+import dbtoys.utilities.client
+import dbtoys.utilities.key
+import dbtoys.utilities.ledger
+import dbtoys.utilities.logging
+from dbtoys.dbsync.gaps import CoverageSpec
+from dbtoys.dbsync.gaps import SyncRequest
+from dbtoys.dbsync.gaps import load_specs
+from dbtoys.dbsync.gaps import plan_requests
+from dbtoys.dbsync.manifest import MANIFEST_FILE_NAME
+from dbtoys.dbsync.manifest import Manifest
+from dbtoys.utilities.coordination import DEFAULT_COORDINATION_DIR
+from dbtoys.utilities.coordination import DEFAULT_LEASE_SECONDS
+from dbtoys.utilities.coordination import Coordinator
+from dbtoys.utilities.coordination import WorkUnit
+
+_LOG = logging.getLogger()
+_PROG = "dbsync"
+
+DEFAULT_JOBS: int = 4
+
+# How long a coordinated worker waits for units leased by others, in seconds.
+_POLL_SECONDS: float = 1.0
+
+
+def plan_sync(
+    manifest: Manifest,
+    specs: Iterable[CoverageSpec],
+    max_gap_days: int = 0,
+    max_days: Optional[int] = None,
+) -> List[SyncRequest]:
+    """Work out the requests which fill the gaps of every spec.
+    This only reads the manifest, so it is cheap when nothing is missing.
+    :param manifest: The manifest of the mirror.
+    :param specs: The coverage specs.
+    :param max_gap_days: Merge gaps separated by this many covered days.
+    :param max_days: If given, split requests longer than this many days.
+    :return: The requests to make.
+    """
+    requests: List[SyncRequest] = []
+    for spec in specs:
+        covered = manifest.covered(
+            spec.dataset, spec.schema, spec.symbols, spec.start, spec.end
+        )
+        requests.extend(
+            plan_requests(
+                spec, covered, max_gap_days=max_gap_days, max_days=max_days
+            )
+        )
+    return requests
+
+
+def estimate_costs(
+    metadata: Any,
+    requests: List[SyncRequest],
+    jobs: int = DEFAULT_JOBS,
+    ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+) -> List[float]:
+    """Get the cost of every request concurrently.
+    :param metadata: The metadata API of a databento client.
+    :param requests: The requests to estimate.
+    :param jobs: The number of concurrent requests.
+    :param ledger: If given, record each estimate.
+    :return: The cost of each request.
+    """
+
+    def get_cost(request: SyncRequest) -> float:
+        cost = metadata.get_cost(
+            dataset=request.dataset,
+            symbols=list(request.symbols),
+            schema=request.schema,
+            start=request.start.isoformat(),
+            end=request.end.isoformat(),
+        )
+        if ledger is not None:
+            ledger.record(
+                "estimate",
+                dataset=request.dataset,
+                schema=request.schema,
+                symbols=request.symbols,
+                start=request.start,
+                end=request.end,
+                cost=cost,
+            )
+        return cost
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(get_cost, requests))
+
+
+def request_path(root: Path, request: SyncRequest) -> Path:
+    """The path a request is downloaded to.
+    :param root: The root of the mirror.
+    :param request: The request.
+    :return: A path unique to the request.
+    """
+    digest = hashlib.sha1(",".join(request.symbols).encode("utf-8"))
+    return (
+        root
+        / request.dataset
+        / request.schema
+        / f"{request.start}_{request.end}_{digest.hexdigest()[:12]}.dbz"
+    )
+
+
+def download(
+    client: Any,
+    manifest: Optional[Manifest],
+    request: SyncRequest,
+    root: Path,
+    cost: Optional[float] = None,
+    ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+) -> Optional[Path]:
+    """Download a request and record it in the manifest.
+    A failed request is logged and leaves its gap for the next sync. A
+    request the API has no data for writes no file and is recorded as
+    having no data.
+    :param client: The databento historical client.
+    :param manifest: The manifest of the mirror; None to leave recording
+        the request to the caller.
+    :param request: The request to download.
+    :param root: The root of the mirror.
+    :param cost: If given, the estimated cost of the request.
+    :param ledger: If given, record the download.
+    :return: The path of the request, which does not exist if it has no
+        data, or None if it failed.
+    """
+    path = request_path(root, request)
+    # Unique, so workers which both download a request do not collide.
+    partial = path.with_suffix(f".{uuid.uuid4().hex[:12]}.partial")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        client.timeseries.stream(
+            dataset=request.dataset,
+            symbols=list(request.symbols),
+            schema=request.schema,
+            start=request.start.isoformat(),
+            end=request.end.isoformat(),
+            path=str(partial),
+        )
+        # The client leaves an empty file when there is no data.
+        empty = not partial.exists() or partial.stat().st_size == 0
+        if empty:
+            partial.unlink(missing_ok=True)
+        else:
+            # Only complete downloads are visible to the mirror.
+            os.replace(partial, path)
+    except Exception as exc:  # pylint: disable=broad-except
+        _LOG.exception("Failed to download %s: %s", request, exc)
+        return None
+
+    if manifest is not None:
+        manifest.add(
+            request.dataset,
+            request.schema,
+            request.symbols,
+            request.days(),
+            None if empty else path,
+        )
+    if ledger is not None:
+        ledger.record(
+            "download",
+            dataset=request.dataset,
+            schema=request.schema,
+            symbols=request.symbols,
+            start=request.start,
+            end=request.end,
+            cost=cost,
+            size=0 if empty else path.stat().st_size,
+        )
+    if empty:
+        _LOG.info("No data for %s", request)
+    else:
+        _LOG.info("Downloaded %s", path)
+    return path
+
+
+def fetch(
+    client: Any,
+    manifest: Manifest,
+    requests: List[SyncRequest],
+    root: Path,
+    costs: Optional[List[float]] = None,
+    jobs: int = DEFAULT_JOBS,
+    ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+) -> List[Optional[Path]]:
+    """Download requests concurrently and record them in the manifest.
+    :param client: The databento historical client.
+    :param manifest: The manifest of the mirror.
+    :param requests: The requests to download.
+    :param root: The root of the mirror.
+    :param costs: If given, the estimated cost of each request.
+    :param jobs: The number of concurrent downloads.
+    :param ledger: If given, record each download.
+    :return: The path of each request, or None if it failed.
+    """
+    costs = costs or [None] * len(requests)  # type: ignore
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(
+            executor.map(
+                lambda request, cost: download(
+                    client, manifest, request, root, cost, ledger
+                ),
+                requests,
+                costs,
+            )
+        )
+
+
+def plan_units(requests: Iterable[SyncRequest]) -> List[WorkUnit]:
+    """Split requests into units of one symbol and day.
+    Units do not depend on how gaps were grouped into requests, so every
+    worker of a coordinated sync agrees on them.
+    :param requests: The requests.
+    :return: The units, by day.
+    """
+    units = {
+        WorkUnit(request.dataset, request.schema, symbol, day)
+        for request in requests
+        for symbol in request.symbols
+        for day in request.days()
+    }
+    return sorted(units, key=lambda unit: (unit.day, unit))
+
+
+def unit_costs(
+    requests: Iterable[SyncRequest], costs: Iterable[float]
+) -> Dict[WorkUnit, float]:
+    """Share the cost of each request evenly between its units.
+    :param requests: The requests.
+    :param costs: The cost of each request.
+    :return: The cost of each unit.
+    """
+    result: Dict[WorkUnit, float] = {}
+    for request, cost in zip(requests, costs):
+        days = request.days()
+        share = cost / (len(request.symbols) * len(days))
+        for symbol in request.symbols:
+            for day in days:
+                unit = WorkUnit(request.dataset, request.schema, symbol, day)
+                result[unit] = share
+    return result
+
+
+def fetch_coordinated(
+    client: Any,
+    units: List[WorkUnit],
+    root: Path,
+    coordinator: Coordinator,
+    costs: Optional[Dict[WorkUnit, float]] = None,
+    jobs: int = DEFAULT_JOBS,
+    ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+) -> List[Optional[Path]]:
+    """Download units claimed from a coordinator shared with other workers.
+    Each thread claims a unit, downloads it and marks it done with its path,
+    until every unit is done or has failed here. Units leased by other
+    workers are waited for, and taken over if their leases expire.
+    The manifest is not written, as SQLite is unsafe to share between hosts;
+    one process folds the done units into it afterwards, see fold_done.
+    :param client: The databento historical client.
+    :param units: The units to download.
+    :param root: The root of the mirror.
+    :param coordinator: The coordinator, with its heartbeat running.
+    :param costs: If given, the estimated cost of each unit.
+    :param jobs: The number of concurrent downloads.
+    :param ledger: If given, record each download.
+    :return: The path of each unit, which does not exist if it has no
+        data, or None if it failed here and is not done.
+    """
+    costs = costs or {}
+    failed: Set[WorkUnit] = set()
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            with lock:
+                candidates = [unit for unit in units if unit not in failed]
+            pending = coordinator.pending(candidates)
+            if not pending:
+                return
+            lease = coordinator.claim_next(pending)
+            if lease is None:
+                time.sleep(min(_POLL_SECONDS, coordinator.ttl))
+                continue
+            unit = lease.unit
+            request = SyncRequest(
+                dataset=unit.dataset,
+                schema=unit.schema,
+                symbols=(unit.symbol,),
+                start=unit.day,
+                end=unit.day + datetime.timedelta(days=1),
+            )
+            path = download(
+                client, None, request, root, costs.get(unit), ledger
+            )
+            if path is None:
+                with lock:
+                    failed.add(unit)
+                coordinator.release(lease)
+            else:
+                coordinator.complete(
+                    lease, path=str(path), empty=not path.exists()
+                )
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for result in [executor.submit(work) for _ in range(jobs)]:
+            result.result()
+
+    paths: List[Optional[Path]] = []
+    for unit in units:
+        details = coordinator.done(unit)
+        paths.append(None if details is None else Path(details["path"]))
+    return paths
+
+
+def fold_done(
+    manifest: Manifest, coordinator: Coordinator, units: Iterable[WorkUnit]
+) -> int:
+    """Record the units done by coordinated workers in the manifest.
+    Only one process may do this at a time, once the workers finish.
+    :param manifest: The manifest of the mirror.
+    :param coordinator: The coordinator the workers shared.
+    :param units: The units to record if they are done.
+    :return: The number of units recorded.
+    """
+    folded = 0
+    for unit in units:
+        details = coordinator.done(unit)
+        if details is None:
+            continue
+        manifest.add(
+            unit.dataset,
+            unit.schema,
+            (unit.symbol,),
+            [unit.day],
+            None if details.get("empty") else Path(details["path"]),
+        )
+        folded += 1
+    return folded
+
+
+def main(
+    spec: str,
+    root: str,
+    max_cost: Optional[float],
+    jobs: int,
+    max_gap_days: int,
+    max_days: Optional[int],
+    dry_run: bool,
+    verbose: bool,
+    coordinate: Optional[str] = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    fold: bool = False,
+) -> int:
+    """Runs the toy dbsync.
+    :param spec: The path to a JSON coverage spec.
+    :param root: The root of the local mirror.
+    :param max_cost: Refuse to download if the total cost is higher.
+    :param jobs: The number of concurrent requests.
+    :param max_gap_days: Merge gaps separated by this many covered days.
+    :param max_days: If given, split requests longer than this many days.
+    :param dry_run: Print the requests and their cost without downloading.
+    :param verbose: Enables printing of log records to stderr.
+    :param coordinate: If given, claim work units with other workers
+        through this shared directory; ROOT/.coordination if empty.
+    :param lease_seconds: How long a claimed unit lasts without a heartbeat.
+    :param fold: Record the units done by coordinated workers in the
+        manifest instead of syncing.
+    :return: POSIX exit code.
+    """
+    logging.config.dictConfig(dbtoys.utilities.logging.DEFAULT_LOGGING)
+    dbtoys.utilities.logging.configure_file_logger(
+        logger=_LOG, log_file_name=f"{_PROG}.log"
+    )
+    _LOG.setLevel("NOTSET")
+
+    if verbose:
+        # If the --verbose flag was given we will print log events to stderr.
+        dbtoys.utilities.logging.configure_console_handler(
+            logger=_LOG, stream=sys.stderr
+        )
+
+    _LOG.debug(
+        "Executing %s with arguments: spec=%s root=%s max_cost=%s jobs=%s "
+        "max_gap_days=%s max_days=%s dry_run=%s verbose=%s coordinate=%s "
+        "lease_seconds=%s fold=%s",
+        _PROG,
+        spec,
+        root,
+        max_cost,
+        jobs,
+        max_gap_days,
+        max_days,
+        dry_run,
+        verbose,
+        coordinate,
+        lease_seconds,
+        fold,
+    )
+
+    try:
+        root_path = Path(root)
+        manifest = Manifest(root_path / MANIFEST_FILE_NAME)
+        requests = plan_sync(
+            manifest,
+            load_specs(spec),
+            max_gap_days=max_gap_days,
+            max_days=max_days,
+        )
+        if not requests:
+            sys.stdout.write("Nothing to sync.\n")
+            return 0
+        directory = Path(coordinate or root_path / DEFAULT_COORDINATION_DIR)
+        if fold:
+            folded = fold_done(
+                manifest, Coordinator(directory), plan_units(requests)
+            )
+            sys.stdout.write(f"Recorded {folded} units in the manifest\n")
+            return 0
+
+        api_key = dbtoys.utilities.key.get_api_key(prompt_for_key=True)
+        client = dbtoys.utilities.client.get_historical_client(key=api_key)
+        try:
+            ledger = dbtoys.utilities.ledger.Ledger()
+        except (OSError, sqlite3.Error) as exc:
+            _LOG.warning("Running without the ledger: %s", exc)
+            ledger = None
+        costs = estimate_costs(client.metadata, requests, jobs, ledger)
+        for request, cost in zip(requests, costs):
+            sys.stdout.write(
+                f"{request.dataset} {request.schema} {request.start} "
+                f"{request.end} {len(request.symbols)} symbols ${cost:.2f}\n"
+            )
+        total = sum(costs)
+        sys.stdout.write(f"{len(requests)} requests costing ${total:.2f}\n")
+
+        if max_cost is not None and total > max_cost:
+            sys.stderr.write(
+                f"Refusing to sync, ${total:.2f} exceeds ${max_cost:.2f}\n"
+            )
+            return 1
+        if dry_run:
+            return 0
+
+        if coordinate is not None:
+            with Coordinator(directory, ttl=lease_seconds) as coordinator:
+                paths = fetch_coordinated(
+                    client,
+                    plan_units(requests),
+                    root_path,
+                    coordinator,
+                    unit_costs(requests, costs),
+                    jobs,
+                    ledger,
+                )
+        else:
+            paths = fetch(
+                client, manifest, requests, root_path, costs, jobs, ledger
+            )
+        failed = sum(path is None for path in paths)
+        if failed:
+            sys.stderr.write(f"{failed} of {len(paths)} requests failed\n")
+            return 1
+    except Exception as exc:
+        _LOG.exception("Terminating due to unhandled %s!", exc.__class__)
+        return 1
+    else:
+        return 0
@@ -0,0 +1,147 @@
+"""Find the gaps between a coverage spec and a local manifest."""
+import collections
+import datetime
+import json
+from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+import pandas
+
+Day = datetime.date
+Interval = Tuple[Day, Day]
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+
+class CoverageSpec(NamedTuple):
+    """The data a local mirror should hold; the end day is exclusive."""
+
+    dataset: str
+    schema: str
+    symbols: Tuple[str, ...]
+    start: Day
+    end: Day
+
+    def days(self) -> List[Day]:
+        """Every day of the spec.
+        :return: The days from start until end.
+        """
+        return [
+            self.start + _ONE_DAY * i
+            for i in range((self.end - self.start).days)
+        ]
+
+
+class SyncRequest(NamedTuple):
+    """A request for several symbols over one interval of days."""
+
+    dataset: str
+    schema: str
+    symbols: Tuple[str, ...]
+    start: Day
+    end: Day
+
+    def days(self) -> List[Day]:
+        """Every day of the request.
+        :return: The days from start until end.
+        """
+        return CoverageSpec.days(self)  # type: ignore
+
+
+def _day(value) -> Day:
+    return pandas.Timestamp(value).date()
+
+
+def load_specs(path: Union[str, Path]) -> List[CoverageSpec]:
+    """Load coverage specs from a JSON file holding a list of objects with
+    dataset, schema, symbols, start and end keys.
+    :param path: The path to the spec file.
+    :return: The coverage specs.
+    """
+    with open(path, "r", encoding="utf-8") as spec_file:
+        entries = json.load(spec_file)
+    if isinstance(entries, dict):
+        entries = [entries]
+    specs = []
+    for entry in entries:
+        symbols = entry["symbols"]
+        if isinstance(symbols, str):
+            symbols = symbols.split(",")
+        specs.append(
+            CoverageSpec(
+                dataset=entry["dataset"],
+                schema=entry["schema"],
+                symbols=tuple(symbols),
+                start=_day(entry["start"]),
+                end=_day(entry["end"]),
+            )
+        )
+    return specs
+
+
+def merge_days(days: Iterable[Day], max_gap_days: int = 0) -> List[Interval]:
+    """Merge days into as few intervals as possible.
+    :param days: The days to merge.
+    :param max_gap_days: Also merge across this many days which are not
+        given, trading a little redundant data for fewer requests.
+    :return: Intervals of days; each end is exclusive.
+    """
+    intervals: List[Interval] = []
+    for day in sorted(set(days)):
+        if intervals and (day - intervals[-1][1]).days <= max_gap_days:
+            intervals[-1] = (intervals[-1][0], day + _ONE_DAY)
+        else:
+            intervals.append((day, day + _ONE_DAY))
+    return intervals
+
+
+def plan_requests(
+    spec: CoverageSpec,
+    covered: Set[Tuple[str, Day]],
+    max_gap_days: int = 0,
+    max_days: Optional[int] = None,
+) -> List[SyncRequest]:
+    """Work out the requests which fill the gaps of a spec.
+    Symbols missing the same intervals share a request.
+    :param spec: The coverage spec.
+    :param covered: The (symbol, day) pairs already held locally.
+    :param max_gap_days: Merge gaps separated by this many covered days.
+    :param max_days: If given, split requests longer than this many days.
+    :return: The requests to make.
+    """
+    by_interval: Dict[Interval, List[str]] = collections.defaultdict(list)
+    days = spec.days()
+    for symbol in spec.symbols:
+        missing = [day for day in days if (symbol, day) not in covered]
+        for interval in merge_days(missing, max_gap_days=max_gap_days):
+            for part in _split(interval, max_days):
+                by_interval[part].append(symbol)
+
+    return [
+        SyncRequest(
+            dataset=spec.dataset,
+            schema=spec.schema,
+            symbols=tuple(symbols),
+            start=start,
+            end=end,
+        )
+        for (start, end), symbols in sorted(by_interval.items())
+    ]
+
+
+def _split(interval: Interval, max_days: Optional[int]) -> List[Interval]:
+    start, end = interval
+    if max_days is None:
+        return [interval]
+    parts = []
+    while start < end:
+        parts.append((start, min(end, start + _ONE_DAY * max_days)))
+        start = parts[-1][1]
+    return parts
@@ -0,0 +1,115 @@
+"""The manifest of data held by a local mirror."""
+import datetime
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+_LOG = logging.getLogger()
+
+MANIFEST_FILE_NAME: str = "manifest.db"
+# The path recorded for days the API has no data for.
+NO_DATA_PATH: str = ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS coverage (
+    dataset TEXT NOT NULL,
+    schema TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (dataset, schema, symbol, day)
+) WITHOUT ROWID;
+"""
+
+
+class Manifest:
+    """Records which (dataset, schema, symbol, day) the mirror holds.
+    The manifest is SQLite in WAL mode, so concurrent syncs on one host may
+    share it. SQLite is unsafe to write from several hosts, so coordinated
+    workers leave it to one process to record their work.
+    Days with no data are recorded without a file, so they are not requested
+    again.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.path, timeout=30.0, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the manifest."""
+        self._connection.close()
+
+    def covered(
+        self,
+        dataset: str,
+        schema: str,
+        symbols: Iterable[str],
+        start: datetime.date,
+        end: datetime.date,
+    ) -> Set[Tuple[str, datetime.date]]:
+        """Find the (symbol, day) pairs held for a window.
+        :param dataset: The dataset.
+        :param schema: The schema.
+        :param symbols: The symbols.
+        :param start: The first day.
+        :param end: The last day (exclusive).
+        :return: The pairs present in the manifest.
+        """
+        result: Set[Tuple[str, datetime.date]] = set()
+        for symbol in symbols:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT day FROM coverage WHERE dataset = ? "
+                    "AND schema = ? AND symbol = ? AND day >= ? AND day < ?",
+                    (
+                        dataset,
+                        schema,
+                        symbol,
+                        start.isoformat(),
+                        end.isoformat(),
+                    ),
+                ).fetchall()
+            result.update(
+                (symbol, datetime.date.fromisoformat(day)) for (day,) in rows
+            )
+        return result
+
+    def add(
+        self,
+        dataset: str,
+        schema: str,
+        symbols: Iterable[str],
+        days: Iterable[datetime.date],
+        path: Optional[Union[str, Path]],
+    ):
+        """Record the symbols and days held by a file.
+        :param dataset: The dataset.
+        :param schema: The schema.
+        :param symbols: The symbols of the file.
+        :param days: The days of the file.
+        :param path: The path of the file; None if the days have no data.
+        """
+        path = NO_DATA_PATH if path is None else str(path)
+        days = [day.isoformat() for day in days]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)",
+                (
+                    (dataset, schema, symbol, day, path)
+                    for symbol in symbols
+                    for day in days
+                ),
+            )
+        _LOG.debug("Recorded %s in the manifest", path or "no data")
@@ -0,0 +1,5 @@
+"""Rolling analytics of local DBZ files, which import numpy and pandas."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.analytics:AnalyticsCommands"
+COMMANDS: Dict[str, str] = {"analytics": "Data Commands"}
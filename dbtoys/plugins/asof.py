@@ -0,0 +1,9 @@
+"""As-of queries and joins of local DBZ files, which import numpy and
+zstandard."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.asof:AsofCommands"
+COMMANDS: Dict[str, str] = {
+    "asof": "Data Commands",
+    "join_quotes": "Data Commands",
+}
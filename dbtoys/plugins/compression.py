@@ -0,0 +1,8 @@
+"""Compression benchmarks and dictionaries, which import zstandard."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.compression:CompressionCommands"
+COMMANDS: Dict[str, str] = {
+    "benchmark_compression": "Diagnostic Commands",
+    "train_dictionary": "Data Commands",
+}
@@ -0,0 +1,5 @@
+"""Offline cost estimates, which import numpy and pandas."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.estimate:EstimateCommands"
+COMMANDS: Dict[str, str] = {"estimate_cost": "Planning Commands"}
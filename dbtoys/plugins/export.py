@@ -0,0 +1,8 @@
+"""Conversion and export of local DBZ files, which import pyarrow."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.export:ExportCommands"
+COMMANDS: Dict[str, str] = {
+    "convert": "Data Commands",
+    "export": "Data Commands",
+}
@@ -0,0 +1,5 @@
+"""Queued download jobs."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.jobs:JobCommands"
+COMMANDS: Dict[str, str] = {"jobs": "Data Commands"}
@@ -0,0 +1,5 @@
+"""Data quality checks of local DBZ files, which import numpy and pandas."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.quality:QualityCommands"
+COMMANDS: Dict[str, str] = {"validate": "Data Commands"}
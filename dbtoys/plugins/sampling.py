@@ -0,0 +1,5 @@
+"""Random samples of local DBZ files and remote windows."""
+from typing import Dict
+
+COMMAND_SET: str = "dbtoys.dbexplore.commands.sampling:SamplingCommands"
+COMMANDS: Dict[str, str] = {"sample": "Data Commands"}
@@ -0,0 +1,293 @@
+"""Utility module for as-of queries over local DBZ files.
+The first query of a file builds an index next to it: the records sorted by
+product and time, kept as an uncompressed .npy file which later queries map
+into memory, with keys ranking each record by product and then time. The
+latest record of every product at or before a time is then found with one
+searchsorted of those keys across all products at once.
+"""
+import logging
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Union
+
+import numpy
+import pandas
+
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+
+_LOG = logging.getLogger()
+
+DEFAULT_TS_FIELD: str = "ts_event"
+INDEX_SUFFIX: str = ".asof"
+
+
+def product_time_keys(
+    ids: numpy.ndarray,
+    ts: numpy.ndarray,
+    products: numpy.ndarray,
+    times: numpy.ndarray,
+) -> numpy.ndarray:
+    """Rank records by product and then time in a single sortable key.
+    :param ids: The product IDs of the records.
+    :param ts: The times of the records.
+    :param products: The sorted unique product IDs of the records.
+    :param times: The sorted unique times of the records.
+    :return: The key of each record.
+    """
+    slots = numpy.searchsorted(products, ids).astype(numpy.int64)
+    return slots * (len(times) + 1) + numpy.searchsorted(times, ts)
+
+
+def latest_positions(
+    keys: numpy.ndarray,
+    ids: numpy.ndarray,
+    products: numpy.ndarray,
+    times: numpy.ndarray,
+    query_ids: numpy.ndarray,
+    query_ts: Union[int, numpy.ndarray],
+    allow_exact: bool = True,
+) -> numpy.ndarray:
+    """Find the latest record of the same product at or before each query.
+    :param keys: The sorted keys of the records from product_time_keys.
+    :param ids: The product IDs of the records.
+    :param products: The products the keys were made with.
+    :param times: The times the keys were made with.
+    :param query_ids: The product IDs to find.
+    :param query_ts: The time of each query, or one time for all.
+    :param allow_exact: Match records at the same time as a query.
+    :return: Positions into the records; -1 where there is no record.
+    """
+    if not len(keys):
+        return numpy.full(len(query_ids), -1)
+    slots = numpy.searchsorted(products, query_ids).astype(numpy.int64)
+    # Ranking a query after every time it may match, the record before its
+    # key is the latest of its product, or of an earlier one if it has none.
+    ranks = numpy.searchsorted(
+        times, query_ts, side="right" if allow_exact else "left"
+    )
+    positions = numpy.searchsorted(keys, slots * (len(times) + 1) + ranks) - 1
+    found = positions >= 0
+    found[found] = ids[positions[found]] == query_ids[found]
+    return numpy.where(found, positions, -1)
+
+
+class IndexPaths(NamedTuple):
+    """The files of an as-of index."""
+
+    records: Path
+    keys: Path
+    times: Path
+    offsets: Path
+
+
+def index_paths(
+    path: Union[str, Path], ts_field: str = DEFAULT_TS_FIELD
+) -> IndexPaths:
+    """The paths of the index files of a DBZ file.
+    :param path: The DBZ file.
+    :param ts_field: The timestamp field the index is sorted by.
+    :return: The paths of the sorted records, their keys, their unique times
+        and of the products.
+    """
+    path = Path(path)
+    stem = f"{path.name}{INDEX_SUFFIX}.{ts_field}"
+    return IndexPaths(
+        records=path.with_name(f"{stem}.npy"),
+        keys=path.with_name(f"{stem}.keys.npy"),
+        times=path.with_name(f"{stem}.times.npy"),
+        offsets=path.with_name(f"{stem}.npz"),
+    )
+
+
+class AsofIndex:
+    """The records of one DBZ file sorted by product and time."""
+
+    def __init__(
+        self,
+        records: numpy.ndarray,
+        keys: numpy.ndarray,
+        products: numpy.ndarray,
+        times: numpy.ndarray,
+        symbols: Dict[int, str],
+        ts_field: str = DEFAULT_TS_FIELD,
+    ):
+        self.records = records
+        self.keys = keys
+        self.products = products
+        self.times = times
+        self.symbols = symbols
+        self.ts_field = ts_field
+
+    @classmethod
+    def build(
+        cls,
+        path: Union[str, Path],
+        ts_field: str = DEFAULT_TS_FIELD,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> "AsofIndex":
+        """Build and save the index of a DBZ file.
+        :param path: The DBZ file.
+        :param ts_field: The timestamp field to sort by.
+        :param metadata: The DBZ metadata; read from the file if not given.
+        :return: The index.
+        """
+        if metadata is None:
+            metadata = dbtoys.utilities.dbz.read_metadata(path)
+        schema = metadata["schema"]
+        chunks = list(dbtoys.utilities.dbz.iter_records(path, schema))
+        records = (
+            numpy.concatenate(chunks)
+            if chunks
+            else numpy.zeros(0, dtype=dbtoys.utilities.dbz.record_dtype(schema))
+        )
+        records = records[
+            numpy.lexsort((records[ts_field], records["product_id"]))
+        ]
+        products = numpy.unique(records["product_id"])
+        times = numpy.unique(records[ts_field])
+        keys = product_time_keys(
+            records["product_id"], records[ts_field], products, times
+        )
+        symbols = dbtoys.utilities.dbz.symbol_map(metadata)
+
+        paths = index_paths(path, ts_field)
+        numpy.save(paths.records, records)
+        numpy.save(paths.keys, keys)
+        numpy.save(paths.times, times)
+        stat = Path(path).stat()
+        numpy.savez(
+            paths.offsets,
+            products=products,
+            symbol_ids=numpy.fromiter(symbols.keys(), dtype=numpy.int64),
+            symbol_names=numpy.array(list(symbols.values()), dtype=str),
+            source=numpy.array([stat.st_size, stat.st_mtime_ns]),
+        )
+        _LOG.debug("Built as-of index of %s by %s", path, ts_field)
+        return cls(records, keys, products, times, symbols, ts_field)
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, Path],
+        ts_field: str = DEFAULT_TS_FIELD,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> "AsofIndex":
+        """Load the index of a DBZ file, building it if it is missing or
+        older than the file.
+        :param path: The DBZ file.
+        :param ts_field: The timestamp field to sort by.
+        :param metadata: The DBZ metadata; read from the file if needed.
+        :return: The index.
+        """
+        paths = index_paths(path, ts_field)
+        if all(index_path.exists() for index_path in paths):
+            stat = Path(path).stat()
+            with numpy.load(paths.offsets) as offsets:
+                if list(offsets["source"]) == [stat.st_size, stat.st_mtime_ns]:
+                    return cls(
+                        numpy.load(paths.records, mmap_mode="r"),
+                        numpy.load(paths.keys, mmap_mode="r"),
+                        offsets["products"],
+                        numpy.load(paths.times, mmap_mode="r"),
+                        dict(
+                            zip(
+                                offsets["symbol_ids"].tolist(),
+                                offsets["symbol_names"].tolist(),
+                            )
+                        ),
+                        ts_field,
+                    )
+            _LOG.debug("As-of index of %s is stale", path)
+        return cls.build(path, ts_field=ts_field, metadata=metadata)
+
+    def latest(self, product_ids: numpy.ndarray, ts: int) -> numpy.ndarray:
+        """Find the position of the latest record at or before a time for
+        each product.
+        :param product_ids: The products to find.
+        :param ts: The time in nanoseconds since the UNIX epoch.
+        :return: Positions into records; -1 where there is no record.
+        """
+        return latest_positions(
+            self.keys,
+            self.records["product_id"],
+            self.products,
+            self.times,
+            numpy.asarray(product_ids, dtype=self.products.dtype),
+            ts,
+        )
+
+
+def asof(
+    paths: Iterable[Union[str, Path]],
+    ts: Union[int, str, pandas.Timestamp],
+    symbols: Optional[Iterable[str]] = None,
+    ts_field: str = DEFAULT_TS_FIELD,
+    pretty_px: bool = False,
+    pretty_ts: bool = False,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> pandas.DataFrame:
+    """Get the latest record of each symbol at or before a time.
+    :param paths: DBZ files of one schema to search.
+    :param ts: The time; naive timestamps are UTC.
+    :param symbols: The symbols or product IDs to find; defaults to all.
+    :param ts_field: The timestamp field to search by.
+    :param pretty_px: Convert fixed precision prices to floats.
+    :param pretty_ts: Convert nanosecond timestamps to datetimes.
+    :param metadata: The DBZ metadata of every file; read if needed.
+    :return: One record per symbol found, ordered by product ID.
+    """
+    if not isinstance(ts, int):
+        timestamp = pandas.Timestamp(ts)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.tz_localize("UTC")
+        ts = timestamp.value
+
+    paths = list(paths)
+    if not paths:
+        raise ValueError("No files to search")
+    metadatas = [
+        dbtoys.utilities.dbz.read_metadata(path)
+        if metadata is None
+        else metadata
+        for path in paths
+    ]
+    schemas = {path_metadata["schema"] for path_metadata in metadatas}
+    if len(schemas) > 1:
+        raise ValueError(
+            f"Files of one schema must be searched, not {sorted(schemas)}"
+        )
+
+    found: List[numpy.ndarray] = []
+    names: Dict[int, str] = {}
+    for path, path_metadata in zip(paths, metadatas):
+        index = AsofIndex.load(path, ts_field=ts_field, metadata=path_metadata)
+        names.update(index.symbols)
+        if symbols is None:
+            product_ids = index.products
+        else:
+            wanted = set(symbols)
+            product_ids = numpy.fromiter(
+                {int(s) for s in wanted if s.isdigit()}
+                | {p for p, s in index.symbols.items() if s in wanted},
+                dtype=numpy.int64,
+            )
+        positions = index.latest(product_ids, ts)
+        found.append(numpy.asarray(index.records[positions[positions >= 0]]))
+
+    records = numpy.concatenate(found)
+    # Keep the latest record of each product across files.
+    records = records[numpy.lexsort((records[ts_field], records["product_id"]))]
+    last = numpy.ones(len(records), dtype=bool)
+    last[:-1] = records["product_id"][1:] != records["product_id"][:-1]
+    return dbtoys.utilities.convert.transform_records(
+        records[last],
+        symbols=names or None,
+        pretty_px=pretty_px,
+        pretty_ts=pretty_ts,
+    )
@@ -0,0 +1,354 @@
+"""Utility module for creating databento clients with pooled connections."""
+import asyncio
+import atexit
+import functools
+import logging
+import threading
+from typing import Any
+from typing import BinaryIO
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import aiohttp
+import databento
+import requests
+from databento.common.bento import Bento
+from databento.common.bento import FileBento
+from databento.historical.http import check_http_error
+from databento.historical.http import check_http_error_async
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+
+_LOG = logging.getLogger()
+
+DEFAULT_POOL_SIZE: int = 16
+DEFAULT_TIMEOUT: Tuple[float, float] = (10.0, 100.0)
+DEFAULT_KEEPALIVE: float = 30.0
+DEFAULT_COMPRESSION: bool = True
+DATABENTO_VERSION: str = "0.4.0"
+
+_NO_DATA_FOUND = b"No data found for query."
+_STREAM_CHUNK_SIZE = 1024 * 32
+
+_LOCK = threading.RLock()
+_SETTINGS: Dict[str, Any] = {
+    "pool_size": DEFAULT_POOL_SIZE,
+    "timeout": DEFAULT_TIMEOUT,
+    "keepalive": DEFAULT_KEEPALIVE,
+    "compression": DEFAULT_COMPRESSION,
+}
+_SESSION: Optional[requests.Session] = None
+# Sessions are closed on their own loop, so the loops are held until then.
+_ASYNC_SESSIONS: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_CLIENTS: Dict[Tuple[str, str], databento.Historical] = {}
+
+# The private methods of the databento 0.4 API classes replaced with pooled
+# versions; other versions are left unpooled.
+_POOLED_METHODS: Tuple[str, ...] = (
+    "_get",
+    "_post",
+    "_stream",
+    "_get_async",
+    "_stream_async",
+)
+
+
+def configure_pool(
+    pool_size: Optional[int] = None,
+    timeout: Optional[Tuple[float, float]] = None,
+    keepalive: Optional[float] = None,
+    compression: Optional[bool] = None,
+):
+    """Configure the process wide connection pool.
+    Existing sessions are closed and recreated on next use.
+    :param pool_size: The maximum number of pooled connections per host.
+    :param timeout: The connect and read timeouts in seconds.
+    :param keepalive: Seconds to keep an idle asyncio connection open.
+    :param compression: Enables gzip/zstd transport compression.
+    """
+    with _LOCK:
+        if pool_size is not None:
+            _SETTINGS["pool_size"] = pool_size
+        if timeout is not None:
+            _SETTINGS["timeout"] = timeout
+        if keepalive is not None:
+            _SETTINGS["keepalive"] = keepalive
+        if compression is not None:
+            _SETTINGS["compression"] = compression
+        close_pool()
+
+
+def close_pool():
+    """Close the pooled session and forget every cached client."""
+    global _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+        sessions = list(_ASYNC_SESSIONS.items())
+        _ASYNC_SESSIONS.clear()
+        _CLIENTS.clear()
+    for loop, session in sessions:
+        _close_on_loop(loop, session)
+
+
+def _close_on_loop(
+    loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession
+):
+    """Close an aiohttp session on the loop it belongs to."""
+    if session.closed:
+        return
+    try:
+        running: Optional[
+            asyncio.AbstractEventLoop
+        ] = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop.is_closed():
+        # Its transports went with the loop; aiohttp only marks the session
+        # closed, which any loop can do.
+        if running is None:
+            asyncio.run(session.close())
+        else:
+            running.create_task(session.close())
+    elif running is loop:
+        loop.create_task(session.close())
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result(
+            timeout=_SETTINGS["timeout"][0]
+        )
+    else:
+        loop.run_until_complete(session.close())
+
+
+def _accept_encoding() -> str:
+    """The Accept-Encoding header for the configured transport compression.
+    requests advertises zstd when urllib3 is able to decode it.
+    """
+    if _SETTINGS["compression"]:
+        return DEFAULT_ACCEPT_ENCODING
+    return "identity"
+
+
+def get_session() -> requests.Session:
+    """Get the process wide pooled requests session.
+    The session is created on first use and is shared between threads.
+    :return: A requests session with a keep-alive connection pool.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=_SETTINGS["pool_size"],
+                pool_maxsize=_SETTINGS["pool_size"],
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = _accept_encoding()
+            session.headers["Connection"] = "keep-alive"
+            _LOG.debug(
+                "Created pooled session with %s connections",
+                _SETTINGS["pool_size"],
+            )
+            _SESSION = session
+        return _SESSION
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Get the pooled aiohttp session for the running event loop.
+    aiohttp sessions are bound to a loop, so one session is kept per loop.
+    :return: An aiohttp session with a keep-alive connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        stale = [
+            (other, session)
+            for other, session in _ASYNC_SESSIONS.items()
+            if other.is_closed()
+        ]
+        for other, _ in stale:
+            del _ASYNC_SESSIONS[other]
+    for other, session in stale:
+        _close_on_loop(other, session)
+    with _LOCK:
+        session = _ASYNC_SESSIONS.get(loop)
+        if session is None or session.closed:
+            connect, read = _SETTINGS["timeout"]
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=_SETTINGS["pool_size"],
+                    keepalive_timeout=_SETTINGS["keepalive"],
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=connect, sock_read=read
+                ),
+                headers={
+                    "Accept-Encoding": "gzip, deflate"
+                    if _SETTINGS["compression"]
+                    else "identity"
+                },
+            )
+            _ASYNC_SESSIONS[loop] = session
+        return session
+
+
+async def close_async_session():
+    """Close the pooled aiohttp session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _LOCK:
+        session = _ASYNC_SESSIONS.pop(loop, None)
+    if session is not None:
+        await session.close()
+
+
+def get_historical_client(
+    key: str, gateway: str = "nearest"
+) -> databento.Historical:
+    """Get a databento historical client which uses the pooled sessions.
+    Clients are cached so every caller with the same key shares one client.
+    :param key: The databento API key.
+    :param gateway: The historical gateway.
+    :return: A databento historical client.
+    """
+    with _LOCK:
+        client = _CLIENTS.get((key, gateway))
+        if client is None:
+            client = databento.Historical(key=key, gateway=gateway)
+            for api in (
+                client.batch,
+                client.metadata,
+                client.symbology,
+                client.timeseries,
+            ):
+                _attach_pool(api)
+            _CLIENTS[(key, gateway)] = client
+        return client
+
+
+def _attach_pool(api):
+    """Replace the HTTP methods of a databento API with pooled versions."""
+    missing = [name for name in _POOLED_METHODS if not hasattr(api, name)]
+    if missing:
+        _LOG.warning(
+            "Not pooling %s, which has no %s; dbtoys targets databento %s",
+            type(api).__name__,
+            ", ".join(missing),
+            DATABENTO_VERSION,
+        )
+        return
+    api._get = functools.partial(_pooled_request, api, "GET")
+    api._post = functools.partial(_pooled_request, api, "POST")
+    api._stream = functools.partial(_pooled_stream, api)
+    api._get_async = functools.partial(_pooled_get_async, api)
+    api._stream_async = functools.partial(_pooled_stream_async, api)
+
+
+def _basic_auth(api, basic_auth: bool) -> Optional[HTTPBasicAuth]:
+    if not basic_auth:
+        return None
+    return HTTPBasicAuth(username=api._key, password=None)
+
+
+def _async_basic_auth(api, basic_auth: bool) -> Optional[aiohttp.BasicAuth]:
+    if not basic_auth:
+        return None
+    return aiohttp.BasicAuth(login=api._key, password="", encoding="utf-8")
+
+
+def _pooled_request(
+    api,
+    method: str,
+    url: str,
+    params: Optional[List[Tuple[str, str]]] = None,
+    basic_auth: bool = False,
+) -> requests.Response:
+    api._check_api_key()
+    with get_session().request(
+        method=method,
+        url=url,
+        params=params,
+        headers=api._headers,
+        auth=_basic_auth(api, basic_auth),
+        timeout=_SETTINGS["timeout"],
+    ) as response:
+        check_http_error(response)
+        return response
+
+
+def _pooled_stream(
+    api,
+    url: str,
+    params: List[Tuple[str, str]],
+    basic_auth: bool,
+    bento: Bento,
+):
+    api._check_api_key()
+    with get_session().get(
+        url=url,
+        params=params,
+        headers=api._headers,
+        auth=_basic_auth(api, basic_auth),
+        timeout=_SETTINGS["timeout"],
+        stream=True,
+    ) as response:
+        check_http_error(response)
+        writer: BinaryIO = bento.writer()
+        for chunk in response.iter_content(chunk_size=_STREAM_CHUNK_SIZE):
+            if chunk == _NO_DATA_FOUND:
+                _LOG.info("No data found for query.")
+                return
+            writer.write(chunk)
+        if isinstance(bento, FileBento):
+            writer.close()
+        bento.set_metadata(bento.source_metadata())
+
+
+async def _pooled_get_async(
+    api,
+    url: str,
+    params: Optional[List[Tuple[str, str]]] = None,
+    basic_auth: bool = False,
+) -> aiohttp.ClientResponse:
+    api._check_api_key()
+    async with get_async_session().get(
+        url=url,
+        params=params,
+        headers=api._headers,
+        auth=_async_basic_auth(api, basic_auth),
+    ) as response:
+        await check_http_error_async(response)
+        await response.read()
+        return response
+
+
+async def _pooled_stream_async(
+    api,
+    url: str,
+    params: List[Tuple[str, Optional[str]]],
+    basic_auth: bool,
+    bento: Bento,
+):
+    api._check_api_key()
+    async with get_async_session().get(
+        url=url,
+        params=[x for x in params if x[1] is not None],
+        headers=api._headers,
+        auth=_async_basic_auth(api, basic_auth),
+    ) as response:
+        await check_http_error_async(response)
+        writer: BinaryIO = bento.writer()
+        async for data, _ in response.content.iter_chunks():
+            if data == _NO_DATA_FOUND:
+                _LOG.info("No data found for query.")
+                return
+            writer.write(data)
+        if isinstance(bento, FileBento):
+            writer.close()
+        bento.set_metadata(bento.source_metadata())
+
+
+atexit.register(close_pool)
@@ -0,0 +1,236 @@
+"""Utility module for compressing files written by dbtoys.
+Files are compressed with streaming zstd at a configurable level, optionally
+with worker threads. Small files, such as the records of one symbol, compress
+poorly alone; a dictionary trained per schema recovers most of the ratio.
+"""
+import collections
+import logging
+import time
+from pathlib import Path
+from typing import BinaryIO
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import zstandard
+from databento.common.enums import Compression
+
+import dbtoys.utilities.dbz
+
+_LOG = logging.getLogger()
+
+KNOWN_COMPRESSIONS: Tuple[str, ...] = tuple(x.value for x in Compression)
+DEFAULT_LEVEL: int = 3
+DEFAULT_BENCHMARK_LEVELS: Tuple[int, ...] = (1, 3, 6, 9, 15, 19)
+DEFAULT_DICTIONARY_PATH: Path = Path.home() / ".dbtoys" / "dictionaries"
+DEFAULT_DICTIONARY_SIZE: int = 112 * 1024
+DEFAULT_SAMPLE_SIZE: int = 16 * 1024
+DEFAULT_SAMPLE_LIMIT: int = 64 * 1024 * 1024
+
+
+def _compressor(
+    level: int = DEFAULT_LEVEL,
+    threads: int = 0,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+) -> zstandard.ZstdCompressor:
+    if not 1 <= level <= zstandard.MAX_COMPRESSION_LEVEL:
+        raise ValueError(
+            f"zstd level must be between 1 and {zstandard.MAX_COMPRESSION_LEVEL}"
+        )
+    return zstandard.ZstdCompressor(
+        level=level, threads=threads, dict_data=dictionary
+    )
+
+
+def open_writer(
+    path: Union[str, Path],
+    compression: str = "none",
+    level: int = DEFAULT_LEVEL,
+    threads: int = 0,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+) -> BinaryIO:
+    """Open a file for writing, compressing what is written to it.
+    :param path: The file to write.
+    :param compression: One of KNOWN_COMPRESSIONS.
+    :param level: The zstd compression level.
+    :param threads: The number of zstd worker threads; -1 for every core.
+    :param dictionary: If given, compress with this dictionary.
+    :return: A binary writer.
+    """
+    if compression not in KNOWN_COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression}")
+    output_file = open(path, "wb")  # pylint: disable=consider-using-with
+    if compression == Compression.NONE.value:
+        return output_file
+    return _compressor(level, threads, dictionary).stream_writer(
+        output_file, closefd=True
+    )  # type: ignore
+
+
+def open_reader(
+    path: Union[str, Path],
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+) -> BinaryIO:
+    """Open a zstd compressed file for reading.
+    :param path: The file to read.
+    :param dictionary: The dictionary the file was compressed with, if any.
+    :return: A binary reader of the decompressed content.
+    """
+    return zstandard.ZstdDecompressor(dict_data=dictionary).stream_reader(
+        open(path, "rb"), read_across_frames=True, closefd=True
+    )  # type: ignore
+
+
+def archive_sample(
+    path: Union[str, Path],
+    schema: str,
+    limit: int = DEFAULT_SAMPLE_LIMIT,
+) -> bytes:
+    """Read the records at the start of a DBZ file as one sample.
+    :param path: The DBZ file.
+    :param schema: The schema of the records.
+    :param limit: The most bytes of records to read.
+    :return: The records, as they would be archived.
+    """
+    chunks = []
+    total = 0
+    for records in dbtoys.utilities.dbz.iter_records(path, schema):
+        # Samples end on a record boundary.
+        records = records[: max(0, (limit - total) // records.itemsize)]
+        chunks.append(records.tobytes())
+        total += records.nbytes
+        if total + records.itemsize > limit:
+            break
+    return b"".join(chunks)
+
+
+def symbol_samples(
+    path: Union[str, Path],
+    schema: str,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    limit: int = DEFAULT_SAMPLE_LIMIT,
+) -> List[bytes]:
+    """Split the records of a DBZ file into small per-symbol samples.
+    :param path: The DBZ file.
+    :param schema: The schema of the records.
+    :param sample_size: The approximate size of each sample.
+    :param limit: Stop after reading this many bytes of records.
+    :return: Samples holding the records of one symbol each.
+    """
+    by_product: Dict[int, List[bytes]] = collections.defaultdict(list)
+    total = 0
+    for records in dbtoys.utilities.dbz.iter_records(path, schema):
+        for product_id in set(records["product_id"].tolist()):
+            by_product[product_id].append(
+                records[records["product_id"] == product_id].tobytes()
+            )
+        total += records.nbytes
+        if total >= limit:
+            break
+
+    samples = []
+    for chunks in by_product.values():
+        data = b"".join(chunks)
+        samples.extend(
+            data[i : i + sample_size] for i in range(0, len(data), sample_size)
+        )
+    return samples
+
+
+def train_dictionary(
+    samples: List[bytes],
+    dict_size: int = DEFAULT_DICTIONARY_SIZE,
+    level: int = DEFAULT_LEVEL,
+) -> zstandard.ZstdCompressionDict:
+    """Train a zstd dictionary from samples of similar data.
+    :param samples: The samples; at least several hundred work best.
+    :param dict_size: The maximum size of the dictionary in bytes.
+    :param level: The compression level the dictionary is tuned for.
+    :return: The trained dictionary.
+    """
+    return zstandard.train_dictionary(dict_size, samples, level=level)
+
+
+def dictionary_path(
+    schema: str, directory: Union[str, Path] = DEFAULT_DICTIONARY_PATH
+) -> Path:
+    """The path of the trained dictionary of a schema.
+    :param schema: The schema of the dictionary.
+    :param directory: The directory holding dictionaries.
+    :return: The path of the dictionary.
+    """
+    return Path(directory) / f"{schema}.zdict"
+
+
+def save_dictionary(
+    dictionary: zstandard.ZstdCompressionDict, path: Union[str, Path]
+):
+    """Write a dictionary to a file.
+    :param dictionary: The dictionary.
+    :param path: The file to write.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_bytes(dictionary.as_bytes())
+
+
+def load_dictionary(path: Union[str, Path]) -> zstandard.ZstdCompressionDict:
+    """Read a dictionary from a file.
+    :param path: The file to read.
+    :return: The dictionary.
+    """
+    return zstandard.ZstdCompressionDict(Path(path).read_bytes())
+
+
+class BenchmarkResult(NamedTuple):
+    """The ratio and throughput of one compression level."""
+
+    level: int
+    ratio: float
+    compress_mbps: float
+    decompress_mbps: float
+
+
+def benchmark(
+    samples: List[bytes],
+    levels: Iterable[int] = DEFAULT_BENCHMARK_LEVELS,
+    threads: int = 0,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+) -> List[BenchmarkResult]:
+    """Compare ratio and throughput across compression levels.
+    Each sample is compressed as its own frame, so many small samples
+    measure small files and one large sample measures an archive.
+    :param samples: The data to compress.
+    :param levels: The zstd levels to compare.
+    :param threads: The number of zstd worker threads.
+    :param dictionary: If given, compress with this dictionary.
+    :return: A result per level.
+    """
+    size = sum(len(sample) for sample in samples)
+    decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+    results = []
+    for level in levels:
+        compressor = _compressor(level, threads, dictionary)
+        started = time.perf_counter()
+        frames = [compressor.compress(sample) for sample in samples]
+        compress_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for frame in frames:
+            decompressor.decompress(frame)
+        decompress_seconds = time.perf_counter() - started
+
+        compressed = sum(len(frame) for frame in frames)
+        results.append(
+            BenchmarkResult(
+                level=level,
+                ratio=size / max(compressed, 1),
+                compress_mbps=size / 1e6 / max(compress_seconds, 1e-9),
+                decompress_mbps=size / 1e6 / max(decompress_seconds, 1e-9),
+            )
+        )
+        _LOG.debug("Benchmarked zstd level %s: %s", level, results[-1])
+    return results
@@ -0,0 +1,297 @@
+"""Utility module for converting DBZ files with a pool of worker processes.
+The parent process decompresses record aligned chunks into shared memory
+and workers decode and transform them in place, so no record data is pickled.
+Outputs are written in the same order as the input chunks.
+"""
+import collections
+import logging
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy
+import pandas
+import zstandard
+
+import dbtoys.utilities.compression
+import dbtoys.utilities.dbz
+import dbtoys.utilities.memory
+
+_LOG = logging.getLogger()
+
+KNOWN_FORMATS: Tuple[str, ...] = ("csv", "json")
+
+# Chunk sized buffers held per worker: two shared memory slots, then the
+# decoded table and its encoded output, which are several times larger.
+_COPIES_PER_JOB: float = 8.0
+
+
+def transform_records(
+    records: numpy.ndarray,
+    product_ids: Optional[Iterable[int]] = None,
+    symbols: Optional[Dict[int, str]] = None,
+    pretty_px: bool = False,
+    pretty_ts: bool = False,
+) -> pandas.DataFrame:
+    """Decode an array of records into a table.
+    :param records: The records to decode.
+    :param product_ids: If given, only keep records for these product IDs.
+    :param symbols: If given, add a symbol column using this mapping.
+    :param pretty_px: Convert fixed precision prices to floats.
+    :param pretty_ts: Convert nanosecond timestamps to datetimes.
+    :return: The decoded records.
+    """
+    if product_ids is not None:
+        records = records[
+            numpy.isin(records["product_id"], numpy.fromiter(product_ids, int))
+        ]
+
+    frame = pandas.DataFrame(records).drop(
+        columns=list(dbtoys.utilities.dbz.ENCODING_FIELDS)
+    )
+    for name, (field_type, _) in records.dtype.fields.items():
+        if field_type.kind == "S" and name in frame:
+            frame[name] = frame[name].str.decode("utf-8")
+
+    if pretty_px:
+        for name in dbtoys.utilities.dbz.price_fields(records.dtype):
+            frame[name] = frame[name] * dbtoys.utilities.dbz.FIXED_PRICE_SCALE
+
+    if pretty_ts:
+        for name in frame.columns:
+            if name.startswith("ts_") and "delta" not in name:
+                frame[name] = pandas.to_datetime(frame[name], utc=True)
+
+    if symbols is not None:
+        frame["symbol"] = frame["product_id"].map(symbols)
+
+    return frame
+
+
+def format_records(frame: pandas.DataFrame, fmt: str, header: bool) -> bytes:
+    """Encode a table in an output format.
+    :param frame: The table to encode.
+    :param fmt: One of KNOWN_FORMATS.
+    :param header: Include a header, if the format has one.
+    :return: The encoded table.
+    """
+    if fmt == "csv":
+        text = frame.to_csv(index=False, header=header)
+    elif fmt == "json":
+        text = frame.to_json(orient="records", lines=True) if len(frame) else ""
+        if text and not text.endswith("\n"):
+            text += "\n"
+    else:
+        raise ValueError(f"Unknown output format {fmt}")
+    return text.encode("utf-8")
+
+
+def _convert_chunk(
+    shm_name: str,
+    count: int,
+    dtype: numpy.dtype,
+    header: bool,
+    options: Dict[str, Any],
+) -> bytes:
+    """Worker task converting one chunk of records from shared memory."""
+    shm, records = attach_chunk(shm_name, count, dtype)
+    try:
+        frame = transform_records(
+            records,
+            product_ids=options["product_ids"],
+            symbols=options["symbols"],
+            pretty_px=options["pretty_px"],
+            pretty_ts=options["pretty_ts"],
+        )
+        del records
+        return format_records(frame, options["fmt"], header)
+    finally:
+        shm.close()
+
+
+def attach_chunk(
+    shm_name: str, count: int, dtype: numpy.dtype
+) -> Tuple[shared_memory.SharedMemory, numpy.ndarray]:
+    """Attach to a chunk of records in shared memory from a worker.
+    The records must be deleted before the shared memory is closed.
+    :param shm_name: The name of the shared memory.
+    :param count: The number of records in the chunk.
+    :param dtype: The record type.
+    :return: The shared memory and a view of its records.
+    """
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    else:
+        shm = shared_memory.SharedMemory(name=shm_name)
+    return shm, numpy.frombuffer(shm.buf, dtype=dtype, count=count)
+
+
+def map_chunks(
+    path: Union[str, Path],
+    dtype: numpy.dtype,
+    size: int,
+    jobs: int,
+    task: Callable[..., Any],
+    options: Dict[str, Any],
+) -> Iterator[Tuple[int, Any]]:
+    """Run a task on every chunk of a DBZ file in a pool of processes.
+    Tasks are called with the name of the shared memory holding the chunk,
+    its record count, the record type, whether it is the first chunk and the
+    options. An empty file is one empty chunk.
+    :param path: The DBZ file to read.
+    :param dtype: The record type of the file.
+    :param size: The size of each chunk in bytes, a multiple of the record
+        size.
+    :param jobs: The number of worker processes.
+    :param task: The picklable task to run on each chunk.
+    :param options: The options passed to every task.
+    :return: An iterator of the record count and task result of each chunk,
+        in file order.
+    """
+    # Two slots per worker keeps workers busy while the parent decompresses.
+    slots = [
+        shared_memory.SharedMemory(create=True, size=size)
+        for _ in range(jobs * 2)
+    ]
+    free: Deque[shared_memory.SharedMemory] = collections.deque(slots)
+    pending: Deque[
+        Tuple[int, Future, shared_memory.SharedMemory]
+    ] = collections.deque()
+    total = 0
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=jobs
+        ) as executor, dbtoys.utilities.dbz.open_records(path) as reader:
+            while True:
+                if not free:
+                    count, future, slot = pending.popleft()
+                    yield count, future.result()
+                    free.append(slot)
+
+                slot = free.popleft()
+                # Shared memory may be larger than requested, so slice it.
+                count = dbtoys.utilities.dbz.read_into(reader, slot.buf[:size])
+                count //= dtype.itemsize
+                if count == 0 and total > 0:
+                    free.append(slot)
+                    break
+
+                pending.append(
+                    (
+                        count,
+                        executor.submit(
+                            task, slot.name, count, dtype, total == 0, options
+                        ),
+                        slot,
+                    )
+                )
+                total += count
+                if count == 0:
+                    # An empty file is still one chunk.
+                    break
+
+            while pending:
+                count, future, slot = pending.popleft()
+                yield count, future.result()
+    finally:
+        for slot in slots:
+            slot.close()
+            slot.unlink()
+
+
+def convert(
+    path: Union[str, Path],
+    output: Union[str, Path],
+    fmt: str = "csv",
+    symbols: Optional[Iterable[str]] = None,
+    pretty_px: bool = False,
+    pretty_ts: bool = False,
+    jobs: Optional[int] = None,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+    metadata: Optional[Dict[str, Any]] = None,
+    compression: str = "none",
+    level: int = dbtoys.utilities.compression.DEFAULT_LEVEL,
+    threads: int = 0,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+    memory_budget: Optional[int] = None,
+) -> int:
+    """Convert a DBZ file using a pool of worker processes.
+    With a memory budget chunks are made smaller, then workers fewer, until
+    the buffers of every worker fit.
+    :param path: The DBZ file to convert.
+    :param output: The file to write.
+    :param fmt: One of KNOWN_FORMATS.
+    :param symbols: If given, only keep records for these symbols.
+    :param pretty_px: Convert fixed precision prices to floats.
+    :param pretty_ts: Convert nanosecond timestamps to datetimes.
+    :param jobs: The number of worker processes; defaults to the CPU count.
+    :param chunk_bytes: The approximate size of each chunk.
+    :param metadata: The DBZ metadata; read from the file if not given.
+    :param compression: One of compression.KNOWN_COMPRESSIONS.
+    :param level: The zstd compression level.
+    :param threads: The number of zstd worker threads.
+    :param dictionary: If given, compress with this dictionary.
+    :param memory_budget: If given, the bytes to hold records in.
+    :return: The number of records read.
+    """
+    if fmt not in KNOWN_FORMATS:
+        raise ValueError(f"Unknown output format {fmt}")
+    if metadata is None:
+        metadata = dbtoys.utilities.dbz.read_metadata(path)
+
+    jobs = dbtoys.utilities.memory.jobs_within(
+        memory_budget, jobs or os.cpu_count() or 1, _COPIES_PER_JOB
+    )
+    chunk_bytes = dbtoys.utilities.memory.chunk_bytes_within(
+        memory_budget, chunk_bytes, jobs * _COPIES_PER_JOB
+    )
+    dtype = dbtoys.utilities.dbz.record_dtype(metadata["schema"])
+    size = dbtoys.utilities.dbz.chunk_size(dtype, chunk_bytes)
+    options = {
+        "fmt": fmt,
+        "product_ids": None
+        if symbols is None
+        else dbtoys.utilities.dbz.product_ids(metadata, symbols),
+        "symbols": dbtoys.utilities.dbz.symbol_map(metadata) or None,
+        "pretty_px": pretty_px,
+        "pretty_ts": pretty_ts,
+    }
+
+    _LOG.debug(
+        "Converting %s to %s as %s with %s jobs in %s byte chunks",
+        path,
+        output,
+        fmt,
+        jobs,
+        size,
+    )
+
+    total = 0
+    with dbtoys.utilities.compression.open_writer(
+        output,
+        compression=compression,
+        level=level,
+        threads=threads,
+        dictionary=dictionary,
+    ) as output_file:
+        for count, result in map_chunks(
+            path, dtype, size, jobs, _convert_chunk, options
+        ):
+            output_file.write(result)
+            total += count
+
+    _LOG.debug("Converted %s records from %s", total, path)
+    return total
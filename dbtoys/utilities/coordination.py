@@ -0,0 +1,323 @@
+"""Utility module for coordinating workers through a shared directory.
+Worker processes on one or more hosts sharing a filesystem claim units of
+work, such as a dataset, schema, symbol and day of a backfill, without a
+central service:
+
+- A unit is leased by creating its next lease file with O_CREAT | O_EXCL,
+  which exactly one worker can do. Lease files are numbered by generation
+  and never reused, so taking over an expired lease cannot clobber a newer
+  one.
+- Holders heartbeat by touching their lease file. A lease which has not
+  been touched for its time to live has expired and may be taken over.
+- A unit is completed by linking its done marker into place, which again
+  exactly one worker can do, so it is recorded once even if a worker whose
+  lease expired finishes the unit as well.
+
+The filesystem must create files exclusively and link atomically, as local
+filesystems and NFSv3 or later do, and the clocks of the hosts must agree to
+well within the time to live of a lease.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Union
+
+_LOG = logging.getLogger()
+
+DEFAULT_COORDINATION_DIR: str = ".coordination"
+DEFAULT_LEASE_SECONDS: float = 60.0
+
+# Leases are renewed this many times in each time to live.
+_HEARTBEATS_PER_LEASE: int = 3
+
+
+class WorkUnit(NamedTuple):
+    """A unit of work: one symbol of a dataset and schema on one day."""
+
+    dataset: str
+    schema: str
+    symbol: str
+    day: datetime.date
+
+    @property
+    def key(self) -> str:
+        """A file name unique to the unit."""
+        return urllib.parse.quote(
+            "/".join(
+                (self.dataset, self.schema, self.symbol, self.day.isoformat())
+            ),
+            safe="",
+        )
+
+
+class Lease(NamedTuple):
+    """A worker's claim on a unit."""
+
+    unit: WorkUnit
+    generation: int
+    token: str
+    path: Path
+
+
+class Coordinator:
+    """Claims units of work from a directory shared with other workers.
+    Used as a context manager, held leases are renewed by a heartbeat thread
+    and released on exit.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        ttl: float = DEFAULT_LEASE_SECONDS,
+        owner: Optional[str] = None,
+    ):
+        """
+        :param root: The shared directory.
+        :param ttl: The seconds a lease lasts without a heartbeat.
+        :param owner: A name for this worker, recorded in its leases.
+        """
+        if ttl <= 0:
+            raise ValueError("Leases must last a positive time")
+        self.root = Path(root)
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._leases = self.root / "leases"
+        self._done = self.root / "done"
+        self._leases.mkdir(parents=True, exist_ok=True)
+        self._done.mkdir(parents=True, exist_ok=True)
+        self._held: Dict[str, Lease] = {}
+        self._finished: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "Coordinator":
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        with self._lock:
+            held = list(self._held.values())
+        for lease in held:
+            self.release(lease)
+
+    def _beat(self):
+        while not self._stop.wait(self.ttl / _HEARTBEATS_PER_LEASE):
+            with self._lock:
+                held = list(self._held.values())
+            for lease in held:
+                if not self.renew(lease):
+                    _LOG.warning("Lost the lease of %s", lease.unit)
+
+    def done(self, unit: WorkUnit) -> Optional[Dict[str, Any]]:
+        """Read the done marker of a unit.
+        :param unit: The unit.
+        :return: The details it was completed with; None if it is not done.
+        """
+        try:
+            with open(self._done / unit.key, "r", encoding="utf-8") as marker:
+                details = json.load(marker)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._finished.add(unit.key)
+        return details
+
+    def pending(self, units: Sequence[WorkUnit]) -> List[WorkUnit]:
+        """Find the units which are not done.
+        :param units: The units.
+        :return: The units without done markers, in order.
+        """
+        with self._lock:
+            finished = set(self._finished)
+        return [
+            unit
+            for unit in units
+            if unit.key not in finished and self.done(unit) is None
+        ]
+
+    def _generations(self, directory: Path) -> List[int]:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name) for name in names if name.isdigit())
+
+    def claim(self, unit: WorkUnit) -> Optional[Lease]:
+        """Lease a unit unless it is done or leased by a live worker.
+        :param unit: The unit to claim.
+        :return: The lease; None if the unit cannot be claimed.
+        """
+        if self.done(unit) is not None:
+            return None
+        directory = self._leases / unit.key
+        try:
+            directory.mkdir()
+        except FileExistsError:
+            # Possibly being removed by a worker completing the unit, which
+            # the exclusive create below notices.
+            pass
+        generations = self._generations(directory)
+        latest = generations[-1] if generations else 0
+        if latest:
+            try:
+                age = time.time() - (directory / str(latest)).stat().st_mtime
+            except FileNotFoundError:
+                age = self.ttl
+            if age < self.ttl:
+                return None
+
+        lease = Lease(
+            unit=unit,
+            generation=latest + 1,
+            token=uuid.uuid4().hex,
+            path=directory / str(latest + 1),
+        )
+        try:
+            descriptor = os.open(
+                lease.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644
+            )
+        except (FileExistsError, FileNotFoundError):
+            # Another worker claimed it first, or completed it and removed
+            # its leases.
+            return None
+        with os.fdopen(descriptor, "w", encoding="utf-8") as lease_file:
+            json.dump({"owner": self.owner, "token": lease.token}, lease_file)
+        if self.done(unit) is not None:
+            # It was completed while being claimed.
+            self._drop(lease)
+            return None
+
+        for generation in generations:
+            try:
+                (directory / str(generation)).unlink()
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._held[unit.key] = lease
+        _LOG.debug("Leased %s, generation %s", unit, lease.generation)
+        return lease
+
+    def claim_next(self, units: Sequence[WorkUnit]) -> Optional[Lease]:
+        """Lease the first unit which can be claimed.
+        Workers start looking at random places to contend less.
+        :param units: The units to claim from.
+        :return: The lease; None if no unit can be claimed now.
+        """
+        if not units:
+            return None
+        start = random.randrange(len(units))
+        for unit in list(units[start:]) + list(units[:start]):
+            lease = self.claim(unit)
+            if lease is not None:
+                return lease
+        return None
+
+    @staticmethod
+    def _token(path: Path) -> Optional[str]:
+        """The token of a lease file; None if it is gone or being written."""
+        try:
+            with open(path, "r", encoding="utf-8") as lease_file:
+                return json.load(lease_file).get("token")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def holds(self, lease: Lease) -> bool:
+        """Test if a lease is still held and has not expired.
+        :param lease: The lease.
+        :return: True if no other worker may take over the unit.
+        """
+        if self._token(lease.path) != lease.token:
+            return False
+        try:
+            age = time.time() - lease.path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return age < self.ttl
+
+    def renew(self, lease: Lease) -> bool:
+        """Heartbeat a lease, extending it by its time to live.
+        :param lease: The lease.
+        :return: True if it was renewed; False if it was lost.
+        """
+        if not self.holds(lease):
+            with self._lock:
+                self._held.pop(lease.unit.key, None)
+            return False
+        os.utime(lease.path)
+        return True
+
+    def release(self, lease: Lease):
+        """Give up a lease without completing its unit, so another worker
+        may claim it at once.
+        :param lease: The lease.
+        """
+        with self._lock:
+            self._held.pop(lease.unit.key, None)
+        if self.holds(lease):
+            # Expire it; the file stays so its generation is not reused.
+            os.utime(lease.path, (0, 0))
+
+    def complete(self, lease: Lease, **details: Any) -> bool:
+        """Mark the unit of a lease done, exactly once across all workers.
+        :param lease: The lease.
+        :param details: JSON serializable details to record in the marker.
+        :return: True if this call completed the unit; False if it was
+            already done.
+        """
+        marker = self._done / lease.unit.key
+        staged = self._done / f".{lease.unit.key}.{lease.token}"
+        with open(staged, "w", encoding="utf-8") as staged_file:
+            json.dump(
+                {"owner": self.owner, "completed": time.time(), **details},
+                staged_file,
+            )
+        try:
+            # Linking is atomic and fails if the marker exists, so markers
+            # are never seen half written.
+            os.link(staged, marker)
+            completed = True
+        except FileExistsError:
+            completed = False
+        finally:
+            staged.unlink()
+        with self._lock:
+            self._held.pop(lease.unit.key, None)
+            self._finished.add(lease.unit.key)
+        self._drop(lease)
+        if not completed:
+            _LOG.info("%s was already completed by another worker", lease.unit)
+        return completed
+
+    def _drop(self, lease: Lease):
+        """Remove a lease file, and its directory once empty."""
+        if self._token(lease.path) == lease.token:
+            try:
+                lease.path.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            lease.path.parent.rmdir()
+        except OSError:
+            pass
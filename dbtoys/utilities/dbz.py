@@ -0,0 +1,142 @@
+"""Utility module for reading DBZ files downloaded from databento."""
+from pathlib import Path
+from typing import Any
+from typing import BinaryIO
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Set
+from typing import Union
+
+import databento
+import numpy
+import zstandard
+from databento.common.data import DBZ_STRUCT_MAP
+from databento.common.enums import Schema
+
+# Prices are fixed precision integers in units of 1e-9.
+FIXED_PRICE_SCALE: float = 1e-9
+
+DEFAULT_CHUNK_BYTES: int = 8 * 1024 * 1024
+
+# Header fields which are not useful outside of the binary encoding.
+ENCODING_FIELDS = ("nwords", "type")
+
+
+def read_metadata(path: Union[str, Path]) -> Dict[str, Any]:
+    """Read the metadata header of a DBZ file.
+    :param path: The path to the DBZ file.
+    :return: The decoded metadata.
+    """
+    return databento.Bento.from_file(str(path)).metadata
+
+
+def record_dtype(schema: str) -> numpy.dtype:
+    """Get the binary record type of a schema.
+    :param schema: The schema of the records.
+    :return: A numpy structured dtype.
+    """
+    return numpy.dtype(DBZ_STRUCT_MAP[Schema(schema)])
+
+
+def price_fields(dtype: numpy.dtype) -> List[str]:
+    """Find the fixed precision price fields of a record type.
+    :param dtype: The record type.
+    :return: The names of every price field.
+    """
+    return [
+        name
+        for name in dtype.names or ()
+        if name in ("price", "open", "high", "low", "close")
+        or name.startswith(("bid_px", "ask_px"))
+    ]
+
+
+def chunk_size(dtype: numpy.dtype, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """Round a chunk size down to a whole number of records.
+    :param dtype: The record type.
+    :param chunk_bytes: The desired chunk size in bytes.
+    :return: The chunk size in bytes; at least one record.
+    """
+    return max(1, chunk_bytes // dtype.itemsize) * dtype.itemsize
+
+
+def open_records(path: Union[str, Path]) -> BinaryIO:
+    """Open a DBZ file as a stream of decompressed records.
+    The metadata header is a skippable frame and is not returned.
+    :param path: The path to the DBZ file.
+    :return: A binary reader of the raw records.
+    """
+    return zstandard.ZstdDecompressor().stream_reader(
+        open(path, "rb"), read_across_frames=True, closefd=True
+    )
+
+
+def read_into(reader: BinaryIO, buffer: memoryview) -> int:
+    """Fill a buffer from a reader, which may return short reads.
+    :param reader: The binary reader.
+    :param buffer: The buffer to fill.
+    :return: The number of bytes read; less than the buffer only at EOF.
+    """
+    total = 0
+    while total < len(buffer):
+        count = reader.readinto(buffer[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+def iter_records(
+    path: Union[str, Path],
+    schema: str,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> Iterator[numpy.ndarray]:
+    """Iterate over the records of a DBZ file in record aligned chunks.
+    :param path: The path to the DBZ file.
+    :param schema: The schema of the records.
+    :param chunk_bytes: The approximate size of each chunk.
+    :return: An iterator of record arrays.
+    """
+    dtype = record_dtype(schema)
+    with open_records(path) as reader:
+        while True:
+            buffer = bytearray(chunk_size(dtype, chunk_bytes))
+            count = read_into(reader, memoryview(buffer))
+            count -= count % dtype.itemsize
+            if count == 0:
+                return
+            yield numpy.frombuffer(
+                buffer, dtype=dtype, count=count // dtype.itemsize
+            )
+
+
+def symbol_map(metadata: Dict[str, Any]) -> Dict[int, str]:
+    """Map product IDs to native symbols using the metadata mappings.
+    :param metadata: The metadata of a DBZ file.
+    :return: A mapping of product_id to native symbol.
+    """
+    result: Dict[int, str] = {}
+    for native, intervals in metadata.get("mappings", {}).items():
+        for interval in intervals:
+            if interval["symbol"]:
+                result[int(interval["symbol"])] = native
+    return result
+
+
+def product_ids(metadata: Dict[str, Any], symbols: Iterable[str]) -> Set[int]:
+    """Find the product IDs of native symbols using the metadata mappings.
+    Numeric symbols are treated as product IDs.
+    :param metadata: The metadata of a DBZ file.
+    :param symbols: The symbols to find.
+    :return: The product IDs of the symbols.
+    """
+    wanted = set(symbols)
+    result = {int(symbol) for symbol in wanted if symbol.isdigit()}
+    result.update(
+        product_id
+        for product_id, native in symbol_map(metadata).items()
+        if native in wanted
+    )
+    return result
@@ -0,0 +1,782 @@
+"""Utility module for a persistent queue of download jobs.
+A job is a timeseries request split into parts of a few days each. The queue
+is a SQLite database in WAL mode and a part is checkpointed, with its size,
+as soon as its file is complete, so a runner killed part way through a
+backfill resumes from the parts which were not done. Parts are the unit of
+resumption: the API streams a request from its start, so a part which was
+killed is downloaded again from zero, and long or dense windows should be
+split into parts of fewer days.
+A JobRunner downloads parts with a pool of threads, highest priority first,
+holding to a cap on the concurrent parts of each dataset and to a global
+bandwidth limit. Runners heartbeat the parts they are running, and parts
+whose heartbeat stops for the lease time are queued again, whichever host
+ran them.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import pandas
+
+import dbtoys.utilities.ledger
+from dbtoys.utilities.ledger import DEFAULT_BUSY_TIMEOUT_MS
+
+_LOG = logging.getLogger()
+
+DEFAULT_JOBS_PATH: Path = Path.home() / ".dbtoys" / "jobs.db"
+DEFAULT_JOBS_ROOT: Path = Path.home() / ".dbtoys" / "jobs"
+DEFAULT_PART_DAYS: int = 1
+DEFAULT_WORKERS: int = 4
+DEFAULT_DATASET_LIMIT: int = 2
+DEFAULT_MAX_ATTEMPTS: int = 3
+DEFAULT_LEASE_SECONDS: float = 60.0
+
+JOB_STATES: Tuple[str, ...] = ("queued", "done", "failed", "cancelled")
+PART_STATES: Tuple[str, ...] = ("queued", "running", "done", "failed")
+
+# How long an idle worker waits before looking for parts again, in seconds.
+_POLL_SECONDS: float = 0.5
+# Running parts are heartbeat this many times in each lease time.
+_HEARTBEATS_PER_LEASE: int = 3
+
+# Windows API values for probing whether a process is running.
+_PROCESS_QUERY_LIMITED_INFORMATION: int = 0x1000
+_ERROR_ACCESS_DENIED: int = 5
+_STILL_ACTIVE: int = 259
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    submitted INTEGER NOT NULL,
+    dataset TEXT NOT NULL,
+    schema TEXT NOT NULL,
+    symbols TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    root TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parts (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    part INTEGER NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    state TEXT NOT NULL,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER,
+    error TEXT,
+    heartbeat INTEGER,
+    PRIMARY KEY (job_id, part)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state
+    ON jobs(state, dataset, priority, id);
+CREATE INDEX IF NOT EXISTS parts_by_state
+    ON parts(state, job_id, part);
+"""
+
+
+class Job(NamedTuple):
+    """A download job and its progress."""
+
+    id: int
+    dataset: str
+    schema: str
+    symbols: Tuple[str, ...]
+    start: str
+    end: str
+    priority: int
+    state: str
+    parts: int
+    parts_done: int
+    bytes: int
+
+
+class Part(NamedTuple):
+    """One part of a download job, claimed by a worker."""
+
+    job_id: int
+    part: int
+    dataset: str
+    schema: str
+    symbols: Tuple[str, ...]
+    start: str
+    end: str
+    path: Path
+
+
+class RunStats(NamedTuple):
+    """What a run of the job runner downloaded."""
+
+    parts: int
+    bytes: int
+    failed: int
+    seconds: float
+
+
+def split_window(start: Any, end: Any, part_days: int) -> List[Tuple[str, str]]:
+    """Split a request window into parts of at most part_days days.
+    :param start: The start of the window (inclusive).
+    :param end: The end of the window (exclusive).
+    :param part_days: The longest part in days.
+    :return: The start and end of each part in ISO 8601 format.
+    """
+    if part_days < 1:
+        raise ValueError("Parts must be at least one day long")
+    start = pandas.Timestamp(start)
+    end = pandas.Timestamp(end)
+    if end <= start:
+        raise ValueError("The end of a job must be after its start")
+    step = pandas.Timedelta(days=part_days)
+    windows = []
+    while start < end:
+        windows.append((start.isoformat(), min(start + step, end).isoformat()))
+        start += step
+    return windows
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _windows_process_alive(pid: int) -> bool:
+    """Test if a process is running on Windows, where os.kill cannot probe
+    a process without signalling it.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import ctypes
+
+    kernel32 = ctypes.WinDLL(  # type: ignore[attr-defined]
+        "kernel32", use_last_error=True
+    )
+    handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, 0, pid)
+    if not handle:
+        # The process exists if it only may not be queried.
+        return ctypes.get_last_error() == _ERROR_ACCESS_DENIED  # type: ignore
+    try:
+        exit_code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == _STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Test if the process owning a part may still be running.
+    Owners which cannot be checked, such as those on other hosts, are
+    assumed to be running until their heartbeat stops.
+    """
+    if owner is None:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        # Processes on other hosts cannot be checked.
+        return True
+    try:
+        if sys.platform.startswith("win"):
+            return _windows_process_alive(int(pid))
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (OSError, ValueError):
+        return True
+    return True
+
+
+class JobQueue:
+    """A persistent queue of download jobs.
+    Each thread uses its own connection to the database.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_JOBS_PATH,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
+        """
+        :param path: The database of the queue.
+        :param lease_seconds: How long a running part lasts without a
+            heartbeat before it is queued again.
+        """
+        if lease_seconds <= 0:
+            raise ValueError("Leases must last a positive time")
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        columns = [
+            row[1] for row in connection.execute("PRAGMA table_info(parts)")
+        ]
+        if "heartbeat" not in columns:
+            # Queues made before parts had heartbeats.
+            connection.execute("ALTER TABLE parts ADD COLUMN heartbeat INTEGER")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=DEFAULT_BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _write(self, statements: Iterable[Tuple[str, Tuple[Any, ...]]]):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for statement, parameters in statements:
+                connection.execute(statement, parameters)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def submit(
+        self,
+        dataset: str,
+        schema: str,
+        symbols: Iterable[str],
+        start: Any,
+        end: Any,
+        priority: int = 0,
+        part_days: int = DEFAULT_PART_DAYS,
+        root: Union[str, Path] = DEFAULT_JOBS_ROOT,
+    ) -> int:
+        """Queue a download job.
+        :param dataset: The dataset to download.
+        :param schema: The schema to download.
+        :param symbols: The symbols to download.
+        :param start: The start of the window (inclusive).
+        :param end: The end of the window (exclusive).
+        :param priority: Jobs with higher priorities are downloaded first.
+        :param part_days: The longest part in days.
+        :param root: The directory to download into.
+        :return: The ID of the new job.
+        """
+        symbols = sorted(set(symbols))
+        if not symbols:
+            raise ValueError("A job needs at least one symbol")
+        windows = split_window(start, end, part_days)
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            job_id = connection.execute(
+                "INSERT INTO jobs (submitted, dataset, schema, symbols, "
+                "window_start, window_end, priority, root, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'queued')",
+                (
+                    time.time_ns(),
+                    dataset,
+                    schema,
+                    ",".join(symbols),
+                    windows[0][0],
+                    windows[-1][1],
+                    priority,
+                    str(Path(root).expanduser()),
+                ),
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO parts (job_id, part, window_start, window_end, "
+                "state) VALUES (?, ?, ?, ?, 'queued')",
+                [
+                    (job_id, i, part_start, part_end)
+                    for i, (part_start, part_end) in enumerate(windows)
+                ],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        _LOG.debug("Submitted job %s with %s parts", job_id, len(windows))
+        return job_id  # type: ignore
+
+    def jobs(self, states: Optional[Iterable[str]] = None) -> List[Job]:
+        """List jobs with their progress.
+        :param states: If given, only list jobs in these states.
+        :return: The jobs, in the order they will be run.
+        """
+        query = (
+            "SELECT j.id, j.dataset, j.schema, j.symbols, j.window_start, "
+            "j.window_end, j.priority, j.state, COUNT(p.part), "
+            "SUM(p.state = 'done'), COALESCE(SUM(p.bytes), 0) "
+            "FROM jobs AS j JOIN parts AS p ON p.job_id = j.id"
+        )
+        parameters: Tuple[str, ...] = ()
+        if states is not None:
+            parameters = tuple(states)
+            query += f" WHERE j.state IN ({', '.join('?' * len(parameters))})"
+        query += " GROUP BY j.id ORDER BY j.priority DESC, j.id"
+        return [
+            Job(
+                id=row[0],
+                dataset=row[1],
+                schema=row[2],
+                symbols=tuple(row[3].split(",")),
+                start=row[4],
+                end=row[5],
+                priority=row[6],
+                state=row[7],
+                parts=row[8],
+                parts_done=row[9],
+                bytes=row[10],
+            )
+            for row in self._connection().execute(query, parameters)
+        ]
+
+    def cancel(self, job_id: int) -> bool:
+        """Stop claiming the parts of a job; running parts still finish.
+        :param job_id: The job to cancel.
+        :return: True if the job was queued or failed and is now cancelled.
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET state = 'cancelled' "
+            "WHERE id = ? AND state IN ('queued', 'failed')",
+            (job_id,),
+        )
+        return cursor.rowcount > 0
+
+    def resume(self, job_id: int) -> bool:
+        """Queue the parts of a cancelled or failed job which are not done.
+        :param job_id: The job to resume.
+        :return: True if the job was cancelled or failed and is now queued.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            resumed = connection.execute(
+                "UPDATE jobs SET state = 'queued' "
+                "WHERE id = ? AND state IN ('cancelled', 'failed')",
+                (job_id,),
+            ).rowcount
+            if resumed:
+                connection.execute(
+                    "UPDATE parts SET state = 'queued', attempts = 0, "
+                    "error = NULL WHERE job_id = ? AND state = 'failed'",
+                    (job_id,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return resumed > 0
+
+    def renew(self) -> int:
+        """Heartbeat the running parts of this process.
+        :return: The number of parts renewed.
+        """
+        return (
+            self._connection()
+            .execute(
+                "UPDATE parts SET heartbeat = ? "
+                "WHERE state = 'running' AND owner = ?",
+                (time.time_ns(), _owner()),
+            )
+            .rowcount
+        )
+
+    def recover(self) -> int:
+        """Queue again the running parts of processes which have died, or
+        whose heartbeat has stopped for the lease time on any host.
+        :return: The number of parts queued again.
+        """
+        running = self._connection().execute(
+            "SELECT job_id, part, owner, heartbeat FROM parts "
+            "WHERE state = 'running'"
+        )
+        expired = time.time_ns() - int(self.lease_seconds * 1e9)
+        dead = [
+            (job_id, part, owner)
+            for job_id, part, owner, heartbeat in running.fetchall()
+            if heartbeat is None
+            or heartbeat < expired
+            or not _owner_alive(owner)
+        ]
+        self._write(
+            (
+                "UPDATE parts SET state = 'queued', owner = NULL "
+                "WHERE job_id = ? AND part = ? AND state = 'running' "
+                "AND owner IS ?",
+                row,
+            )
+            for row in dead
+        )
+        if dead:
+            _LOG.info("Recovered %s parts of dead runners", len(dead))
+        return len(dead)
+
+    def pending(self) -> int:
+        """The number of queued or running parts of queued jobs."""
+        return (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM parts AS p "
+                "JOIN jobs AS j ON j.id = p.job_id "
+                "WHERE j.state = 'queued' AND p.state IN ('queued', 'running')"
+            )
+            .fetchone()[0]
+        )
+
+    def claim(
+        self,
+        dataset_limits: Optional[Dict[str, int]] = None,
+        default_limit: int = DEFAULT_DATASET_LIMIT,
+    ) -> Optional[Part]:
+        """Claim the next part to download.
+        Parts of datasets at their limit are skipped, so a busy dataset does
+        not hold back the others.
+        :param dataset_limits: The most running parts of each dataset.
+        :param default_limit: The most running parts of other datasets.
+        :return: The claimed part; None if no part may be run now.
+        """
+        dataset_limits = dataset_limits or {}
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            running = dict(
+                connection.execute(
+                    "SELECT j.dataset, COUNT(*) FROM parts AS p "
+                    "JOIN jobs AS j ON j.id = p.job_id "
+                    "WHERE p.state = 'running' GROUP BY j.dataset"
+                ).fetchall()
+            )
+            best = None
+            datasets = connection.execute(
+                "SELECT DISTINCT dataset FROM jobs WHERE state = 'queued'"
+            ).fetchall()
+            for (dataset,) in datasets:
+                limit = dataset_limits.get(dataset, default_limit)
+                if running.get(dataset, 0) >= limit:
+                    continue
+                row = connection.execute(
+                    "SELECT j.priority, j.id, p.part, j.dataset, j.schema, "
+                    "j.symbols, p.window_start, p.window_end, j.root "
+                    "FROM jobs AS j JOIN parts AS p ON p.job_id = j.id "
+                    "WHERE j.state = 'queued' AND j.dataset = ? "
+                    "AND p.state = 'queued' "
+                    "ORDER BY j.priority DESC, j.id, p.part LIMIT 1",
+                    (dataset,),
+                ).fetchone()
+                if row is not None and (
+                    best is None or (-row[0], row[1]) < (-best[0], best[1])
+                ):
+                    best = row
+            if best is not None:
+                connection.execute(
+                    "UPDATE parts SET state = 'running', owner = ?, "
+                    "heartbeat = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ? AND part = ?",
+                    (_owner(), time.time_ns(), best[1], best[2]),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if best is None:
+            return None
+
+        _, job_id, part, dataset, schema, symbols, start, end, root = best
+        return Part(
+            job_id=job_id,
+            part=part,
+            dataset=dataset,
+            schema=schema,
+            symbols=tuple(symbols.split(",")),
+            start=start,
+            end=end,
+            path=Path(root)
+            / dataset
+            / schema
+            / f"job-{job_id}"
+            / f"{part:05d}_{pandas.Timestamp(start).date().isoformat()}.dbz",
+        )
+
+    def complete(self, part: Part, size: int):
+        """Checkpoint a downloaded part, and its job if it was the last.
+        :param part: The downloaded part.
+        :param size: The size of its file in bytes.
+        """
+        self._write(
+            (
+                (
+                    "UPDATE parts SET state = 'done', bytes = ?, owner = NULL, "
+                    "error = NULL WHERE job_id = ? AND part = ?",
+                    (size, part.job_id, part.part),
+                ),
+                (
+                    "UPDATE jobs SET state = 'done' WHERE id = ? "
+                    "AND state = 'queued' AND NOT EXISTS (SELECT 1 FROM parts "
+                    "WHERE job_id = ? AND state != 'done')",
+                    (part.job_id, part.job_id),
+                ),
+            )
+        )
+
+    def fail(
+        self,
+        part: Part,
+        error: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> bool:
+        """Queue a failed part again, or fail its job after max_attempts.
+        :param part: The part which failed.
+        :param error: The error to record.
+        :param max_attempts: The most times a part is attempted.
+        :return: True if the job failed.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            (attempts,) = connection.execute(
+                "SELECT attempts FROM parts WHERE job_id = ? AND part = ?",
+                (part.job_id, part.part),
+            ).fetchone()
+            failed = attempts >= max_attempts
+            connection.execute(
+                "UPDATE parts SET state = ?, owner = NULL, error = ? "
+                "WHERE job_id = ? AND part = ?",
+                (
+                    "failed" if failed else "queued",
+                    error,
+                    part.job_id,
+                    part.part,
+                ),
+            )
+            if failed:
+                connection.execute(
+                    "UPDATE jobs SET state = 'failed' "
+                    "WHERE id = ? AND state = 'queued'",
+                    (part.job_id,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return failed
+
+
+class Bandwidth:
+    """A token bucket limiting the bytes downloaded per second.
+    Downloads are charged when they finish, so a worker waits until the
+    bucket has paid back what earlier downloads overdrew.
+    """
+
+    def __init__(self, bytes_per_second: float):
+        if bytes_per_second <= 0:
+            raise ValueError("The bandwidth limit must be positive")
+        self.bytes_per_second = bytes_per_second
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        # Idle time earns at most a second of burst.
+        self._tokens = min(
+            self.bytes_per_second,
+            self._tokens + (now - self._updated) * self.bytes_per_second,
+        )
+        self._updated = now
+
+    def delay(self) -> float:
+        """The seconds until a download may start."""
+        with self._lock:
+            self._refill()
+            return max(0.0, -self._tokens / self.bytes_per_second)
+
+    def wait(self, stop: Optional[threading.Event] = None):
+        """Wait until a download may start.
+        :param stop: If given, stop waiting when this is set.
+        """
+        delay = self.delay()
+        while delay > 0:
+            if stop is not None:
+                if stop.wait(delay):
+                    return
+            else:
+                time.sleep(delay)
+            delay = self.delay()
+
+    def charge(self, size: int):
+        """Charge the bytes of a finished download.
+        :param size: The bytes downloaded.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= size
+
+
+class JobRunner:
+    """Downloads the parts of queued jobs with a pool of threads."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        client: Any,
+        workers: int = DEFAULT_WORKERS,
+        dataset_limits: Optional[Dict[str, int]] = None,
+        default_limit: int = DEFAULT_DATASET_LIMIT,
+        bandwidth: Optional[float] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        ledger: Optional[dbtoys.utilities.ledger.Ledger] = None,
+    ):
+        """
+        :param queue: The queue to run.
+        :param client: The databento historical client.
+        :param workers: The number of concurrent downloads.
+        :param dataset_limits: The most concurrent downloads of each dataset.
+        :param default_limit: The most concurrent downloads of other datasets.
+        :param bandwidth: If given, the most bytes to download per second.
+        :param max_attempts: The most times a part is attempted.
+        :param ledger: If given, record each download.
+        """
+        self.queue = queue
+        self.client = client
+        self.workers = workers
+        self.dataset_limits = dataset_limits or {}
+        self.default_limit = default_limit
+        self.bandwidth = None if bandwidth is None else Bandwidth(bandwidth)
+        self.max_attempts = max_attempts
+        self.ledger = ledger
+        self._lock = threading.Lock()
+        self._parts = 0
+        self._bytes = 0
+        self._failed = 0
+
+    def download(self, part: Part) -> int:
+        """Download one part, only making its file visible once complete.
+        :param part: The part to download.
+        :return: The size of the file in bytes.
+        """
+        # Unique, so a runner whose lease expired does not collide with the
+        # runner which took the part over.
+        partial = part.path.with_suffix(f".{uuid.uuid4().hex[:12]}.partial")
+        part.path.parent.mkdir(parents=True, exist_ok=True)
+        self.client.timeseries.stream(
+            dataset=part.dataset,
+            symbols=list(part.symbols),
+            schema=part.schema,
+            start=part.start,
+            end=part.end,
+            path=str(partial),
+        )
+        os.replace(partial, part.path)
+        return part.path.stat().st_size
+
+    def _work(self, stop: threading.Event):
+        while not stop.is_set():
+            if self.bandwidth is not None:
+                self.bandwidth.wait(stop)
+                if stop.is_set():
+                    break
+            part = self.queue.claim(self.dataset_limits, self.default_limit)
+            if part is None:
+                if not self.queue.pending():
+                    break
+                # The parts left may be running on a runner which died.
+                self.queue.recover()
+                stop.wait(_POLL_SECONDS)
+                continue
+
+            try:
+                size = self.download(part)
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOG.exception("Failed to download %s: %s", part, exc)
+                job_failed = self.queue.fail(part, str(exc), self.max_attempts)
+                with self._lock:
+                    self._failed += job_failed
+                continue
+
+            if self.bandwidth is not None:
+                self.bandwidth.charge(size)
+            self.queue.complete(part, size)
+            if self.ledger is not None:
+                self.ledger.record(
+                    "download",
+                    dataset=part.dataset,
+                    schema=part.schema,
+                    symbols=part.symbols,
+                    start=part.start,
+                    end=part.end,
+                    size=size,
+                )
+            with self._lock:
+                self._parts += 1
+                self._bytes += size
+            _LOG.info("Downloaded %s", part.path)
+        self.queue.close()
+
+    def _beat(self, finished: threading.Event):
+        while not finished.wait(
+            self.queue.lease_seconds / _HEARTBEATS_PER_LEASE
+        ):
+            self.queue.renew()
+        self.queue.close()
+
+    def run(self, stop: Optional[threading.Event] = None) -> RunStats:
+        """Run until no parts are left or until stopped.
+        Parts left running by runners which died are queued again first.
+        :param stop: If given, stop claiming parts when this is set.
+        :return: What the run downloaded.
+        """
+        stop = stop or threading.Event()
+        self.queue.recover()
+        started = time.perf_counter()
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._beat, args=(finished,), daemon=True
+        )
+        heartbeat.start()
+        threads = [
+            threading.Thread(target=self._work, args=(stop,), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(_POLL_SECONDS)
+        except KeyboardInterrupt:
+            # Running parts finish, then the workers stop.
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finished.set()
+        heartbeat.join()
+        return RunStats(
+            parts=self._parts,
+            bytes=self._bytes,
+            failed=self._failed,
+            seconds=time.perf_counter() - started,
+        )
@@ -0,0 +1,366 @@
+"""Utility module for joining trades to the prevailing quotes.
+Two local DBZ files sorted by time, trades and quotes with a top of book
+(mbp-1, mbp-10 or tbbo), are merged chunk by chunk. Each step joins the
+trades whose quotes have all been read and carries the last quote of every
+product into the next step, so memory is bounded by a chunk of each file.
+
+Within a step, every product is joined at once with one searchsorted over
+keys of product and time rank. Trades are signed with the Lee-Ready rule:
+buys above the mid, sells below it, and the tick test at the mid or
+without a quote, with the last price and tick of each product carried
+between steps too.
+"""
+import logging
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy
+import pandas
+import zstandard
+
+import dbtoys.utilities.asof
+import dbtoys.utilities.compression
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+
+_LOG = logging.getLogger()
+
+DEFAULT_JOIN_TS_FIELD: str = "ts_recv"
+QUOTE_FIELDS: Tuple[str, ...] = (
+    "bid_px_00",
+    "ask_px_00",
+    "bid_sz_00",
+    "ask_sz_00",
+)
+
+
+def asof_positions(
+    quote_ids: numpy.ndarray,
+    quote_ts: numpy.ndarray,
+    trade_ids: numpy.ndarray,
+    trade_ts: numpy.ndarray,
+    allow_exact: bool = True,
+) -> numpy.ndarray:
+    """Find the latest quote of the same product at or before each trade.
+    :param quote_ids: The product IDs of the quotes, sorted with quote_ts.
+    :param quote_ts: The times of the quotes, sorted within each product.
+    :param trade_ids: The product IDs of the trades.
+    :param trade_ts: The times of the trades.
+    :param allow_exact: Match quotes at the same time as a trade.
+    :return: Positions into the quotes; -1 where there is no quote.
+    """
+    products = numpy.unique(quote_ids)
+    times = numpy.unique(quote_ts)
+    return dbtoys.utilities.asof.latest_positions(
+        dbtoys.utilities.asof.product_time_keys(
+            quote_ids, quote_ts, products, times
+        ),
+        quote_ids,
+        products,
+        times,
+        trade_ids,
+        trade_ts,
+        allow_exact=allow_exact,
+    )
+
+
+def _last_by_product(records: numpy.ndarray) -> numpy.ndarray:
+    """The last record of each product of records sorted by product."""
+    last = numpy.ones(len(records), dtype=bool)
+    last[:-1] = records["product_id"][1:] != records["product_id"][:-1]
+    return records[last]
+
+
+def _tick_signs(
+    trades: pandas.DataFrame, ticks: pandas.DataFrame
+) -> Tuple[numpy.ndarray, pandas.DataFrame]:
+    """Sign trades by the tick test, continuing from the last trades.
+    :param trades: The product_id and price of trades in time order.
+    :param ticks: The last price and sign of each product, by product_id.
+    :return: The signs, 0 where unknown, and the new last price and sign.
+    """
+    order = numpy.argsort(trades["product_id"].to_numpy(), kind="stable")
+    ordered = trades.iloc[order]
+    product_ids = ordered["product_id"].to_numpy()
+    first = numpy.ones(len(ordered), dtype=bool)
+    first[1:] = product_ids[1:] != product_ids[:-1]
+
+    prices = ordered["price"].to_numpy(float)
+    previous = numpy.empty(len(ordered))
+    previous[1:] = prices[:-1]
+    carried = ticks.reindex(product_ids[first])
+    previous[first] = carried["price"].to_numpy(float)
+    signs = numpy.sign(prices - previous)
+    signs[signs == 0] = numpy.nan
+    # A zero tick takes the sign of the last nonzero tick.
+    leading = first & numpy.isnan(signs)
+    signs[leading] = carried["sign"].to_numpy(float)[numpy.isnan(signs[first])]
+    signs = (
+        pandas.Series(signs).groupby(product_ids).ffill().fillna(0).to_numpy()
+    )
+
+    last = numpy.append(first[1:], True)
+    updated = pandas.DataFrame(
+        {"price": prices[last], "sign": signs[last]},
+        index=pandas.Index(product_ids[last], name="product_id"),
+    )
+    ticks = pandas.concat([ticks[~ticks.index.isin(updated.index)], updated])
+    result = numpy.empty(len(signs))
+    result[order] = signs
+    return result, ticks
+
+
+def enrich(
+    trades: numpy.ndarray,
+    quotes: numpy.ndarray,
+    positions: numpy.ndarray,
+    signs: numpy.ndarray,
+    ts_field: str = DEFAULT_JOIN_TS_FIELD,
+    symbols: Optional[Dict[int, str]] = None,
+    pretty_px: bool = False,
+    pretty_ts: bool = False,
+) -> pandas.DataFrame:
+    """Add the prevailing quote, sign and effective spread to trades.
+    :param trades: The trades.
+    :param quotes: The quotes the positions index.
+    :param positions: The position of the quote of each trade, or -1.
+    :param signs: The tick test sign of each trade, used at the mid.
+    :param ts_field: The timestamp field the quotes were matched by.
+    :param symbols: If given, add a symbol column using this mapping.
+    :param pretty_px: Convert fixed precision prices to floats.
+    :param pretty_ts: Convert nanosecond timestamps to datetimes.
+    :return: The enriched trades.
+    """
+    frame = dbtoys.utilities.convert.transform_records(
+        trades, symbols=symbols, pretty_px=pretty_px, pretty_ts=pretty_ts
+    )
+    found = positions >= 0
+    matched = quotes[numpy.where(found, positions, 0)] if len(quotes) else None
+    scale = dbtoys.utilities.dbz.FIXED_PRICE_SCALE
+    for field in QUOTE_FIELDS:
+        values = (
+            numpy.zeros(len(trades), dtype=numpy.int64)
+            if matched is None
+            else matched[field].astype(numpy.int64)
+        )
+        if field.endswith("_px_00"):
+            column = pandas.Series(values * scale if pretty_px else values)
+        else:
+            column = pandas.Series(values)
+        frame[field] = column.where(found).to_numpy()
+
+    quote_ts = pandas.Series(
+        numpy.zeros(len(trades), dtype=numpy.int64)
+        if matched is None
+        else matched[ts_field].astype(numpy.int64)
+    ).where(found)
+    if pretty_ts:
+        quote_ts = pandas.to_datetime(quote_ts, utc=True)
+    frame[f"quote_{ts_field}"] = quote_ts.to_numpy()
+
+    price = trades["price"] * scale
+    bid = frame["bid_px_00"].to_numpy(float) * (1 if pretty_px else scale)
+    ask = frame["ask_px_00"].to_numpy(float) * (1 if pretty_px else scale)
+    quoted_sizes = (frame["bid_sz_00"] > 0) & (frame["ask_sz_00"] > 0)
+    mid = numpy.where(
+        quoted_sizes.to_numpy() & (bid > 0) & (ask >= bid),
+        (bid + ask) / 2,
+        numpy.nan,
+    )
+    quoted = numpy.sign(price - mid)
+    sign = numpy.where(
+        numpy.isnan(quoted) | (quoted == 0), signs, quoted
+    ).astype(numpy.int8)
+    frame["mid"] = mid
+    frame["sign"] = sign
+    frame["effective_spread"] = 2 * sign * (price - mid)
+    frame["effective_spread_bps"] = frame["effective_spread"] / mid * 1e4
+    return frame
+
+
+def iter_join(
+    trades_path: Union[str, Path],
+    quotes_path: Union[str, Path],
+    tolerance: Optional[float] = None,
+    ts_field: str = DEFAULT_JOIN_TS_FIELD,
+    allow_exact: bool = True,
+    pretty_px: bool = False,
+    pretty_ts: bool = False,
+    trades_metadata: Optional[Dict[str, Any]] = None,
+    quotes_metadata: Optional[Dict[str, Any]] = None,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+) -> Iterator[pandas.DataFrame]:
+    """Join trades to the prevailing quote of their product chunk by chunk.
+    Both files must be sorted by ts_field.
+    :param trades_path: The DBZ file of trades.
+    :param quotes_path: The DBZ file of quotes with a top of book.
+    :param tolerance: If given, ignore quotes older than this many seconds.
+    :param ts_field: The timestamp field to join by.
+    :param allow_exact: Match quotes at the same time as a trade.
+    :param pretty_px: Convert fixed precision prices to floats.
+    :param pretty_ts: Convert nanosecond timestamps to datetimes.
+    :param trades_metadata: The trades metadata; read if not given.
+    :param quotes_metadata: The quotes metadata; read if not given.
+    :param chunk_bytes: The approximate size of each chunk of each file.
+    :return: An iterator of enriched trades in file order.
+    """
+    if trades_metadata is None:
+        trades_metadata = dbtoys.utilities.dbz.read_metadata(trades_path)
+    if quotes_metadata is None:
+        quotes_metadata = dbtoys.utilities.dbz.read_metadata(quotes_path)
+    trade_dtype = dbtoys.utilities.dbz.record_dtype(trades_metadata["schema"])
+    quote_dtype = dbtoys.utilities.dbz.record_dtype(quotes_metadata["schema"])
+    if "price" not in (trade_dtype.names or ()):
+        raise ValueError(f"{trades_path} has no trade prices")
+    if not set(QUOTE_FIELDS) <= set(quote_dtype.names or ()):
+        raise ValueError(f"{quotes_path} has no top of book")
+    symbols = dbtoys.utilities.dbz.symbol_map(trades_metadata) or None
+    max_age = None if tolerance is None else int(tolerance * 1e9)
+
+    trade_chunks = dbtoys.utilities.dbz.iter_records(
+        trades_path, trades_metadata["schema"], chunk_bytes
+    )
+    quote_chunks = dbtoys.utilities.dbz.iter_records(
+        quotes_path, quotes_metadata["schema"], chunk_bytes
+    )
+    trades = numpy.zeros(0, dtype=trade_dtype)
+    quotes = numpy.zeros(0, dtype=quote_dtype)
+    # The last quote of each product, sorted by product.
+    latest = numpy.zeros(0, dtype=quote_dtype)
+    ticks = pandas.DataFrame(
+        {
+            "price": pandas.Series(dtype=float),
+            "sign": pandas.Series(dtype=float),
+        },
+        index=pandas.Index([], name="product_id"),
+    )
+    quotes_done = False
+
+    while True:
+        if not len(trades):
+            trades = next(trade_chunks, trades)
+            if not len(trades):
+                break
+        if not len(quotes) and not quotes_done:
+            quotes = next(quote_chunks, quotes)
+            quotes_done = not len(quotes)
+
+        trade_ts = trades[ts_field]
+        if quotes_done:
+            count = len(trades)
+        else:
+            # More quotes at the last time may be in the next chunk.
+            count = numpy.searchsorted(
+                trade_ts, quotes[ts_field][-1], side="left"
+            )
+        if count == 0:
+            # Every buffered quote is at or before the buffered trades. Those
+            # at the time of the first trade stay buffered, as they must not
+            # replace an earlier quote which a strict join matches.
+            cut = numpy.searchsorted(quotes[ts_field], trade_ts[0], side="left")
+            latest = _merge_latest(latest, quotes[:cut])
+            following = next(quote_chunks, quotes[:0])
+            quotes_done = not len(following)
+            quotes = numpy.concatenate([quotes[cut:], following])
+            continue
+
+        step = trades[:count]
+        # The next trades may be at the time of the last of these, so a
+        # strict join keeps quotes at that time out of the latest quotes.
+        cut = numpy.searchsorted(
+            quotes[ts_field],
+            trade_ts[count - 1],
+            side="right" if allow_exact else "left",
+        )
+        candidates = numpy.concatenate([latest, quotes[:cut]])
+        candidates = candidates[
+            numpy.lexsort((candidates[ts_field], candidates["product_id"]))
+        ]
+        positions = asof_positions(
+            candidates["product_id"],
+            candidates[ts_field].astype(numpy.int64),
+            step["product_id"],
+            step[ts_field].astype(numpy.int64),
+            allow_exact=allow_exact,
+        )
+        if max_age is not None and len(candidates):
+            found = positions >= 0
+            age = step[ts_field].astype(numpy.int64) - candidates[ts_field][
+                numpy.where(found, positions, 0)
+            ].astype(numpy.int64)
+            positions = numpy.where(found & (age <= max_age), positions, -1)
+
+        signs, ticks = _tick_signs(
+            pandas.DataFrame(
+                {"product_id": step["product_id"], "price": step["price"]}
+            ),
+            ticks,
+        )
+        yield enrich(
+            step,
+            candidates,
+            positions,
+            signs,
+            ts_field=ts_field,
+            symbols=symbols,
+            pretty_px=pretty_px,
+            pretty_ts=pretty_ts,
+        )
+
+        latest = _last_by_product(candidates)
+        quotes = quotes[cut:]
+        trades = trades[count:]
+
+
+def _merge_latest(
+    latest: numpy.ndarray, quotes: numpy.ndarray
+) -> numpy.ndarray:
+    """Fold quotes into the last quote of each product."""
+    merged = numpy.concatenate([latest, quotes])
+    # Quotes come after the latest, so a stable sort keeps them last.
+    return _last_by_product(
+        merged[numpy.argsort(merged["product_id"], kind="stable")]
+    )
+
+
+def join_quotes(
+    trades_path: Union[str, Path],
+    quotes_path: Union[str, Path],
+    output: Union[str, Path],
+    fmt: str = "csv",
+    compression: str = "none",
+    level: int = dbtoys.utilities.compression.DEFAULT_LEVEL,
+    dictionary: Optional[zstandard.ZstdCompressionDict] = None,
+    **kwargs,
+) -> int:
+    """Join trades to the prevailing quotes and write the enriched trades.
+    :param trades_path: The DBZ file of trades.
+    :param quotes_path: The DBZ file of quotes with a top of book.
+    :param output: The file to write.
+    :param fmt: One of convert.KNOWN_FORMATS.
+    :param compression: One of compression.KNOWN_COMPRESSIONS.
+    :param level: The zstd compression level.
+    :param dictionary: If given, compress with this dictionary.
+    :param kwargs: The options of iter_join.
+    :return: The number of trades written.
+    """
+    if fmt not in dbtoys.utilities.convert.KNOWN_FORMATS:
+        raise ValueError(f"Unknown output format {fmt}")
+    total = 0
+    with dbtoys.utilities.compression.open_writer(
+        output, compression=compression, level=level, dictionary=dictionary
+    ) as output_file:
+        for frame in iter_join(trades_path, quotes_path, **kwargs):
+            output_file.write(
+                dbtoys.utilities.convert.format_records(
+                    frame, fmt, header=total == 0
+                )
+            )
+            total += len(frame)
+    _LOG.debug("Joined %s trades of %s to %s", total, trades_path, quotes_path)
+    return total
@@ -1,36 +1,66 @@
-"""Utility module for manging Databento API keys."""
+"""Utility module for manging Databento API keys.
+A key is resolved by a chain of providers, by default the DATABENTO_API_KEY
+environment variable, a credential helper command, the OS keyring and then
+a key file. The first key found is cached for the life of the process, so
+later lookups and short-lived cantrips do not touch the filesystem.
+"""
 import logging
+import os
 import re
+import shlex
+import subprocess
 import sys
+import threading
 from getpass import getpass
-from os import getcwd
+from getpass import getuser
 from pathlib import Path
+from typing import Callable
 from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import Tuple
 
 _LOG = logging.getLogger()
 
 # Some sane defaults for convenience.
 DEFAULT_KEY_FILENAME = ".bentokey"
-DEFAULT_PATHS = (
-    Path(getcwd()),
-    Path.home(),
-)
+KEY_ENV_VAR = "DATABENTO_API_KEY"
+# A command which prints the key, such as "pass show databento".
+KEY_HELPER_ENV_VAR = "DATABENTO_KEY_HELPER"
+KEYRING_SERVICE = "databento"
+HELPER_TIMEOUT_SECONDS = 10.0
+
+KeyProvider = Callable[[], Optional[str]]
+
+
+def default_paths() -> Tuple[Path, ...]:
+    """The directories searched for a key file, found when they are needed.
+    :return: The current working directory and the home directory.
+    """
+    return (Path.cwd(), Path.home())
+
+
+def __getattr__(name: str):
+    """Keep DEFAULT_PATHS for callers which used it, computing it on access
+    like default_paths rather than at import time."""
+    if name == "DEFAULT_PATHS":
+        return default_paths()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def find_key(
     key_file_name: str = DEFAULT_KEY_FILENAME,
-    paths: Iterable[Path] = DEFAULT_PATHS,
+    paths: Optional[Iterable[Path]] = None,
 ) -> Optional[Path]:
     """Search for a databento key file.
-    :param key_file_name: The name of the key file (default: .dbkey)
-    :param paths: A list of directort paths to try. (default: cwd, ~)
+    :param key_file_name: The name of the key file (default: .bentokey)
+    :param paths: A list of directory paths to try. (default: cwd, ~)
     :return: The path to a key file or None if no file is found.
     """
-    for path in paths:
-        key_file_path = path / DEFAULT_KEY_FILENAME
-        if not key_file_path.exists():
-            _LOG.debug("No %s found in %s", DEFAULT_KEY_FILENAME, path)
+    for path in default_paths() if paths is None else paths:
+        key_file_path = path / key_file_name
+        if not key_file_path.is_file():
+            _LOG.debug("No %s found in %s", key_file_name, path)
             continue
         _LOG.debug("Found key file in %s", key_file_path)
         return key_file_path
@@ -74,26 +104,131 @@ def sanitize_key(key: str) -> str:
     return re.sub("[^A-Za-z0-9-]+", "", key)
 
 
+def from_environment() -> Optional[str]:
+    """Get a key from the DATABENTO_API_KEY environment variable.
+    :return: The key, or None if the variable is not set.
+    """
+    return os.environ.get(KEY_ENV_VAR) or None
+
+
+def from_helper() -> Optional[str]:
+    """Get a key from the credential helper command named by the
+    DATABENTO_KEY_HELPER environment variable.
+    :return: The key, or None if there is no helper or it fails.
+    """
+    command = os.environ.get(KEY_HELPER_ENV_VAR)
+    if not command:
+        return None
+    try:
+        result = subprocess.run(  # nosec
+            shlex.split(command),
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=HELPER_TIMEOUT_SECONDS,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        _LOG.warning("Key helper %s failed: %s", command, exc)
+        return None
+    return result.stdout.strip() or None
+
+
+def from_keyring() -> Optional[str]:
+    """Get a key from the OS keyring, if the keyring package is installed.
+    :return: The key, or None if there is no keyring or no key in it.
+    """
+    try:
+        import keyring  # pylint: disable=import-outside-toplevel
+        from keyring.errors import (
+            KeyringError,  # pylint: disable=import-outside-toplevel
+        )
+    except ImportError:
+        return None
+    try:
+        return keyring.get_password(KEYRING_SERVICE, getuser())
+    except KeyringError as exc:
+        _LOG.warning("Failed to read the keyring: %s", exc)
+        return None
+
+
+def from_key_file() -> Optional[str]:
+    """Get a key from the first key file found.
+    :return: The key, or None if there is no key file.
+    """
+    key_file = find_key()
+    if key_file is None:
+        return None
+    return read_key_file(key_file)
+
+
+DEFAULT_PROVIDERS: Tuple[KeyProvider, ...] = (
+    from_environment,
+    from_helper,
+    from_keyring,
+    from_key_file,
+)
+_providers: List[KeyProvider] = list(DEFAULT_PROVIDERS)
+_cached_key: Optional[str] = None
+_cache_lock = threading.Lock()
+
+
+def set_providers(providers: Iterable[KeyProvider] = DEFAULT_PROVIDERS):
+    """Replace the chain of key providers and forget any cached key.
+    :param providers: Callables returning a key or None, tried in order.
+    """
+    global _providers  # pylint: disable=global-statement
+    _providers = list(providers)
+    clear_key_cache()
+
+
+def clear_key_cache():
+    """Forget the key cached by this process."""
+    global _cached_key  # pylint: disable=global-statement
+    with _cache_lock:
+        _cached_key = None
+
+
+def resolve_key() -> Optional[str]:
+    """Get a key from the first provider which has one.
+    :return: The sanitized key, or None if no provider has a key.
+    """
+    for provider in _providers:
+        key = provider()
+        if key:
+            key = sanitize_key(key)
+            _LOG.debug(
+                "Using %s as a key from %s.",
+                hide_key(key),
+                getattr(provider, "__name__", provider),
+            )
+            return key
+    return None
+
+
 def get_api_key(prompt_for_key: bool = False) -> str:
-    """Get an API key to use for databento from a file (.dbkey) or user input.
+    """Get an API key to use for databento from the key providers or user
+    input. The key is cached for the rest of the process.
     :param prompt_for_key: If a key is not found, prompt the user to enter a key.
     """
-    key_file = find_key()
-    if key_file:
-        file_key = sanitize_key(read_key_file(key_file))
-        _LOG.debug("Using %s as a key from key file.", hide_key(file_key))
-        return file_key
-
-    if prompt_for_key:
-        # Prompt the user for a key.
-        try:
-            sys.stderr.write("Please enter a databento API key.\n")
-            user_key = sanitize_key(getpass("<> ", sys.stderr))
-            _LOG.debug("User provided %s as a key.", hide_key(user_key))
-        except KeyboardInterrupt as kbi:
-            _LOG.debug("Received interrupt signal, exiting")
-            raise SystemExit from kbi
-        else:
-            return user_key
+    global _cached_key  # pylint: disable=global-statement
+    with _cache_lock:
+        if _cached_key:
+            return _cached_key
+        _cached_key = resolve_key()
+        if _cached_key:
+            return _cached_key
+
+        if prompt_for_key:
+            # Prompt the user for a key.
+            try:
+                sys.stderr.write("Please enter a databento API key.\n")
+                user_key = sanitize_key(getpass("<> ", sys.stderr))
+                _LOG.debug("User provided %s as a key.", hide_key(user_key))
+            except KeyboardInterrupt as kbi:
+                _LOG.debug("Received interrupt signal, exiting")
+                raise SystemExit from kbi
+            else:
+                _cached_key = user_key or None
+                return user_key
 
     return ""
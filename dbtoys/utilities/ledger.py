@@ -0,0 +1,336 @@
+"""Utility module for an append-only ledger of costs and usage.
+The ledger is a SQLite database in WAL mode, so any number of processes may
+append to it while others read. Aggregates are answered from covering
+indexes and stay fast with millions of entries. The ledger also caches the
+unit prices of datasets, which unlike entries are replaced when refreshed.
+"""
+import getpass
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import pandas
+
+_LOG = logging.getLogger()
+
+DEFAULT_LEDGER_PATH: Path = Path.home() / ".dbtoys" / "ledger.db"
+DEFAULT_BUSY_TIMEOUT_MS: int = 30_000
+
+ENTRY_KINDS: Tuple[str, ...] = (
+    "estimate",
+    "billable_size",
+    "shape",
+    "plan",
+    "download",
+)
+# Kinds of entry whose bytes are billable sizes rather than file sizes.
+SIZE_KINDS: Tuple[str, ...] = ("estimate", "billable_size", "shape", "plan")
+SPEND_GROUPS: Tuple[str, ...] = ("dataset", "day", "user")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    user TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    dataset TEXT,
+    schema TEXT,
+    window_start TEXT,
+    window_end TEXT,
+    symbol_count INTEGER NOT NULL,
+    cost REAL,
+    bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS entry_symbols (
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    kind TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_by_dataset
+    ON entries(dataset, kind, cost, bytes);
+CREATE INDEX IF NOT EXISTS entries_by_day
+    ON entries(day, kind, cost, bytes);
+CREATE INDEX IF NOT EXISTS entries_by_user
+    ON entries(user, kind, cost, bytes);
+CREATE INDEX IF NOT EXISTS entry_symbols_by_symbol
+    ON entry_symbols(kind, symbol, bytes);
+CREATE TABLE IF NOT EXISTS unit_prices (
+    dataset TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    schema TEXT NOT NULL,
+    price REAL NOT NULL,
+    ts INTEGER NOT NULL,
+    PRIMARY KEY (dataset, mode, schema)
+);
+CREATE TRIGGER IF NOT EXISTS entries_no_update BEFORE UPDATE ON entries
+    BEGIN SELECT RAISE(ABORT, 'the ledger is append only'); END;
+CREATE TRIGGER IF NOT EXISTS entries_no_delete BEFORE DELETE ON entries
+    BEGIN SELECT RAISE(ABORT, 'the ledger is append only'); END;
+CREATE TRIGGER IF NOT EXISTS entry_symbols_no_update
+    BEFORE UPDATE ON entry_symbols
+    BEGIN SELECT RAISE(ABORT, 'the ledger is append only'); END;
+CREATE TRIGGER IF NOT EXISTS entry_symbols_no_delete
+    BEFORE DELETE ON entry_symbols
+    BEGIN SELECT RAISE(ABORT, 'the ledger is append only'); END;
+"""
+
+
+def _isoformat(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return pandas.Timestamp(value).isoformat()
+
+
+class Ledger:
+    """An append-only ledger of cost estimates, billable sizes and
+    downloads. Each thread uses its own connection to the database.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_LEDGER_PATH,
+        user: Optional[str] = None,
+    ):
+        self.path = Path(path)
+        self.user = user or getpass.getuser()
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=DEFAULT_BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={DEFAULT_BUSY_TIMEOUT_MS}")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def record(
+        self,
+        kind: str,
+        dataset: Optional[str] = None,
+        schema: Optional[str] = None,
+        symbols: Iterable[str] = (),
+        start: Any = None,
+        end: Any = None,
+        cost: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> int:
+        """Append an entry to the ledger.
+        The bytes of an entry are attributed evenly to its symbols.
+        :param kind: One of ENTRY_KINDS.
+        :param dataset: The dataset of the request.
+        :param schema: The schema of the request.
+        :param symbols: The symbols of the request.
+        :param start: The start of the request window.
+        :param end: The end of the request window.
+        :param cost: The cost in US dollars.
+        :param size: The size in bytes.
+        :return: The ID of the new entry.
+        """
+        if kind not in ENTRY_KINDS:
+            raise ValueError(f"Unknown ledger entry kind {kind}")
+        symbols = list(symbols)
+        now = time.time_ns()
+        symbol_bytes = (
+            None if size is None or not symbols else size // len(symbols)
+        )
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                "INSERT INTO entries (ts, day, user, kind, dataset, schema, "
+                "window_start, window_end, symbol_count, cost, bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    now,
+                    pandas.Timestamp(now, tz="UTC").date().isoformat(),
+                    self.user,
+                    kind,
+                    dataset,
+                    schema,
+                    _isoformat(start),
+                    _isoformat(end),
+                    len(symbols),
+                    cost,
+                    size,
+                ),
+            )
+            entry_id = cursor.lastrowid
+            connection.executemany(
+                "INSERT INTO entry_symbols (entry_id, kind, symbol, bytes) "
+                "VALUES (?, ?, ?, ?)",
+                ((entry_id, kind, symbol, symbol_bytes) for symbol in symbols),
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        _LOG.debug("Recorded ledger entry %s of kind %s", entry_id, kind)
+        return entry_id
+
+    def spend_by(
+        self,
+        group: str,
+    ) -> List[Tuple[str, float, float, int]]:
+        """Aggregate estimated and spent cost by a group.
+        The candidates priced by a plan are not estimates of a request, so
+        they are left out.
+        :param group: One of SPEND_GROUPS.
+        :return: Rows of group, estimated cost, spent cost, downloaded bytes.
+        """
+        if group not in SPEND_GROUPS:
+            raise ValueError(f"Unknown ledger group {group}")
+        # The group is checked above, so it is safe to format into the query.
+        return (
+            self._connection()
+            .execute(
+                f"SELECT {group}, "
+                "TOTAL(CASE WHEN kind = 'estimate' THEN cost END), "
+                "TOTAL(CASE WHEN kind = 'download' THEN cost END), "
+                "TOTAL(CASE WHEN kind = 'download' THEN bytes END) "
+                f"FROM entries INDEXED BY entries_by_{group} "
+                f"GROUP BY {group} ORDER BY {group}"
+            )
+            .fetchall()
+        )
+
+    def top_symbols(
+        self,
+        kind: str = "download",
+        limit: int = 10,
+    ) -> List[Tuple[str, int]]:
+        """Find the symbols with the most bytes.
+        :param kind: One of ENTRY_KINDS.
+        :param limit: The number of symbols to return.
+        :return: Rows of symbol and bytes, largest first.
+        """
+        return (
+            self._connection()
+            .execute(
+                "SELECT symbol, TOTAL(bytes) AS total FROM entry_symbols "
+                "WHERE kind = ? GROUP BY symbol ORDER BY total DESC LIMIT ?",
+                (kind, limit),
+            )
+            .fetchall()
+        )
+
+    def size_observations(
+        self,
+        dataset: Optional[str] = None,
+    ) -> pandas.DataFrame:
+        """Find the billable sizes the ledger has seen, per symbol.
+        :param dataset: If given, only find sizes of this dataset.
+        :return: A table of dataset, schema, symbol, window_start,
+            window_end and bytes.
+        """
+        query = (
+            "SELECT e.dataset, e.schema, s.symbol, e.window_start, "
+            "e.window_end, s.bytes FROM entry_symbols AS s "
+            "JOIN entries AS e ON e.id = s.entry_id "
+            f"WHERE s.kind IN ({', '.join('?' * len(SIZE_KINDS))}) "
+            "AND s.bytes IS NOT NULL AND e.schema IS NOT NULL "
+            "AND e.window_start IS NOT NULL AND e.window_end IS NOT NULL"
+        )
+        parameters: Tuple[str, ...] = SIZE_KINDS
+        if dataset is not None:
+            query += " AND e.dataset = ?"
+            parameters += (dataset,)
+        return pandas.DataFrame(
+            self._connection().execute(query, parameters).fetchall(),
+            columns=[
+                "dataset",
+                "schema",
+                "symbol",
+                "window_start",
+                "window_end",
+                "bytes",
+            ],
+        )
+
+    def cache_unit_prices(
+        self,
+        dataset: str,
+        mode: str,
+        prices: Dict[str, float],
+    ):
+        """Replace the cached unit prices of a dataset and feed mode.
+        :param dataset: The dataset of the prices.
+        :param mode: The feed mode of the prices.
+        :param prices: The price per GB of each schema.
+        """
+        now = time.time_ns()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM unit_prices WHERE dataset = ? AND mode = ?",
+                (dataset, mode),
+            )
+            connection.executemany(
+                "INSERT INTO unit_prices (dataset, mode, schema, price, ts) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (dataset, mode, schema, price, now)
+                    for schema, price in prices.items()
+                ),
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def unit_prices(
+        self,
+        dataset: str,
+        mode: str,
+        max_age: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """Get the cached unit prices of a dataset and feed mode.
+        :param dataset: The dataset of the prices.
+        :param mode: The feed mode of the prices.
+        :param max_age: If given, ignore prices older than this in seconds.
+        :return: The price per GB of each schema; empty if none are cached.
+        """
+        oldest = 0 if max_age is None else time.time_ns() - int(max_age * 1e9)
+        return dict(
+            self._connection()
+            .execute(
+                "SELECT schema, price FROM unit_prices "
+                "WHERE dataset = ? AND mode = ? AND ts >= ?",
+                (dataset, mode, oldest),
+            )
+            .fetchall()
+        )
+
+    def __len__(self) -> int:
+        return (
+            self._connection()
+            .execute("SELECT COUNT(*) FROM entries")
+            .fetchone()[0]
+        )
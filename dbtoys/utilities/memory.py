@@ -0,0 +1,179 @@
+"""Utility module for measuring and bounding the memory of dbtoys work.
+Peak memory is measured two ways: tracemalloc counts what Python, numpy and
+pandas allocate, while the resident set size, sampled from a second thread,
+counts everything the process holds. Memory of worker processes is not
+counted by either.
+A memory budget is a number of bytes which streaming stages divide between
+the copies of a chunk they hold, so they read smaller chunks and spill to
+disk rather than outgrow the budget.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import tracemalloc
+from typing import Optional
+from typing import Union
+
+import humanize
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+_LOG = logging.getLogger()
+
+DEFAULT_SAMPLE_INTERVAL: float = 0.01
+MIN_CHUNK_BYTES: int = 64 * 1024
+
+SIZE_UNITS = {
+    "": 1,
+    "K": 1024,
+    "M": 1024**2,
+    "G": 1024**3,
+    "T": 1024**4,
+}
+
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d*)?)\s*([KMGT]?)(?:I?B)?\s*$", re.I)
+
+
+def parse_size(value: Union[str, int]) -> int:
+    """Parse a size such as 512M, 1.5G or 1048576.
+    Units are powers of 1024; a B or iB suffix is optional.
+    :param value: The size to parse.
+    :return: The size in bytes.
+    """
+    if isinstance(value, int):
+        return value
+    match = _SIZE_PATTERN.match(value)
+    if match is None:
+        raise ValueError(f"Invalid size {value}")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+def current_rss() -> Optional[int]:
+    """The resident set size of this process in bytes.
+    :return: The size; None where it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    # Elsewhere only the high water mark of the process is known.
+    return peak_rss()
+
+
+def peak_rss() -> Optional[int]:
+    """The highest resident set size of this process so far in bytes.
+    :return: The size; None where it cannot be read.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def chunk_bytes_within(
+    budget: Optional[int],
+    chunk_bytes: int,
+    copies: float = 1.0,
+) -> int:
+    """The size of chunks which fit a budget.
+    :param budget: The memory budget in bytes; None for no budget.
+    :param chunk_bytes: The size of chunks without a budget.
+    :param copies: The number of chunk sized buffers held at once.
+    :return: The chunk size; never less than MIN_CHUNK_BYTES.
+    """
+    if budget is None:
+        return chunk_bytes
+    return max(MIN_CHUNK_BYTES, min(chunk_bytes, int(budget / copies)))
+
+
+def jobs_within(budget: Optional[int], jobs: int, copies: float) -> int:
+    """The number of workers which fit a budget with the smallest chunks.
+    :param budget: The memory budget in bytes; None for no budget.
+    :param jobs: The number of workers without a budget.
+    :param copies: The number of chunk sized buffers held per worker.
+    :return: The number of workers; at least one.
+    """
+    if budget is None:
+        return jobs
+    return max(1, min(jobs, int(budget / (copies * MIN_CHUNK_BYTES))))
+
+
+class MemoryMonitor:
+    """A context manager measuring the peak memory of the code it wraps.
+    tracemalloc slows allocation down, so it can be turned off to only
+    sample the resident set size.
+    """
+
+    def __init__(
+        self,
+        trace: bool = True,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ):
+        self.trace = trace
+        self.interval = interval
+        self.peak_traced: Optional[int] = None
+        self.start_rss: Optional[int] = None
+        self.peak_rss: Optional[int] = None
+        self._base_traced = 0
+        self._started_tracing = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "MemoryMonitor":
+        if self.trace:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+            self._base_traced = tracemalloc.get_traced_memory()[0]
+        self.start_rss = current_rss()
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stopped.set()
+        self._thread.join()
+        self._sample()
+        if self.trace:
+            self.peak_traced = (
+                tracemalloc.get_traced_memory()[1] - self._base_traced
+            )
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def summary(self) -> str:
+        """Summarize the peak memory measured.
+        :return: One line of the traced peak and resident set sizes.
+        """
+        parts = []
+        if self.peak_traced is not None:
+            parts.append(
+                f"peak allocated {humanize.naturalsize(self.peak_traced)}"
+            )
+        if self.peak_rss is not None:
+            parts.append(f"peak RSS {humanize.naturalsize(self.peak_rss)}")
+            if self.start_rss is not None:
+                grown = max(0, self.peak_rss - self.start_rss)
+                parts.append(f"grew {humanize.naturalsize(grown)}")
+        return "Memory: " + (", ".join(parts) or "not measured")
@@ -0,0 +1,455 @@
+"""Utility module for exporting records to partitioned Parquet datasets.
+Files are laid out as root/dataset=<dataset>/schema=<schema>/date=<date>/,
+which DuckDB and Polars read as hive partitions. Within a file records are
+sorted by symbol and time, so row group statistics prune both predicates.
+Records of a day which recurs after another day in a file, such as when
+times step back across midnight, are written to numbered part files
+alongside the first, <name>-part<n>.parquet.
+"""
+import collections
+import logging
+import re
+import tempfile
+from pathlib import Path
+from typing import Any
+from typing import Counter
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import pandas
+
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+import dbtoys.utilities.memory
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None  # type: ignore
+
+_LOG = logging.getLogger()
+
+DEFAULT_ROW_GROUP_SIZE: int = 64 * 1024
+DEFAULT_PARQUET_COMPRESSION: str = "zstd"
+
+# Buffers the size of the buffered day held while a day is written: the
+# frames, their concatenation, the sorted copy and the Arrow table.
+_EXPORT_COPIES: float = 4.0
+# Spilled runs are read back once, so they favour speed over size.
+_SPILL_COMPRESSION: str = "snappy"
+
+Timestamp = Union[pandas.Timestamp, str, int]
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError(
+            "pyarrow is required for Parquet support, "
+            "install dbtoys with the parquet extra"
+        )
+
+
+def _to_nanoseconds(value: Timestamp) -> int:
+    if isinstance(value, int):
+        return value
+    timestamp = pandas.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize("UTC")
+    return timestamp.value
+
+
+def partition_path(root: Union[str, Path], dataset: str, schema: str, date):
+    """The directory of one dataset, schema and date partition.
+    :param root: The root of the Parquet dataset.
+    :param dataset: The dataset of the records.
+    :param schema: The schema of the records.
+    :param date: The UTC date of the records.
+    :return: The partition directory.
+    """
+    return (
+        Path(root)
+        / f"dataset={dataset}"
+        / f"schema={schema}"
+        / f"date={pandas.Timestamp(date).date().isoformat()}"
+    )
+
+
+def _write_row_groups(
+    writer: "pyarrow.parquet.ParquetWriter",
+    table: "pyarrow.Table",
+    symbol_counts: Iterable[int],
+    row_group_size: int,
+):
+    # Row groups end on symbol boundaries where possible, otherwise the
+    # time statistics of a row group span two symbols and prune nothing.
+    start = 0
+    end = 0
+    for count in symbol_counts:
+        if end > start and end - start + count > row_group_size:
+            writer.write_table(table.slice(start, end - start), row_group_size)
+            start = end
+        end += count
+    if end > start:
+        writer.write_table(table.slice(start, end - start), row_group_size)
+
+
+def _write_partition(
+    frame: pandas.DataFrame,
+    path: Path,
+    row_group_size: int,
+    compression: str,
+):
+    frame = frame.sort_values(["symbol", "ts_event"], kind="stable")
+    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    symbol_counts = frame["symbol"].value_counts(sort=False).sort_index()
+    with pyarrow.parquet.ParquetWriter(
+        path,
+        table.schema,
+        compression=compression,
+        use_dictionary=["symbol"],
+        write_statistics=True,
+    ) as writer:
+        _write_row_groups(writer, table, symbol_counts, row_group_size)
+    _LOG.debug("Wrote %s rows to %s", len(frame), path)
+
+
+def _symbol_batches(
+    symbol_counts: Dict[str, int], batch_rows: int
+) -> Iterator[List[str]]:
+    """Group sorted symbols into batches of about batch_rows rows.
+    A symbol with more rows than a batch is a batch of its own.
+    """
+    batch: List[str] = []
+    rows = 0
+    for symbol in sorted(symbol_counts):
+        if batch and rows + symbol_counts[symbol] > batch_rows:
+            yield batch
+            batch = []
+            rows = 0
+        batch.append(symbol)
+        rows += symbol_counts[symbol]
+    if batch:
+        yield batch
+
+
+def _merge_runs(
+    runs: List[Path],
+    symbol_counts: Dict[str, int],
+    path: Path,
+    row_group_size: int,
+    compression: str,
+    batch_rows: int,
+):
+    """Write a partition from runs spilled to disk, a batch of symbols at
+    a time. Each run is sorted, so a batch only reads its own row groups.
+    """
+    schema = pyarrow.parquet.read_schema(runs[0])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with pyarrow.parquet.ParquetWriter(
+        path,
+        schema,
+        compression=compression,
+        use_dictionary=["symbol"],
+        write_statistics=True,
+    ) as writer:
+        for batch in _symbol_batches(symbol_counts, batch_rows):
+            table = pyarrow.concat_tables(
+                pyarrow.parquet.read_table(
+                    run, filters=[("symbol", "in", batch)], schema=schema
+                )
+                for run in runs
+            )
+            # The sort is stable, so records keep the order of the runs.
+            table = table.sort_by(
+                [("symbol", "ascending"), ("ts_event", "ascending")]
+            )
+            _write_row_groups(
+                writer,
+                table,
+                (symbol_counts[symbol] for symbol in batch),
+                row_group_size,
+            )
+    _LOG.debug("Merged %s spilled runs to %s", len(runs), path)
+
+
+def export_parquet(
+    path: Union[str, Path],
+    root: Union[str, Path],
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = DEFAULT_PARQUET_COMPRESSION,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+    metadata: Optional[Dict[str, Any]] = None,
+    memory_budget: Optional[int] = None,
+) -> List[Path]:
+    """Export a DBZ file into date partitions of a Parquet dataset.
+    Each partition of a day is buffered in memory so it can be sorted.
+    With a memory budget, a day which outgrows it is spilled to disk in
+    sorted runs, which are merged a batch of symbols at a time; then only
+    the records of one symbol in one day need to fit in memory.
+    :param path: The DBZ file to export.
+    :param root: The root of the Parquet dataset.
+    :param row_group_size: The number of rows in each row group.
+    :param compression: The Parquet compression codec.
+    :param chunk_bytes: The approximate size of each chunk read.
+    :param metadata: The DBZ metadata; read from the file if not given.
+    :param memory_budget: If given, the bytes to buffer records in.
+    :return: The Parquet files written.
+    """
+    _require_pyarrow()
+    if metadata is None:
+        metadata = dbtoys.utilities.dbz.read_metadata(path)
+
+    dataset = metadata["dataset"]
+    schema = metadata["schema"]
+    symbols = dbtoys.utilities.dbz.symbol_map(metadata)
+    stem = Path(path).stem
+    stale_part = re.compile(rf"{re.escape(stem)}-part\d+\.parquet")
+
+    chunk_bytes = dbtoys.utilities.memory.chunk_bytes_within(
+        memory_budget, chunk_bytes, _EXPORT_COPIES
+    )
+    spill_bytes = (
+        None if memory_budget is None else memory_budget / _EXPORT_COPIES
+    )
+
+    written: List[Path] = []
+    day_frames: List[pandas.DataFrame] = []
+    day_bytes = 0
+    row_bytes = 1.0
+    symbol_counts: Counter[str] = collections.Counter()
+    runs: List[Path] = []
+    current_day = None
+    # The number of times each day has been written.
+    day_parts: Counter[pandas.Timestamp] = collections.Counter()
+
+    with tempfile.TemporaryDirectory(prefix="dbtoys-spill-") as spill_dir:
+
+        def spill():
+            nonlocal day_bytes
+            run = Path(spill_dir) / f"run-{len(runs)}.parquet"
+            _write_partition(
+                pandas.concat(day_frames, ignore_index=True),
+                run,
+                row_group_size,
+                _SPILL_COMPRESSION,
+            )
+            runs.append(run)
+            day_frames.clear()
+            day_bytes = 0
+
+        def flush():
+            if not runs and not day_frames:
+                return
+            directory = partition_path(root, dataset, schema, current_day)
+            part = day_parts[current_day]
+            if part:
+                target = directory / f"{stem}-part{part}.parquet"
+            else:
+                target = directory / f"{stem}.parquet"
+                # Parts left by an earlier export would duplicate records.
+                if directory.is_dir():
+                    for existing in directory.iterdir():
+                        if stale_part.fullmatch(existing.name):
+                            existing.unlink()
+            day_parts[current_day] += 1
+            if runs:
+                if day_frames:
+                    spill()
+                _merge_runs(
+                    runs,
+                    symbol_counts,
+                    target,
+                    row_group_size,
+                    compression,
+                    max(1, int(spill_bytes / row_bytes)),  # type: ignore
+                )
+                for run in runs:
+                    run.unlink()
+                runs.clear()
+            else:
+                _write_partition(
+                    pandas.concat(day_frames, ignore_index=True),
+                    target,
+                    row_group_size,
+                    compression,
+                )
+            written.append(target)
+            day_frames.clear()
+            symbol_counts.clear()
+
+        for records in dbtoys.utilities.dbz.iter_records(
+            path, schema, chunk_bytes=chunk_bytes
+        ):
+            frame = dbtoys.utilities.convert.transform_records(records)
+            frame["symbol"] = (
+                frame["product_id"]
+                .map(symbols)
+                .fillna(frame["product_id"].astype(str))
+            )
+            days = pandas.to_datetime(
+                frame["ts_event"], utc=True
+            ).dt.normalize()
+            for day, day_frame in frame.groupby(days, sort=False):
+                if current_day is not None and day != current_day:
+                    flush()
+                current_day = day
+                day_frames.append(day_frame)
+                if spill_bytes is None:
+                    continue
+                frame_bytes = day_frame.memory_usage(index=False).sum()
+                row_bytes = max(row_bytes, frame_bytes / len(day_frame))
+                day_bytes += frame_bytes
+                symbol_counts.update(
+                    day_frame["symbol"].value_counts().to_dict()
+                )
+                if day_bytes > spill_bytes:
+                    spill()
+        flush()
+
+    return written
+
+
+def _overlaps(statistics, low: Any, high: Any) -> bool:
+    """Test if row group statistics may contain values in [low, high]."""
+    if statistics is None or not statistics.has_min_max:
+        return True
+    return statistics.max >= low and statistics.min <= high
+
+
+def scan_row_groups(
+    root: Union[str, Path],
+    dataset: str,
+    schema: str,
+    start: Optional[Timestamp] = None,
+    end: Optional[Timestamp] = None,
+    symbols: Optional[Iterable[str]] = None,
+) -> List[Tuple[Path, List[int]]]:
+    """Find the row groups which may match time and symbol predicates.
+    Partitions are pruned by date, then row groups by their statistics.
+    :param root: The root of the Parquet dataset.
+    :param dataset: The dataset to read.
+    :param schema: The schema to read.
+    :param start: The earliest time to read (inclusive).
+    :param end: The latest time to read (exclusive).
+    :param symbols: If given, the symbols to read.
+    :return: The files to read with the row groups to read from each.
+    """
+    _require_pyarrow()
+    start_ns = None if start is None else _to_nanoseconds(start)
+    end_ns = None if end is None else _to_nanoseconds(end)
+    wanted = None if symbols is None else sorted(set(symbols))
+
+    selected: List[Tuple[Path, List[int]]] = []
+    schema_path = Path(root) / f"dataset={dataset}" / f"schema={schema}"
+    for partition in sorted(schema_path.glob("date=*")):
+        day = pandas.Timestamp(partition.name.split("=", 1)[1], tz="UTC")
+        if end_ns is not None and day.value >= end_ns:
+            continue
+        if start_ns is not None and (day + pandas.Timedelta(days=1)).value <= (
+            start_ns
+        ):
+            continue
+
+        for file_path in sorted(partition.glob("*.parquet")):
+            parquet_metadata = pyarrow.parquet.ParquetFile(file_path).metadata
+            names = parquet_metadata.schema.names
+            ts_index = names.index("ts_event")
+            symbol_index = names.index("symbol")
+            row_groups = []
+            for i in range(parquet_metadata.num_row_groups):
+                row_group = parquet_metadata.row_group(i)
+                if not _overlaps(
+                    row_group.column(ts_index).statistics,
+                    start_ns if start_ns is not None else 0,
+                    end_ns - 1 if end_ns is not None else 2**64 - 1,
+                ):
+                    continue
+                if wanted is not None and not any(
+                    _overlaps(
+                        row_group.column(symbol_index).statistics,
+                        symbol,
+                        symbol,
+                    )
+                    for symbol in wanted
+                ):
+                    continue
+                row_groups.append(i)
+            if row_groups:
+                selected.append((file_path, row_groups))
+    return selected
+
+
+def read_parquet(
+    root: Union[str, Path],
+    dataset: str,
+    schema: str,
+    start: Optional[Timestamp] = None,
+    end: Optional[Timestamp] = None,
+    symbols: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> pandas.DataFrame:
+    """Read records from a Parquet dataset, pushing predicates down to
+    row group statistics so only matching row groups are read.
+    :param root: The root of the Parquet dataset.
+    :param dataset: The dataset to read.
+    :param schema: The schema to read.
+    :param start: The earliest time to read (inclusive).
+    :param end: The latest time to read (exclusive).
+    :param symbols: If given, the symbols to read.
+    :param columns: If given, the columns to read.
+    :return: The matching records.
+    """
+    _require_pyarrow()
+    symbols = None if symbols is None else list(symbols)
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys([*columns, "ts_event", "symbol"]))
+
+    tables = []
+    for file_path, row_groups in scan_row_groups(
+        root, dataset, schema, start=start, end=end, symbols=symbols
+    ):
+        table = pyarrow.parquet.ParquetFile(
+            file_path, read_dictionary=["symbol"]
+        ).read_row_groups(row_groups, columns=read_columns)
+        mask = None
+        if start is not None:
+            mask = pyarrow.compute.greater_equal(
+                table["ts_event"], _to_nanoseconds(start)
+            )
+        if end is not None:
+            end_mask = pyarrow.compute.less(
+                table["ts_event"], _to_nanoseconds(end)
+            )
+            mask = (
+                end_mask
+                if mask is None
+                else pyarrow.compute.and_(mask, end_mask)
+            )
+        if symbols is not None:
+            symbol_mask = pyarrow.compute.is_in(
+                table["symbol"].cast(pyarrow.string()),
+                value_set=pyarrow.array(symbols, pyarrow.string()),
+            )
+            mask = (
+                symbol_mask
+                if mask is None
+                else pyarrow.compute.and_(mask, symbol_mask)
+            )
+        tables.append(table if mask is None else table.filter(mask))
+
+    if not tables:
+        return pandas.DataFrame(columns=columns)
+    frame = pyarrow.concat_tables(tables).to_pandas()
+    if columns is not None:
+        frame = frame[columns]
+    return frame
@@ -1,5 +1,10 @@
 """Common path CLI for dbtoys applications."""
 import argparse
+import contextlib
+import sys
+from typing import Any
+from typing import Callable
+from typing import Dict
 
 import dbtoys.utilities.splash
 
@@ -18,3 +23,45 @@ class ToyParser(argparse.ArgumentParser):
             epilog=dbtoys.utilities.splash.DBTOYS_GOODBYE,
             formatter_class=argparse.RawDescriptionHelpFormatter,
         )
+        self.add_argument(
+            "--profile",
+            action="store_true",
+            help="profile the run and write pstats and flame graph files",
+        )
+        self.add_argument(
+            "--memory",
+            action="store_true",
+            help="report the peak memory of the run",
+        )
+
+
+def run_main(prog: str, main: Callable[..., int], args: Dict[str, Any]) -> int:
+    """Run the main function of a toy, profiling it if --profile was given
+    and measuring its memory if --memory was given.
+    :param prog: The name of the toy.
+    :param main: The main function of the toy.
+    :param args: The parsed arguments, including profile and memory.
+    :return: The POSIX exit code of main.
+    """
+    profile = args.pop("profile", False)
+    memory = args.pop("memory", False)
+    profiler = None
+    monitor = None
+    with contextlib.ExitStack() as stack:
+        # These are only imported when their option is given.
+        if profile:
+            # pylint: disable-next=import-outside-toplevel
+            from dbtoys.utilities.profiling import Profiler
+
+            profiler = stack.enter_context(Profiler(prog))
+        if memory:
+            # pylint: disable-next=import-outside-toplevel
+            from dbtoys.utilities.memory import MemoryMonitor
+
+            monitor = stack.enter_context(MemoryMonitor())
+        exit_code = main(**args)
+    if profiler is not None:
+        sys.stderr.write(profiler.summary() + "\n")
+    if monitor is not None:
+        sys.stderr.write(monitor.summary() + "\n")
+    return exit_code
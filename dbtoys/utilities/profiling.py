@@ -0,0 +1,171 @@
+"""Utility module for profiling dbtoys commands.
+A profile runs cProfile on the profiled thread while a second thread samples
+its stack. The cProfile statistics are written as a pstats file and the
+samples as collapsed stacks, which flamegraph.pl, speedscope and similar
+tools draw as flame graphs.
+"""
+import collections
+import cProfile
+import io
+import logging
+import pstats
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import Counter
+from typing import List
+from typing import Optional
+from typing import Union
+
+import dbtoys.utilities.logging
+import dbtoys.utilities.render
+
+_LOG = logging.getLogger()
+
+DEFAULT_PROFILE_PATH: Path = (
+    dbtoys.utilities.logging.DEFAULT_LOG_FILE_PATH / "profiles"
+)
+DEFAULT_SAMPLE_INTERVAL: float = 0.005
+DEFAULT_TOP: int = 15
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    # Semicolons separate frames in collapsed stacks.
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(
+        ";", ":"
+    )
+
+
+class StackSampler:
+    """Samples the stack of one thread from another thread."""
+
+    def __init__(
+        self,
+        thread_id: Optional[int] = None,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples: Counter[str] = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = (
+                sys._current_frames().get(  # pylint: disable=protected-access
+                    self.thread_id
+                )
+            )
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampling thread."""
+        self._stopped.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, one stack and count per line."""
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in sorted(self.samples.items())
+        )
+
+
+class Profiler:
+    """A context manager profiling the calling thread.
+    On exit the profile is written under the profile directory as
+    <name>-<time>.pstats and <name>-<time>.collapsed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        directory: Optional[Union[str, Path]] = None,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ):
+        self.name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        self.directory = Path(
+            DEFAULT_PROFILE_PATH if directory is None else directory
+        )
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.sampler: Optional[StackSampler] = None
+        self.pstats_path: Optional[Path] = None
+        self.collapsed_path: Optional[Path] = None
+
+    def __enter__(self) -> "Profiler":
+        self.sampler = StackSampler(interval=self.interval)
+        self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *_):
+        self.profile.disable()
+        self.sampler.stop()  # type: ignore
+        self.write()
+
+    def write(self):
+        """Write the pstats and collapsed stack files of the profile."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = time.time_ns()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now / 1e9))
+        stem = f"{self.name}-{stamp}.{now % 10**9:09d}"
+        self.pstats_path = self.directory / f"{stem}.pstats"
+        self.collapsed_path = self.directory / f"{stem}.collapsed"
+        self.profile.dump_stats(self.pstats_path)
+        self.collapsed_path.write_text(
+            self.sampler.collapsed(), encoding="utf-8"  # type: ignore
+        )
+        _LOG.debug("Wrote profile of %s to %s", self.name, self.pstats_path)
+
+    def summary(self, top: int = DEFAULT_TOP) -> str:
+        """Summarize the functions with the most time spent in them.
+        :param top: The number of functions to show.
+        :return: A table of the hottest functions and the profile paths.
+        """
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = sorted(
+            (
+                (total_time, cumulative_time, calls, function)
+                for function, (
+                    _,
+                    calls,
+                    total_time,
+                    cumulative_time,
+                    _,
+                ) in stats.stats.items()  # type: ignore
+            ),
+            reverse=True,
+        )[:top]
+        table = dbtoys.utilities.render.stream_table(
+            (
+                [
+                    pstats.func_std_string(function),
+                    calls,
+                    total_time,
+                    cumulative_time,
+                ]
+                for total_time, cumulative_time, calls, function in rows
+            ),
+            headers=["function", "calls", "tottime", "cumtime"],
+            floatfmt=".4f",
+        )
+        return (
+            "\n".join(table) + "\n"
+            f"Profile written to {self.pstats_path}\n"
+            f"Flame graph stacks written to {self.collapsed_path}"
+        )
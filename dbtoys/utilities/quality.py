@@ -0,0 +1,356 @@
+"""Utility module for checking the quality of downloaded DBZ files.
+Chunks are scanned by a pool of worker processes with vectorized checks,
+each returning counts by product and day along with the first and last
+record of every product it saw. The parent stitches the chunks together at
+their boundaries, so the report is the same for any chunk size.
+
+A record is a duplicate when it is identical to the previous record of its
+product and out of order when its ts_event is before that record's. The gap
+of a product and day is the longest time between consecutive records.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy
+import pandas
+
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+import dbtoys.utilities.memory
+
+_LOG = logging.getLogger()
+
+DAY_NS: int = 24 * 60 * 60 * 10**9
+
+# Prices which are absent rather than zero.
+UNDEF_PRICE: int = numpy.iinfo(numpy.int64).max
+
+COUNT_COLUMNS: Tuple[str, ...] = (
+    "records",
+    "duplicates",
+    "out_of_order",
+    "crossed",
+    "bad_prices",
+)
+REPORT_COLUMNS: Tuple[str, ...] = (
+    "symbol",
+    "date",
+    *COUNT_COLUMNS,
+    "max_gap_s",
+    "issues",
+)
+
+# Chunk sized buffers held per worker: two shared memory slots, then the
+# sorted copy of the chunk and the per record flags.
+_COPIES_PER_JOB: float = 5.0
+
+
+class Validation(NamedTuple):
+    """The quality report of a DBZ file."""
+
+    path: str
+    records: int
+    expected: Optional[int]
+    report: pandas.DataFrame
+
+    @property
+    def truncated(self) -> bool:
+        """Whether fewer records were read than the shape of the request."""
+        return self.expected is not None and self.records < self.expected
+
+
+def _bad_prices(records: numpy.ndarray) -> numpy.ndarray:
+    """Flag records with a zero or negative price."""
+    names = records.dtype.names or ()
+    bad = numpy.zeros(len(records), dtype=bool)
+    for name in ("price", "open", "high", "low", "close"):
+        if name in names:
+            price = records[name].astype(numpy.int64)
+            bad |= (price <= 0) & (price != UNDEF_PRICE)
+    for side in ("bid", "ask"):
+        if f"{side}_px_00" in names:
+            # Empty levels have no price to check.
+            bad |= (records[f"{side}_sz_00"] > 0) & (
+                records[f"{side}_px_00"] <= 0
+            )
+    return bad
+
+
+def _crossed(records: numpy.ndarray) -> numpy.ndarray:
+    """Flag records whose top of book bid is above its ask."""
+    if "bid_px_00" not in (records.dtype.names or ()):
+        return numpy.zeros(len(records), dtype=bool)
+    return (
+        (records["bid_sz_00"] > 0)
+        & (records["ask_sz_00"] > 0)
+        & (records["bid_px_00"] > records["ask_px_00"])
+    )
+
+
+def scan_records(records: numpy.ndarray) -> Dict[str, pandas.DataFrame]:
+    """Check a chunk of records.
+    :param records: The records, in file order.
+    :return: The "counts" by product_id and day, with the max_gap in
+        nanoseconds, and the "first" and "last" record of each product as
+        its ts_event and raw bytes.
+    """
+    # A stable sort keeps the file order of the records of each product.
+    order = numpy.argsort(records["product_id"], kind="stable")
+    product_ids = records["product_id"][order]
+    ts_event = records["ts_event"][order].astype(numpy.int64)
+    raw = records.view(numpy.uint8).reshape(
+        len(records), records.dtype.itemsize
+    )[order]
+    day = ts_event // DAY_NS
+
+    same = numpy.zeros(len(records), dtype=bool)
+    same[1:] = product_ids[1:] == product_ids[:-1]
+    step = numpy.zeros(len(records), dtype=numpy.int64)
+    step[1:] = ts_event[1:] - ts_event[:-1]
+    duplicate = numpy.zeros(len(records), dtype=bool)
+    duplicate[1:] = (raw[1:] == raw[:-1]).all(axis=1)
+    same_day = same.copy()
+    same_day[1:] &= day[1:] == day[:-1]
+
+    frame = pandas.DataFrame(
+        {
+            "product_id": product_ids,
+            "day": day,
+            "records": 1,
+            "duplicates": same & duplicate,
+            "out_of_order": same & (step < 0),
+            "crossed": _crossed(records)[order],
+            "bad_prices": _bad_prices(records)[order],
+            "max_gap": numpy.where(same_day, step, 0),
+        }
+    )
+    counts = frame.groupby(["product_id", "day"]).agg(
+        {
+            **{column: "sum" for column in COUNT_COLUMNS},
+            "max_gap": "max",
+        }
+    )
+
+    starts = numpy.flatnonzero(~same)
+    ends = numpy.append(starts[1:], len(records))[: len(starts)] - 1
+    return {
+        "counts": counts,
+        "first": _boundary(product_ids, ts_event, raw, starts),
+        "last": _boundary(product_ids, ts_event, raw, ends),
+    }
+
+
+def _boundary(
+    product_ids: numpy.ndarray,
+    ts_event: numpy.ndarray,
+    raw: numpy.ndarray,
+    positions: numpy.ndarray,
+) -> pandas.DataFrame:
+    return pandas.DataFrame(
+        {
+            "ts_event": ts_event[positions],
+            "raw": [row.tobytes() for row in raw[positions]],
+        },
+        index=pandas.Index(product_ids[positions], name="product_id"),
+    )
+
+
+def _scan_chunk(
+    shm_name: str,
+    count: int,
+    dtype: numpy.dtype,
+    first: bool,
+    options: Dict[str, Any],
+) -> Dict[str, pandas.DataFrame]:
+    """Worker task checking one chunk of records from shared memory."""
+    shm, records = dbtoys.utilities.convert.attach_chunk(shm_name, count, dtype)
+    try:
+        result = scan_records(records)
+        del records
+        return result
+    finally:
+        shm.close()
+
+
+def _stitch(
+    last: pandas.DataFrame, first: pandas.DataFrame
+) -> pandas.DataFrame:
+    """Check the first records of a chunk against the last records before
+    it.
+    :return: Counts by product_id and day of the first records.
+    """
+    joined = first.join(last, how="inner", rsuffix="_before")
+    day = joined["ts_event"] // DAY_NS
+    step = joined["ts_event"] - joined["ts_event_before"]
+    return pandas.DataFrame(
+        {
+            "day": day,
+            "records": 0,
+            "duplicates": (joined["raw"] == joined["raw_before"]).astype(int),
+            "out_of_order": (step < 0).astype(int),
+            "crossed": 0,
+            "bad_prices": 0,
+            "max_gap": step.where(
+                day == joined["ts_event_before"] // DAY_NS, 0
+            ),
+        }
+    ).set_index("day", append=True)
+
+
+def _missing_days(counts: pandas.DataFrame) -> pandas.DataFrame:
+    """Add empty rows for the weekdays between the first and last day of each
+    product without records."""
+    frames = [counts]
+    for product_id, days in counts.groupby(level="product_id"):
+        seen = days.index.get_level_values("day")
+        weekdays = pandas.bdate_range(
+            pandas.Timestamp(seen.min() * DAY_NS),
+            pandas.Timestamp(seen.max() * DAY_NS),
+        )
+        missing = numpy.setdiff1d(
+            (weekdays - pandas.Timestamp(0)) // pandas.Timedelta(days=1),
+            seen.to_numpy(numpy.int64),
+        )
+        if len(missing):
+            frames.append(
+                pandas.DataFrame(
+                    0,
+                    index=pandas.MultiIndex.from_product(
+                        [[product_id], missing], names=["product_id", "day"]
+                    ),
+                    columns=counts.columns,
+                )
+            )
+    return pandas.concat(frames)
+
+
+def _issues(
+    report: pandas.DataFrame, max_gap: Optional[float]
+) -> pandas.Series:
+    """Name the problems of each row of a report."""
+    flags = {
+        "missing": report["records"] == 0,
+        "duplicates": report["duplicates"] > 0,
+        "out_of_order": report["out_of_order"] > 0,
+        "crossed": report["crossed"] > 0,
+        "bad_prices": report["bad_prices"] > 0,
+    }
+    if max_gap is not None:
+        flags["gap"] = report["max_gap_s"] > max_gap
+    issues = pandas.Series("", index=report.index, dtype=object)
+    for name, flagged in flags.items():
+        issues = issues.where(~flagged, issues + "," + name)
+    return issues.str.lstrip(",")
+
+
+def expected_records(metadata_api: Any, metadata: Dict[str, Any]) -> int:
+    """Query the number of records of the request a DBZ file was made from.
+    :param metadata_api: The databento metadata API to query.
+    :param metadata: The DBZ metadata of the file.
+    :return: The record count, capped by the limit of the request.
+    """
+    rows, _ = metadata_api.get_shape(
+        dataset=metadata["dataset"],
+        symbols=metadata["symbols"],
+        stype_in=metadata["stype_in"],
+        schema=metadata["schema"],
+        start=pandas.Timestamp(metadata["start"], tz="UTC").isoformat(),
+        end=pandas.Timestamp(metadata["end"], tz="UTC").isoformat(),
+    )
+    if metadata.get("limit"):
+        return min(int(rows), int(metadata["limit"]))
+    return int(rows)
+
+
+def validate(
+    path: Union[str, Path],
+    metadata: Optional[Dict[str, Any]] = None,
+    metadata_api: Any = None,
+    max_gap: Optional[float] = None,
+    jobs: Optional[int] = None,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+    memory_budget: Optional[int] = None,
+) -> Validation:
+    """Check a DBZ file for gaps, duplicates, out of order timestamps,
+    crossed books and bad prices using a pool of worker processes.
+    :param path: The DBZ file to check.
+    :param metadata: The DBZ metadata; read from the file if not given.
+    :param metadata_api: If given, compare the record count with the shape
+        of the request from this databento metadata API.
+    :param max_gap: If given, flag gaps longer than this many seconds.
+    :param jobs: The number of worker processes; defaults to the CPU count.
+    :param chunk_bytes: The approximate size of each chunk.
+    :param memory_budget: If given, the bytes to hold records in.
+    :return: The report, a row per symbol and day, and the record counts.
+    """
+    if metadata is None:
+        metadata = dbtoys.utilities.dbz.read_metadata(path)
+    jobs = dbtoys.utilities.memory.jobs_within(
+        memory_budget, jobs or os.cpu_count() or 1, _COPIES_PER_JOB
+    )
+    chunk_bytes = dbtoys.utilities.memory.chunk_bytes_within(
+        memory_budget, chunk_bytes, jobs * _COPIES_PER_JOB
+    )
+    dtype = dbtoys.utilities.dbz.record_dtype(metadata["schema"])
+    size = dbtoys.utilities.dbz.chunk_size(dtype, chunk_bytes)
+    _LOG.debug("Validating %s with %s jobs in %s byte chunks", path, jobs, size)
+
+    parts = []
+    last = pandas.DataFrame(
+        {"ts_event": pandas.Series(dtype=numpy.int64), "raw": []},
+        index=pandas.Index([], name="product_id", dtype=numpy.uint32),
+    )
+    total = 0
+    for count, scanned in dbtoys.utilities.convert.map_chunks(
+        path, dtype, size, jobs, _scan_chunk, {}
+    ):
+        parts.append(scanned["counts"])
+        parts.append(_stitch(last, scanned["first"]))
+        last = pandas.concat([last, scanned["last"]])
+        last = last[~last.index.duplicated(keep="last")]
+        total += count
+
+    counts = (
+        pandas.concat(parts)
+        .groupby(level=["product_id", "day"])
+        .agg(
+            {
+                **{column: "sum" for column in COUNT_COLUMNS},
+                "max_gap": "max",
+            }
+        )
+    )
+    if len(counts):
+        counts = _missing_days(counts)
+    symbols = dbtoys.utilities.dbz.symbol_map(metadata)
+    product_ids = counts.index.get_level_values("product_id")
+    report = pandas.DataFrame(
+        {
+            "symbol": [symbols.get(int(p), str(p)) for p in product_ids],
+            "date": pandas.to_datetime(
+                counts.index.get_level_values("day").to_numpy() * DAY_NS
+            ).strftime("%Y-%m-%d"),
+            **{
+                column: counts[column].to_numpy(numpy.int64)
+                for column in COUNT_COLUMNS
+            },
+            "max_gap_s": counts["max_gap"].to_numpy() / 1e9,
+        }
+    )
+    report["issues"] = _issues(report, max_gap)
+    report = report.sort_values(["symbol", "date"], ignore_index=True)
+
+    expected = None
+    if metadata_api is not None:
+        expected = expected_records(metadata_api, metadata)
+    _LOG.debug("Validated %s records of %s, expected %s", total, path, expected)
+    return Validation(
+        path=str(path), records=total, expected=expected, report=report
+    )
@@ -0,0 +1,120 @@
+"""Utility module for rendering large tables with bounded memory.
+Column widths are measured from a sample of the first rows, then every row
+is formatted as it is needed, so output starts immediately and memory does
+not grow with the number of rows. The layout matches tabulate's simple
+format; cells wider than the sample are not truncated.
+"""
+import contextlib
+import itertools
+import numbers
+import subprocess
+from typing import Any
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+
+DEFAULT_SAMPLE_ROWS: int = 1000
+COLUMN_SEPARATOR: str = "  "
+# Headers are padded like tabulate pads them.
+HEADER_PADDING: int = 2
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def format_cell(value: Any, floatfmt: str = "g") -> str:
+    """Format a table cell.
+    :param value: The cell value.
+    :param floatfmt: The format of float values.
+    :return: The formatted cell.
+    """
+    if isinstance(value, float):
+        return format(value, floatfmt)
+    return "" if value is None else str(value)
+
+
+def window(
+    rows: Iterable[Any], offset: int = 0, limit: Optional[int] = None
+) -> Iterator[Any]:
+    """Select a window of rows without reading past its end.
+    :param rows: The rows.
+    :param offset: The number of rows to skip.
+    :param limit: If given, the maximum number of rows to keep.
+    :return: An iterator of the rows in the window.
+    """
+    return itertools.islice(
+        rows, offset, None if limit is None else offset + limit
+    )
+
+
+def stream_table(
+    rows: Iterable[Sequence[Any]],
+    headers: Sequence[str],
+    floatfmt: str = "g",
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+) -> Iterator[str]:
+    """Render a table one line at a time.
+    :param rows: The rows of the table; may be a lazy iterator.
+    :param headers: The column headers.
+    :param floatfmt: The format of float values.
+    :param sample_rows: The number of rows to measure column widths from.
+    :return: An iterator of lines without newlines.
+    """
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, sample_rows))
+    widths = [len(header) + HEADER_PADDING for header in headers]
+    numeric = [bool(sample) for _ in headers]
+    for row in sample:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(format_cell(value, floatfmt)))
+            numeric[i] = numeric[i] and (value is None or _is_number(value))
+
+    def render(cells: Sequence[str]) -> str:
+        return COLUMN_SEPARATOR.join(
+            cell.rjust(width) if is_numeric else cell.ljust(width)
+            for cell, width, is_numeric in zip(cells, widths, numeric)
+        ).rstrip()
+
+    yield render(list(headers))
+    yield COLUMN_SEPARATOR.join("-" * width for width in widths)
+    for row in itertools.chain(sample, rows):
+        yield render([format_cell(value, floatfmt) for value in row])
+
+
+def stream_sections(
+    sections: Iterable[Iterable[str]],
+) -> Iterator[str]:
+    """Join tables with a blank line between each of them.
+    :param sections: Iterables of lines.
+    :return: An iterator of lines.
+    """
+    for i, section in enumerate(sections):
+        if i:
+            yield ""
+        yield from section
+
+
+def page(lines: Iterable[str], pager: str, stdout: BinaryIO):
+    """Write lines to a pager as they are produced.
+    Closing the pager early stops consuming the lines.
+    :param lines: The lines to show.
+    :param pager: The pager command.
+    :param stdout: The stream the pager writes to.
+    """
+    with subprocess.Popen(  # nosec
+        pager, shell=True, stdin=subprocess.PIPE, stdout=stdout
+    ) as process:
+        try:
+            for line in lines:
+                process.stdin.write(  # type: ignore
+                    line.encode("utf-8", "replace") + b"\n"
+                )
+        except BrokenPipeError:
+            # The pager was closed before the end of the output.
+            pass
+        finally:
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.close()  # type: ignore
@@ -0,0 +1,754 @@
+"""Utility module for rolling analytics over batches of records.
+Windows end at each record and hold the records of its product within a
+duration, or the last count records. Batches are processed whole with
+numpy. Each product's records still inside its window are kept with running
+aggregates of the records before them, so a batch only computes its own
+records, and files and live feeds are computed the same way with work in
+proportion to the batch rather than the window:
+
+- Sums, such as volume and notional for VWAP, are differences of prefix
+  sums kept for each record.
+- Variances use the same prefix sums of returns shifted by the first return
+  of each product, which keeps the sums small as Welford's method does.
+- Minimums and maximums split each product's records into blocks the size
+  of a window, so a window spans at most two blocks and is the extreme of a
+  suffix of one and a prefix of the next; the batch equivalent of a
+  monotonic deque. Prefix extremes are kept as records arrive, and suffix
+  extremes once their block is complete.
+- Duration windows of a batch are found within the batch, and binary
+  searched for among the kept records only where they reach before it.
+"""
+import logging
+import re
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy
+import pandas
+
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+
+_LOG = logging.getLogger()
+
+DEFAULT_ANALYTICS_TS_FIELD: str = "ts_event"
+ANALYTICS_COLUMNS: Tuple[str, ...] = (
+    "count",
+    "volume",
+    "vwap",
+    "low",
+    "high",
+    "volatility",
+    "spread",
+)
+
+# The columns kept of each record, and the prefix sums before each record.
+_RECORD_COLUMNS: Tuple[str, ...] = (
+    "ts",
+    "block",
+    "price",
+    "low",
+    "high",
+    "low_suffix",
+    "high_suffix",
+)
+_SUM_COLUMNS: Tuple[str, ...] = (
+    "size",
+    "notional",
+    "returned",
+    "shifted",
+    "squares",
+    "quoted",
+    "spread",
+)
+
+# The state of each product, and its value before its first record.
+_PRODUCT_STATE: Dict[str, Any] = {
+    "price": numpy.nan,
+    "shift": numpy.nan,
+    "block": -1,
+    "block_first": 0,
+    "low": 0,
+    "high": 0,
+}
+
+# The fewest records a product's slab holds.
+_MIN_SLAB: int = 16
+
+
+class Window(NamedTuple):
+    """A rolling window of a duration in nanoseconds or a count of records."""
+
+    duration: Optional[int] = None
+    count: Optional[int] = None
+
+    @classmethod
+    def parse(cls, value: str) -> "Window":
+        """Parse a window such as 500 records, or a duration such as 5s.
+        :param value: A count of records or a pandas timedelta string.
+        :return: The window.
+        """
+        if re.fullmatch(r"\d+", value.strip()):
+            window = cls(count=int(value))
+        else:
+            window = cls(duration=pandas.Timedelta(value).value)
+        if (window.count or window.duration or 0) <= 0:
+            raise ValueError(f"Invalid window {value}")
+        return window
+
+
+def _fields(dtype: numpy.dtype) -> Tuple[str, str]:
+    """The price and size fields of a record type."""
+    names = dtype.names or ()
+    if "price" in names and "size" in names:
+        return "price", "size"
+    if "close" in names and "volume" in names:
+        return "close", "volume"
+    raise ValueError("Rolling analytics need records with prices and sizes")
+
+
+def _ranges(starts: numpy.ndarray, lengths: numpy.ndarray) -> numpy.ndarray:
+    """Concatenate the positions of ranges of the given starts and lengths."""
+    offsets = starts - numpy.cumsum(lengths) + lengths
+    return numpy.repeat(offsets, lengths) + numpy.arange(lengths.sum())
+
+
+def _segment_maximum(ranks: numpy.ndarray, segments: numpy.ndarray, scale: int):
+    """The running maximum of ranks below scale within increasing segments."""
+    offsets = segments * scale
+    return numpy.maximum.accumulate(offsets + ranks) - offsets
+
+
+def running_extremes(
+    values: numpy.ndarray, segments: numpy.ndarray
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """The running minimum and maximum of integers within segments.
+    :param values: The values.
+    :param segments: The segment of each value, increasing from zero.
+    :return: The minimums and the maximums.
+    """
+    if not len(values):
+        return values.copy(), values.copy()
+    # Accumulate ranks of the values offset by their segment, so each
+    # segment starts afresh.
+    count = int(segments[-1]) + 1
+    lowest = int(values.min())
+    scale = int(values.max()) - lowest + 1
+    levels = None
+    if count * scale < 2**62:
+        ranks = values - lowest
+    else:
+        levels, ranks = numpy.unique(values, return_inverse=True)
+        scale = len(levels)
+    highs = _segment_maximum(ranks, segments, scale)
+    lows = scale - 1 - _segment_maximum(scale - 1 - ranks, segments, scale)
+    if levels is None:
+        return lows + lowest, highs + lowest
+    return levels[lows], levels[highs]
+
+
+class _Slabs:
+    """Columns of the records each product still needs, in a slab of shared
+    arrays per product. Records are addressed by their sequence number
+    within their product, at base + sequence.
+
+    Batches write to the ends of their products' slabs, and records before
+    a product's first needed one are dropped by moving its first. A full
+    slab is compacted in place if it is at most half needed, and otherwise
+    moved to the tail of the arrays at twice its size; the arrays are
+    rebuilt when the tail reaches their end. Prefix sums are rebased when
+    moved, so they do not grow with the stream.
+    """
+
+    def __init__(self, dtypes: Dict[str, Any], prefixes: Tuple[str, ...]):
+        """
+        :param dtypes: The dtype of each column.
+        :param prefixes: The columns which hold prefix sums.
+        """
+        self.columns: Dict[str, numpy.ndarray] = {
+            name: numpy.zeros(_MIN_SLAB, dtype=dtype)
+            for name, dtype in dtypes.items()
+        }
+        self.totals: Dict[str, numpy.ndarray] = {
+            name: numpy.zeros(0) for name in prefixes
+        }
+        self.base = numpy.zeros(0, dtype=numpy.int64)
+        self.begin = numpy.zeros(0, dtype=numpy.int64)
+        self.capacity = numpy.zeros(0, dtype=numpy.int64)
+        self.first = numpy.zeros(0, dtype=numpy.int64)
+        self.end = numpy.zeros(0, dtype=numpy.int64)
+        self.tail = 0
+
+    def add(self, count: int):
+        """Add empty slabs for new products."""
+        for name in ("base", "begin", "capacity", "first", "end"):
+            setattr(
+                self,
+                name,
+                numpy.concatenate(
+                    [getattr(self, name), numpy.zeros(count, dtype=numpy.int64)]
+                ),
+            )
+        for name, totals in self.totals.items():
+            self.totals[name] = numpy.concatenate([totals, numpy.zeros(count)])
+
+    def reserve(self, products: numpy.ndarray, counts: numpy.ndarray):
+        """Make room at the end of the slabs of products.
+        :param products: Distinct products.
+        :param counts: The number of records to make room for in each.
+        """
+        full = (
+            self.base[products] + self.end[products] + counts
+            > self.begin[products] + self.capacity[products]
+        )
+        if not full.any():
+            return
+        moved = products[full]
+        needed = self.end[moved] - self.first[moved] + counts[full]
+        in_place = 2 * needed <= self.capacity[moved]
+        capacity = numpy.where(
+            in_place,
+            self.capacity[moved],
+            numpy.maximum(2 * needed, _MIN_SLAB),
+        )
+        grown = numpy.where(in_place, 0, capacity)
+        if self.tail + int(grown.sum()) > len(self.columns["ts"]):
+            extra = numpy.zeros(len(self.base), dtype=numpy.int64)
+            extra[products] = counts
+            self._rebuild(extra)
+            return
+        begin = numpy.where(
+            in_place, self.begin[moved], self.tail + numpy.cumsum(grown) - grown
+        )
+        self.tail += int(grown.sum())
+        self._move(moved, begin, capacity, self.columns)
+
+    def _rebuild(self, extra: numpy.ndarray):
+        """Move every slab into new arrays, twice the size of the slabs.
+        :param extra: The records to make room for in each slab.
+        """
+        products = numpy.arange(len(self.base))
+        needed = self.end - self.first + extra
+        capacity = numpy.maximum(2 * needed, _MIN_SLAB)
+        total = int(capacity.sum())
+        columns = {
+            name: numpy.zeros(2 * total, dtype=column.dtype)
+            for name, column in self.columns.items()
+        }
+        self._move(
+            products, numpy.cumsum(capacity) - capacity, capacity, columns
+        )
+        self.columns = columns
+        self.tail = total
+        _LOG.debug("Rebuilt rolling windows of %s records", 2 * total)
+
+    def _move(
+        self,
+        products: numpy.ndarray,
+        begin: numpy.ndarray,
+        capacity: numpy.ndarray,
+        columns: Dict[str, numpy.ndarray],
+    ):
+        """Move the needed records of slabs to the start of new slabs."""
+        first = self.first[products]
+        lengths = self.end[products] - first
+        source = _ranges(self.base[products] + first, lengths)
+        target = _ranges(begin, lengths)
+        held = lengths > 0
+        for name, column in self.columns.items():
+            values = column[source]
+            totals = self.totals.get(name)
+            if totals is not None:
+                # Rebase on the first needed record, or the total if none.
+                firsts = column[
+                    numpy.minimum(self.base[products] + first, len(column) - 1)
+                ]
+                bases = numpy.where(held, firsts, totals[products])
+                values -= numpy.repeat(bases, lengths)
+                totals[products] -= bases
+            columns[name][target] = values
+        self.base[products] = begin - first
+        self.begin[products] = begin
+        self.capacity[products] = capacity
+
+
+class RollingAnalytics:
+    """Rolling VWAP, range, volatility and spread of every product over
+    batches of records."""
+
+    def __init__(
+        self,
+        window: Window,
+        ts_field: str = DEFAULT_ANALYTICS_TS_FIELD,
+    ):
+        """
+        :param window: The window of every statistic.
+        :param ts_field: The timestamp field to order windows by.
+        """
+        self.window = window
+        self.ts_field = ts_field
+        self.records = 0
+        self._products: Dict[int, int] = {}
+        self._slabs = _Slabs(
+            {
+                **{name: numpy.int64 for name in _RECORD_COLUMNS},
+                **{name: numpy.float64 for name in _SUM_COLUMNS},
+            },
+            _SUM_COLUMNS,
+        )
+        self._state: Dict[str, numpy.ndarray] = {
+            name: numpy.zeros(0, dtype=numpy.asarray(value).dtype)
+            for name, value in _PRODUCT_STATE.items()
+        }
+
+    def _dense(self, product_ids: numpy.ndarray) -> numpy.ndarray:
+        """Number products from zero in order of appearance."""
+        ids = product_ids.tolist()
+        new = [
+            product_id for product_id in ids if product_id not in self._products
+        ]
+        if new:
+            for product_id in new:
+                self._products[product_id] = len(self._products)
+            self._slabs.add(len(new))
+            for name, value in _PRODUCT_STATE.items():
+                state = self._state[name]
+                self._state[name] = numpy.concatenate(
+                    [state, numpy.full(len(new), value, dtype=state.dtype)]
+                )
+        return numpy.array(
+            [self._products[product_id] for product_id in ids],
+            dtype=numpy.int64,
+        )
+
+    def update(self, records: numpy.ndarray) -> pandas.DataFrame:
+        """Compute the statistics of the windows ending at each record.
+        Records of each product must be in time order.
+        :param records: The next batch of records.
+        :return: The product_id, ts and ANALYTICS_COLUMNS of each record,
+            in the order of the batch. Volatility is the standard deviation
+            of log returns between records, and spread the mean top of book
+            spread, where the records have one.
+        """
+        price_field, size_field = _fields(records.dtype)
+        batch = {
+            "product_id": records["product_id"].astype(numpy.int64),
+            "ts": records[self.ts_field].astype(numpy.int64),
+        }
+        if not len(records):
+            return pandas.DataFrame(
+                {
+                    **batch,
+                    **{name: numpy.zeros(0) for name in ANALYTICS_COLUMNS},
+                }
+            )
+
+        scale = dbtoys.utilities.dbz.FIXED_PRICE_SCALE
+        order = self._order(batch["product_id"])
+        # Fields are gathered one by one; gathering records is much slower.
+        product_ids = batch["product_id"][order]
+        ts = batch["ts"][order]
+        price = records[price_field][order].astype(numpy.int64)
+        size = records[size_field][order].astype(float)
+        spread = self._spreads(records)[order] * scale
+
+        # Number the records of each product of the batch after its
+        # earlier records.
+        leading = numpy.ones(len(records), dtype=bool)
+        leading[1:] = product_ids[1:] != product_ids[:-1]
+        group_first = numpy.flatnonzero(leading)
+        counts = numpy.diff(numpy.append(group_first, len(records)))
+        group = numpy.cumsum(leading) - 1
+        last = group_first + counts - 1
+        products = self._dense(product_ids[group_first])
+        product = numpy.repeat(products, counts)
+        slabs = self._slabs
+        seq = numpy.arange(len(records)) + numpy.repeat(
+            slabs.end[products] - group_first, counts
+        )
+        slabs.reserve(products, counts)
+        base = numpy.repeat(slabs.base[products], counts)
+        columns = slabs.columns
+        position = base + seq
+
+        state = self._state
+        if self.window.count is not None:
+            blocks = seq // self.window.count
+        else:
+            blocks = ts // self.window.duration
+        prices = price.astype(float)
+        previous = numpy.empty(len(records))
+        previous[1:] = prices[:-1]
+        previous[group_first] = state["price"][products]
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            returns = numpy.log(prices / previous)
+        returned = numpy.isfinite(returns)
+        # Returns are shifted by each product's first return, which keeps
+        # their sums small as Welford's method does.
+        valid = numpy.flatnonzero(returned)
+        valid_groups, first_valid = numpy.unique(
+            group[valid], return_index=True
+        )
+        unset = numpy.isnan(state["shift"][products[valid_groups]])
+        state["shift"][products[valid_groups[unset]]] = returns[
+            valid[first_valid[unset]]
+        ]
+        shifted = numpy.where(returned, returns - state["shift"][product], 0.0)
+        quoted = numpy.isfinite(spread)
+        values = {
+            "size": size,
+            "notional": price * scale * size,
+            "returned": returned.astype(float),
+            "shifted": shifted,
+            "squares": shifted * shifted,
+            "quoted": quoted.astype(float),
+            "spread": numpy.where(quoted, spread, 0.0),
+        }
+        for name, value in values.items():
+            # Prefix sums before each record.
+            before = numpy.cumsum(value) - value
+            totals = slabs.totals[name]
+            columns[name][position] = before + numpy.repeat(
+                totals[products] - before[group_first], counts
+            )
+            totals[products] += numpy.add.reduceat(value, group_first)
+
+        columns["ts"][position] = ts
+        low, high = self._extremes(
+            price, blocks, seq, leading, counts, products, position
+        )
+        state["price"][products] = prices[last]
+
+        # Windows start at or after the window of each product's last
+        # record.
+        if self.window.count is not None:
+            first = numpy.maximum(seq - self.window.count + 1, 0)
+        else:
+            first = self._duration_starts(
+                group,
+                numpy.repeat(group_first, counts),
+                seq,
+                base,
+                ts,
+                numpy.repeat(slabs.first[products], counts),
+            )
+        start = base + first
+        slabs.first[products] = first[last]
+        slabs.end[products] += counts
+        self.records += len(records)
+
+        def total(name: str) -> numpy.ndarray:
+            return columns[name][position] + values[name] - columns[name][start]
+
+        spans = columns["block"][start] != blocks
+        low = numpy.where(
+            spans, numpy.minimum(columns["low_suffix"][start], low), low
+        )
+        high = numpy.where(
+            spans, numpy.maximum(columns["high_suffix"][start], high), high
+        )
+        volume = total("size")
+        count = total("returned")
+        sums = total("shifted")
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            variance = (total("squares") - sums * sums / count) / (count - 1)
+            statistics = {
+                "count": seq - first + 1,
+                "volume": volume,
+                "vwap": total("notional") / volume,
+                "low": low * scale,
+                "high": high * scale,
+                "volatility": numpy.sqrt(
+                    numpy.where(
+                        count > 1, numpy.maximum(variance, 0.0), numpy.nan
+                    )
+                ),
+                "spread": total("spread") / total("quoted"),
+            }
+        for name in ANALYTICS_COLUMNS:
+            batch[name] = numpy.empty(len(records), statistics[name].dtype)
+            batch[name][order] = statistics[name]
+        return pandas.DataFrame(batch)
+
+    def _extremes(
+        self,
+        price: numpy.ndarray,
+        blocks: numpy.ndarray,
+        seq: numpy.ndarray,
+        leading: numpy.ndarray,
+        counts: numpy.ndarray,
+        products: numpy.ndarray,
+        position: numpy.ndarray,
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Keep the extremes of each block of a batch ordered by product.
+        :param price: The price of each record.
+        :param blocks: The block of each record.
+        :param seq: The sequence number of each record.
+        :param leading: Which records are the first of their product.
+        :param counts: The number of records of each product.
+        :param products: Each product of the batch.
+        :param position: Where each record is kept.
+        :return: The minimum and maximum price of each record's block up to
+            the record.
+        """
+        columns = self._slabs.columns
+        state = self._state
+        group_first = numpy.flatnonzero(leading)
+        last = group_first + counts - 1
+        product = numpy.repeat(products, counts)
+        # Extremes of each block so far, continuing the block each product
+        # was in.
+        boundary = leading.copy()
+        boundary[1:] |= blocks[1:] != blocks[:-1]
+        segments = numpy.cumsum(boundary) - 1
+        low, high = running_extremes(price, segments)
+        continued = (
+            segments == numpy.repeat(segments[group_first], counts)
+        ) & (blocks == state["block"][product])
+        low = numpy.where(
+            continued, numpy.minimum(low, state["low"][product]), low
+        )
+        high = numpy.where(
+            continued, numpy.maximum(high, state["high"][product]), high
+        )
+        columns["block"][position] = blocks
+        columns["price"][position] = price
+        columns["low"][position] = low
+        columns["high"][position] = high
+
+        # Blocks are complete once a later block starts; keep the extremes
+        # of each of their records until their end.
+        segment_first = numpy.flatnonzero(boundary)[segments]
+        block_first = numpy.where(
+            continued[last],
+            state["block_first"][products],
+            seq[segment_first[last]],
+        )
+        lengths = block_first - state["block_first"][products]
+        if lengths.any():
+            done = _ranges(
+                self._slabs.base[products] + state["block_first"][products],
+                lengths,
+            )
+            ends = numpy.zeros(len(done), dtype=bool)
+            ends[numpy.cumsum(lengths)[lengths > 0] - 1] = True
+            done_blocks = columns["block"][done]
+            ends[:-1] |= done_blocks[1:] != done_blocks[:-1]
+            low_suffix, high_suffix = running_extremes(
+                columns["price"][done][::-1], numpy.cumsum(ends[::-1]) - 1
+            )
+            columns["low_suffix"][done] = low_suffix[::-1]
+            columns["high_suffix"][done] = high_suffix[::-1]
+        state["block"][products] = blocks[last]
+        state["block_first"][products] = block_first
+        state["low"][products] = low[last]
+        state["high"][products] = high[last]
+        return low, high
+
+    @staticmethod
+    def _order(product_ids: numpy.ndarray) -> numpy.ndarray:
+        """Order records by product, keeping their order within each."""
+        if len(product_ids) and product_ids.max() < 2**16:
+            # Small integers are radix sorted.
+            product_ids = product_ids.astype(numpy.uint16)
+        return numpy.argsort(product_ids, kind="stable")
+
+    @staticmethod
+    def _spreads(records: numpy.ndarray) -> numpy.ndarray:
+        """The top of book spread of records; NaN without a two sided book."""
+        if "bid_px_00" not in (records.dtype.names or ()):
+            return numpy.full(len(records), numpy.nan)
+        bid = records["bid_px_00"].astype(float)
+        ask = records["ask_px_00"].astype(float)
+        two_sided = (records["bid_sz_00"] > 0) & (records["ask_sz_00"] > 0)
+        return numpy.where(two_sided & (ask >= bid), ask - bid, numpy.nan)
+
+    def _duration_starts(
+        self,
+        group: numpy.ndarray,
+        leading: numpy.ndarray,
+        seq: numpy.ndarray,
+        base: numpy.ndarray,
+        ts: numpy.ndarray,
+        kept: numpy.ndarray,
+    ) -> numpy.ndarray:
+        """Find the first record after each record's time less the window.
+        Windows are searched for within the batch, and only those reaching
+        before it are binary searched for among the kept records.
+        :param group: The product of each record of the batch, from zero.
+        :param leading: The first record of each record's product in the
+            batch.
+        :param seq: The sequence number of each record of the batch.
+        :param base: The position of the first record of each product.
+        :param ts: The time of each record of the batch.
+        :param kept: The first kept record of each record's product.
+        :return: The sequence number of the first record of each window.
+        """
+        duration = self.window.duration
+        # Keys of product and time sort like the records; a window holds
+        # the records of its product after its end less the duration.
+        lowest = int(ts.min()) - duration
+        span = int(ts.max()) - lowest + 1
+        if (int(group[-1]) + 1) * span < 2**62:
+            keys = group * span + (ts - lowest)
+            bounds = keys - duration
+        else:
+            times = numpy.unique(ts)
+            span = len(times) + 1
+            keys = group * span + numpy.searchsorted(times, ts, side="right")
+            bounds = group * span + numpy.searchsorted(
+                times, ts - duration, side="right"
+            )
+        inside = numpy.searchsorted(keys, bounds, side="right")
+        first = seq[inside]
+
+        times = self._slabs.columns["ts"]
+        reaching = inside == leading
+        reaching[reaching] = (seq[leading[reaching]] > kept[reaching]) & (
+            times[base[reaching] + seq[leading[reaching]] - 1]
+            > ts[reaching] - duration
+        )
+        searching = numpy.flatnonzero(reaching)
+        low = kept[searching]
+        high = seq[leading[searching]] - 1
+        bound = ts[searching] - duration
+        while len(searching):
+            middle = (low + high) // 2
+            before = times[base[searching] + middle] <= bound
+            low = numpy.where(before, middle + 1, low)
+            high = numpy.where(before, high, middle)
+            first[searching] = low
+            narrowing = low < high
+            searching, low, high, bound = (
+                searching[narrowing],
+                low[narrowing],
+                high[narrowing],
+                bound[narrowing],
+            )
+        return first
+
+
+class VolumeProfile:
+    """The volume traded at each price of every product."""
+
+    def __init__(self, tick: Optional[float] = None):
+        """
+        :param tick: If given, round prices down to multiples of this.
+        """
+        self.tick = tick
+        self.volumes = pandas.Series(
+            dtype=float,
+            index=pandas.MultiIndex.from_arrays(
+                [[], []], names=["product_id", "price"]
+            ),
+        )
+
+    def update(self, records: numpy.ndarray):
+        """Add the volume of a batch of records.
+        :param records: The records.
+        """
+        price_field, size_field = _fields(records.dtype)
+        price = records[price_field] * dbtoys.utilities.dbz.FIXED_PRICE_SCALE
+        if self.tick:
+            price = numpy.floor(price / self.tick) * self.tick
+        batch = (
+            pandas.Series(records[size_field].astype(float))
+            .groupby([records["product_id"].astype(numpy.int64), price])
+            .sum()
+        )
+        batch.index.names = ["product_id", "price"]
+        self.volumes = self.volumes.add(batch, fill_value=0)
+
+    def profile(self) -> pandas.DataFrame:
+        """The volume profile.
+        :return: The product_id, price, volume and share of the product's
+            volume at each price.
+        """
+        frame = self.volumes.rename("volume").reset_index()
+        frame["share"] = frame["volume"] / frame.groupby("product_id")[
+            "volume"
+        ].transform("sum")
+        return frame.sort_values(["product_id", "price"], ignore_index=True)
+
+
+def analyze(
+    paths: Iterable[Union[str, Path]],
+    window: Window,
+    ts_field: str = DEFAULT_ANALYTICS_TS_FIELD,
+    output: Optional[Union[str, Path]] = None,
+    fmt: str = "csv",
+    tick: Optional[float] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+) -> Tuple[pandas.DataFrame, pandas.DataFrame]:
+    """Compute rolling analytics of DBZ files in a single pass.
+    :param paths: DBZ files of one schema, in time order.
+    :param window: The window of every statistic.
+    :param ts_field: The timestamp field to order windows by.
+    :param output: If given, write the statistics of every record here.
+    :param fmt: One of convert.KNOWN_FORMATS.
+    :param tick: If given, round volume profile prices down to multiples.
+    :param metadata: The DBZ metadata; read from each file if not given.
+    :param chunk_bytes: The approximate size of each batch.
+    :return: The latest statistics and the volume profile of each symbol.
+    """
+    if fmt not in dbtoys.utilities.convert.KNOWN_FORMATS:
+        raise ValueError(f"Unknown output format {fmt}")
+    analytics = RollingAnalytics(window, ts_field)
+    profile = VolumeProfile(tick)
+    symbols: Dict[int, str] = {}
+    latest = []
+    schema = None
+    output_file = open(output, "wb") if output is not None else None
+    try:
+        for path in paths:
+            file_metadata = metadata or dbtoys.utilities.dbz.read_metadata(path)
+            if schema is not None and file_metadata["schema"] != schema:
+                raise ValueError(
+                    "Files of different schemas cannot be analyzed"
+                )
+            schema = file_metadata["schema"]
+            symbols.update(dbtoys.utilities.dbz.symbol_map(file_metadata))
+            for records in dbtoys.utilities.dbz.iter_records(
+                path, schema, chunk_bytes
+            ):
+                frame = analytics.update(records)
+                profile.update(records)
+                frame.insert(0, "symbol", _symbols(frame, symbols))
+                frame = frame.rename(columns={"ts": ts_field})
+                if output_file is not None:
+                    output_file.write(
+                        dbtoys.utilities.convert.format_records(
+                            frame, fmt, header=not latest
+                        )
+                    )
+                latest.append(frame.drop_duplicates("product_id", keep="last"))
+    finally:
+        if output_file is not None:
+            output_file.close()
+    if schema is None:
+        raise ValueError("No files to analyze")
+    _LOG.debug("Analyzed %s records", analytics.records)
+
+    summary = (
+        pandas.concat(latest, ignore_index=True)
+        .drop_duplicates("product_id", keep="last")
+        .sort_values("symbol", ignore_index=True)
+    )
+    summary[ts_field] = pandas.to_datetime(summary[ts_field], utc=True)
+    volumes = profile.profile()
+    volumes.insert(0, "symbol", _symbols(volumes, symbols))
+    return summary, volumes
+
+
+def _symbols(frame: pandas.DataFrame, symbols: Dict[int, str]) -> pandas.Series:
+    """The symbol of each row, or its product_id without one."""
+    return (
+        frame["product_id"].map(symbols).fillna(frame["product_id"].astype(str))
+    )
@@ -0,0 +1,344 @@
+"""Utility module for previewing large data with reservoir samples.
+Local files are sampled in a single pass with Algorithm L, which draws the
+position of the next record to keep instead of a random number per record,
+so most chunks are skipped without being touched. Remote windows are split
+into time strata which are each downloaded from a random time with a record
+limit, so only enough data for the sample is fetched.
+"""
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+import numpy
+import pandas
+
+import dbtoys.utilities.convert
+import dbtoys.utilities.dbz
+
+_LOG = logging.getLogger()
+
+DEFAULT_SAMPLE_SIZE: int = 20
+DEFAULT_STRATA: int = 10
+DEFAULT_SAMPLE_WORKERS: int = 4
+
+# Remote windows are split into a stratum per sampled record, up to this
+# many, so few records are taken from each random time.
+MAX_STRATA: int = 100
+
+
+class Reservoir:
+    """A uniform random sample of a stream of record arrays."""
+
+    def __init__(
+        self,
+        size: int,
+        dtype: numpy.dtype,
+        rng: Optional[numpy.random.Generator] = None,
+    ):
+        """
+        :param size: The number of records to keep.
+        :param dtype: The record type.
+        :param rng: The random number generator to sample with.
+        """
+        if size < 1:
+            raise ValueError("A sample needs at least one record")
+        self.size = size
+        self.rng = rng or numpy.random.default_rng()
+        self.seen = 0
+        self._records = numpy.zeros(size, dtype=dtype)
+        self._positions = numpy.zeros(size, dtype=numpy.int64)
+        self._weight = 1.0
+        self._next = size
+
+    def _uniform(self) -> float:
+        # In (0, 1], so its logarithm is finite.
+        return 1.0 - self.rng.random()
+
+    def _skip(self):
+        """Draw the weight and position of the next record to keep."""
+        self._weight *= math.exp(math.log(self._uniform()) / self.size)
+        if self._weight >= 1.0:
+            self._next += 1
+            return
+        self._next += (
+            math.floor(math.log(self._uniform()) / math.log1p(-self._weight))
+            + 1
+        )
+
+    def add(self, records: numpy.ndarray):
+        """Offer the next records of the stream to the sample.
+        :param records: The records, in stream order.
+        """
+        start = self.seen
+        if start < self.size:
+            take = min(self.size - start, len(records))
+            self._records[start : start + take] = records[:take]
+            self._positions[start : start + take] = numpy.arange(
+                start, start + take
+            )
+            if start + take == self.size:
+                self._next = self.size - 1
+                self._skip()
+        while self._next < start + len(records):
+            slot = self.rng.integers(self.size)
+            self._records[slot] = records[self._next - start]
+            self._positions[slot] = self._next
+            self._skip()
+        self.seen += len(records)
+
+    @property
+    def records(self) -> numpy.ndarray:
+        """The sampled records in stream order."""
+        count = min(self.seen, self.size)
+        order = numpy.argsort(self._positions[:count], kind="stable")
+        return self._records[:count][order]
+
+
+class StratifiedReservoir:
+    """A reservoir sample of every product in a stream of record arrays."""
+
+    def __init__(
+        self,
+        size: int,
+        dtype: numpy.dtype,
+        rng: Optional[numpy.random.Generator] = None,
+    ):
+        """
+        :param size: The number of records to keep of each product.
+        :param dtype: The record type.
+        :param rng: The random number generator to sample with.
+        """
+        self.size = size
+        self.dtype = dtype
+        self.rng = rng or numpy.random.default_rng()
+        self.reservoirs: Dict[int, Reservoir] = {}
+
+    @property
+    def seen(self) -> int:
+        """The number of records offered to the sample."""
+        return sum(reservoir.seen for reservoir in self.reservoirs.values())
+
+    def add(self, records: numpy.ndarray):
+        """Offer the next records of the stream to the sample.
+        :param records: The records, in stream order.
+        """
+        order = numpy.argsort(records["product_id"], kind="stable")
+        product_ids, starts = numpy.unique(
+            records["product_id"][order], return_index=True
+        )
+        for product_id, group in zip(
+            product_ids.tolist(), numpy.split(order, starts[1:])
+        ):
+            reservoir = self.reservoirs.get(product_id)
+            if reservoir is None:
+                reservoir = Reservoir(self.size, self.dtype, self.rng)
+                self.reservoirs[product_id] = reservoir
+            reservoir.add(records[group])
+
+    @property
+    def records(self) -> numpy.ndarray:
+        """The sampled records, by product then stream order."""
+        if not self.reservoirs:
+            return numpy.zeros(0, dtype=self.dtype)
+        return numpy.concatenate(
+            [
+                self.reservoirs[product_id].records
+                for product_id in sorted(self.reservoirs)
+            ]
+        )
+
+
+def new_reservoir(
+    size: int,
+    dtype: numpy.dtype,
+    by_symbol: bool = False,
+    seed: Optional[int] = None,
+) -> Union[Reservoir, StratifiedReservoir]:
+    """Create a reservoir sample.
+    :param size: The number of records to keep, of each symbol if by_symbol.
+    :param dtype: The record type.
+    :param by_symbol: Sample each symbol separately.
+    :param seed: The seed of the random number generator.
+    :return: The empty sample.
+    """
+    rng = numpy.random.default_rng(seed)
+    if by_symbol:
+        return StratifiedReservoir(size, dtype, rng)
+    return Reservoir(size, dtype, rng)
+
+
+def sample_files(
+    paths: Iterable[Union[str, Path]],
+    size: int = DEFAULT_SAMPLE_SIZE,
+    by_symbol: bool = False,
+    seed: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    chunk_bytes: int = dbtoys.utilities.dbz.DEFAULT_CHUNK_BYTES,
+) -> pandas.DataFrame:
+    """Sample the records of DBZ files in a single pass.
+    :param paths: DBZ files of one schema.
+    :param size: The number of records to keep, of each symbol if by_symbol.
+    :param by_symbol: Sample each symbol separately.
+    :param seed: The seed of the random number generator.
+    :param metadata: The DBZ metadata; read from each file if not given.
+    :param chunk_bytes: The approximate size of each chunk.
+    :return: The sampled records.
+    """
+    reservoir = None
+    symbols: Dict[int, str] = {}
+    schema = None
+    for path in paths:
+        file_metadata = metadata or dbtoys.utilities.dbz.read_metadata(path)
+        if schema is not None and file_metadata["schema"] != schema:
+            raise ValueError("Files of different schemas cannot be sampled")
+        schema = file_metadata["schema"]
+        symbols.update(dbtoys.utilities.dbz.symbol_map(file_metadata))
+        if reservoir is None:
+            reservoir = new_reservoir(
+                size,
+                dbtoys.utilities.dbz.record_dtype(schema),
+                by_symbol=by_symbol,
+                seed=seed,
+            )
+        for records in dbtoys.utilities.dbz.iter_records(
+            path, schema, chunk_bytes
+        ):
+            reservoir.add(records)
+    if reservoir is None:
+        raise ValueError("No files to sample")
+    _LOG.debug(
+        "Sampled %s of %s records", len(reservoir.records), reservoir.seen
+    )
+    return preview(reservoir.records, symbols)
+
+
+def strata(start: Any, end: Any, count: int) -> List[pandas.Timestamp]:
+    """Split a window into strata of equal duration.
+    :param start: The start of the window.
+    :param end: The end of the window.
+    :param count: The number of strata.
+    :return: The bounds of the strata, one more than their count.
+    """
+    start = pandas.Timestamp(start)
+    end = pandas.Timestamp(end)
+    if end <= start:
+        raise ValueError("The end of the window must be after its start")
+    return list(pandas.date_range(start, end, periods=count + 1))
+
+
+def sample_window(
+    timeseries: Any,
+    dataset: str,
+    symbols: Sequence[str],
+    schema: str,
+    start: Any,
+    end: Any,
+    size: int = DEFAULT_SAMPLE_SIZE,
+    by_symbol: bool = False,
+    seed: Optional[int] = None,
+    count: int = DEFAULT_STRATA,
+    max_workers: int = DEFAULT_SAMPLE_WORKERS,
+) -> pandas.DataFrame:
+    """Sample a remote window stratified by time.
+    The window is split into at least count strata, and into one per
+    sampled record up to MAX_STRATA. Each stratum is downloaded
+    concurrently from a uniformly random time within it until its end,
+    limited to its share of the sample, so the records of a stratum are
+    the first ones after that time rather than the first ones of the
+    stratum. Records are thereby sampled uniformly in time within their
+    strata; records of busy moments are not more likely to be sampled.
+    :param timeseries: The databento timeseries API to stream from.
+    :param dataset: The dataset to sample.
+    :param symbols: The symbols to sample.
+    :param schema: The schema to sample.
+    :param start: The start of the window.
+    :param end: The end of the window.
+    :param size: The number of records to keep, of each symbol if by_symbol.
+    :param by_symbol: Sample each symbol of each stratum separately.
+    :param seed: The seed of the random number generator.
+    :param count: The least number of strata.
+    :param max_workers: The maximum number of concurrent downloads.
+    :return: The sampled records.
+    """
+    count = max(count, min(size, MAX_STRATA))
+    bounds = strata(start, end, count)
+    share = math.ceil(size / count)
+    limit = share * len(symbols) if by_symbol else share
+
+    def fetch(stratum_start, stratum_end):
+        return timeseries.stream(
+            dataset=dataset,
+            symbols=list(symbols),
+            schema=schema,
+            start=stratum_start.isoformat(),
+            end=stratum_end.isoformat(),
+            limit=limit,
+        )
+
+    rng = numpy.random.default_rng(seed)
+    dtype = dbtoys.utilities.dbz.record_dtype(schema)
+    offsets = rng.random(count)
+    samples = []
+    mappings: Dict[int, str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                fetch,
+                stratum_start + (stratum_end - stratum_start) * offset,
+                stratum_end,
+            )
+            for stratum_start, stratum_end, offset in zip(
+                bounds[:-1], bounds[1:], offsets
+            )
+        ]
+        for future in futures:
+            bento = future.result()
+            mappings.update(dbtoys.utilities.dbz.symbol_map(bento.metadata))
+            reservoir = (
+                StratifiedReservoir(share, dtype, rng)
+                if by_symbol
+                else Reservoir(share, dtype, rng)
+            )
+            reservoir.add(bento.to_ndarray())
+            samples.append(reservoir.records)
+    # Shares are rounded up, so the strata may hold more than the sample.
+    sample = (
+        StratifiedReservoir(size, dtype, rng)
+        if by_symbol
+        else Reservoir(size, dtype, rng)
+    )
+    sample.add(numpy.concatenate(samples))
+    records = sample.records
+    _LOG.debug(
+        "Sampled %s records of %s from %s strata", len(records), dataset, count
+    )
+    return preview(records, mappings)
+
+
+def preview(
+    records: numpy.ndarray, symbols: Dict[int, str]
+) -> pandas.DataFrame:
+    """Decode sampled records for display.
+    :param records: The sampled records.
+    :param symbols: A mapping of product_id to symbol.
+    :return: The records with prices as floats and timestamps as datetimes.
+    """
+    frame = dbtoys.utilities.convert.transform_records(
+        records, pretty_px=True, pretty_ts=True
+    )
+    frame.insert(
+        0,
+        "symbol",
+        frame["product_id"]
+        .map(symbols)
+        .fillna(frame["product_id"].astype(str)),
+    )
+    return frame
@@ -0,0 +1,166 @@
+"""Utility module for coalescing identical concurrent requests.
+While a request is in flight, identical requests wait for it and share its
+result or exception instead of being sent again. Results are not cached
+once the request completes, and shared results must not be mutated.
+"""
+import logging
+import threading
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+
+import pandas
+
+_LOG = logging.getLogger()
+
+# Only these client APIs are read only, so only they are coalesced.
+COALESCED_APIS: Tuple[str, ...] = ("metadata", "symbology")
+
+
+class _Call:
+    """A request in flight and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """A group of requests where identical keys share one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: Dict[str, int] = {
+            "requests": 0,
+            "executed": 0,
+            "coalesced": 0,
+        }
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Call a function unless a call with the same key is in flight,
+        in which case wait for that call and share its outcome.
+        :param key: The normalized key of the request.
+        :param func: The function making the request.
+        :return: The result of the request.
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executed"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            _LOG.debug("Coalescing request %s", key)
+            call.done.wait()
+        else:
+            try:
+                call.result = func()
+            except BaseException as exc:  # pylint: disable=broad-except
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """The request counters of this group.
+        :return: A mapping of counter name to value.
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+    def reset_stats(self):
+        """Reset the request counters of this group."""
+        with self._lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+def normalize(value: Any) -> Hashable:
+    """Normalize an argument into a hashable key component.
+    :param value: The argument value.
+    :return: A hashable equivalent of the value.
+    """
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, pandas.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "value") and isinstance(value.value, str):
+        # Enums are equivalent to their string values.
+        return value.value
+    return value
+
+
+def request_key(
+    api: str, method: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]
+) -> Hashable:
+    """Build the key identifying a client request.
+    :param api: The client API, such as metadata.
+    :param method: The method of the API.
+    :param args: The positional arguments.
+    :param kwargs: The keyword arguments.
+    :return: A hashable key.
+    """
+    return (
+        api,
+        method,
+        normalize(args),
+        tuple(sorted((k, normalize(v)) for k, v in kwargs.items())),
+    )
+
+
+class _SingleFlightAPI:
+    """A proxy of one client API which coalesces its method calls."""
+
+    def __init__(self, api: Any, name: str, group: SingleFlight):
+        self._api = api
+        self._name = name
+        self._group = group
+
+    def __getattr__(self, method: str) -> Any:
+        attr = getattr(self._api, method)
+        if method.startswith("_") or not callable(attr):
+            return attr
+
+        def coalesced(*args, **kwargs):
+            return self._group.do(
+                request_key(self._name, method, args, kwargs),
+                lambda: attr(*args, **kwargs),
+            )
+
+        return coalesced
+
+
+class SingleFlightClient:
+    """A proxy of a databento client which coalesces identical concurrent
+    requests to its read only APIs. Other APIs are passed through.
+    """
+
+    def __init__(self, client: Any, group: SingleFlight):
+        self._client = client
+        self._group = group
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name in COALESCED_APIS:
+            return _SingleFlightAPI(attr, name, self._group)
+        return attr
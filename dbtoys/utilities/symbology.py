@@ -0,0 +1,317 @@
+"""Utility module for resolving symbols to product IDs.
+Symbols may be product IDs, native tickers or smart symbols such as
+continuous contracts; their type is inferred from their form. Mappings are
+resolved in batches per symbol type and kept in a SQLite cache as intervals
+of dates, indexed by symbol and start date, so a symbol resolved once for a
+date range is answered locally for any range within it.
+"""
+import itertools
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Union
+
+import pandas
+from databento.common.enums import SType
+
+_LOG = logging.getLogger()
+
+DEFAULT_SYMBOLOGY_PATH: Path = Path.home() / ".dbtoys" / "symbology.db"
+# The API resolves at most this many symbols per request.
+DEFAULT_BATCH_SIZE: int = 2000
+# SQLite limits the number of parameters of a query.
+_QUERY_BATCH_SIZE: int = 500
+
+_SMART_SYMBOL = re.compile(r"^[A-Z0-9]+\.([cnv]\.\d+|FUT|OPT)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    dataset TEXT NOT NULL,
+    stype_in TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    PRIMARY KEY (dataset, stype_in, symbol, start_date)
+);
+CREATE TABLE IF NOT EXISTS resolved (
+    dataset TEXT NOT NULL,
+    stype_in TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resolved_by_symbol
+    ON resolved(dataset, stype_in, symbol, start_date, end_date);
+"""
+
+
+class SymbolInterval(NamedTuple):
+    """The product ID of a symbol from start_date until end_date."""
+
+    start_date: str
+    end_date: str
+    product_id: str
+
+
+def infer_stype(symbol: str) -> str:
+    """Infer the symbology type of a symbol from its form.
+    :param symbol: A product ID, native symbol or smart symbol.
+    :return: The stype of the symbol.
+    """
+    if symbol.isdigit():
+        return SType.PRODUCT_ID.value
+    if _SMART_SYMBOL.match(symbol):
+        return SType.SMART.value
+    return SType.NATIVE.value
+
+
+def date_range(start: Any, end: Any):
+    """The dates a time range resolves symbols over.
+    :param start: The start of the range.
+    :param end: The end of the range; defaults to one day after start.
+    :return: ISO 8601 start and exclusive end dates.
+    """
+    start_date = pandas.Timestamp(start).date()
+    end_date = pandas.Timestamp(end).date() if end is not None else start_date
+    if end_date <= start_date:
+        end_date = start_date + pandas.Timedelta(days=1)
+    return start_date.isoformat(), end_date.isoformat()
+
+
+def _batches(items: Sequence[str], size: int) -> Iterable[List[str]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class SymbologyCache:
+    """A cache of symbol to product ID intervals.
+    Each thread uses its own connection to the database.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_SYMBOLOGY_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def covered(
+        self,
+        dataset: str,
+        stype_in: str,
+        symbols: Sequence[str],
+        start_date: str,
+        end_date: str,
+    ) -> Set[str]:
+        """Find the symbols already resolved over a date range.
+        :param dataset: The dataset of the symbols.
+        :param stype_in: The symbology type of the symbols.
+        :param symbols: The symbols to look for.
+        :param start_date: The first date of the range.
+        :param end_date: The exclusive end date of the range.
+        :return: The symbols that need no request.
+        """
+        found: Set[str] = set()
+        for batch in _batches(symbols, _QUERY_BATCH_SIZE):
+            found.update(
+                row[0]
+                for row in self._connection().execute(
+                    "SELECT DISTINCT symbol FROM resolved "
+                    "WHERE dataset = ? AND stype_in = ? "
+                    f"AND symbol IN ({','.join('?' * len(batch))}) "
+                    "AND start_date <= ? AND end_date >= ?",
+                    (dataset, stype_in, *batch, start_date, end_date),
+                )
+            )
+        return found
+
+    def intervals(
+        self,
+        dataset: str,
+        stype_in: str,
+        symbols: Sequence[str],
+        start_date: str,
+        end_date: str,
+    ) -> Dict[str, List[SymbolInterval]]:
+        """Get the cached intervals of symbols overlapping a date range.
+        :param dataset: The dataset of the symbols.
+        :param stype_in: The symbology type of the symbols.
+        :param symbols: The symbols to look up.
+        :param start_date: The first date of the range.
+        :param end_date: The exclusive end date of the range.
+        :return: The intervals of each symbol, ordered by date.
+        """
+        result: Dict[str, List[SymbolInterval]] = {}
+        for batch in _batches(symbols, _QUERY_BATCH_SIZE):
+            for symbol, *interval in self._connection().execute(
+                "SELECT symbol, start_date, end_date, product_id "
+                "FROM mappings WHERE dataset = ? AND stype_in = ? "
+                f"AND symbol IN ({','.join('?' * len(batch))}) "
+                "AND start_date < ? AND end_date > ? "
+                "ORDER BY symbol, start_date",
+                (dataset, stype_in, *batch, end_date, start_date),
+            ):
+                result.setdefault(symbol, []).append(SymbolInterval(*interval))
+        return result
+
+    def add(
+        self,
+        dataset: str,
+        stype_in: str,
+        symbols: Iterable[str],
+        start_date: str,
+        end_date: str,
+        mappings: Dict[str, List[Dict[str, str]]],
+    ):
+        """Store the result of a resolution.
+        Symbols without mappings are stored as resolved too, so they are
+        not requested again.
+        :param dataset: The dataset of the symbols.
+        :param stype_in: The symbology type of the symbols.
+        :param symbols: The symbols that were requested.
+        :param start_date: The first date of the request.
+        :param end_date: The exclusive end date of the request.
+        :param mappings: Intervals by symbol, with d0, d1 and s keys.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO mappings VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        dataset,
+                        stype_in,
+                        symbol,
+                        interval["d0"],
+                        interval["d1"],
+                        interval["s"],
+                    )
+                    for symbol, intervals in mappings.items()
+                    for interval in intervals
+                    if interval["s"]
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO resolved VALUES (?, ?, ?, ?, ?)",
+                (
+                    (dataset, stype_in, symbol, start_date, end_date)
+                    for symbol in symbols
+                ),
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+def resolve(
+    client: Any,
+    dataset: str,
+    symbols: Iterable[str],
+    start: Any,
+    end: Any = None,
+    cache: Optional[SymbologyCache] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, List[SymbolInterval]]:
+    """Resolve symbols of any type to product ID intervals.
+    Only symbols missing from the cache are requested, in batches per type.
+    :param client: A databento historical client.
+    :param dataset: The dataset of the symbols.
+    :param symbols: Product IDs, native or smart symbols, possibly mixed.
+    :param start: The start of the time range.
+    :param end: The end of the time range.
+    :param cache: If given, the cache to read and store mappings in.
+    :param batch_size: The maximum number of symbols per request.
+    :return: The intervals of each symbol found.
+    """
+    start_date, end_date = date_range(start, end)
+    by_stype: Dict[str, List[str]] = {}
+    for symbol in dict.fromkeys(symbols):
+        by_stype.setdefault(infer_stype(symbol), []).append(symbol)
+
+    result: Dict[str, List[SymbolInterval]] = {}
+    for symbol in by_stype.pop(SType.PRODUCT_ID.value, []):
+        result[symbol] = [SymbolInterval(start_date, end_date, symbol)]
+
+    for stype_in, wanted in by_stype.items():
+        local: Set[str] = set()
+        if cache is not None:
+            local = cache.covered(
+                dataset, stype_in, wanted, start_date, end_date
+            )
+            result.update(
+                cache.intervals(
+                    dataset, stype_in, list(local), start_date, end_date
+                )
+            )
+        missing = [symbol for symbol in wanted if symbol not in local]
+        _LOG.debug(
+            "Resolving %s %s symbols, %s of them cached",
+            len(wanted),
+            stype_in,
+            len(local),
+        )
+        for batch in _batches(missing, batch_size):
+            response = client.symbology.resolve(
+                dataset=dataset,
+                symbols=batch,
+                stype_in=stype_in,
+                stype_out=SType.PRODUCT_ID.value,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            mappings = response.get("result", {})
+            if cache is not None:
+                cache.add(
+                    dataset, stype_in, batch, start_date, end_date, mappings
+                )
+            for symbol, intervals in mappings.items():
+                found = [
+                    SymbolInterval(x["d0"], x["d1"], x["s"])
+                    for x in intervals
+                    if x["s"]
+                ]
+                if found:
+                    result[symbol] = found
+    return result
+
+
+def product_ids(mappings: Dict[str, List[SymbolInterval]]) -> List[str]:
+    """Flatten resolved mappings into the product IDs they cover.
+    :param mappings: The intervals of each symbol.
+    :return: The distinct product IDs in order of first appearance.
+    """
+    return list(
+        dict.fromkeys(
+            interval.product_id
+            for intervals in mappings.values()
+            for interval in intervals
+        )
+    )
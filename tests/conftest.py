@@ -0,0 +1,51 @@
+"""Shared fixtures for dbtoys unit tests."""
+from pathlib import Path
+from typing import Callable
+from typing import List
+
+import numpy
+import pytest
+import zstandard
+
+# An empty zstd skippable frame stands in for the DBZ metadata header.
+EMPTY_METADATA_FRAME = b"P*M\x18" + (0).to_bytes(4, "little")
+
+
+def pytest_addoption(parser: pytest.Parser):
+    """Add the option which runs timing tests."""
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        help="run the timing tests marked benchmark",
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: List[pytest.Item]
+):
+    """Skip timing tests unless --benchmark is given, since their bounds
+    depend on the machine running them."""
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="timing test, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(name="write_dbz")
+def fixture_write_dbz(tmp_path: Path) -> Callable[..., Path]:
+    """A factory fixture for writing records to DBZ files.
+    The metadata header is left empty, so tests pass metadata explicitly.
+    """
+
+    def write_dbz(records: numpy.ndarray, name: str = "data.dbz") -> Path:
+        path = tmp_path / name
+        with open(path, "wb") as dbz_file:
+            dbz_file.write(EMPTY_METADATA_FRAME)
+            dbz_file.write(
+                zstandard.ZstdCompressor().compress(records.tobytes())
+            )
+        return path
+
+    return write_dbz
@@ -0,0 +1,136 @@
+"""Unit tests for utilities.asof"""
+import time
+from typing import Any
+from typing import Dict
+from unittest import mock
+
+import numpy
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import less_than
+
+from dbtoys.utilities.asof import AsofIndex
+from dbtoys.utilities.asof import asof
+from dbtoys.utilities.asof import index_paths
+from dbtoys.utilities.dbz import record_dtype
+
+START = 1_600_000_000_000_000_000
+PRODUCTS = 10_000
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a trades file with two mapped symbols."""
+    return {
+        "schema": "trades",
+        "mappings": {
+            "ESH1": [{"symbol": "5482"}],
+            "NQH1": [{"symbol": "6641"}],
+        },
+    }
+
+
+@pytest.fixture(name="trades")
+def fixture_trades() -> numpy.ndarray:
+    """Trades at random times for many products."""
+    rng = numpy.random.default_rng(0)
+    records = numpy.zeros(PRODUCTS * 20, dtype=record_dtype("trades"))
+    records["product_id"] = rng.integers(0, PRODUCTS, len(records))
+    records["product_id"][:2] = [5482, 6641]
+    records["ts_event"] = numpy.sort(
+        START + rng.integers(0, 10**12, len(records))
+    )
+    records["price"] = numpy.arange(len(records))
+    return records
+
+
+def brute_force(trades: numpy.ndarray, product_id: int, ts: int) -> int:
+    """The price of the latest trade of a product by a full scan."""
+    match = trades[
+        (trades["product_id"] == product_id) & (trades["ts_event"] <= ts)
+    ]
+    return int(match["price"][-1]) if len(match) else -1
+
+
+def test_asof_matches_scan(
+    write_dbz, trades: numpy.ndarray, metadata: Dict[str, Any]
+):
+    """As-of results match a full scan of the records."""
+    path = write_dbz(trades)
+    ts = START + 5 * 10**11
+    result = asof([path], ts, metadata=metadata)
+
+    rng = numpy.random.default_rng(1)
+    for product_id in rng.choice(PRODUCTS, 50):
+        expected = brute_force(trades, product_id, ts)
+        row = result[result["product_id"] == product_id]
+        assert_that(
+            int(row["price"].iloc[0]) if len(row) else -1, equal_to(expected)
+        )
+    assert_that(bool((result["ts_event"] <= ts).all()), equal_to(True))
+
+
+def test_asof_symbols(
+    write_dbz, trades: numpy.ndarray, metadata: Dict[str, Any]
+):
+    """Symbols are found by native symbol or product ID."""
+    path = write_dbz(trades)
+    result = asof(
+        [path], START + 10**12, symbols=["ESH1", "6641"], metadata=metadata
+    )
+    assert_that(list(result["symbol"]), equal_to(["ESH1", "NQH1"]))
+    assert_that(len(asof([path], START - 1, metadata=metadata)), equal_to(0))
+
+
+def test_asof_index_reused(
+    write_dbz, trades: numpy.ndarray, metadata: Dict[str, Any]
+):
+    """The index is kept next to the file and rebuilt when it is stale."""
+    path = write_dbz(trades)
+    AsofIndex.load(path, metadata=metadata)
+    for index_path in index_paths(path):
+        assert_that(index_path.exists(), equal_to(True))
+
+    index = AsofIndex.load(path)
+    assert_that(isinstance(index.records, numpy.memmap), equal_to(True))
+
+    write_dbz(trades[:10])
+    assert_that(
+        len(AsofIndex.load(path, metadata=metadata).records), equal_to(10)
+    )
+
+
+@pytest.mark.benchmark
+def test_asof_fast(write_dbz, trades: numpy.ndarray, metadata: Dict[str, Any]):
+    """A 10k symbol query over an index is answered quickly."""
+    index = AsofIndex.load(write_dbz(trades), metadata=metadata)
+    started = time.perf_counter()
+    positions = index.latest(numpy.arange(PRODUCTS), START + 5 * 10**11)
+    elapsed = time.perf_counter() - started
+
+    assert_that(len(positions), equal_to(PRODUCTS))
+    assert_that(elapsed, less_than(0.5))
+
+
+def test_asof_no_files():
+    """Searching no files is an error."""
+    with pytest.raises(ValueError):
+        asof([], START)
+
+
+def test_asof_mixed_schemas(
+    write_dbz, trades: numpy.ndarray, metadata: Dict[str, Any]
+):
+    """Files of different schemas are rejected before any is indexed."""
+    paths = [write_dbz(trades[:10], "a.dbz"), write_dbz(trades[:10], "b.dbz")]
+    with mock.patch(
+        "dbtoys.utilities.dbz.read_metadata",
+        side_effect=[metadata, {**metadata, "schema": "mbp-1"}],
+    ):
+        with pytest.raises(ValueError):
+            asof(paths, START)
+    for path in paths:
+        assert_that(index_paths(path).records.exists(), equal_to(False))
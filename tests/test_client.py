@@ -0,0 +1,110 @@
+"""Unit tests for utilities.client"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import has_entries
+from hamcrest import is_not
+from hamcrest import only_contains
+from hamcrest import same_instance
+
+from dbtoys.utilities.client import close_async_session
+from dbtoys.utilities.client import close_pool
+from dbtoys.utilities.client import configure_pool
+from dbtoys.utilities.client import get_async_session
+from dbtoys.utilities.client import get_historical_client
+from dbtoys.utilities.client import get_session
+
+
+@pytest.fixture(name="pool", autouse=True)
+def fixture_pool():
+    """Reset the process wide pool around every test."""
+    configure_pool(pool_size=4, timeout=(1.0, 2.0), compression=True)
+    yield
+    close_pool()
+
+
+def test_get_session_shared_between_threads():
+    """Every thread should share the same pooled session."""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        sessions = list(executor.map(lambda _: get_session(), range(32)))
+    assert_that(sessions, only_contains(same_instance(sessions[0])))
+
+
+def test_configure_pool_sizes_adapter():
+    """The connection pool size should be applied to the HTTP adapter."""
+    configure_pool(pool_size=7)
+    adapter = get_session().get_adapter("https://hist.databento.com")
+    assert_that(adapter.poolmanager.connection_pool_kw["maxsize"], equal_to(7))
+
+
+def test_configure_pool_compression():
+    """Disabling compression should request identity transfers."""
+    configure_pool(compression=False)
+    assert_that(
+        get_session().headers,
+        has_entries({"Accept-Encoding": "identity"}),
+    )
+
+
+def test_get_historical_client_cached():
+    """Clients with the same key should be shared."""
+    client = get_historical_client(key="UNITTEST")
+    assert_that(get_historical_client(key="UNITTEST"), same_instance(client))
+    assert_that(
+        get_historical_client(key="OTHER"), is_not(same_instance(client))
+    )
+
+
+def test_get_historical_client_uses_pool():
+    """Requests from a pooled client go through the shared session."""
+    client = get_historical_client(key="UNITTEST")
+    with mock.patch.object(get_session(), "request") as request:
+        response = request.return_value.__enter__.return_value
+        response.status_code = 200
+        response.json.return_value = ["GLBX.MDP3"]
+
+        result = client.metadata.list_datasets()
+
+    assert_that(result, equal_to(["GLBX.MDP3"]))
+    request.assert_called_once()
+    assert_that(request.call_args.kwargs, has_entries({"timeout": (1.0, 2.0)}))
+
+
+def test_get_async_session_per_loop():
+    """Each event loop should have exactly one pooled aiohttp session."""
+
+    async def get_twice():
+        first = get_async_session()
+        second = get_async_session()
+        await close_async_session()
+        return first, second
+
+    first, second = asyncio.run(get_twice())
+    other, _ = asyncio.run(get_twice())
+    assert_that(first, same_instance(second))
+    assert_that(other, is_not(same_instance(first)))
+
+
+def test_close_pool_closes_async_sessions():
+    """Closing the pool closes the aiohttp sessions of open and closed
+    loops."""
+
+    async def get():
+        return get_async_session()
+
+    loop = asyncio.new_event_loop()
+    try:
+        idle = loop.run_until_complete(get())
+        finished = asyncio.run(get())
+        assert_that(idle.closed or finished.closed, equal_to(False))
+        close_pool()
+        assert_that(idle.closed, equal_to(True))
+        assert_that(finished.closed, equal_to(True))
+    finally:
+        loop.close()
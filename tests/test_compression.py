@@ -0,0 +1,122 @@
+"""Unit tests for utilities.compression"""
+import io
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import greater_than
+
+from dbtoys.utilities.compression import archive_sample
+from dbtoys.utilities.compression import benchmark
+from dbtoys.utilities.compression import load_dictionary
+from dbtoys.utilities.compression import open_reader
+from dbtoys.utilities.compression import open_writer
+from dbtoys.utilities.compression import save_dictionary
+from dbtoys.utilities.compression import symbol_samples
+from dbtoys.utilities.compression import train_dictionary
+from dbtoys.utilities.convert import convert
+from dbtoys.utilities.dbz import record_dtype
+
+PRODUCTS = 200
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a trades file without mappings."""
+    return {"schema": "trades", "mappings": {}}
+
+
+@pytest.fixture(name="trades")
+def fixture_trades() -> numpy.ndarray:
+    """Trades records of many products."""
+    rng = numpy.random.default_rng(0)
+    records = numpy.zeros(PRODUCTS * 100, dtype=record_dtype("trades"))
+    records["product_id"] = numpy.tile(numpy.arange(PRODUCTS), 100)
+    records["ts_event"] = 1_600_000_000_000_000_000 + numpy.cumsum(
+        rng.integers(1, 1_000_000, len(records))
+    )
+    records["ts_recv"] = records["ts_event"] + rng.integers(
+        0, 5000, len(records)
+    )
+    records["price"] = (
+        4_000_000_000_000 + rng.integers(-50, 50, len(records)) * 250_000_000
+    )
+    records["size"] = rng.integers(1, 10, len(records))
+    records["action"] = b"T"
+    records["side"] = rng.choice([b"A", b"B"], len(records))
+    return records
+
+
+@pytest.mark.parametrize("threads", [pytest.param(0), pytest.param(2)])
+def test_writer_round_trip(tmp_path: Path, threads: int):
+    """Compressed output decompresses to what was written."""
+    data = b"ESH1,1,2,3\n" * 100_000
+    path = tmp_path / "data.csv.zst"
+    with open_writer(path, "zstd", level=9, threads=threads) as writer:
+        writer.write(data)
+
+    with open_reader(path) as reader:
+        assert_that(reader.read(), equal_to(data))
+    assert_that(len(data), greater_than(path.stat().st_size * 10))
+
+
+def test_writer_invalid():
+    """Unknown compressions and levels are rejected."""
+    with pytest.raises(ValueError):
+        open_writer("unused", "lz4")
+    with pytest.raises(ValueError):
+        benchmark([b"data"], levels=[99])
+
+
+def test_archive_sample_limit(write_dbz, trades: numpy.ndarray):
+    """Archive samples stop at the limit, on a record boundary."""
+    path = write_dbz(trades)
+    assert_that(archive_sample(path, "trades"), equal_to(trades.tobytes()))
+
+    limit = 100 * trades.itemsize + 1
+    sample = archive_sample(path, "trades", limit=limit)
+    assert_that(sample, equal_to(trades[:100].tobytes()))
+
+
+def test_dictionary_small_files(
+    write_dbz, tmp_path: Path, trades: numpy.ndarray
+):
+    """A trained dictionary improves the ratio of per-symbol samples."""
+    samples = symbol_samples(write_dbz(trades), "trades", sample_size=512)
+    assert_that(len(samples), greater_than(PRODUCTS))
+
+    path = tmp_path / "trades.zdict"
+    save_dictionary(train_dictionary(samples, dict_size=16 * 1024), path)
+    dictionary = load_dictionary(path)
+
+    (plain,) = benchmark(samples, levels=[3])
+    (trained,) = benchmark(samples, levels=[3], dictionary=dictionary)
+    assert_that(trained.ratio, greater_than(plain.ratio))
+
+
+def test_convert_compressed(
+    write_dbz,
+    tmp_path: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+):
+    """Converted output can be compressed with zstd."""
+    output = tmp_path / "trades.csv.zst"
+    convert(
+        write_dbz(trades),
+        output,
+        jobs=1,
+        metadata=metadata,
+        compression="zstd",
+        level=1,
+    )
+    with open_reader(output) as reader:
+        result = pandas.read_csv(io.BytesIO(reader.read()))
+    assert_that(len(result), equal_to(len(trades)))
@@ -0,0 +1,138 @@
+"""Unit tests for utilities.convert"""
+import json
+from io import StringIO
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import only_contains
+
+from dbtoys.utilities.convert import convert
+from dbtoys.utilities.dbz import iter_records
+from dbtoys.utilities.dbz import record_dtype
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a trades file with two mapped symbols."""
+    return {
+        "schema": "trades",
+        "mappings": {
+            "ESH1": [{"symbol": "5482"}],
+            "NQH1": [{"symbol": "6641"}],
+        },
+    }
+
+
+@pytest.fixture(name="trades")
+def fixture_trades() -> numpy.ndarray:
+    """Trades records alternating between two products."""
+    records = numpy.zeros(1000, dtype=record_dtype("trades"))
+    records["product_id"] = numpy.where(numpy.arange(1000) % 2, 5482, 6641)
+    records["ts_event"] = numpy.arange(1000) + 1_600_000_000_000_000_000
+    records["price"] = numpy.arange(1000) * 250_000_000
+    records["size"] = 1
+    records["action"] = b"T"
+    records["side"] = b"B"
+    return records
+
+
+def test_iter_records(write_dbz, trades: numpy.ndarray):
+    """Records are read back in record aligned chunks."""
+    path = write_dbz(trades)
+    chunks = list(iter_records(path, "trades", chunk_bytes=1000))
+    assert_that(
+        [len(c) for c in chunks[:-1]],
+        only_contains(1000 // trades.dtype.itemsize),
+    )
+    assert_that(
+        numpy.array_equal(numpy.concatenate(chunks), trades), equal_to(True)
+    )
+
+
+@pytest.mark.parametrize("jobs", [pytest.param(1), pytest.param(3)])
+def test_convert_csv_in_order(
+    write_dbz,
+    tmp_path: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+    jobs: int,
+):
+    """Chunks converted by workers are reassembled in input order."""
+    output = tmp_path / "trades.csv"
+    total = convert(
+        write_dbz(trades),
+        output,
+        fmt="csv",
+        pretty_px=True,
+        jobs=jobs,
+        chunk_bytes=4096,
+        metadata=metadata,
+    )
+
+    result = pandas.read_csv(output)
+    assert_that(total, equal_to(len(trades)))
+    assert_that(len(result), equal_to(len(trades)))
+    assert_that(list(result["ts_event"]), equal_to(list(trades["ts_event"])))
+    assert_that(result["price"].iloc[4], equal_to(1.0))
+    assert_that(set(result["symbol"]), equal_to({"ESH1", "NQH1"}))
+
+
+def test_convert_json_symbols(
+    write_dbz,
+    tmp_path: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+):
+    """Only records of the requested symbols are written."""
+    output = tmp_path / "trades.json"
+    convert(
+        write_dbz(trades),
+        output,
+        fmt="json",
+        symbols=["ESH1"],
+        jobs=2,
+        chunk_bytes=4096,
+        metadata=metadata,
+    )
+
+    with open(output, encoding="utf-8") as json_file:
+        rows = [json.loads(line) for line in json_file]
+    assert_that(len(rows), equal_to(len(trades) // 2))
+    assert_that([r["symbol"] for r in rows], only_contains("ESH1"))
+
+
+def test_convert_empty(
+    write_dbz,
+    tmp_path: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+):
+    """An empty file converts to a CSV with only a header."""
+    output = tmp_path / "empty.csv"
+    total = convert(write_dbz(trades[:0]), output, jobs=1, metadata=metadata)
+    assert_that(total, equal_to(0))
+    assert_that(len(pandas.read_csv(StringIO(output.read_text()))), equal_to(0))
+
+
+def test_convert_within_memory_budget(
+    write_dbz,
+    tmp_path: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+):
+    """A budget smaller than a chunk per worker still converts everything."""
+    path = write_dbz(trades)
+    expected = tmp_path / "expected.csv"
+    convert(path, expected, jobs=3, metadata=metadata)
+    output = tmp_path / "budget.csv"
+    total = convert(path, output, jobs=3, metadata=metadata, memory_budget=1024)
+    assert_that(total, equal_to(len(trades)))
+    assert_that(output.read_bytes(), equal_to(expected.read_bytes()))
@@ -0,0 +1,124 @@
+"""Unit tests for utilities.coordination"""
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import none
+from hamcrest import not_none
+
+from dbtoys.utilities.coordination import Coordinator
+from dbtoys.utilities.coordination import WorkUnit
+
+WORKERS = 4
+UNITS = 200
+
+
+def units(count: int) -> List[WorkUnit]:
+    """Units of one symbol over consecutive days."""
+    first = datetime.date(2022, 1, 1)
+    return [
+        WorkUnit("GLBX.MDP3", "trades", "ES/H2", first + datetime.timedelta(i))
+        for i in range(count)
+    ]
+
+
+def run_worker(root: Path, owner: str) -> int:
+    """Work through every unit from another process, logging each run."""
+    completed = 0
+    with Coordinator(root, owner=owner) as coordinator:
+        while True:
+            pending = coordinator.pending(units(UNITS))
+            if not pending:
+                return completed
+            lease = coordinator.claim_next(pending)
+            if lease is None:
+                time.sleep(0.01)
+                continue
+            with open(root / "runs.log", "a", encoding="utf-8") as log:
+                log.write(f"{lease.unit.key}\n")
+            completed += coordinator.complete(lease, owner=owner)
+
+
+def test_claim_is_exclusive(tmp_path: Path):
+    """A leased unit cannot be claimed until it is released, and a done unit
+    cannot be claimed at all."""
+    first = Coordinator(tmp_path, owner="first")
+    second = Coordinator(tmp_path, owner="second")
+    unit = units(1)[0]
+    assert_that(unit.key, equal_to("GLBX.MDP3%2Ftrades%2FES%2FH2%2F2022-01-01"))
+
+    lease = first.claim(unit)
+    assert_that(lease, not_none())
+    assert_that(second.claim(unit), none())
+
+    first.release(lease)
+    retry = second.claim(unit)
+    assert_that(retry.generation, equal_to(2))
+    assert_that(first.holds(lease), equal_to(False))
+    assert_that(second.complete(retry, path="a.dbz"), equal_to(True))
+
+    assert_that(first.claim(unit), none())
+    assert_that(first.done(unit)["path"], equal_to("a.dbz"))
+    assert_that(first.pending(units(2)), equal_to(units(2)[1:]))
+    assert_that(os.listdir(tmp_path / "leases"), equal_to([]))
+
+
+def test_lease_expiry(tmp_path: Path):
+    """A lease without heartbeats is taken over, and only one completion of
+    its unit is recorded."""
+    first = Coordinator(tmp_path, ttl=0.2, owner="first")
+    second = Coordinator(tmp_path, ttl=0.2, owner="second")
+    unit = units(1)[0]
+    lease = first.claim(unit)
+    time.sleep(0.3)
+
+    takeover = second.claim(unit)
+    assert_that(takeover.generation, equal_to(2))
+    assert_that(first.renew(lease), equal_to(False))
+    assert_that(second.complete(takeover), equal_to(True))
+    assert_that(first.complete(lease), equal_to(False))
+    assert_that(first.done(unit)["owner"], equal_to("second"))
+
+    with pytest.raises(ValueError):
+        Coordinator(tmp_path, ttl=0)
+
+
+def test_heartbeat(tmp_path: Path):
+    """Heartbeats keep a lease past its time to live until the holder
+    exits."""
+    unit = units(1)[0]
+    other = Coordinator(tmp_path, ttl=0.5, owner="other")
+    with Coordinator(tmp_path, ttl=0.5, owner="holder") as holder:
+        lease = holder.claim(unit)
+        time.sleep(1.0)
+        assert_that(other.claim(unit), none())
+        assert_that(holder.holds(lease), equal_to(True))
+    assert_that(other.claim(unit), not_none())
+
+
+def test_workers_complete_units_once(tmp_path: Path):
+    """Processes share the units, completing and running each exactly
+    once."""
+    with ProcessPoolExecutor(max_workers=WORKERS) as executor:
+        completed = list(
+            executor.map(
+                run_worker,
+                [tmp_path] * WORKERS,
+                [f"worker{i}" for i in range(WORKERS)],
+            )
+        )
+    assert_that(sum(completed), equal_to(UNITS))
+    runs = (tmp_path / "runs.log").read_text().splitlines()
+    assert_that(
+        sorted(runs), equal_to(sorted(unit.key for unit in units(UNITS)))
+    )
+    coordinator = Coordinator(tmp_path)
+    assert_that(coordinator.pending(units(UNITS)), equal_to([]))
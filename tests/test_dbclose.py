@@ -0,0 +1,206 @@
+"""Unit tests for dbclose"""
+import shutil
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import contains_exactly
+from hamcrest import equal_to
+from hamcrest import less_than
+
+from dbtoys.dbclose.adjustments import adjust_closes
+from dbtoys.dbclose.adjustments import load_actions
+from dbtoys.dbclose.app import fetch_closes
+from dbtoys.dbclose.app import read_closes
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.symbology import SymbologyCache
+
+DAY = 24 * 60 * 60 * 10**9
+
+
+@pytest.fixture(name="closes")
+def fixture_closes() -> pandas.DataFrame:
+    """Four days of closes for AAPL and MSFT."""
+    return pandas.DataFrame(
+        {
+            "AAPL": [400.0, 100.0, 101.0, 102.0],
+            "MSFT": [50.0, 50.0, 49.0, 50.0],
+        },
+        index=pandas.date_range("2022-01-03", periods=4),
+    )
+
+
+def actions(*rows) -> pandas.DataFrame:
+    """A table of corporate actions."""
+    return pandas.DataFrame(
+        rows, columns=["symbol", "ex_date", "action", "value"]
+    ).assign(ex_date=lambda frame: pandas.to_datetime(frame["ex_date"]))
+
+
+def test_adjust_splits(closes: pandas.DataFrame):
+    """Closes before a split are divided by its ratio."""
+    adjusted = adjust_closes(
+        closes, actions(["AAPL", "2022-01-04", "split", 4.0]), "splits"
+    )
+    assert_that(
+        list(adjusted["AAPL"]), contains_exactly(100.0, 100.0, 101.0, 102.0)
+    )
+    assert_that(list(adjusted["MSFT"]), equal_to(list(closes["MSFT"])))
+
+
+def test_adjust_total(closes: pandas.DataFrame):
+    """Dividends scale earlier closes by one less the yield and compound with
+    splits."""
+    table = actions(
+        ["AAPL", "2022-01-04", "split", 4.0],
+        ["MSFT", "2022-01-05", "dividend", 1.0],
+        ["MSFT", "2022-01-06", "dividend", 0.49],
+    )
+    adjusted = adjust_closes(closes, table, "total")
+    assert_that(adjusted["AAPL"].iloc[0], equal_to(100.0))
+    numpy.testing.assert_allclose(
+        adjusted["MSFT"], [50.0 * 0.98 * 0.99, 50.0 * 0.98 * 0.99, 48.51, 50.0]
+    )
+
+
+def test_adjust_splits_ignores_dividends(closes: pandas.DataFrame):
+    """Only splits adjust closes with --adjust splits, and nothing with
+    none."""
+    table = actions(["MSFT", "2022-01-05", "dividend", 1.0])
+    assert_that(
+        adjust_closes(closes, table, "splits").equals(closes), equal_to(True)
+    )
+    assert_that(
+        adjust_closes(closes, table, "none").equals(closes), equal_to(True)
+    )
+
+
+def test_adjust_ignores_unmatched_actions(closes: pandas.DataFrame):
+    """Actions of other symbols or before the first close are ignored."""
+    table = actions(
+        ["TSLA", "2022-01-04", "split", 3.0],
+        ["AAPL", "2022-01-03", "split", 2.0],
+        ["AAPL", "2021-06-01", "dividend", 1.0],
+    )
+    assert_that(
+        adjust_closes(closes, table, "total").equals(closes), equal_to(True)
+    )
+
+
+def test_adjust_unknown():
+    """An unknown adjustment is an error."""
+    with pytest.raises(ValueError):
+        adjust_closes(pandas.DataFrame(), actions(), "dividends")
+
+
+def test_load_actions(tmp_path: Path):
+    """Actions are loaded from CSV and validated."""
+    path = tmp_path / "actions.csv"
+    path.write_text(
+        "symbol,ex_date,action,value\nAAPL,2022-01-04,split,4\n"
+        "MSFT,2022-01-05,dividend,0.62\n"
+    )
+    loaded = load_actions(path)
+    assert_that(list(loaded["value"]), contains_exactly(4.0, 0.62))
+    assert_that(
+        loaded["ex_date"].iloc[1], equal_to(pandas.Timestamp("2022-01-05"))
+    )
+
+    path.write_text("symbol,ex_date,action,value\nAAPL,2022-01-04,merger,1\n")
+    with pytest.raises(ValueError):
+        load_actions(path)
+    path.write_text("symbol,action\nAAPL,split\n")
+    with pytest.raises(ValueError):
+        load_actions(path)
+
+
+def test_read_closes(write_dbz):
+    """Daily bars are read into a matrix of closes by date and symbol."""
+    records = numpy.zeros(3, dtype=record_dtype("ohlcv-1d"))
+    records["product_id"] = [1, 2, 1]
+    records["ts_event"] = [DAY * 19000, DAY * 19000, DAY * 19001]
+    records["close"] = [400 * 10**9, 50 * 10**9, 101 * 10**9]
+    metadata = {"mappings": {"AAPL": [{"symbol": "1"}]}}
+
+    closes = read_closes(write_dbz(records), metadata=metadata)
+    assert_that(list(closes.columns), contains_exactly("2", "AAPL"))
+    assert_that(list(closes["AAPL"]), contains_exactly(400.0, 101.0))
+    assert_that(closes.index[1].date().isoformat(), equal_to("2022-01-09"))
+
+
+def test_fetch_closes_cached(tmp_path: Path, write_dbz):
+    """Symbols resolve through the symbology cache, and closes are named by
+    the symbol each product was on each date."""
+    records = numpy.zeros(3, dtype=record_dtype("ohlcv-1d"))
+    records["product_id"] = [1, 2, 2]
+    records["ts_event"] = [DAY * 19000, DAY * 19000, DAY * 19001]
+    records["close"] = [400 * 10**9, 50 * 10**9, 51 * 10**9]
+    written = write_dbz(records)
+    client = mock.MagicMock()
+    client.timeseries.stream.side_effect = lambda path, **_: shutil.copy(
+        written, path
+    )
+    client.symbology.resolve.return_value = {
+        "result": {
+            "AAPL": [{"d0": "2022-01-08", "d1": "2022-01-10", "s": "1"}],
+            "MSFT": [{"d0": "2022-01-09", "d1": "2022-01-10", "s": "2"}],
+        }
+    }
+    cache = SymbologyCache(tmp_path / "symbology.db")
+
+    for _ in range(2):
+        closes = fetch_closes(
+            client,
+            "XNAS.ITCH",
+            ["AAPL", "MSFT"],
+            "2022-01-08",
+            "2022-01-09",
+            cache,
+        )
+    client.symbology.resolve.assert_called_once()
+    kwargs = client.timeseries.stream.call_args.kwargs
+    assert_that(kwargs["symbols"], equal_to(["1", "2"]))
+    assert_that(kwargs["stype_in"], equal_to("product_id"))
+    assert_that(list(closes.columns), contains_exactly("AAPL", "MSFT"))
+    # Product 2 was not MSFT on the first date.
+    assert_that(closes["MSFT"].isna().tolist(), equal_to([True, False]))
+
+    client.symbology.resolve.return_value = {"result": {}}
+    with pytest.raises(ValueError):
+        fetch_closes(
+            client, "XNAS.ITCH", ["TSLA"], "2022-01-08", "2022-01-09", cache
+        )
+
+
+@pytest.mark.benchmark
+def test_adjust_fast():
+    """Years of closes for thousands of symbols adjust well under a second."""
+    rng = numpy.random.default_rng(0)
+    symbols = [f"S{i}" for i in range(2000)]
+    dates = pandas.bdate_range("2018-01-01", periods=1000)
+    closes = pandas.DataFrame(
+        rng.uniform(10, 100, (len(dates), len(symbols))),
+        index=dates,
+        columns=symbols,
+    )
+    count = 20_000
+    table = pandas.DataFrame(
+        {
+            "symbol": rng.choice(symbols, count),
+            "ex_date": rng.choice(dates, count),
+            "action": rng.choice(["split", "dividend"], count),
+            "value": rng.uniform(0.1, 2.0, count),
+        }
+    )
+    started = time.perf_counter()
+    adjusted = adjust_closes(closes, table, "total")
+    elapsed = time.perf_counter() - started
+
+    assert_that(adjusted.shape, equal_to(closes.shape))
+    assert_that(elapsed, less_than(1.0))
@@ -1,5 +1,10 @@
 """Unit tests for dbexplore"""
+import contextlib
 import json
+import pstats
+import sqlite3
+import subprocess
+import sys
 from io import StringIO
 from pathlib import Path
 from typing import Any
@@ -12,6 +17,7 @@ from typing import Union
 from unittest import mock
 
 import humanize
+import numpy
 import pytest
 from databento.historical.error import BentoClientError
 from databento.historical.error import BentoHttpError
@@ -19,12 +25,22 @@ from databento.historical.error import BentoServerError
 
 # pyright: reportPrivateImportUsage=false
 from hamcrest import assert_that
+from hamcrest import contains_string
 from hamcrest import empty
 from hamcrest import equal_to
 from hamcrest import has_item
+from hamcrest import is_not
 from hamcrest import string_contains_in_order
 
 from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.app import main
+from dbtoys.dbexplore.plugins import discover
+from dbtoys.dbexplore.plugins import load
+from dbtoys.utilities.client import get_session
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.jobs import JobQueue
+from dbtoys.utilities.ledger import Ledger
+from dbtoys.utilities.symbology import SymbologyCache
 
 TEST_DATA_PATH: Path = Path("tests", "test_dbexplore")
 
@@ -153,8 +169,8 @@ def test_command_bentoexception(
 @pytest.mark.parametrize(
     "args, result",
     [
-        pytest.param(["GLBX.MDP3", "ESH1", "trades", "json"], 1024),
-        pytest.param(["XNAS.ITCH", "*", "mbo", "dbz"], 892374),
+        pytest.param(["GLBX.MDP3", "ESH1", "trades"], 1024),
+        pytest.param(["XNAS.ITCH", "*", "mbo"], 892374),
     ],
 )
 def test_get_billable_size(
@@ -245,6 +261,36 @@ def test_get_shape(
     )
 
 
+@pytest.mark.parametrize(
+    "command, args, response",
+    [
+        pytest.param("get_billable_size", ["XNAS.ITCH", "MSFT", "mbo"], 1024),
+        pytest.param("get_cost", ["XNAS.ITCH", "MSFT", "tbbo"], 1.5),
+        pytest.param("get_shape", ["GLBX.MDP3", "ESH1", "trades"], [2, 11]),
+        pytest.param("list_compressions", [], ["zstd"]),
+        pytest.param("list_datasets", ["-s", "2022-06-01"], ["XNAS.ITCH"]),
+        pytest.param("list_encodings", [], ["dbz"]),
+        pytest.param("list_fields", ["GLBX.MDP3", "trades", "dbz"], {}),
+        pytest.param("list_schemas", ["XNAS.ITCH", "-e", "2022-06-10"], []),
+        pytest.param("list_unit_prices", ["XNAS.ITCH"], {}),
+    ],
+)
+def test_command_pinned_client(
+    mock_stdout: StringIO, command: str, args: Iterable[str], response: Any
+):
+    """Every metadata command calls the pinned databento client with
+    arguments it accepts."""
+    app = DataBentoExplorer(api_key="db-UNITTEST", stdout=mock_stdout)
+    with mock.patch.object(get_session(), "request") as request:
+        result = request.return_value.__enter__.return_value
+        result.status_code = 200
+        result.json.return_value = response
+
+        app.onecmd(" ".join([command, *args]))
+
+    assert_that(request.call_args.kwargs["url"], contains_string(f".{command}"))
+
+
 @pytest.mark.parametrize(
     "command,args",
     [
@@ -319,6 +365,32 @@ def test_list_fields(
                     )
 
 
+def test_list_fields_encoding_headers(dbexplore: DataBentoExplorer):
+    """Without an encoding, one header precedes the schemas of each."""
+    fields = {"ts_event": "uint64_t", "price": "int64_t"}
+    call_command_and_assert(
+        dbexplore,
+        command="list_fields",
+        args=["GLBX.MDP3", "trades"],
+        return_value={
+            "GLBX.MDP3": {
+                "dbz": {"trades": fields, "tbbo": fields},
+                "csv": {"trades": fields, "tbbo": fields},
+            }
+        },
+    )
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(output.count("fields ---"), equal_to(2))
+    assert_that(
+        output,
+        string_contains_in_order(
+            "--- dbz fields ---\n\n", "price", "price", "--- csv fields ---"
+        ),
+    )
+
+
 @pytest.mark.parametrize("command", [pytest.param("list_unit_prices")])
 @pytest.mark.parametrize(
     "args",
@@ -355,3 +427,528 @@ def test_list_unit_prices(
                     string_contains_in_order(schema, f"{unit_price:.2f}", "\n")
                 ),
             )
+
+
+@pytest.mark.parametrize(
+    "args, costs",
+    [
+        pytest.param(
+            ["GLBX.MDP3", "ESH1", "ohlcv-1h"],
+            {"ohlcv-1h": 5.0, "ohlcv-1m": 1.0, "ohlcv-1s": 9.0},
+        ),
+        pytest.param(
+            ["XNAS.ITCH", "AAPL,MSFT", "ohlcv-1d"],
+            {"ohlcv-1d": 0.5, "trades": 0.25, "mbo": 75.0},
+        ),
+    ],
+)
+def test_plan(
+    dbexplore: DataBentoExplorer,
+    args: List[str],
+    costs: Dict[str, float],
+):
+    """Test plan ranking candidate schemas from cheapest to most expensive.
+    Schemas without an explicit cost are priced above every other option.
+    """
+    metadata = dbexplore.historical_client.metadata
+    metadata.list_unit_prices.return_value = {"historical-streaming": {}}
+    metadata.get_cost.side_effect = lambda **kw: costs.get(kw["schema"], 1e6)
+    metadata.get_billable_size.return_value = 1024
+
+    dbexplore.onecmd(" ".join(["plan", *args]))
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.readlines()
+    ranked = sorted(costs, key=costs.get)
+    assert_that(
+        "".join(output),
+        string_contains_in_order(*(f"{s} " for s in ranked)),
+    )
+
+
+@pytest.mark.parametrize(
+    "bento_exception",
+    [
+        pytest.param(BentoClientError),
+        pytest.param(BentoServerError),
+        pytest.param(BentoHttpError),
+    ],
+)
+def test_plan_bentoexception(
+    dbexplore: DataBentoExplorer,
+    bento_exception: Type,
+):
+    """Tests that plan handles BentoExceptions from any parallel request."""
+    metadata = dbexplore.historical_client.metadata
+    metadata.get_cost.side_effect = bento_exception
+
+    dbexplore.onecmd("plan GLBX.MDP3 ESH1 trades")
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.readlines()
+    assert_that(output, empty())
+
+
+def test_request_stats(dbexplore: DataBentoExplorer):
+    """Test request_stats counting metadata requests."""
+    call_command(dbexplore, command="list_schemas", args=["XNAS.ITCH"])
+    dbexplore.onecmd("request_stats")
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(output, string_contains_in_order("requests", "1"))
+    assert_that(output, string_contains_in_order("coalesced", "0"))
+
+
+def test_ledger(tmp_path: Path, dbexplore: DataBentoExplorer):
+    """Test get_cost recording an estimate reported by ledger."""
+    dbexplore.ledger = Ledger(tmp_path / "ledger.db", user="unittest")
+    call_command(
+        dbexplore,
+        command="get_cost",
+        args=["GLBX.MDP3", "ESH1", "trades"],
+        return_value=12.5,
+    )
+    dbexplore.onecmd("ledger spend --by user")
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(output, string_contains_in_order("unittest", "12.50"))
+
+
+def test_ledger_plan(tmp_path: Path, dbexplore: DataBentoExplorer):
+    """Test plan recording its candidates apart from estimates."""
+    dbexplore.ledger = Ledger(tmp_path / "ledger.db", user="unittest")
+    metadata = dbexplore.historical_client.metadata
+    metadata.list_unit_prices.return_value = {"historical-streaming": {}}
+    metadata.get_cost.return_value = 12.5
+    metadata.get_billable_size.return_value = 1024
+
+    dbexplore.onecmd("plan GLBX.MDP3 ESH1 ohlcv-1m")
+
+    assert_that(
+        dbexplore.ledger.spend_by("user"),
+        equal_to([("unittest", 0.0, 0.0, 0.0)]),
+    )
+    assert_that(dbexplore.ledger.top_symbols(kind="plan"), is_not(empty()))
+
+
+def test_ledger_shape_without_record_type(
+    tmp_path: Path, dbexplore: DataBentoExplorer
+):
+    """Test get_shape of a schema without a DBZ record type recording
+    nothing rather than failing."""
+    dbexplore.ledger = Ledger(tmp_path / "ledger.db", user="unittest")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        call_command(
+            dbexplore,
+            command="get_shape",
+            args=["GLBX.MDP3", "ESH1", "statistics"],
+            return_value=(10, 4),
+        )
+    perror.assert_not_called()
+    dbexplore.stdout.seek(0)
+    assert_that(dbexplore.stdout.read(), string_contains_in_order("10", "4"))
+    assert_that(dbexplore.ledger.top_symbols(kind="shape"), empty())
+
+
+def test_ledger_not_configured(dbexplore: DataBentoExplorer):
+    """Test ledger reporting an error without a ledger."""
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("ledger symbols")
+    perror.assert_called_once()
+
+
+def test_main_without_stores():
+    """The explorer runs without the stores it cannot open."""
+    failure = sqlite3.OperationalError("attempt to write a readonly database")
+    with contextlib.ExitStack() as stack:
+        for store in (Ledger, SymbologyCache, JobQueue):
+            stack.enter_context(
+                mock.patch.object(store, "__init__", side_effect=failure)
+            )
+        stack.enter_context(
+            mock.patch(
+                "dbtoys.utilities.key.get_api_key", return_value="UNITTEST"
+            )
+        )
+        assert_that(main(cantrip=["help"]), equal_to(0))
+
+
+def test_list_unit_prices_window(dbexplore: DataBentoExplorer):
+    """Test list_unit_prices showing a window of each table."""
+    prices = {f"schema{i}": float(i) for i in range(10)}
+    call_command(
+        dbexplore,
+        command="list_unit_prices",
+        args=["GLBX.MDP3", "historical", "--offset", "2", "--limit", "3"],
+        return_value={"historical": prices},
+    )
+
+    dbexplore.stdout.seek(0)
+    rows = dbexplore.stdout.readlines()[2:]
+    assert_that(
+        [row.split()[0] for row in rows],
+        equal_to(["schema2", "schema3", "schema4"]),
+    )
+
+
+def test_plugins_discovered():
+    """Test the data commands being discovered from dbtoys.plugins."""
+    plugins = discover()
+    assert_that(
+        plugins["convert"].target,
+        equal_to("dbtoys.dbexplore.commands.export:ExportCommands"),
+    )
+    assert_that(plugins["convert"].category, equal_to("Data Commands"))
+    assert_that(
+        plugins["estimate_cost"].category, equal_to("Planning Commands")
+    )
+    with pytest.raises(TypeError):
+        load("dbtoys.dbexplore.app:log_command")
+
+
+def test_plugin_loaded_on_first_use(dbexplore: DataBentoExplorer):
+    """Test a plugin command set being registered when first used."""
+    assert_that(hasattr(dbexplore, "do_convert"), equal_to(False))
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("convert missing.dbz missing.csv")
+    perror.assert_called_once()
+    assert_that(hasattr(dbexplore, "do_export"), equal_to(True))
+
+    dbexplore.onecmd("plugins")
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(output, string_contains_in_order("convert", "True"))
+    assert_that(hasattr(dbexplore, "do_validate"), equal_to(False))
+
+
+def test_plugin_commands_listed(dbexplore: DataBentoExplorer):
+    """Test help and completion listing plugin commands without loading
+    them.
+    """
+    dbexplore.onecmd("help")
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(
+        output,
+        string_contains_in_order(
+            "Data Commands", "convert", "Planning Commands", "estimate_cost"
+        ),
+    )
+    assert_that(output, is_not(contains_string("Undocumented")))
+    assert_that(
+        dbexplore.complete_help_command("est", "help est", 5, 8),
+        equal_to(["estimate_cost"]),
+    )
+    assert_that(hasattr(dbexplore, "do_convert"), equal_to(False))
+    assert_that(hasattr(dbexplore, "do_estimate_cost"), equal_to(False))
+
+
+def test_plugin_not_imported_at_startup():
+    """Test the heavy data modules not being imported by the application."""
+    modules = (
+        "dbtoys.dbexplore.commands.analytics",
+        "dbtoys.dbexplore.commands.asof",
+        "dbtoys.dbexplore.commands.compression",
+        "dbtoys.dbexplore.commands.estimate",
+        "dbtoys.dbexplore.commands.export",
+        "dbtoys.dbexplore.commands.jobs",
+        "dbtoys.dbexplore.commands.quality",
+        "dbtoys.dbexplore.commands.sampling",
+        "dbtoys.dbexplore.estimator",
+        "dbtoys.utilities.compression",
+        "dbtoys.utilities.convert",
+        "dbtoys.utilities.dbz",
+        "dbtoys.utilities.jobs",
+        "dbtoys.utilities.memory",
+        "dbtoys.utilities.parquet",
+        "dbtoys.utilities.profiling",
+        "dbtoys.utilities.quality",
+        "dbtoys.utilities.rolling",
+    )
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; import dbtoys.dbexplore.app; "
+            f"print([m for m in {modules!r} if m in sys.modules])",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert_that(result.stdout.strip(), equal_to("[]"))
+
+
+def test_get_cost_mixed_symbols(dbexplore: DataBentoExplorer):
+    """Test get_cost resolving mixed symbol types to product IDs."""
+    dbexplore.historical_client.symbology.resolve.return_value = {
+        "result": {
+            "ESH1": [{"d0": "2022-01-01", "d1": "2022-02-01", "s": "5482"}]
+        }
+    }
+    call_command(
+        dbexplore,
+        command="get_cost",
+        args=["GLBX.MDP3", "ESH1,6641", "trades", "--start", "2022-01-10"],
+        return_value=1.0,
+    )
+    kwargs = dbexplore.historical_client.metadata.get_cost.call_args.kwargs
+    assert_that(kwargs["symbols"], equal_to(["6641", "5482"]))
+    assert_that(kwargs["stype_in"], equal_to("product_id"))
+
+
+def test_get_cost_cached_symbols(tmp_path: Path, dbexplore: DataBentoExplorer):
+    """Test get_cost resolving symbols of one type through the symbology
+    cache once."""
+    dbexplore.symbology = SymbologyCache(tmp_path / "symbology.db")
+    dbexplore.historical_client.symbology.resolve.return_value = {
+        "result": {
+            "ESH1": [{"d0": "2022-01-01", "d1": "2022-02-01", "s": "5482"}]
+        }
+    }
+    for _ in range(2):
+        call_command(
+            dbexplore,
+            command="get_cost",
+            args=["GLBX.MDP3", "ESH1", "trades", "--start", "2022-01-10"],
+            return_value=1.0,
+        )
+    dbexplore.historical_client.symbology.resolve.assert_called_once()
+    kwargs = dbexplore.historical_client.metadata.get_cost.call_args.kwargs
+    assert_that(kwargs["symbols"], equal_to(["5482"]))
+    assert_that(kwargs["stype_in"], equal_to("product_id"))
+
+
+def test_get_cost_unresolved_symbols(dbexplore: DataBentoExplorer):
+    """Test get_cost failing on mixed symbols which do not resolve."""
+    dbexplore.historical_client.symbology.resolve.return_value = {"result": {}}
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("get_cost GLBX.MDP3 ESH1,6641 trades -s 2022-01-10")
+    assert_that(perror.call_args.args[0], contains_string("ESH1"))
+    assert_that(perror.call_args.args[0], is_not(contains_string("6641")))
+    dbexplore.historical_client.metadata.get_cost.assert_not_called()
+
+
+def test_profile_setting(
+    monkeypatch, tmp_path: Path, dbexplore: DataBentoExplorer
+):
+    """Test commands printing a profile summary while profile is on."""
+    monkeypatch.setattr(
+        "dbtoys.utilities.profiling.DEFAULT_PROFILE_PATH", tmp_path
+    )
+    dbexplore.onecmd("set profile on")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("request_stats")
+    assert_that(
+        perror.call_args.args[0],
+        string_contains_in_order("function", "Profile written to"),
+    )
+    assert_that(len(list(tmp_path.glob("request_stats-*"))), equal_to(2))
+    # Whether the command is among the hottest functions depends on timing.
+    (profile,) = tmp_path.glob("request_stats-*.pstats")
+    functions = pstats.Stats(str(profile)).stats  # type: ignore
+    assert_that(
+        [name for _, _, name in functions], has_item("do_request_stats")
+    )
+
+    dbexplore.onecmd("set profile off")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("request_stats")
+    perror.assert_not_called()
+
+
+def test_memory_settings(dbexplore: DataBentoExplorer):
+    """Test commands reporting peak memory and the memory budget setting."""
+    dbexplore.onecmd("set memory on")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("request_stats")
+    assert_that(
+        perror.call_args.args[0],
+        string_contains_in_order("Memory:", "peak allocated", "peak RSS"),
+    )
+
+    dbexplore.onecmd("set memory_budget 512M")
+    assert_that(dbexplore.memory_budget, equal_to(512 * 1024 * 1024))
+    dbexplore.onecmd("set memory_budget off")
+    assert_that(dbexplore.memory_budget, equal_to(None))
+
+
+def test_jobs(tmp_path: Path, dbexplore: DataBentoExplorer, mock_stdout):
+    """Test submitting, cancelling and listing download jobs."""
+    dbexplore.job_queue = JobQueue(tmp_path / "jobs.db")
+    dbexplore.onecmd(
+        "jobs submit GLBX.MDP3 ESH2,NQH2 trades -s 2022-01-03 -e 2022-01-06 "
+        f"--root {tmp_path}"
+    )
+    dbexplore.onecmd("jobs cancel 1")
+    dbexplore.onecmd("jobs list --state cancelled")
+    output = mock_stdout.getvalue()
+    assert_that(
+        output,
+        string_contains_in_order(
+            "Submitted job 1",
+            "Job 1 cancelled",
+            "GLBX.MDP3",
+            "cancelled",
+            "0/3",
+        ),
+    )
+
+
+def test_estimate_cost(tmp_path: Path, dbexplore: DataBentoExplorer):
+    """Test estimate_cost pricing scenarios from the ledger, caching the
+    unit prices and verifying the cheapest against get_cost."""
+    dbexplore.ledger = Ledger(tmp_path / "ledger.db", user="unittest")
+    dbexplore.ledger.record(
+        "billable_size",
+        "GLBX.MDP3",
+        "trades",
+        ["ESH1"],
+        start="2022-01-01",
+        end="2022-01-02",
+        size=2_000_000_000,
+    )
+    metadata = dbexplore.historical_client.metadata
+    metadata.list_unit_prices.return_value = {
+        "historical-streaming": {"trades": 10.0}
+    }
+    metadata.get_cost.return_value = 21.0
+
+    for _ in range(2):
+        dbexplore.onecmd(
+            "estimate_cost GLBX.MDP3 -y ESH1 -w 2022-02-01/2022-02-03 "
+            "--verify 1"
+        )
+    metadata.list_unit_prices.assert_called_once()
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(
+        output,
+        string_contains_in_order("ESH1", "trades", "4.0 GB", "40.00", "21.00"),
+    )
+
+
+def test_validate(write_dbz, dbexplore: DataBentoExplorer):
+    """Test validate reporting issues and a truncated download as a table
+    and as JSON."""
+    trades = numpy.zeros(3, dtype=record_dtype("trades"))
+    trades["product_id"] = 5482
+    trades["ts_event"] = [3, 1, 2]
+    trades["price"] = [1, 0, 1]
+    path = write_dbz(trades)
+    metadata = {
+        "dataset": "GLBX.MDP3",
+        "schema": "trades",
+        "symbols": ["ESH1"],
+        "stype_in": "native",
+        "start": 0,
+        "end": 10,
+        "limit": None,
+        "mappings": {"ESH1": [{"symbol": "5482"}]},
+    }
+    dbexplore.historical_client.metadata.get_shape.return_value = (4, 15)
+
+    with mock.patch(
+        "dbtoys.utilities.dbz.read_metadata", return_value=metadata
+    ):
+        dbexplore.onecmd(f"validate {path} --jobs 1")
+        dbexplore.onecmd(f"validate {path} --jobs 1 --json --offline")
+
+    dbexplore.stdout.seek(0)
+    output = dbexplore.stdout.read()
+    assert_that(
+        output,
+        string_contains_in_order(
+            "3 records, 4 expected from get_shape, TRUNCATED",
+            "ESH1",
+            "1970-01-01",
+            "out_of_order,bad_prices",
+        ),
+    )
+    report = json.loads(output[output.index("[") :])
+    assert_that(report[0]["expected"], equal_to(None))
+    assert_that(report[0]["report"][0]["out_of_order"], equal_to(1))
+
+
+def test_sample(write_dbz, dbexplore: DataBentoExplorer):
+    """Test sample previewing a file, and needing a window for a dataset."""
+    trades = numpy.zeros(100, dtype=record_dtype("trades"))
+    trades["product_id"] = 5482
+    trades["price"] = numpy.arange(100) * 10**9
+    path = write_dbz(trades)
+    metadata = {"schema": "trades", "mappings": {"ESH1": [{"symbol": "5482"}]}}
+
+    with mock.patch(
+        "dbtoys.utilities.dbz.read_metadata", return_value=metadata
+    ):
+        dbexplore.onecmd(f"sample {path} -n 5 --seed 0")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("sample --dataset GLBX.MDP3 --symbols ESH1")
+    perror.assert_called_once()
+
+    dbexplore.stdout.seek(0)
+    rows = dbexplore.stdout.readlines()
+    assert_that(rows[0].split()[:2], equal_to(["symbol", "publisher_id"]))
+    assert_that(len(rows), equal_to(7))
+    assert_that(rows[2].split()[0], equal_to("ESH1"))
+
+
+def test_join_quotes(tmp_path: Path, write_dbz, dbexplore: DataBentoExplorer):
+    """Test join_quotes writing trades enriched with the prevailing quote."""
+    trades = numpy.zeros(2, dtype=record_dtype("trades"))
+    trades["ts_recv"] = [1, 3]
+    quotes = numpy.zeros(1, dtype=record_dtype("mbp-1"))
+    quotes["ts_recv"] = 2
+    paths = {
+        str(write_dbz(trades, "trades.dbz")): {"schema": "trades"},
+        str(write_dbz(quotes, "quotes.dbz")): {"schema": "mbp-1"},
+    }
+    output = tmp_path / "taq.json"
+
+    with mock.patch(
+        "dbtoys.utilities.dbz.read_metadata", side_effect=paths.get
+    ):
+        dbexplore.onecmd(f"join_quotes {' '.join(paths)} {output} -f json")
+
+    dbexplore.stdout.seek(0)
+    assert_that(
+        dbexplore.stdout.read().strip(),
+        equal_to(f"Joined 2 trades to {output}"),
+    )
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert_that([line["quote_ts_recv"] for line in lines], equal_to([None, 2]))
+
+
+def test_analytics(tmp_path: Path, write_dbz, dbexplore: DataBentoExplorer):
+    """Test analytics showing the latest rolling statistics of each symbol."""
+    trades = numpy.zeros(3, dtype=record_dtype("trades"))
+    trades["ts_event"] = [1, 2, 3]
+    trades["price"] = numpy.array([10, 12, 11]) * 10**9
+    trades["size"] = [1, 1, 2]
+    path = write_dbz(trades)
+    metadata = {"schema": "trades", "mappings": {"ESH1": [{"symbol": "0"}]}}
+    output = tmp_path / "rolling.csv"
+
+    with mock.patch(
+        "dbtoys.utilities.dbz.read_metadata", return_value=metadata
+    ):
+        dbexplore.onecmd(f"analytics {path} -w 2 -o {output} --volume-profile")
+    with mock.patch.object(dbexplore, "perror") as perror:
+        dbexplore.onecmd("analytics missing.dbz")
+    perror.assert_called_once()
+
+    dbexplore.stdout.seek(0)
+    rows = dbexplore.stdout.readlines()
+    assert_that(
+        rows[0].split()[:4], equal_to(["symbol", "ts_event", "count", "volume"])
+    )
+    assert_that(rows[2].split()[0], equal_to("ESH1"))
+    assert_that(rows[2].split()[4:7], equal_to(["3", "11.3333", "11"]))
+    assert_that(
+        rows[-1].strip(),
+        equal_to(f"Wrote the statistics of every record to {output}"),
+    )
+    assert_that(len(output.read_text().splitlines()), equal_to(4))
@@ -0,0 +1,134 @@
+"""Unit tests for dblive"""
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+import numpy
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import greater_than
+from hamcrest import less_than
+
+from dbtoys.dblive.latency import LatencyHistogram
+from dbtoys.dblive.replay import ReplayServer
+from dbtoys.dblive.ring import RingBuffer
+from dbtoys.dblive.stream import LiveConsumer
+from dbtoys.utilities.dbz import record_dtype
+
+RECORDS = 100_000
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a trades file without mappings."""
+    return {"schema": "trades", "mappings": {}}
+
+
+@pytest.fixture(name="trades_path")
+def fixture_trades_path(write_dbz) -> Path:
+    """A DBZ file of trades numbered by price."""
+    records = numpy.zeros(RECORDS, dtype=record_dtype("trades"))
+    records["price"] = numpy.arange(RECORDS)
+    return write_dbz(records)
+
+
+@pytest.fixture(name="server")
+def fixture_server(
+    trades_path: Path, metadata: Dict[str, Any]
+) -> Iterator[ReplayServer]:
+    """A replay server of the trades on a free local port."""
+    with ReplayServer(
+        trades_path, ("127.0.0.1", 0), repeat=2, metadata=metadata
+    ) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+
+
+def test_ring_wraps_records():
+    """Records are whole and in order across the end of the ring."""
+    dtype = record_dtype("trades")
+    records = numpy.zeros(1000, dtype=dtype)
+    records["price"] = numpy.arange(1000)
+    ring = RingBuffer(dtype.itemsize * 7, dtype)
+    sender, receiver = socket.socketpair()
+
+    def receive():
+        while ring.recv_into(receiver):
+            pass
+        ring.close()
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+    sender.sendall(records.tobytes())
+    sender.close()
+
+    prices: List[int] = []
+    while len(batch := ring.peek(3, timeout=5)):
+        prices.extend(batch["price"].tolist())
+        ring.release(len(batch))
+    thread.join()
+    receiver.close()
+    assert_that(prices, equal_to(list(range(1000))))
+    assert_that(ring.stalls, greater_than(0))
+
+
+def test_latency_percentiles():
+    """Percentiles are within a bucket of the exact values."""
+    histogram = LatencyHistogram()
+    latencies = numpy.arange(1, 1_000_001)
+    histogram.record(latencies)
+    percentiles = histogram.percentiles([50.0, 99.0])
+    assert_that(percentiles[50.0] / 500_000, less_than(1.05))
+    assert_that(percentiles[50.0] / 500_000, greater_than(0.99))
+    assert_that(percentiles[99.0] / 990_000, less_than(1.05))
+    assert_that(histogram.max, equal_to(1_000_000))
+
+
+def test_consume_replay(server: ReplayServer):
+    """Every replayed record reaches the callback in order."""
+    prices: List[numpy.ndarray] = []
+    consumer = LiveConsumer(
+        lambda batch: prices.append(batch["price"].copy()),
+        address=server.server_address,
+        ring_bytes=1024 * 1024,
+    )
+    stats = consumer.run(duration=30)
+
+    assert_that(stats.records, equal_to(2 * RECORDS))
+    assert_that(
+        consumer.metadata, equal_to({"schema": "trades", "mappings": {}})
+    )
+    expected = numpy.tile(numpy.arange(RECORDS), 2)
+    assert_that(
+        bool((numpy.concatenate(prices) == expected).all()), equal_to(True)
+    )
+    assert_that(stats.latency.total, equal_to(2 * RECORDS))
+
+
+def test_replay_rate(trades_path: Path, metadata: Dict[str, Any]):
+    """Paced replays send records at the requested rate."""
+    with ReplayServer(
+        trades_path, ("127.0.0.1", 0), rate=200_000, metadata=metadata
+    ) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started = time.perf_counter()
+        stats = LiveConsumer(lambda _: None, address=server.server_address).run(
+            duration=30
+        )
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+
+    assert_that(stats.records, equal_to(RECORDS))
+    # 100k records at 200k/s take half a second.
+    assert_that(elapsed, greater_than(0.4))
+    assert_that(elapsed, less_than(5.0))
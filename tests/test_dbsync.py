@@ -0,0 +1,221 @@
+"""Unit tests for dbsync"""
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import empty
+from hamcrest import equal_to
+
+from dbtoys.dbsync.app import estimate_costs
+from dbtoys.dbsync.app import fetch
+from dbtoys.dbsync.app import fetch_coordinated
+from dbtoys.dbsync.app import fold_done
+from dbtoys.dbsync.app import plan_sync
+from dbtoys.dbsync.app import plan_units
+from dbtoys.dbsync.app import unit_costs
+from dbtoys.dbsync.gaps import CoverageSpec
+from dbtoys.dbsync.gaps import SyncRequest
+from dbtoys.dbsync.gaps import load_specs
+from dbtoys.dbsync.gaps import merge_days
+from dbtoys.dbsync.gaps import plan_requests
+from dbtoys.dbsync.manifest import Manifest
+from dbtoys.utilities.coordination import Coordinator
+
+
+def day(value: int) -> datetime.date:
+    """A day of January 2022."""
+    return datetime.date(2022, 1, value)
+
+
+@pytest.fixture(name="spec")
+def fixture_spec() -> CoverageSpec:
+    """Two symbols over ten days."""
+    return CoverageSpec(
+        "GLBX.MDP3", "trades", ("ESH2", "NQH2"), day(1), day(11)
+    )
+
+
+@pytest.fixture(name="manifest")
+def fixture_manifest(tmp_path: Path) -> Manifest:
+    """An empty manifest."""
+    return Manifest(tmp_path / "manifest.db")
+
+
+@pytest.fixture(name="client")
+def fixture_client() -> mock.MagicMock:
+    """A client which writes a small file for every stream."""
+    client = mock.MagicMock()
+    client.metadata.get_cost.return_value = 1.0
+    client.timeseries.stream.side_effect = lambda path, **_: Path(
+        path
+    ).write_bytes(b"data")
+    return client
+
+
+@pytest.mark.parametrize(
+    "days, max_gap_days, expected",
+    [
+        pytest.param([], 0, []),
+        pytest.param([1, 2, 3], 0, [(1, 4)]),
+        pytest.param([1, 2, 5, 6], 0, [(1, 3), (5, 7)]),
+        pytest.param([1, 2, 5, 6], 2, [(1, 7)]),
+        pytest.param([3, 1, 2, 2], 0, [(1, 4)]),
+    ],
+)
+def test_merge_days(days, max_gap_days, expected):
+    """Adjacent days are merged into intervals."""
+    assert_that(
+        merge_days(map(day, days), max_gap_days=max_gap_days),
+        equal_to([(day(s), day(e)) for s, e in expected]),
+    )
+
+
+def test_plan_requests_groups_symbols(spec: CoverageSpec):
+    """Symbols missing the same interval share one request."""
+    covered = {("ESH2", day(d)) for d in range(4, 11)}
+    covered |= {("NQH2", day(d)) for d in range(4, 8)}
+
+    assert_that(
+        plan_requests(spec, covered),
+        equal_to(
+            [
+                SyncRequest(
+                    "GLBX.MDP3", "trades", ("ESH2", "NQH2"), day(1), day(4)
+                ),
+                SyncRequest("GLBX.MDP3", "trades", ("NQH2",), day(8), day(11)),
+            ]
+        ),
+    )
+    assert_that(
+        plan_requests(spec, covered, max_days=2)[:2],
+        equal_to(
+            [
+                SyncRequest(
+                    "GLBX.MDP3", "trades", ("ESH2", "NQH2"), day(1), day(3)
+                ),
+                SyncRequest(
+                    "GLBX.MDP3", "trades", ("ESH2", "NQH2"), day(3), day(4)
+                ),
+            ]
+        ),
+    )
+
+
+def test_load_specs(tmp_path: Path, spec: CoverageSpec):
+    """Specs are loaded from JSON."""
+    spec_path = tmp_path / "spec.json"
+    spec_path.write_text(
+        json.dumps(
+            {
+                "dataset": "GLBX.MDP3",
+                "schema": "trades",
+                "symbols": "ESH2,NQH2",
+                "start": "2022-01-01",
+                "end": "2022-01-11",
+            }
+        )
+    )
+    assert_that(load_specs(spec_path), equal_to([spec]))
+
+
+def test_sync_then_noop(
+    tmp_path: Path,
+    spec: CoverageSpec,
+    manifest: Manifest,
+    client: mock.MagicMock,
+):
+    """A second sync finds nothing missing and makes no requests."""
+    requests = plan_sync(manifest, [spec])
+    costs = estimate_costs(client.metadata, requests)
+    paths = fetch(client, manifest, requests, tmp_path, costs)
+
+    assert_that(len(requests), equal_to(1))
+    assert_that(costs, equal_to([1.0]))
+    assert_that(paths[0].exists(), equal_to(True))
+    assert_that(plan_sync(manifest, [spec]), empty())
+    client.timeseries.stream.assert_called_once()
+
+
+def test_sync_failure_leaves_gap(
+    tmp_path: Path,
+    spec: CoverageSpec,
+    manifest: Manifest,
+    client: mock.MagicMock,
+):
+    """A failed download is not recorded in the manifest."""
+    client.timeseries.stream.side_effect = RuntimeError("unavailable")
+    requests = plan_sync(manifest, [spec])
+    assert_that(fetch(client, manifest, requests, tmp_path), equal_to([None]))
+    assert_that(plan_sync(manifest, [spec]), equal_to(requests))
+
+
+@pytest.mark.parametrize("coordinated", [False, True])
+def test_sync_no_data(
+    tmp_path: Path,
+    spec: CoverageSpec,
+    manifest: Manifest,
+    client: mock.MagicMock,
+    coordinated: bool,
+):
+    """Days the API has no data for are recorded without a file, so they
+    are not requested again."""
+    client.timeseries.stream.side_effect = lambda path, **_: Path(
+        path
+    ).write_bytes(b"")
+    requests = plan_sync(manifest, [spec])
+    if coordinated:
+        units = plan_units(requests)
+        with Coordinator(tmp_path / "coordination") as coordinator:
+            paths = fetch_coordinated(client, units, tmp_path, coordinator)
+        assert_that(fold_done(manifest, coordinator, units), equal_to(20))
+    else:
+        paths = fetch(client, manifest, requests, tmp_path)
+
+    assert_that(any(path.exists() for path in paths), equal_to(False))
+    assert_that(list(tmp_path.rglob("*.dbz*")), empty())
+    assert_that(plan_sync(manifest, [spec]), empty())
+
+
+def test_sync_coordinated(
+    tmp_path: Path,
+    spec: CoverageSpec,
+    manifest: Manifest,
+    client: mock.MagicMock,
+):
+    """Coordinated workers download each symbol and day once between
+    them, and one process records their work in the manifest."""
+    requests = plan_sync(manifest, [spec])
+    units = plan_units(requests)
+    assert_that(len(units), equal_to(20))
+    assert_that(units[0].day, equal_to(day(1)))
+    costs = unit_costs(requests, [10.0])
+    assert_that(costs[units[0]], equal_to(0.5))
+    ledger = mock.MagicMock()
+
+    def sync(owner: str):
+        with Coordinator(tmp_path / "coordination", owner=owner) as coordinator:
+            return fetch_coordinated(
+                client, units, tmp_path, coordinator, costs, 2, ledger
+            )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first, second = executor.map(sync, ["first", "second"])
+
+    assert_that(first, equal_to(second))
+    assert_that(all(path.exists() for path in first), equal_to(True))
+    assert_that(client.timeseries.stream.call_count, equal_to(20))
+    assert_that(
+        [call.kwargs["cost"] for call in ledger.record.call_args_list],
+        equal_to([0.5] * 20),
+    )
+    assert_that(plan_sync(manifest, [spec]), equal_to(requests))
+
+    coordinator = Coordinator(tmp_path / "coordination")
+    assert_that(fold_done(manifest, coordinator, units), equal_to(20))
+    assert_that(plan_sync(manifest, [spec]), empty())
@@ -0,0 +1,98 @@
+"""Unit tests for dbexplore.estimator"""
+from unittest import mock
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+
+from dbtoys.dbexplore.estimator import SizeModel
+from dbtoys.dbexplore.estimator import estimate_grid
+from dbtoys.dbexplore.estimator import verify_estimates
+
+
+@pytest.fixture(name="model")
+def fixture_model() -> SizeModel:
+    """A model of ESH1 at 100 bytes a day and NQH1 at 300 bytes a day."""
+    return SizeModel.fit(
+        pandas.DataFrame(
+            [
+                [
+                    "GLBX.MDP3",
+                    "trades",
+                    "ESH1",
+                    "2022-01-01",
+                    "2022-01-03",
+                    200,
+                ],
+                [
+                    "GLBX.MDP3",
+                    "trades",
+                    "NQH1",
+                    "2022-01-01",
+                    "2022-01-02",
+                    300,
+                ],
+                ["GLBX.MDP3", "mbo", "ESH1", "2022-01-01", "2022-01-02", 1000],
+                ["GLBX.MDP3", "mbo", "ESH1", "2022-01-02", "2022-01-02", 5],
+            ],
+            columns=[
+                "dataset",
+                "schema",
+                "symbol",
+                "window_start",
+                "window_end",
+                "bytes",
+            ],
+        )
+    )
+
+
+def test_rates_fall_back_to_schema(model: SizeModel):
+    """Unseen symbols are priced at the rate of their dataset and schema."""
+    rates = model.rates(
+        "GLBX.MDP3", [["ESH1"], ["ESH1", "NQH1"], ["YMH1"]], ["trades", "mbo"]
+    )
+    assert_that(rates[:, 0].tolist(), equal_to([100.0, 400.0, 500 / 3]))
+    assert_that(rates[:, 1].tolist(), equal_to([1000.0, 2000.0, 1000.0]))
+    assert_that(model.schemas("GLBX.MDP3"), equal_to(["mbo", "trades"]))
+
+
+def test_estimate_grid(model: SizeModel):
+    """Every combination is estimated and ranked by cost."""
+    estimates = estimate_grid(
+        model,
+        {"trades": 10.0, "mbo": 1.0},
+        "GLBX.MDP3",
+        [["ESH1"], ["NQH1"]],
+        ["trades", "mbo", "tbbo"],
+        [("2022-01-01", "2022-01-11"), ("2022-01-01", "2022-02-01")],
+    )
+    assert_that(len(estimates), equal_to(12))
+    first = estimates.iloc[0]
+    assert_that(
+        (first.symbols, first.schema, first.bytes),
+        equal_to(("ESH1", "trades", 1000.0)),
+    )
+    assert_that(first.cost, equal_to(1000 / 1e9 * 10))
+    assert_that(numpy.isnan(estimates["cost"].iloc[-1]), equal_to(True))
+
+
+def test_verify_estimates(model: SizeModel):
+    """The cheapest estimates are priced by the live API."""
+    metadata = mock.MagicMock()
+    metadata.get_cost.side_effect = lambda **kw: len(kw["symbols"]) * 1.0
+    estimates = estimate_grid(
+        model,
+        {"trades": 10.0},
+        "GLBX.MDP3",
+        [["ESH1"], ["ESH1", "NQH1"]],
+        ["trades"],
+        [("2022-01-01", "2022-01-02")],
+    )
+    verified = verify_estimates(metadata, "GLBX.MDP3", estimates, top=1)
+    assert_that(list(verified["live_cost"]), equal_to([1.0]))
+    assert_that(metadata.get_cost.call_count, equal_to(1))
@@ -0,0 +1,237 @@
+"""Unit tests for utilities.jobs"""
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import close_to
+from hamcrest import equal_to
+
+from dbtoys.utilities.jobs import Bandwidth
+from dbtoys.utilities.jobs import JobQueue
+from dbtoys.utilities.jobs import JobRunner
+from dbtoys.utilities.jobs import _owner_alive
+from dbtoys.utilities.jobs import split_window
+
+
+@pytest.fixture(name="queue")
+def fixture_queue(tmp_path: Path) -> JobQueue:
+    """An empty job queue."""
+    return JobQueue(tmp_path / "jobs.db")
+
+
+@pytest.fixture(name="client")
+def fixture_client() -> mock.MagicMock:
+    """A client which writes a 100 byte file for every stream."""
+    client = mock.MagicMock()
+    client.timeseries.stream.side_effect = lambda path, **_: Path(
+        path
+    ).write_bytes(b"\0" * 100)
+    return client
+
+
+def submit(queue: JobQueue, tmp_path: Path, dataset: str = "GLBX.MDP3", **kw):
+    """Submit a three day job."""
+    return queue.submit(
+        dataset,
+        "trades",
+        ["ESH2", "NQH2"],
+        "2022-01-03",
+        "2022-01-06",
+        root=tmp_path / "downloads",
+        **kw,
+    )
+
+
+def test_split_window():
+    """Windows are split into parts no longer than part_days."""
+    assert_that(
+        split_window("2022-01-01", "2022-01-04T12:00", 2),
+        equal_to(
+            [
+                ("2022-01-01T00:00:00", "2022-01-03T00:00:00"),
+                ("2022-01-03T00:00:00", "2022-01-04T12:00:00"),
+            ]
+        ),
+    )
+    with pytest.raises(ValueError):
+        split_window("2022-01-02", "2022-01-01", 1)
+
+
+def test_claim_order_and_dataset_limits(queue: JobQueue, tmp_path: Path):
+    """Higher priorities are claimed first, skipping datasets at a limit."""
+    low = submit(queue, tmp_path)
+    high = submit(queue, tmp_path, priority=5)
+    other = submit(queue, tmp_path, dataset="XNAS.ITCH")
+
+    limits = {"GLBX.MDP3": 2}
+    claimed = [queue.claim(limits, default_limit=1) for _ in range(4)]
+    assert_that(
+        [(part.job_id, part.part) for part in claimed[:3]],  # type: ignore
+        equal_to([(high, 0), (high, 1), (other, 0)]),
+    )
+    assert_that(claimed[3], equal_to(None))
+
+    queue.complete(claimed[0], 100)  # type: ignore
+    part = queue.claim(limits, default_limit=1)
+    assert_that((part.job_id, part.part), equal_to((high, 2)))  # type: ignore
+    assert_that(queue.pending(), equal_to(8))
+    assert_that(
+        low in [job.id for job in queue.jobs(["queued"])], equal_to(True)
+    )
+
+
+def test_run_downloads_every_part(
+    queue: JobQueue, tmp_path: Path, client: mock.MagicMock
+):
+    """A run downloads and checkpoints every part of every job."""
+    job_id = submit(queue, tmp_path)
+    stats = JobRunner(queue, client, workers=2).run()
+
+    assert_that((stats.parts, stats.bytes, stats.failed), equal_to((3, 300, 0)))
+    (job,) = queue.jobs()
+    assert_that(
+        (job.id, job.state, job.parts_done, job.bytes),
+        equal_to((job_id, "done", 3, 300)),
+    )
+    files = sorted((tmp_path / "downloads").glob("**/*.dbz"))
+    assert_that(
+        [path.name for path in files],
+        equal_to(
+            [
+                "00000_2022-01-03.dbz",
+                "00001_2022-01-04.dbz",
+                "00002_2022-01-05.dbz",
+            ]
+        ),
+    )
+
+
+def test_run_recovers_parts_of_dead_runners(
+    queue: JobQueue, tmp_path: Path, client: mock.MagicMock
+):
+    """Parts left running by a killed runner are downloaded again, while
+    checkpointed parts are not."""
+    submit(queue, tmp_path)
+    queue.complete(queue.claim(), 100)  # type: ignore
+    queue.claim()
+    # A process which has exited leaves its parts running.
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.strip()
+    with sqlite3.connect(queue.path) as connection:
+        connection.execute(
+            "UPDATE parts SET owner = ? WHERE state = 'running'",
+            (f"{socket.gethostname()}:{dead}",),
+        )
+
+    stats = JobRunner(queue, client, workers=1).run()
+    assert_that(stats.parts, equal_to(2))
+    assert_that(client.timeseries.stream.call_count, equal_to(2))
+    assert_that(queue.jobs()[0].state, equal_to("done"))
+
+
+def test_recover_stale_parts(queue: JobQueue, tmp_path: Path):
+    """Parts whose heartbeat stopped are queued again on any host, while
+    parts of live runners on other hosts are left running."""
+    submit(queue, tmp_path)
+    for _ in range(2):
+        queue.claim()
+    assert_that(queue.renew(), equal_to(2))
+    with sqlite3.connect(queue.path) as connection:
+        connection.execute(
+            "UPDATE parts SET owner = 'elsewhere:1', heartbeat = 0 "
+            "WHERE part = 0"
+        )
+        connection.execute(
+            "UPDATE parts SET owner = 'elsewhere:2' WHERE part = 1"
+        )
+
+    assert_that(queue.recover(), equal_to(1))
+    assert_that(queue.claim().part, equal_to(0))  # type: ignore
+    assert_that(queue.renew(), equal_to(1))
+
+
+def test_heartbeat_columns_added(tmp_path: Path):
+    """Queues made before parts had heartbeats gain the column."""
+    path = tmp_path / "jobs.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE parts (job_id INTEGER NOT NULL, part INTEGER NOT "
+            "NULL, window_start TEXT NOT NULL, window_end TEXT NOT NULL, "
+            "state TEXT NOT NULL, owner TEXT, attempts INTEGER NOT NULL "
+            "DEFAULT 0, bytes INTEGER, error TEXT, PRIMARY KEY (job_id, part))"
+        )
+    queue = JobQueue(path)
+    submit(queue, tmp_path)
+    assert_that(queue.claim().part, equal_to(0))  # type: ignore
+    assert_that(queue.renew(), equal_to(1))
+
+
+def test_owner_alive_probe():
+    """Owners are probed without signals on Windows, and owners whose
+    probe fails are assumed to be running."""
+    host = socket.gethostname()
+    with mock.patch("os.kill", side_effect=OSError(22, "Invalid")):
+        assert_that(_owner_alive(f"{host}:123"), equal_to(True))
+    with mock.patch("os.kill") as kill, mock.patch.object(
+        sys, "platform", "win32"
+    ), mock.patch(
+        "dbtoys.utilities.jobs._windows_process_alive", return_value=False
+    ) as probe:
+        assert_that(_owner_alive(f"{host}:123"), equal_to(False))
+    kill.assert_not_called()
+    probe.assert_called_once_with(123)
+
+
+def test_failed_job_resumes(
+    queue: JobQueue, tmp_path: Path, client: mock.MagicMock
+):
+    """A part failing every attempt fails its job until it is resumed."""
+    job_id = submit(queue, tmp_path)
+    stream = client.timeseries.stream.side_effect
+    client.timeseries.stream.side_effect = OSError("unavailable")
+
+    stats = JobRunner(queue, client, workers=1, max_attempts=2).run()
+    assert_that((stats.parts, stats.failed), equal_to((0, 1)))
+    assert_that(queue.jobs()[0].state, equal_to("failed"))
+    assert_that(client.timeseries.stream.call_count, equal_to(2))
+
+    assert_that(queue.resume(job_id), equal_to(True))
+    client.timeseries.stream.side_effect = stream
+    stats = JobRunner(queue, client, workers=1).run()
+    assert_that(stats.parts, equal_to(3))
+    assert_that(queue.jobs()[0].state, equal_to("done"))
+
+
+def test_cancelled_job_is_not_run(
+    queue: JobQueue, tmp_path: Path, client: mock.MagicMock
+):
+    """Cancelled jobs are skipped until they are resumed."""
+    job_id = submit(queue, tmp_path)
+    assert_that(queue.cancel(job_id), equal_to(True))
+    assert_that(JobRunner(queue, client).run().parts, equal_to(0))
+    assert_that(queue.jobs(["cancelled"])[0].parts_done, equal_to(0))
+    assert_that(queue.resume(job_id), equal_to(True))
+    assert_that(queue.cancel(12345), equal_to(False))
+
+
+def test_bandwidth_waits_for_overdraft():
+    """A download overdrawing the bucket delays the next by its size."""
+    bandwidth = Bandwidth(1000)
+    assert_that(bandwidth.delay(), equal_to(0.0))
+    bandwidth.charge(500)
+    assert_that(bandwidth.delay(), close_to(0.5, 0.05))
+    stop = threading.Event()
+    stop.set()
+    bandwidth.wait(stop)
@@ -0,0 +1,175 @@
+"""Unit tests for utilities.join"""
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.join import asof_positions
+from dbtoys.utilities.join import iter_join
+from dbtoys.utilities.join import join_quotes
+
+PX = 10**9
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Dict[str, Any]]:
+    """Metadata for trades and mbp-1 quotes of ESH1 and NQH1."""
+    mappings = {"ESH1": [{"symbol": "1"}], "NQH1": [{"symbol": "2"}]}
+    return {
+        "trades_metadata": {"schema": "trades", "mappings": mappings},
+        "quotes_metadata": {"schema": "mbp-1", "mappings": mappings},
+    }
+
+
+@pytest.fixture(name="paths")
+def fixture_paths(write_dbz):
+    """Trades and quotes of two products, interleaved in time."""
+    quotes = numpy.zeros(4, dtype=record_dtype("mbp-1"))
+    quotes["product_id"] = [1, 2, 1, 2]
+    quotes["ts_recv"] = [10, 20, 30, 40]
+    quotes["bid_px_00"] = numpy.array([99, 49, 100, 50]) * PX
+    quotes["ask_px_00"] = numpy.array([101, 51, 102, 52]) * PX
+    quotes["bid_sz_00"] = 1
+    quotes["ask_sz_00"] = 1
+
+    trades = numpy.zeros(7, dtype=record_dtype("trades"))
+    trades["product_id"] = [1, 1, 2, 1, 1, 2, 2]
+    trades["ts_recv"] = [5, 15, 25, 30, 35, 45, 1000]
+    trades["price"] = numpy.array([100, 101, 50, 101, 101, 50, 49]) * PX
+    return write_dbz(trades, "trades.dbz"), write_dbz(quotes, "quotes.dbz")
+
+
+def test_asof_positions():
+    """Per product as-of positions match pandas merge_asof."""
+    rng = numpy.random.default_rng(0)
+    quote_ids = rng.integers(0, 20, 5000)
+    quote_ts = numpy.sort(rng.integers(0, 10**6, 5000))
+    trade_ids = rng.integers(0, 25, 1000)
+    trade_ts = numpy.sort(rng.integers(0, 10**6, 1000))
+    order = numpy.lexsort((quote_ts, quote_ids))
+
+    for allow_exact in (True, False):
+        positions = asof_positions(
+            quote_ids[order],
+            quote_ts[order],
+            trade_ids,
+            trade_ts,
+            allow_exact=allow_exact,
+        )
+        expected = pandas.merge_asof(
+            pandas.DataFrame({"id": trade_ids, "ts": trade_ts}),
+            pandas.DataFrame(
+                {"id": quote_ids, "ts": quote_ts, "quote_ts": quote_ts}
+            ),
+            on="ts",
+            by="id",
+            allow_exact_matches=allow_exact,
+        )["quote_ts"]
+        found = numpy.where(
+            positions >= 0, quote_ts[order][positions], numpy.nan
+        )
+        numpy.testing.assert_array_equal(found, expected.to_numpy())
+
+
+@pytest.mark.parametrize("chunk_records", [1, 2, 100])
+def test_iter_join(paths, metadata, chunk_records: int):
+    """Trades get the prevailing quote, a sign and an effective spread
+    whatever the chunk size."""
+    frame = pandas.concat(
+        iter_join(
+            *paths,
+            tolerance=5e-8,
+            pretty_px=True,
+            chunk_bytes=chunk_records * record_dtype("trades").itemsize,
+            **metadata,
+        ),
+        ignore_index=True,
+    )
+    assert_that(
+        list(frame["symbol"]),
+        equal_to(["ESH1", "ESH1", "NQH1"] + ["ESH1"] * 2 + ["NQH1"] * 2),
+    )
+    numpy.testing.assert_array_equal(
+        frame["bid_px_00"], [numpy.nan, 99, 49, 100, 100, 50, numpy.nan]
+    )
+    numpy.testing.assert_array_equal(
+        frame["quote_ts_recv"], [numpy.nan, 10, 20, 30, 30, 40, numpy.nan]
+    )
+    # Unknown without a quote or a tick, a buy above the mid, unknown at the
+    # mid without a tick, buys at the mid after an uptick and a zero tick, a
+    # sell below the mid, and a downtick without a quote.
+    assert_that(list(frame["sign"]), equal_to([0, 1, 0, 1, 1, -1, -1]))
+    numpy.testing.assert_allclose(
+        frame["effective_spread"],
+        [numpy.nan, 2, 0, 0, 0, 2, numpy.nan],
+    )
+
+
+@pytest.mark.parametrize("chunk_records", [1, 3, 100])
+@pytest.mark.parametrize("allow_exact", [True, False])
+def test_iter_join_ties(
+    write_dbz, metadata, chunk_records: int, allow_exact: bool
+):
+    """Trades at the time of a quote match as pandas merge_asof does,
+    whatever the chunk size."""
+    rng = numpy.random.default_rng(1)
+    quotes = numpy.zeros(200, dtype=record_dtype("mbp-1"))
+    quotes["product_id"] = rng.integers(1, 3, len(quotes))
+    quotes["ts_recv"] = numpy.sort(rng.integers(0, 50, len(quotes)))
+    quotes["bid_px_00"] = numpy.arange(len(quotes)) * PX
+    quotes["ask_px_00"] = quotes["bid_px_00"] + PX
+    trades = numpy.zeros(100, dtype=record_dtype("trades"))
+    trades["product_id"] = rng.integers(1, 3, len(trades))
+    trades["ts_recv"] = numpy.sort(rng.integers(0, 50, len(trades)))
+    trades["price"] = PX
+
+    frame = pandas.concat(
+        iter_join(
+            write_dbz(trades, "trades.dbz"),
+            write_dbz(quotes, "quotes.dbz"),
+            allow_exact=allow_exact,
+            chunk_bytes=chunk_records * record_dtype("trades").itemsize,
+            **metadata,
+        ),
+        ignore_index=True,
+    )
+    expected = pandas.merge_asof(
+        pandas.DataFrame(trades[["product_id", "ts_recv"]]),
+        pandas.DataFrame(quotes[["product_id", "ts_recv", "bid_px_00"]]),
+        on="ts_recv",
+        by="product_id",
+        allow_exact_matches=allow_exact,
+    )
+    numpy.testing.assert_array_equal(
+        frame["bid_px_00"], expected["bid_px_00"].to_numpy(float)
+    )
+
+
+def test_join_quotes(tmp_path: Path, paths, metadata):
+    """Enriched trades are written with one header."""
+    output = tmp_path / "taq.csv"
+    assert_that(
+        join_quotes(*paths, output, chunk_bytes=1, **metadata), equal_to(7)
+    )
+    written = pandas.read_csv(output)
+    assert_that(len(written), equal_to(7))
+    assert_that(
+        list(written.columns[-4:]),
+        equal_to(["mid", "sign", "effective_spread", "effective_spread_bps"]),
+    )
+
+    with pytest.raises(ValueError):
+        join_quotes(
+            *reversed(paths),
+            output,
+            trades_metadata=metadata["quotes_metadata"],
+            quotes_metadata=metadata["trades_metadata"],
+        )
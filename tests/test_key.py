@@ -1,5 +1,6 @@
 """Unit test for utilities.key"""
 from pathlib import Path
+from typing import Iterator
 from typing import Tuple
 from unittest.mock import DEFAULT
 from unittest.mock import patch
@@ -11,11 +12,25 @@ from hamcrest import assert_that
 from hamcrest import equal_to
 
 from dbtoys.utilities.key import DEFAULT_KEY_FILENAME
+from dbtoys.utilities.key import KEY_ENV_VAR
+from dbtoys.utilities.key import KEY_HELPER_ENV_VAR
+from dbtoys.utilities.key import clear_key_cache
 from dbtoys.utilities.key import find_key
 from dbtoys.utilities.key import get_api_key
 from dbtoys.utilities.key import hide_key
 from dbtoys.utilities.key import read_key_file
 from dbtoys.utilities.key import sanitize_key
+from dbtoys.utilities.key import set_providers
+
+
+@pytest.fixture(name="clean_key_providers", autouse=True)
+def fixture_clean_key_providers(monkeypatch) -> Iterator[None]:
+    """Start every test without a cached key or key environment."""
+    monkeypatch.delenv(KEY_ENV_VAR, raising=False)
+    monkeypatch.delenv(KEY_HELPER_ENV_VAR, raising=False)
+    set_providers()
+    yield
+    set_providers()
 
 
 @pytest.fixture(name="key", autouse=True)
@@ -112,3 +127,57 @@ def test_read_key_file(dbkey_file: Path, key: str):
 def test_sanitize_key(key: str, expected: str):
     """A sanitized key shouldn't contain any special characters."""
     assert_that(sanitize_key(key), equal_to(expected))
+
+
+def test_find_key_file_name(tmp_path: Path):
+    """Key files with other names can be found."""
+    key_path = tmp_path / ".otherkey"
+    key_path.write_text("db-other", encoding="utf-8")
+    assert_that(
+        find_key(key_file_name=".otherkey", paths=[tmp_path]),
+        equal_to(key_path),
+    )
+
+
+def test_default_paths(monkeypatch, tmp_path: Path):
+    """DEFAULT_PATHS is still importable and follows the working directory."""
+    monkeypatch.chdir(tmp_path)
+    # pylint: disable-next=import-outside-toplevel
+    from dbtoys.utilities.key import DEFAULT_PATHS
+
+    assert_that(DEFAULT_PATHS, equal_to((tmp_path, Path.home())))
+
+
+def test_get_api_key_from_environment(monkeypatch, key: str):
+    """The environment variable is used without looking for a key file."""
+    monkeypatch.setenv(KEY_ENV_VAR, key)
+    with patch("dbtoys.utilities.key.find_key") as mocked_find_key:
+        assert_that(get_api_key(), equal_to(key))
+    mocked_find_key.assert_not_called()
+
+
+def test_get_api_key_from_helper(monkeypatch, key: str):
+    """A credential helper command is used before key files."""
+    monkeypatch.setenv(KEY_HELPER_ENV_VAR, f"echo {key}")
+    with patch("dbtoys.utilities.key.find_key") as mocked_find_key:
+        assert_that(get_api_key(), equal_to(key))
+    mocked_find_key.assert_not_called()
+
+
+def test_get_api_key_cached(dbkey_file: Path, key: str):
+    """A key is only looked up once per process."""
+    with patch("dbtoys.utilities.key.find_key") as mocked_find_key:
+        mocked_find_key.return_value = dbkey_file
+        get_api_key()
+        assert_that(get_api_key(), equal_to(key))
+        mocked_find_key.assert_called_once()
+
+        clear_key_cache()
+        get_api_key()
+        assert_that(mocked_find_key.call_count, equal_to(2))
+
+
+def test_get_api_key_custom_providers(key: str):
+    """The provider chain can be replaced."""
+    set_providers([lambda: None, lambda: f"{key}\n"])
+    assert_that(get_api_key(), equal_to(key))
@@ -0,0 +1,139 @@
+"""Unit tests for utilities.ledger"""
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+
+from dbtoys.utilities.ledger import Ledger
+
+WRITERS = 4
+ENTRIES_PER_WRITER = 50
+
+
+@pytest.fixture(name="ledger")
+def fixture_ledger(tmp_path: Path) -> Ledger:
+    """An empty ledger."""
+    return Ledger(tmp_path / "ledger.db", user="unittest")
+
+
+def write_entries(path: Path, user: str) -> int:
+    """Append entries to a ledger from another process."""
+    ledger = Ledger(path, user=user)
+    for _ in range(ENTRIES_PER_WRITER):
+        ledger.record("download", "GLBX.MDP3", "trades", ["ESH1"], size=1)
+    ledger.close()
+    return ENTRIES_PER_WRITER
+
+
+def test_spend_by(ledger: Ledger):
+    """Estimates and downloads are aggregated separately."""
+    ledger.record("estimate", "GLBX.MDP3", "trades", ["ESH1"], cost=2.0)
+    ledger.record("estimate", "XNAS.ITCH", "mbo", ["AAPL"], cost=5.0)
+    ledger.record(
+        "download", "GLBX.MDP3", "trades", ["ESH1"], cost=1.5, size=100
+    )
+    ledger.record("billable_size", "GLBX.MDP3", "trades", ["ESH1"], size=7)
+
+    assert_that(
+        ledger.spend_by("dataset"),
+        equal_to(
+            [("GLBX.MDP3", 2.0, 1.5, 100.0), ("XNAS.ITCH", 5.0, 0.0, 0.0)]
+        ),
+    )
+    assert_that(
+        ledger.spend_by("user"), equal_to([("unittest", 7.0, 1.5, 100.0)])
+    )
+    with pytest.raises(ValueError):
+        ledger.spend_by("symbol; DROP TABLE entries")
+
+
+def test_top_symbols(ledger: Ledger):
+    """Bytes are attributed evenly to the symbols of an entry."""
+    ledger.record("download", symbols=["ESH1", "NQH1"], size=100)
+    ledger.record("download", symbols=["NQH1"], size=30)
+    ledger.record("estimate", symbols=["YMH1"], size=1000)
+
+    assert_that(ledger.top_symbols(limit=1), equal_to([("NQH1", 80.0)]))
+    assert_that(
+        ledger.top_symbols(kind="estimate"), equal_to([("YMH1", 1000.0)])
+    )
+
+
+def test_append_only(ledger: Ledger):
+    """Entries cannot be changed or removed."""
+    ledger.record("estimate", symbols=["ESH1"], cost=1.0, size=10)
+    for statement in (
+        "UPDATE entries SET cost = 0",
+        "DELETE FROM entries",
+        "UPDATE entry_symbols SET bytes = 0",
+        "DELETE FROM entry_symbols",
+    ):
+        with pytest.raises(sqlite3.IntegrityError):
+            ledger._connection().execute(  # pylint: disable=protected-access
+                statement
+            )
+    with pytest.raises(ValueError):
+        ledger.record("refund")
+    assert_that(len(ledger), equal_to(1))
+
+
+def test_concurrent_writers(ledger: Ledger):
+    """Processes append to one ledger without losing entries."""
+    with ProcessPoolExecutor(max_workers=WRITERS) as executor:
+        total = sum(
+            executor.map(
+                write_entries,
+                [ledger.path] * WRITERS,
+                [f"user{i}" for i in range(WRITERS)],
+            )
+        )
+    assert_that(len(ledger), equal_to(total))
+    assert_that(len(ledger.spend_by("user")), equal_to(WRITERS))
+
+
+def test_size_observations(ledger: Ledger):
+    """Billable sizes are observed per symbol, but downloads are not."""
+    ledger.record(
+        "billable_size",
+        "GLBX.MDP3",
+        "trades",
+        ["ESH1", "NQH1"],
+        start="2022-01-01",
+        end="2022-01-03",
+        size=400,
+    )
+    ledger.record(
+        "download",
+        "GLBX.MDP3",
+        "trades",
+        ["ESH1"],
+        start="2022-01-01",
+        end="2022-01-03",
+        size=50,
+    )
+    observations = ledger.size_observations("GLBX.MDP3")
+    assert_that(list(observations["symbol"]), equal_to(["ESH1", "NQH1"]))
+    assert_that(list(observations["bytes"]), equal_to([200, 200]))
+    assert_that(len(ledger.size_observations("XNAS.ITCH")), equal_to(0))
+
+
+def test_unit_prices(ledger: Ledger):
+    """Cached unit prices are replaced when refreshed and expire."""
+    ledger.cache_unit_prices("GLBX.MDP3", "historical", {"mbo": 1.0})
+    ledger.cache_unit_prices(
+        "GLBX.MDP3", "historical", {"trades": 2.0, "mbo": 3.0}
+    )
+    assert_that(
+        ledger.unit_prices("GLBX.MDP3", "historical"),
+        equal_to({"trades": 2.0, "mbo": 3.0}),
+    )
+    assert_that(ledger.unit_prices("GLBX.MDP3", "live"), equal_to({}))
+    assert_that(
+        ledger.unit_prices("GLBX.MDP3", "historical", max_age=-1),
+        equal_to({}),
+    )
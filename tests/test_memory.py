@@ -0,0 +1,56 @@
+"""Unit tests for utilities.memory"""
+import numpy
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import greater_than_or_equal_to
+from hamcrest import starts_with
+
+from dbtoys.utilities.memory import MIN_CHUNK_BYTES
+from dbtoys.utilities.memory import MemoryMonitor
+from dbtoys.utilities.memory import chunk_bytes_within
+from dbtoys.utilities.memory import jobs_within
+from dbtoys.utilities.memory import parse_size
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        pytest.param("1048576", 1024**2),
+        pytest.param("512K", 512 * 1024),
+        pytest.param("1.5G", 3 * 1024**3 // 2),
+        pytest.param("64MiB", 64 * 1024**2),
+        pytest.param("2 gb", 2 * 1024**3),
+    ],
+)
+def test_parse_size(value: str, expected: int):
+    """Sizes are parsed with binary units."""
+    assert_that(parse_size(value), equal_to(expected))
+
+
+def test_parse_size_invalid():
+    """A size which is not a number and unit is rejected."""
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_budget_adapts_chunks_and_jobs():
+    """Chunks shrink to fit a budget, then workers, but never below one."""
+    assert_that(chunk_bytes_within(None, 8 << 20, 4), equal_to(8 << 20))
+    assert_that(chunk_bytes_within(4 << 20, 8 << 20, 4), equal_to(1 << 20))
+    assert_that(chunk_bytes_within(1024, 8 << 20, 4), equal_to(MIN_CHUNK_BYTES))
+    assert_that(jobs_within(None, 8, 4), equal_to(8))
+    assert_that(jobs_within(MIN_CHUNK_BYTES * 8, 8, 4), equal_to(2))
+    assert_that(jobs_within(1024, 8, 4), equal_to(1))
+
+
+def test_monitor_measures_peak():
+    """The peak includes memory which was freed before the block ended."""
+    size = 32 * 1024 * 1024
+    with MemoryMonitor() as monitor:
+        array = numpy.ones(size, dtype=numpy.uint8)
+        del array
+    assert_that(monitor.peak_traced, greater_than_or_equal_to(size))
+    assert_that(monitor.summary(), starts_with("Memory: peak allocated"))
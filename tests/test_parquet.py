@@ -0,0 +1,197 @@
+"""Unit tests for utilities.parquet"""
+from pathlib import Path
+from typing import Any
+from typing import Dict
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import only_contains
+
+from dbtoys.utilities.dbz import record_dtype
+
+pyarrow = pytest.importorskip("pyarrow")
+pytest.importorskip("pyarrow.parquet")
+
+# pylint: disable=wrong-import-position
+from dbtoys.utilities.parquet import export_parquet  # noqa: E402
+from dbtoys.utilities.parquet import read_parquet  # noqa: E402
+from dbtoys.utilities.parquet import scan_row_groups  # noqa: E402
+
+SYMBOLS = ("ESH1", "NQH1", "YMH1", "RTYH1")
+START = pandas.Timestamp("2021-01-04", tz="UTC")
+MINUTE = 60 * 1_000_000_000
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a trades file with four mapped symbols."""
+    return {
+        "dataset": "GLBX.MDP3",
+        "schema": "trades",
+        "mappings": {
+            symbol: [{"symbol": str(1000 + i)}]
+            for i, symbol in enumerate(SYMBOLS)
+        },
+    }
+
+
+@pytest.fixture(name="trades")
+def fixture_trades() -> numpy.ndarray:
+    """One trade per symbol per minute over three days."""
+    minutes = 3 * 24 * 60
+    records = numpy.zeros(minutes * len(SYMBOLS), dtype=record_dtype("trades"))
+    records["product_id"] = numpy.tile(
+        1000 + numpy.arange(len(SYMBOLS)), minutes
+    )
+    records["ts_event"] = START.value + MINUTE * numpy.repeat(
+        numpy.arange(minutes), len(SYMBOLS)
+    )
+    records["price"] = numpy.arange(len(records))
+    records["size"] = 1
+    return records
+
+
+@pytest.fixture(name="root")
+def fixture_root(
+    write_dbz, tmp_path: Path, trades: numpy.ndarray, metadata: Dict[str, Any]
+) -> Path:
+    """A Parquet dataset exported from the trades."""
+    root = tmp_path / "parquet"
+    export_parquet(
+        write_dbz(trades),
+        root,
+        row_group_size=1024,
+        chunk_bytes=64 * 1024,
+        metadata=metadata,
+    )
+    return root
+
+
+def test_export_partitions(root: Path, trades: numpy.ndarray):
+    """Each day is written to its own hive partition."""
+    partitions = sorted(
+        p.relative_to(root).as_posix()
+        for p in root.glob("dataset=*/schema=*/date=*")
+    )
+    assert_that(
+        partitions,
+        equal_to(
+            [
+                "dataset=GLBX.MDP3/schema=trades/date=2021-01-04",
+                "dataset=GLBX.MDP3/schema=trades/date=2021-01-05",
+                "dataset=GLBX.MDP3/schema=trades/date=2021-01-06",
+            ]
+        ),
+    )
+    result = read_parquet(root, "GLBX.MDP3", "trades")
+    assert_that(len(result), equal_to(len(trades)))
+    assert_that(set(result["symbol"]), equal_to(set(SYMBOLS)))
+
+
+def test_pushdown_prunes_row_groups(root: Path):
+    """A one hour, one symbol query only reads matching row groups."""
+    start = START + pandas.Timedelta(days=1, hours=3)
+    end = start + pandas.Timedelta(hours=1)
+    selected = scan_row_groups(
+        root, "GLBX.MDP3", "trades", start=start, end=end, symbols=["NQH1"]
+    )
+    assert_that(len(selected), equal_to(1))
+    assert_that(len(selected[0][1]), equal_to(1))
+
+    result = read_parquet(
+        root,
+        "GLBX.MDP3",
+        "trades",
+        start=start,
+        end=end,
+        symbols=["NQH1"],
+        columns=["ts_event", "symbol", "price"],
+    )
+    assert_that(len(result), equal_to(60))
+    assert_that(list(result["symbol"]), only_contains("NQH1"))
+    assert_that(list(result.columns), equal_to(["ts_event", "symbol", "price"]))
+    assert_that(int(result["ts_event"].min()), equal_to(start.value))
+
+
+def test_read_no_match(root: Path):
+    """Predicates outside of the data return an empty table."""
+    result = read_parquet(
+        root,
+        "GLBX.MDP3",
+        "trades",
+        start="2022-01-01",
+        end="2022-01-02",
+        columns=["ts_event"],
+    )
+    assert_that(len(result), equal_to(0))
+
+
+def test_export_within_memory_budget(
+    write_dbz,
+    tmp_path: Path,
+    root: Path,
+    trades: numpy.ndarray,
+    metadata: Dict[str, Any],
+):
+    """Days which outgrow the budget are spilled and merged to the same
+    partitions, sorted and grouped as they would be in memory."""
+    spilled = tmp_path / "spilled"
+    export_parquet(
+        write_dbz(trades, "spilled.dbz"),
+        spilled,
+        row_group_size=1024,
+        metadata=metadata,
+        memory_budget=256 * 1024,
+    )
+
+    for expected_path in sorted(root.glob("**/*.parquet")):
+        relative = expected_path.relative_to(root)
+        path = spilled / relative.parent / "spilled.parquet"
+        expected = pyarrow.parquet.ParquetFile(expected_path)
+        result = pyarrow.parquet.ParquetFile(path)
+        assert_that(
+            result.read().to_pandas().equals(expected.read().to_pandas()),
+            equal_to(True),
+        )
+        assert_that(
+            result.metadata.num_row_groups,
+            equal_to(expected.metadata.num_row_groups),
+        )
+
+
+def test_export_recurring_day(
+    write_dbz, tmp_path: Path, metadata: Dict[str, Any]
+):
+    """A day recurring after another day is written to a part file instead
+    of overwriting the first."""
+    day = 24 * 60 * MINUTE
+    records = numpy.zeros(60_000, dtype=record_dtype("trades"))
+    records["product_id"] = 1000
+    records["ts_event"] = START.value + numpy.concatenate(
+        [
+            numpy.arange(20_000),
+            day + numpy.arange(20_000),
+            20_000 + numpy.arange(20_000),
+        ]
+    )
+    records["price"] = numpy.arange(len(records))
+    root = tmp_path / "parquet"
+
+    for _ in range(2):
+        written = export_parquet(
+            write_dbz(records, "recurring.dbz"),
+            root,
+            chunk_bytes=64 * 1024,
+            metadata=metadata,
+        )
+        assert_that(len(written), equal_to(3))
+        result = read_parquet(root, "GLBX.MDP3", "trades")
+        assert_that(len(result), equal_to(len(records)))
+        assert_that(
+            sorted(result["price"]), equal_to(list(range(len(records))))
+        )
@@ -0,0 +1,62 @@
+"""Unit tests for utilities.profiling"""
+import time
+from pathlib import Path
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import contains_string
+from hamcrest import equal_to
+
+from dbtoys.utilities.parser import ToyParser
+from dbtoys.utilities.parser import run_main
+from dbtoys.utilities.profiling import Profiler
+
+
+def busy_loop(seconds: float) -> int:
+    """Spin for a while."""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        count += 1
+    return count
+
+
+def test_profiler_writes_files(tmp_path: Path):
+    """A profile is written as pstats and collapsed stacks."""
+    with Profiler("unit test", directory=tmp_path, interval=0.001) as profiler:
+        busy_loop(0.2)
+
+    assert_that(profiler.pstats_path.exists(), equal_to(True))  # type: ignore
+    collapsed = profiler.collapsed_path.read_text(  # type: ignore
+        encoding="utf-8"
+    )
+    assert_that(collapsed, contains_string("busy_loop"))
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert_that(int(count) > 0 and ";" in stack, equal_to(True))
+    assert_that(profiler.summary(top=5), contains_string("busy_loop"))
+    assert_that(profiler.name, equal_to("unit_test"))
+
+
+def test_run_main_profile(monkeypatch, tmp_path: Path, capsys):
+    """The --profile flag of a toy profiles its main function."""
+    monkeypatch.setattr(
+        "dbtoys.utilities.profiling.DEFAULT_PROFILE_PATH", tmp_path
+    )
+    parser = ToyParser(prog="toy", description="A toy.")
+    args = dict(vars(parser.parse_args(["--profile"])).items())
+
+    def main() -> int:
+        busy_loop(0.05)
+        return 3
+
+    assert_that(run_main("toy", main, args), equal_to(3))
+    assert_that(capsys.readouterr().err, contains_string("busy_loop"))
+    assert_that(len(list(tmp_path.glob("toy-*.pstats"))), equal_to(1))
+
+
+def test_run_main_memory(capsys):
+    """The --memory flag of a toy reports the peak memory of main."""
+    parser = ToyParser(prog="toy", description="A toy.")
+    args = dict(vars(parser.parse_args(["--memory"])).items())
+    assert_that(run_main("toy", lambda: 0, args), equal_to(0))
+    assert_that(capsys.readouterr().err, contains_string("Memory: peak"))
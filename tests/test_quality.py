@@ -0,0 +1,128 @@
+"""Unit tests for utilities.quality"""
+from typing import Any
+from typing import Dict
+from unittest import mock
+
+import numpy
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import contains_exactly
+from hamcrest import equal_to
+
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.quality import DAY_NS
+from dbtoys.utilities.quality import validate
+
+# A Tuesday.
+START = 19003 * DAY_NS
+SECOND = 10**9
+
+
+@pytest.fixture(name="metadata")
+def fixture_metadata() -> Dict[str, Any]:
+    """Metadata for a mbp-1 file with one mapped symbol."""
+    return {
+        "dataset": "GLBX.MDP3",
+        "schema": "mbp-1",
+        "symbols": ["ESH1", "NQH1"],
+        "stype_in": "native",
+        "start": START,
+        "end": START + 3 * DAY_NS,
+        "limit": None,
+        "mappings": {"ESH1": [{"symbol": "1"}]},
+    }
+
+
+@pytest.fixture(name="quotes")
+def fixture_quotes() -> numpy.ndarray:
+    """Quotes of two products with one of each issue."""
+    records = numpy.zeros(10, dtype=record_dtype("mbp-1"))
+    records["product_id"] = [1, 2, 1, 1, 2, 1, 1, 2, 1, 1]
+    records["ts_event"] = START + SECOND * numpy.array(
+        [0, 1, 2, 2, 3, 1, 5, 6, 7, 7]
+    )
+    # The last quote of ESH1 is two days later.
+    records["ts_event"][-1] += 2 * DAY_NS
+    records["price"] = 100
+    records["bid_px_00"] = 10
+    records["ask_px_00"] = 11
+    records["bid_sz_00"] = 1
+    records["ask_sz_00"] = 1
+    # A zero price, a crossed book and a duplicate.
+    records["price"][4] = 0
+    records["bid_px_00"][6] = 12
+    records[3] = records[2]
+    return records
+
+
+@pytest.mark.parametrize("chunk_records", [1, 3, 100])
+def test_validate(
+    write_dbz,
+    quotes: numpy.ndarray,
+    metadata: Dict[str, Any],
+    chunk_records: int,
+):
+    """Issues are found by symbol and day whatever the chunk size."""
+    result = validate(
+        write_dbz(quotes),
+        metadata=metadata,
+        max_gap=1.5,
+        jobs=2,
+        chunk_bytes=chunk_records * quotes.dtype.itemsize,
+    )
+    report = result.report
+    assert_that(result.records, equal_to(10))
+    assert_that(list(report["symbol"]), equal_to(["2", "ESH1", "ESH1", "ESH1"]))
+    assert_that(
+        list(report["date"]),
+        equal_to(["2022-01-11", "2022-01-11", "2022-01-12", "2022-01-13"]),
+    )
+    assert_that(list(report["records"]), contains_exactly(3, 6, 0, 1))
+    assert_that(list(report["duplicates"]), contains_exactly(0, 1, 0, 0))
+    assert_that(list(report["out_of_order"]), contains_exactly(0, 1, 0, 0))
+    assert_that(list(report["crossed"]), contains_exactly(0, 1, 0, 0))
+    assert_that(list(report["bad_prices"]), contains_exactly(1, 0, 0, 0))
+    assert_that(list(report["max_gap_s"]), contains_exactly(3.0, 4.0, 0, 0))
+    assert_that(
+        list(report["issues"]),
+        contains_exactly(
+            "bad_prices,gap",
+            "duplicates,out_of_order,crossed,gap",
+            "missing",
+            "",
+        ),
+    )
+
+
+def test_validate_truncated(
+    write_dbz, quotes: numpy.ndarray, metadata: Dict[str, Any]
+):
+    """Record counts are compared with the shape of the request."""
+    metadata_api = mock.MagicMock()
+    metadata_api.get_shape.return_value = (12, 20)
+    result = validate(
+        write_dbz(quotes), metadata=metadata, metadata_api=metadata_api, jobs=1
+    )
+    assert_that(result.expected, equal_to(12))
+    assert_that(result.truncated, equal_to(True))
+    kwargs = metadata_api.get_shape.call_args.kwargs
+    assert_that(kwargs["start"], equal_to("2022-01-11T00:00:00+00:00"))
+
+    metadata["limit"] = 10
+    result = validate(
+        write_dbz(quotes), metadata=metadata, metadata_api=metadata_api, jobs=1
+    )
+    assert_that(result.truncated, equal_to(False))
+
+
+def test_validate_empty(write_dbz, metadata: Dict[str, Any]):
+    """An empty file has an empty report."""
+    result = validate(
+        write_dbz(numpy.zeros(0, dtype=record_dtype("mbp-1"))),
+        metadata=metadata,
+        jobs=1,
+    )
+    assert_that(result.records, equal_to(0))
+    assert_that(len(result.report), equal_to(0))
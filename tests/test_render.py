@@ -0,0 +1,56 @@
+"""Unit tests for utilities.render"""
+import itertools
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from tabulate import tabulate
+
+from dbtoys.utilities.render import stream_sections
+from dbtoys.utilities.render import stream_table
+from dbtoys.utilities.render import window
+
+
+@pytest.mark.parametrize(
+    "rows, headers, floatfmt",
+    [
+        pytest.param(
+            [["ohlcv-1d", 1.5], ["mbo", 120.0], ["trades", 7.25]],
+            ["field", "unit_price"],
+            ".2f",
+        ),
+        pytest.param(
+            [["ts_event", "uint64_t"], ["price", "int64_t"]],
+            ["field", "type"],
+            "g",
+        ),
+        pytest.param([], ["field", "type"], "g"),
+    ],
+)
+def test_stream_table_matches_tabulate(rows, headers, floatfmt):
+    """Tables sampled in full render the same as tabulate."""
+    assert_that(
+        "\n".join(stream_table(rows, headers, floatfmt=floatfmt)),
+        equal_to(tabulate(rows, headers=headers, floatfmt=floatfmt)),
+    )
+
+
+def test_stream_table_lazy():
+    """Rows past the sample are only read as lines are consumed."""
+    rows = ([f"field{i}", float(i)] for i in itertools.count())
+    lines = stream_table(rows, ["field", "unit_price"], sample_rows=10)
+    first = list(itertools.islice(lines, 5))
+    assert_that(first[2].split(), equal_to(["field0", "0"]))
+    assert_that(next(lines).split(), equal_to(["field3", "3"]))
+
+
+def test_window_and_sections():
+    """Windows select rows and sections are separated by blank lines."""
+    assert_that(list(window(range(10), 2, 3)), equal_to([2, 3, 4]))
+    assert_that(list(window(range(5), 3)), equal_to([3, 4]))
+    assert_that(
+        list(stream_sections([["a"], ["b", "c"]])),
+        equal_to(["a", "", "b", "c"]),
+    )
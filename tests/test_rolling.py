@@ -0,0 +1,196 @@
+"""Unit tests for utilities.rolling"""
+import time
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import greater_than
+
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.rolling import RollingAnalytics
+from dbtoys.utilities.rolling import VolumeProfile
+from dbtoys.utilities.rolling import Window
+from dbtoys.utilities.rolling import analyze
+
+PX = 10**9
+
+
+def quotes(count: int, products: int, seed: int = 0) -> numpy.ndarray:
+    """Random mbp-1 records of several products in time order."""
+    rng = numpy.random.default_rng(seed)
+    records = numpy.zeros(count, dtype=record_dtype("mbp-1"))
+    records["product_id"] = rng.integers(0, products, count)
+    records["ts_event"] = numpy.sort(rng.integers(0, 10**7, count))
+    records["price"] = rng.integers(90, 110, count) * PX
+    records["size"] = rng.integers(1, 10, count)
+    records["bid_px_00"] = records["price"] - PX
+    records["ask_px_00"] = records["price"] + 2 * PX
+    records["bid_sz_00"] = 1
+    records["ask_sz_00"] = rng.integers(0, 2, count)
+    return records
+
+
+def expected(records: numpy.ndarray, window: Window) -> pandas.DataFrame:
+    """Rolling statistics recomputed from scratch with pandas."""
+    frame = pandas.DataFrame(
+        {
+            "product_id": records["product_id"],
+            "ts": pandas.to_datetime(records["ts_event"]),
+            "price": records["price"] / PX,
+            "size": records["size"].astype(float),
+            "spread": numpy.where(records["ask_sz_00"] > 0, 3.0, numpy.nan),
+        }
+    )
+    frame["notional"] = frame["price"] * frame["size"]
+    frame["ret"] = numpy.log(
+        frame["price"] / frame.groupby("product_id")["price"].shift()
+    )
+    rolling = (
+        frame.set_index("ts")
+        .groupby("product_id")
+        .rolling(
+            f"{window.duration}ns" if window.duration else window.count,
+            min_periods=1,
+        )
+    )
+    result = pandas.DataFrame(
+        {
+            "count": rolling["price"].count(),
+            "volume": rolling["size"].sum(),
+            "vwap": rolling["notional"].sum() / rolling["size"].sum(),
+            "low": rolling["price"].min(),
+            "high": rolling["price"].max(),
+            "volatility": rolling["ret"].std(),
+            "spread": rolling["spread"].mean(),
+        }
+    )
+    # Back from product order to record order.
+    order = numpy.argsort(records["product_id"], kind="stable")
+    result.index = order
+    return result.sort_index()
+
+
+@pytest.mark.parametrize(
+    "window",
+    [
+        Window(duration=20_000),
+        Window(count=7),
+        Window(duration=2_000_000),
+        Window(count=700),
+    ],
+)
+@pytest.mark.parametrize("batches", [1, 13, 997])
+def test_rolling_analytics(window: Window, batches: int):
+    """Incremental statistics match recomputing every window, whatever the
+    batches."""
+    records = quotes(5000, products=5)
+    analytics = RollingAnalytics(window)
+    result = pandas.concat(
+        [
+            analytics.update(batch)
+            for batch in numpy.array_split(records, batches)
+        ],
+        ignore_index=True,
+    )
+    assert_that(analytics.records, equal_to(len(records)))
+    numpy.testing.assert_array_equal(result["ts"], records["ts_event"])
+    truth = expected(records, window)
+    for column in truth.columns:
+        # Differences of prefix sums round a little differently than pandas.
+        numpy.testing.assert_allclose(
+            result[column], truth[column], rtol=1e-6, atol=1e-7, err_msg=column
+        )
+
+
+def test_window_parse():
+    """Windows are counts of records or durations."""
+    assert_that(Window.parse("100"), equal_to(Window(count=100)))
+    assert_that(Window.parse("5s"), equal_to(Window(duration=5 * 10**9)))
+    for value in ("0", "-1s", "soon"):
+        with pytest.raises(ValueError):
+            Window.parse(value)
+
+
+def test_volume_profile():
+    """Volume accumulates at each price across batches."""
+    records = quotes(4, products=1)
+    records["price"] = numpy.array([100, 101, 100, 102.5]) * PX
+    records["size"] = [1, 2, 3, 4]
+    profile = VolumeProfile(tick=2)
+    profile.update(records[:2])
+    profile.update(records[2:])
+    result = profile.profile()
+    assert_that(list(result["price"]), equal_to([100.0, 102.0]))
+    assert_that(list(result["volume"]), equal_to([6.0, 4.0]))
+    assert_that(list(result["share"]), equal_to([0.6, 0.4]))
+
+
+def test_analyze(tmp_path, write_dbz):
+    """Files are analyzed in one pass into the latest statistics of each
+    symbol, the statistics of every record and a volume profile."""
+    path = write_dbz(quotes(1000, products=2))
+    metadata = {"schema": "mbp-1", "mappings": {"ESH1": [{"symbol": "1"}]}}
+    output = tmp_path / "rolling.json"
+    latest, profile = analyze(
+        [path],
+        Window(count=10),
+        output=output,
+        fmt="json",
+        metadata=metadata,
+        chunk_bytes=4096,
+    )
+    assert_that(list(latest["symbol"]), equal_to(["0", "ESH1"]))
+    assert_that(list(latest["count"]), equal_to([10, 10]))
+    assert_that(
+        profile["volume"].sum(), equal_to(quotes(1000, 2)["size"].sum())
+    )
+    written = pandas.read_json(output, lines=True)
+    assert_that(len(written), equal_to(1000))
+
+    with pytest.raises(ValueError):
+        analyze([], Window(count=10))
+
+
+@pytest.mark.benchmark
+def test_rolling_analytics_fast():
+    """Rolling statistics are computed at millions of records a second."""
+    rng = numpy.random.default_rng(0)
+    records = numpy.zeros(4_000_000, dtype=record_dtype("trades"))
+    records["product_id"] = rng.integers(0, 100, len(records))
+    records["ts_event"] = numpy.arange(len(records)) * 1000
+    records["price"] = rng.integers(90, 110, len(records)) * PX
+    records["size"] = 1
+    analytics = RollingAnalytics(Window(duration=10**8))
+    started = time.perf_counter()
+    for batch in numpy.array_split(records, 4):
+        analytics.update(batch)
+    rate = len(records) / (time.perf_counter() - started)
+
+    assert_that(rate, greater_than(1_000_000))
+
+
+@pytest.mark.benchmark
+def test_rolling_analytics_small_batches():
+    """Batches much smaller than their window are computed about as fast as
+    large batches, since records kept for the window are not recomputed."""
+    records = numpy.zeros(200_000, dtype=record_dtype("trades"))
+    records["ts_event"] = numpy.arange(len(records))
+    records["price"] = (
+        numpy.random.default_rng(0).integers(90, 110, len(records)) * PX
+    )
+    records["size"] = 1
+
+    def rate(window: Window, batches: int) -> float:
+        analytics = RollingAnalytics(window)
+        started = time.perf_counter()
+        for batch in numpy.array_split(records, batches):
+            analytics.update(batch)
+        return len(records) / (time.perf_counter() - started)
+
+    for window in (Window(count=100_000), Window(duration=100_000)):
+        # Recomputing every kept record would be a hundred times slower.
+        assert_that(rate(window, 200) * 10, greater_than(rate(window, 2)))
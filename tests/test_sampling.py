@@ -0,0 +1,174 @@
+"""Unit tests for utilities.sampling"""
+import time
+from unittest import mock
+
+import numpy
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import close_to
+from hamcrest import contains_exactly
+from hamcrest import equal_to
+from hamcrest import greater_than
+from hamcrest import less_than
+
+from dbtoys.utilities.dbz import record_dtype
+from dbtoys.utilities.sampling import Reservoir
+from dbtoys.utilities.sampling import StratifiedReservoir
+from dbtoys.utilities.sampling import sample_files
+from dbtoys.utilities.sampling import sample_window
+
+TRADES = record_dtype("trades")
+
+
+def trades(count: int, products: int = 1) -> numpy.ndarray:
+    """Trades numbered by ts_event, cycling through products."""
+    records = numpy.zeros(count, dtype=TRADES)
+    records["ts_event"] = numpy.arange(count)
+    records["product_id"] = numpy.arange(count) % products
+    records["price"] = 10**9
+    return records
+
+
+def test_reservoir_uniform():
+    """Every record is equally likely to be sampled, whatever the chunks."""
+    records = trades(1000)
+    hits = numpy.zeros(len(records))
+    for seed in range(1000):
+        reservoir = Reservoir(10, TRADES, numpy.random.default_rng(seed))
+        for chunk in numpy.array_split(records, 7):
+            reservoir.add(chunk)
+        sample = reservoir.records
+        assert_that(len(numpy.unique(sample["ts_event"])), equal_to(10))
+        assert_that(
+            list(sample["ts_event"]), equal_to(sorted(sample["ts_event"]))
+        )
+        hits[sample["ts_event"]] += 1
+    # Each record is expected in 10 samples of 1000; halves are 5000 each.
+    assert_that(abs(hits[:500].sum() - 5000), less_than(250))
+
+
+def test_reservoir_small_stream():
+    """A stream smaller than the sample is kept whole."""
+    reservoir = Reservoir(10, TRADES)
+    reservoir.add(trades(4))
+    assert_that(list(reservoir.records["ts_event"]), equal_to([0, 1, 2, 3]))
+    with pytest.raises(ValueError):
+        Reservoir(0, TRADES)
+
+
+def test_stratified_reservoir():
+    """Each product is sampled separately."""
+    reservoir = StratifiedReservoir(5, TRADES, numpy.random.default_rng(0))
+    reservoir.add(trades(1000, products=3))
+    reservoir.add(trades(2, products=1))
+    sample = reservoir.records
+    assert_that(reservoir.seen, equal_to(1002))
+    assert_that(
+        list(numpy.bincount(sample["product_id"])), contains_exactly(5, 5, 5)
+    )
+
+
+def test_sample_files(write_dbz):
+    """Files are sampled into a preview with symbols and pretty values."""
+    path = write_dbz(trades(10_000, products=2))
+    metadata = {"schema": "trades", "mappings": {"ESH1": [{"symbol": "1"}]}}
+    result = sample_files(
+        [path], size=3, by_symbol=True, seed=1, metadata=metadata
+    )
+    assert_that(list(result["symbol"]), equal_to(["0"] * 3 + ["ESH1"] * 3))
+    assert_that(list(result["price"]), equal_to([1.0] * 6))
+    assert_that(result["ts_event"].dt.year.iloc[0], equal_to(1970))
+
+    with pytest.raises(ValueError):
+        sample_files([])
+
+
+def test_sample_window():
+    """Remote windows are downloaded in limited time strata."""
+    bento = mock.MagicMock()
+    bento.metadata = {"mappings": {}}
+    bento.to_ndarray.return_value = trades(8)
+    timeseries = mock.MagicMock()
+    timeseries.stream.return_value = bento
+
+    result = sample_window(
+        timeseries,
+        "GLBX.MDP3",
+        ["ESH1"],
+        "trades",
+        "2022-01-01",
+        "2022-01-05",
+        size=8,
+        seed=0,
+        count=4,
+    )
+    assert_that(len(result), equal_to(8))
+    calls = timeseries.stream.call_args_list
+    bounds = pandas.date_range("2022-01-01", "2022-01-05", periods=9)
+    assert_that(
+        sorted(call.kwargs["end"] for call in calls),
+        contains_exactly(*(bound.isoformat() for bound in bounds[1:])),
+    )
+    for call in calls:
+        end = pandas.Timestamp(call.kwargs["end"])
+        start = pandas.Timestamp(call.kwargs["start"])
+        assert_that(end - start <= bounds[1] - bounds[0], equal_to(True))
+    assert_that({call.kwargs["limit"] for call in calls}, equal_to({1}))
+
+    with pytest.raises(ValueError):
+        sample_window(timeseries, "GLBX.MDP3", ["ESH1"], "trades", 2, 1)
+
+
+def test_sample_window_spread():
+    """Records are downloaded from random times within their strata, not
+    from the start of each stratum."""
+    window_start = pandas.Timestamp("2022-01-01", tz="UTC")
+
+    def stream(start, limit, **_):
+        # A record every nanosecond, so the first is at the start.
+        bento = mock.MagicMock()
+        bento.metadata = {"mappings": {}}
+        records = trades(limit)
+        records["ts_event"] += pandas.Timestamp(start).value
+        bento.to_ndarray.return_value = records
+        return bento
+
+    timeseries = mock.MagicMock()
+    timeseries.stream.side_effect = stream
+    offsets = []
+    for seed in range(200):
+        result = sample_window(
+            timeseries,
+            "GLBX.MDP3",
+            ["ESH1"],
+            "trades",
+            window_start,
+            window_start + pandas.Timedelta(days=2),
+            size=2,
+            seed=seed,
+            count=2,
+        )
+        days = (result["ts_event"] - window_start) / pandas.Timedelta(days=1)
+        assert_that(list(days.astype(int)), equal_to([0, 1]))
+        offsets.extend(days % 1)
+    # Uniform offsets within a stratum average a half.
+    assert_that(float(numpy.mean(offsets)), close_to(0.5, 0.05))
+    assert_that(min(offsets), less_than(0.05))
+    assert_that(max(offsets), greater_than(0.95))
+
+
+@pytest.mark.benchmark
+def test_reservoir_fast():
+    """Sampling a hundred million records skips most of them."""
+    reservoir = Reservoir(20, TRADES, numpy.random.default_rng(0))
+    chunk = trades(1_000_000)
+    started = time.perf_counter()
+    for _ in range(100):
+        reservoir.add(chunk)
+    elapsed = time.perf_counter() - started
+
+    assert_that(reservoir.seen, equal_to(100_000_000))
+    assert_that(elapsed, less_than(0.5))
@@ -0,0 +1,149 @@
+"""Unit tests for the dbexplore cantrip server"""
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import contains_string
+from hamcrest import equal_to
+from hamcrest import is_not
+
+from dbtoys.dbexplore.app import DataBentoExplorer
+from dbtoys.dbexplore.server import DEFAULT_SOCKET_PATH
+from dbtoys.dbexplore.server import CantripServer
+from dbtoys.dbexplore.server import forward_cantrip
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"),
+    reason="Unix domain sockets are not supported on this platform",
+)
+
+
+@pytest.fixture(name="socket_path")
+def fixture_socket_path(tmp_path: Path) -> Path:
+    """A path for the server socket."""
+    return tmp_path / "dbexplore.sock"
+
+
+@pytest.fixture(name="dbexplore")
+def fixture_dbexplore() -> DataBentoExplorer:
+    """Fixture for the dbexplore toy."""
+    app = DataBentoExplorer(api_key="UNITTEST")
+    setattr(app, "_historical_client", mock.MagicMock())
+    return app
+
+
+@pytest.fixture(name="cantrip_server")
+def fixture_cantrip_server(dbexplore: DataBentoExplorer, socket_path: Path):
+    """A cantrip server running in a background thread."""
+    server = CantripServer(socket_path, dbexplore)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_forward_cantrip(
+    cantrip_server: CantripServer,
+    dbexplore: DataBentoExplorer,
+    socket_path: Path,
+    capsys,
+):
+    """Cantrips forwarded to the server run against the warm explorer."""
+    metadata = dbexplore.historical_client.metadata
+    metadata.list_datasets.return_value = ["GLBX.MDP3", "XNAS.ITCH"]
+
+    for _ in range(3):
+        exit_code = forward_cantrip("list_datasets", socket_path=socket_path)
+        assert_that(exit_code, equal_to(0))
+
+    assert_that(metadata.list_datasets.call_count, equal_to(3))
+    assert_that(
+        capsys.readouterr().out,
+        contains_string("GLBX.MDP3  XNAS.ITCH\n"),
+    )
+
+
+def test_forward_cantrip_stderr(
+    cantrip_server: CantripServer,
+    socket_path: Path,
+    capsys,
+):
+    """Errors from the served explorer are returned on stderr."""
+    exit_code = forward_cantrip(
+        "list_schemas NOT.A.DATASET", socket_path=socket_path
+    )
+    assert_that(exit_code, is_not(equal_to(0)))
+    captured = capsys.readouterr()
+    assert_that(captured.err, contains_string("invalid choice"))
+    assert_that(captured.out, equal_to(""))
+
+
+def test_forward_cantrip_no_server(socket_path: Path, capsys):
+    """Forwarding without a running server fails with an exit code."""
+    exit_code = forward_cantrip("list_datasets", socket_path=socket_path)
+    assert_that(exit_code, is_not(equal_to(0)))
+    assert_that(capsys.readouterr().err, contains_string(str(socket_path)))
+
+
+def test_server_refuses_running_socket(
+    cantrip_server: CantripServer,
+    dbexplore: DataBentoExplorer,
+    socket_path: Path,
+):
+    """A second server must not steal the socket of a live server."""
+    with pytest.raises(OSError):
+        CantripServer(socket_path, dbexplore)
+
+
+def test_forward_cantrip_no_response(socket_path: Path, capsys):
+    """A server closing without a response fails with an exit code."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(str(socket_path))
+        listener.listen(1)
+
+        def hang_up():
+            connection, _ = listener.accept()
+            connection.recv(1024)
+            connection.close()
+
+        thread = threading.Thread(target=hang_up, daemon=True)
+        thread.start()
+        exit_code = forward_cantrip("list_datasets", socket_path=socket_path)
+        thread.join()
+
+    assert_that(exit_code, is_not(equal_to(0)))
+    assert_that(capsys.readouterr().err, contains_string(str(socket_path)))
+
+
+def test_forward_empty_cantrip(cantrip_server: CantripServer, socket_path):
+    """An empty cantrip is answered with an error instead of hanging up."""
+    exit_code = forward_cantrip("", socket_path=socket_path)
+    assert_that(exit_code, equal_to(2))
+
+
+def test_socket_is_private(cantrip_server: CantripServer, socket_path: Path):
+    """Only the user serving cantrips may connect to the socket."""
+    assert_that(socket_path.stat().st_mode & 0o077, equal_to(0))
+    assert_that(DEFAULT_SOCKET_PATH.parent.name, contains_string("dbtoys-"))
+
+
+def test_remote_requires_cantrip():
+    """--remote without a cantrip, or with --serve, is a usage error."""
+    for args in (["--remote"], ["--remote", "--serve"]):
+        result = subprocess.run(
+            [sys.executable, "-m", "dbtoys.dbexplore", *args],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        assert_that(result.returncode, equal_to(2))
+        assert_that(result.stderr, contains_string("--remote"))
@@ -0,0 +1,114 @@
+"""Unit tests for utilities.singleflight"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pandas
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+from hamcrest import only_contains
+
+from dbtoys.utilities.singleflight import SingleFlight
+from dbtoys.utilities.singleflight import SingleFlightClient
+from dbtoys.utilities.singleflight import request_key
+
+WORKERS = 8
+
+
+def wait_for_waiters(group: SingleFlight, count: int):
+    """Spin until count callers have joined the group."""
+    while group.stats()["requests"] < count:
+        threading.Event().wait(0.001)
+
+
+def test_single_flight_coalesces():
+    """Concurrent identical requests share a single execution."""
+    group = SingleFlight()
+    release = threading.Event()
+    func = mock.MagicMock(side_effect=lambda: release.wait() and "result")
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = [
+            executor.submit(group.do, "key", func) for _ in range(WORKERS)
+        ]
+        wait_for_waiters(group, WORKERS)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert_that(results, only_contains("result"))
+    func.assert_called_once()
+    assert_that(
+        group.stats(),
+        equal_to(
+            {
+                "requests": WORKERS,
+                "executed": 1,
+                "coalesced": WORKERS - 1,
+                "in_flight": 0,
+            }
+        ),
+    )
+
+
+def test_single_flight_shares_exception():
+    """Waiting callers receive the exception of the shared request."""
+    group = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait()
+        raise ValueError("shared")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(group.do, "key", fail) for _ in range(2)]
+        wait_for_waiters(group, 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="shared"):
+                future.result()
+    assert_that(group.stats()["executed"], equal_to(1))
+
+
+def test_single_flight_sequential():
+    """Completed requests are not cached."""
+    group = SingleFlight()
+    func = mock.MagicMock(return_value=1)
+    group.do("key", func)
+    group.do("key", func)
+    assert_that(func.call_count, equal_to(2))
+    assert_that(group.stats()["coalesced"], equal_to(0))
+
+
+def test_request_key_normalized():
+    """Equivalent arguments produce the same request key."""
+    assert_that(
+        request_key(
+            "metadata",
+            "get_cost",
+            (),
+            {"symbols": ["ES"], "start": pandas.Timestamp("2022-01-01")},
+        ),
+        equal_to(
+            request_key(
+                "metadata",
+                "get_cost",
+                (),
+                {"start": "2022-01-01T00:00:00", "symbols": ("ES",)},
+            )
+        ),
+    )
+
+
+def test_single_flight_client():
+    """Only read only APIs of the client are coalesced."""
+    client = mock.MagicMock()
+    group = SingleFlight()
+    proxy = SingleFlightClient(client, group)
+
+    proxy.metadata.list_schemas(dataset="GLBX.MDP3")
+    client.metadata.list_schemas.assert_called_once_with(dataset="GLBX.MDP3")
+    assert_that(proxy.timeseries, equal_to(client.timeseries))
+    assert_that(group.stats()["requests"], equal_to(1))
@@ -0,0 +1,102 @@
+"""Unit tests for utilities.symbology"""
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from unittest import mock
+
+import pytest
+
+# pyright: reportPrivateImportUsage=false
+from hamcrest import assert_that
+from hamcrest import equal_to
+
+from dbtoys.utilities.symbology import SymbolInterval
+from dbtoys.utilities.symbology import SymbologyCache
+from dbtoys.utilities.symbology import infer_stype
+from dbtoys.utilities.symbology import product_ids
+from dbtoys.utilities.symbology import resolve
+
+
+def fake_resolve(symbols: List[str], **_) -> Dict[str, Any]:
+    """A symbology response mapping each symbol to one product ID,
+    except symbols starting with X which are not found.
+    """
+    return {
+        "result": {
+            symbol: [
+                {
+                    "d0": "2022-01-01",
+                    "d1": "2022-02-01",
+                    "s": "" if symbol.startswith("X") else str(len(symbol)),
+                }
+            ]
+            for symbol in symbols
+        }
+    }
+
+
+@pytest.fixture(name="client")
+def fixture_client() -> mock.MagicMock:
+    """A client answering symbology requests."""
+    client = mock.MagicMock()
+    client.symbology.resolve.side_effect = fake_resolve
+    return client
+
+
+@pytest.mark.parametrize(
+    "symbol, stype",
+    [
+        pytest.param("5482", "product_id"),
+        pytest.param("ESH1", "native"),
+        pytest.param("BRK.B", "native"),
+        pytest.param("ES.c.0", "smart"),
+        pytest.param("ES.FUT", "smart"),
+    ],
+)
+def test_infer_stype(symbol: str, stype: str):
+    """Symbol types are inferred from their form."""
+    assert_that(infer_stype(symbol), equal_to(stype))
+
+
+def test_resolve_mixed(client: mock.MagicMock):
+    """Mixed symbols are resolved in one batch per type."""
+    result = resolve(
+        client,
+        "GLBX.MDP3",
+        ["ESH1", "5482", "ES.c.0", "NQH1"],
+        start="2022-01-10",
+    )
+    assert_that(client.symbology.resolve.call_count, equal_to(2))
+    assert_that(
+        result["5482"],
+        equal_to([SymbolInterval("2022-01-10", "2022-01-11", "5482")]),
+    )
+    assert_that(product_ids(result), equal_to(["5482", "4", "6"]))
+
+
+def test_resolve_cached(tmp_path: Path, client: mock.MagicMock):
+    """Resolved symbols, found or not, are answered from the cache."""
+    cache = SymbologyCache(tmp_path / "symbology.db")
+    symbols = [f"S{i}" for i in range(5000)] + ["XMISSING"]
+    first = resolve(
+        client,
+        "GLBX.MDP3",
+        symbols,
+        start="2022-01-01",
+        end="2022-02-01",
+        cache=cache,
+    )
+    # Requests are split into batches the API accepts.
+    assert_that(client.symbology.resolve.call_count, equal_to(3))
+    assert_that("XMISSING" in first, equal_to(False))
+
+    client.symbology.resolve.reset_mock()
+    second = resolve(
+        client, "GLBX.MDP3", symbols, start="2022-01-05", cache=cache
+    )
+    client.symbology.resolve.assert_not_called()
+    assert_that(second, equal_to(first))
+
+    resolve(client, "GLBX.MDP3", ["S1"], start="2022-03-01", cache=cache)
+    client.symbology.resolve.assert_called_once()